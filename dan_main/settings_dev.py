@@ -216,6 +216,46 @@ COMMON_ALLERGEN_MINIMUM_INDEX = 9
 # 他システムからのWebAPI呼出時の認証キー
 WEB_API_KEY = 'dan_2024'
 
+# バッチ処理ワーカー(batch_workerコマンド)の同時実行プロセス数と、待機中ジョブの確認間隔(秒)
+BATCH_JOB_WORKERS = 2
+BATCH_JOB_POLL_INTERVAL = 5
+
+# バッチ処理状況画面リロード間隔(ミリ秒)
+BATCH_JOB_AUTO_RELOAD_INTERVAL = 10 * 1000
+
+# 祝日・長期休暇の読込内容を保持する時間(秒)。保存・削除したプロセスでは即時に読み込み直す
+BUSINESS_CALENDAR_TIMEOUT = 60 * 5
+
+# 製造日・喫食日の対応を保持する期間(当日より前の日数, 当日より後の日数)
+COOKING_CALENDAR_WINDOW_DAYS = (31, 31)
+
+# 集計処理(食数集計・P7・調理表)の中間ファイルの出力レベル
+# off:出力しない、summary:段階毎の行数・食数合計をログ出力、full:summaryに加え中間ファイル(CSV)を出力
+# 調理表(cooking_direction)は設定値によらずsummaryで、中間ファイルは--trace full指定時のみ出力する
+PIPELINE_TRACE_LEVEL = 'full'
+
+# ピッキング用QRコード画像の保存形式(files:画像ファイル毎、zip:1つのアーカイブ)と、作成時の同時実行プロセス数
+QR_IMAGE_STORE = 'files'
+QR_IMAGE_PROCESSES = 4
+
+# 帳票出力1回あたりに、QRコード画像の読込内容を保持する件数
+QR_IMAGE_CACHE_SIZE = 4096
+
+# ピッキング指示書を全種類出力する場合の同時実行プロセス数(1の場合は順に出力する)
+PICKING_DIRECTION_PROCESSES = 1
+
+# 調理表登録時に、計量表を喫食日・食事区分毎に同時に出力するプロセス数(1の場合は順に出力する)
+MEASURE_TABLE_PROCESSES = 1
+
+# 計量表出力時に保持する注文情報(スナップショット・集計済みの注文内容)の使用メモリの上限(バイト)
+MEASURE_ORDER_SNAPSHOT_MAX_BYTES = 256 * 1024 * 1024
+
+# 調理表の読込内容(中間ファイル)の保存先。調理表のファイル名毎のフォルダに最新の内容のみ保持し、計量表・加熱加工記録簿の出力で使う
+COOKING_DIRECTION_SHEET_DIR = os.path.join(OUTPUT_DIR, 'cooking_direction_sheet')
+
+# 調理表の中間ファイルを保持する日数(調理表のファイル名毎のフォルダを、最後に更新してからこの日数が経過したら削除する)
+COOKING_DIRECTION_SHEET_RETENTION_DAYS = 62
+
 """
 if DEBUG:
     INTERNAL_IPS = ['127.0.0.1']
@@ -450,7 +450,7 @@ admin.site.register(RawPlatePackageMaster, RawPlatePackageMasterAdmin)
 
 from .models import PickingResult
 class PickingResultAdmin(admin.ModelAdmin):
-    list_display = ('updated_at', 'document_file')
+    list_display = ('updated_at', 'document_file', 'inserted_count', 'duplicate_count', 'rejected_count')
     ordering = ('-updated_at',)
 
 admin.site.register(PickingResult, PickingResultAdmin)
@@ -506,3 +506,12 @@ class OutputSampleP7Admin(admin.ModelAdmin):
 
 admin.site.register(OutputSampleP7, OutputSampleP7Admin)
 
+
+
+from .models import BatchJob
+class BatchJobAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'command_name', 'target', 'status', 'finished_at', 'requested_by')
+    list_filter = ('status', 'command_name')
+    ordering = ('-created_at',)
+
+admin.site.register(BatchJob, BatchJobAdmin)
@@ -5,7 +5,6 @@ from itertools import groupby
 import json
 import math
 import logging
-import re
 import traceback
 import uuid
 
@@ -23,6 +22,7 @@ from accounts.models import User
 from .api_models import OperatedUnit, OrderRateOutput, UnitOrder, MixRiceStructureOutput, GosuCalculationItemOutput, \
     GosuCalculationOutput
 from .encrypt import Encrypt
+from .plate_name_parser import PlateNameParser
 from .models import NewYearDaySetting, UserOption, GenericSetoutDirection, \
     UnitMaster, Order, OrderRice, UserCreationInput, AggMeasureMixRiceMaster, MixRiceDay, MealDisplay, NewUnitPrice, \
     MenuDisplay, GosuLogging, UnitGosuLogging
@@ -957,11 +957,11 @@ class MixRiceStructureView(APIView):
         """
         料理名から1合当たりの数量を取得する
         """
-        replaced_name = plate.replace('ｇ', 'g')
+        parsed = PlateNameParser.parse(plate)
         logger.info('_get_gosu_quantity_from_plate')
-        logger.info(replaced_name)
-        res = re.findall('(\d+|\d+.\d+)g', replaced_name)
-        res2 = re.findall('(\d+|\d+.\d+)枚', replaced_name)
+        logger.info(parsed.name)
+        res = parsed.grams
+        res2 = parsed.sheets
         if res:
             base_quantity = float(res[index])
 
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class WebOrderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'web_order'
+
+    def ready(self):
+        # 祝日・長期休暇の保存時に、営業日カレンダーを読み込み直すためのシグナル登録
+        from . import business_calendar
+
+        # 調理表献立の保存時に、製造日・喫食日の対応を登録するためのシグナル登録
+        from . import cooking_calendar
@@ -0,0 +1,176 @@
+import datetime as dt
+import logging
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import HolidayList, JapanHoliday
+
+logger = logging.getLogger(__name__)
+
+
+class LongHoliday:
+    """
+    長期休暇(HolidayList)の期間
+    """
+    def __init__(self, holiday):
+        self.id = holiday.id
+        self.name = holiday.holiday_name
+        self.start_date = holiday.start_date
+        self.end_date = holiday.end_date
+        self.limit_day = holiday.limit_day
+
+    def includes(self, day):
+        return self.start_date <= day <= self.end_date
+
+
+class BusinessCalendar:
+    """
+    祝日(JapanHoliday)・長期休暇(HolidayList)を読み込み、営業日の計算を行うクラス。
+    読み込んだ内容はプロセス内で保持し、祝日・長期休暇の保存・削除時と、一定時間経過後に読み込み直す。
+    """
+    # 営業日とする曜日(numpy.busdaycalendarのweekmask、月曜日〜日曜日)
+    WEEKMASK_V1 = '1111110'     # 日曜・祝日以外(食数変更期限ルールバージョン1)
+    WEEKMASK_V2 = '1111100'     # 土曜・日曜・祝日以外(食数変更期限ルールバージョン2)
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, japan_holidays, long_holidays):
+        self.japan_holidays = sorted(set(japan_holidays))
+        self.japan_holiday_set = set(self.japan_holidays)
+        self.np_japan_holidays = np.array(self.japan_holidays, dtype='datetime64[D]')
+
+        self.long_holidays = sorted(
+            [LongHoliday(x) for x in long_holidays], key=lambda x: (x.limit_day or dt.date.min, x.id))
+
+        # 長期休暇の期間を、重複・連続する期間をまとめて開始日順に保持する
+        intervals = []
+        for holiday in sorted(self.long_holidays, key=lambda x: x.start_date):
+            if intervals and (holiday.start_date <= intervals[-1][1] + dt.timedelta(days=1)):
+                intervals[-1][1] = max(intervals[-1][1], holiday.end_date)
+            else:
+                intervals.append([holiday.start_date, holiday.end_date])
+        self.interval_starts = [x[0] for x in intervals]
+        self.interval_ends = [x[1] for x in intervals]
+
+        self._busday_calendars = {}
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls):
+        japan_holidays = JapanHoliday.objects.all().values_list('date', flat=True)
+        long_holidays = HolidayList.objects.all()
+        return cls(list(japan_holidays), list(long_holidays))
+
+    @classmethod
+    def get(cls):
+        """
+        読込済みのカレンダーを取得する。未読込・期限切れの場合は読み込む
+        """
+        instance = cls._instance
+        if instance and (time.monotonic() - instance.loaded_at < settings.BUSINESS_CALENDAR_TIMEOUT):
+            return instance
+
+        with cls._lock:
+            instance = cls.load()
+            cls._instance = instance
+        return instance
+
+    @classmethod
+    def clear(cls):
+        cls._instance = None
+
+    def _to_date(self, day):
+        if isinstance(day, dt.datetime):
+            return day.date()
+        return day
+
+    def _get_busday_calendar(self, weekmask: str):
+        busday_calendar = self._busday_calendars.get(weekmask, None)
+        if busday_calendar is None:
+            busday_calendar = np.busdaycalendar(weekmask=weekmask, holidays=self.np_japan_holidays)
+            self._busday_calendars[weekmask] = busday_calendar
+        return busday_calendar
+
+    def _offset(self, day, days: int, weekmask: str):
+        """
+        営業日の移動。非営業日の場合は、次の営業日を起点とする。時刻付きの場合は時刻を保持する
+        """
+        base_day = self._to_date(day)
+        result = np.busday_offset(
+            np.datetime64(base_day, 'D'), days, roll='forward', busdaycal=self._get_busday_calendar(weekmask))
+        return day + dt.timedelta(days=int((result - np.datetime64(base_day, 'D')).astype('int64')))
+
+    def is_japan_holiday(self, day):
+        return self._to_date(day) in self.japan_holiday_set
+
+    def is_working_day(self, day, weekmask: str = WEEKMASK_V1):
+        """
+        営業日(weekmaskの曜日、かつ祝日以外)かどうか
+        """
+        return (weekmask[day.weekday()] == '1') and (not self.is_japan_holiday(day))
+
+    def add_working_days(self, day, days: int, weekmask: str = WEEKMASK_V1):
+        """
+        指定日(非営業日の場合は次の営業日)から、営業日で指定日数後の日付を取得する
+        """
+        return self._offset(day, days, weekmask)
+
+    def prev_working_day(self, day, days: int, weekmask: str = WEEKMASK_V2):
+        """
+        指定日から、営業日で指定日数前の日付を取得する。指定日が非営業日の場合は、1日前から数える
+        """
+        if not days:
+            return day
+        return self._offset(day, -days, weekmask)
+
+    def _find_interval(self, day):
+        index = bisect_right(self.interval_starts, day) - 1
+        if (index >= 0) and (day <= self.interval_ends[index]):
+            return index
+        return None
+
+    def is_long_holiday(self, day):
+        """
+        指定日が長期休暇に含まれるかどうか
+        """
+        return self._find_interval(self._to_date(day)) is not None
+
+    def next_non_holiday(self, day):
+        """
+        指定日以降で、長期休暇に含まれない最初の日
+        """
+        index = self._find_interval(day)
+        if index is None:
+            return day
+        return self.interval_ends[index] + dt.timedelta(days=1)
+
+    def prev_non_holiday(self, day):
+        """
+        指定日以前で、長期休暇に含まれない最後の日
+        """
+        index = self._find_interval(day)
+        if index is None:
+            return day
+        return self.interval_starts[index] - dt.timedelta(days=1)
+
+    def get_long_holidays(self, limit_day):
+        """
+        入力締め切り日が指定日以降の長期休暇を、締め切り日順に取得する
+        """
+        return [x for x in self.long_holidays if x.limit_day and (x.limit_day >= limit_day)]
+
+
+@receiver(post_save, sender=JapanHoliday)
+@receiver(post_delete, sender=JapanHoliday)
+@receiver(post_save, sender=HolidayList)
+@receiver(post_delete, sender=HolidayList)
+def clear_business_calendar(sender, **kwargs):
+    BusinessCalendar.clear()
@@ -0,0 +1,188 @@
+import datetime as dt
+import logging
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import CookingDirectionPlate, CookingEatingDay
+
+logger = logging.getLogger(__name__)
+
+
+class CookingCalendar:
+    """
+    製造日と、製造日に作成する喫食日・食事区分の対応を管理するクラス。
+    対応は調理表献立(CookingDirectionPlate)の保存時にCookingEatingDayへ登録し、
+    当日の前後一定期間(COOKING_CALENDAR_WINDOW_DAYS)の内容をプロセス内で保持する。
+    CookingEatingDayが更新された場合(件数・最大ID・最終更新日時で判断)は、読み込み直す。
+    リクエストの処理中は、更新の確認をリクエスト毎に1度のみ行う。
+    """
+    MEAL_ORDER = {'朝食': 0, '昼食': 1, '夕食': 2}
+
+    _instance = None
+    _lock = threading.Lock()
+    # スレッド毎のリクエスト処理中かどうか(in_request)と、リクエスト内で更新を確認済みかどうか(is_checked)
+    _request_state = threading.local()
+
+    def __init__(self, rows, stamp=None, loaded_day=None):
+        self.stamp = stamp
+        self.loaded_day = loaded_day
+
+        # key:製造日、value:(喫食日, 食事区分)のリスト(喫食日・食事区分の順)
+        self.entries = {}
+        # key:(喫食日, 食事区分)、value:製造日
+        self.cooking_days = {}
+        for cooking_day, eating_day, meal_name in rows:
+            self._add(cooking_day, eating_day, meal_name)
+        for entry in self.entries.values():
+            entry.sort(key=self._sort_key)
+
+    def _sort_key(self, entry):
+        return entry[0], self.MEAL_ORDER.get(entry[1], len(self.MEAL_ORDER)), entry[1]
+
+    def _add(self, cooking_day, eating_day, meal_name):
+        self.entries.setdefault(cooking_day, []).append((eating_day, meal_name))
+        self.cooking_days[(eating_day, meal_name)] = cooking_day
+
+    @classmethod
+    def get_stamp(cls):
+        stamp = CookingEatingDay.objects.aggregate(Count('id'), Max('id'), Max('updated_at'))
+        return tuple(stamp.values())
+
+    @classmethod
+    def load(cls, stamp=None):
+        before, after = settings.COOKING_CALENDAR_WINDOW_DAYS
+        today = dt.date.today()
+        rows = CookingEatingDay.objects.filter(
+            cooking_day__range=[today - dt.timedelta(days=before), today + dt.timedelta(days=after)]
+        ).values_list('cooking_day', 'eating_day', 'meal_name')
+        return cls(list(rows), stamp, today)
+
+    @classmethod
+    def get(cls):
+        """
+        読込済みの対応を取得する。未読込・更新されている場合と、日付が変わった場合は読み込む
+        """
+        instance = cls._instance
+        state = cls._request_state
+        is_today = instance and (instance.loaded_day == dt.date.today())
+        if is_today and getattr(state, 'is_checked', False):
+            return instance
+
+        stamp = cls.get_stamp()
+        if not (is_today and (instance.stamp == stamp)):
+            with cls._lock:
+                instance = cls.load(stamp)
+                cls._instance = instance
+
+        if getattr(state, 'in_request', False):
+            state.is_checked = True
+        return instance
+
+    @classmethod
+    def clear(cls):
+        cls._instance = None
+
+    @classmethod
+    def start_request(cls):
+        cls._request_state.in_request = True
+        cls._request_state.is_checked = False
+
+    @classmethod
+    def finish_request(cls):
+        cls._request_state.in_request = False
+        cls._request_state.is_checked = False
+
+    @classmethod
+    def refresh(cls, cooking_day):
+        """
+        製造日の対応を、調理表献立から作成し直す
+        """
+        rows = CookingDirectionPlate.objects.filter(cooking_day=cooking_day).values_list(
+            'eating_day', 'meal_name').distinct().order_by('eating_day', 'meal_name')
+        with transaction.atomic():
+            CookingEatingDay.objects.filter(cooking_day=cooking_day).delete()
+            CookingEatingDay.objects.bulk_create(
+                [CookingEatingDay(cooking_day=cooking_day, eating_day=eating_day, meal_name=meal_name)
+                 for eating_day, meal_name in rows])
+        cls.clear()
+        logger.info(f'製造日・喫食日対応更新:製造日={cooking_day},件数={len(rows)}')
+
+    def _to_date(self, day):
+        if isinstance(day, dt.datetime):
+            return day.date()
+        return day
+
+    def get_entries(self, cooking_day):
+        """
+        製造日に作成する(喫食日, 食事区分)のリストを取得する
+        """
+        cooking_day = self._to_date(cooking_day)
+        if cooking_day in self.entries:
+            return self.entries[cooking_day]
+
+        # 保持期間外・未登録の製造日は読み込んで保持する。未登録の場合は調理表献立から作成する
+        rows = list(CookingEatingDay.objects.filter(cooking_day=cooking_day).values_list('eating_day', 'meal_name'))
+        if not rows:
+            rows = list(CookingDirectionPlate.objects.filter(cooking_day=cooking_day).values_list(
+                'eating_day', 'meal_name').distinct())
+        entry = sorted(rows, key=self._sort_key)
+        with self._lock:
+            self.entries[cooking_day] = entry
+            for eating_day, meal_name in entry:
+                self.cooking_days[(eating_day, meal_name)] = cooking_day
+        return entry
+
+    def get_dict_by_cooking_day(self, cooking_day):
+        """
+        製造日に作成する喫食日・食事区分のdict(key:食事区分、value:喫食日リスト)を返す。
+        """
+        eating_day_dict = {'朝食': [], '昼食': [], '夕食': []}
+        for eating_day, meal_name in self.get_entries(cooking_day):
+            eating_day_dict[meal_name].append(eating_day)
+        return eating_day_dict
+
+    def get_meals_dict_by_cooking_day(self, cooking_day):
+        """
+        製造日に作成する喫食日・食事区分のdict(key:喫食日、value:食事区分リスト)を返す。
+        """
+        meal_dict = {}
+        for eating_day, meal_name in self.get_entries(cooking_day):
+            meal_dict.setdefault(eating_day, []).append(meal_name)
+        return meal_dict
+
+    def get_eating_days(self, cooking_day):
+        """
+        製造日に作成する喫食日のリスト(昇順)を返す。
+        """
+        return sorted({x[0] for x in self.get_entries(cooking_day)})
+
+    def get_cooking_day(self, eating_day, meal_name):
+        """
+        喫食日・食事区分を作成する製造日を取得する(保持期間内のみ)。該当がない場合はNone
+        """
+        return self.cooking_days.get((self._to_date(eating_day), meal_name), None)
+
+
+@receiver(post_save, sender=CookingDirectionPlate)
+def add_cooking_eating_day(sender, instance, **kwargs):
+    # 調理表の読込ではまとめて作成し直すため、ここでは未登録の喫食日・食事区分の追加のみ行う
+    _, is_created = CookingEatingDay.objects.get_or_create(
+        cooking_day=instance.cooking_day, eating_day=instance.eating_day, meal_name=instance.meal_name)
+    if is_created:
+        CookingCalendar.clear()
+
+
+@receiver(request_started)
+def start_cooking_calendar_request(sender, **kwargs):
+    CookingCalendar.start_request()
+
+
+@receiver(request_finished)
+def finish_cooking_calendar_request(sender, **kwargs):
+    CookingCalendar.finish_request()
@@ -6,12 +6,17 @@ import re
 
 from django.conf import settings
 from django.core.exceptions import MultipleObjectsReturned
+from django.db import transaction
 from django.db.models import Sum
+from django.utils import timezone
 
 from .models import CookingDirectionPlate, AllergenPlateRelations, PlatePackageForPrint, CommonAllergen
 from .models import UncommonAllergen, Order, UncommonAllergenHistory, BackupAllergenPlateRelations, PackageMaster, UnitPackage
 from .models import TmpPlateNamePackage, OrderEveryday, RawPlatePackageMaster, AllergenMaster
 
+from .cooking_calendar import CookingCalendar
+from .plate_name_parser import PlateNameParser
+
 EATING_MEAL_REGEX_PATTERN = re.compile('■(\d+)/(\d+)(\D+)')
 KIND_REGEX_PATTERN = re.compile('\d+\s(.+)')
 # サンプル食種のリスト
@@ -27,6 +32,85 @@ SAMPLE_PLATE_TYPES = [
 logger = logging.getLogger(__name__)
 
 
+class CookingDirectionPlateIndex:
+    """
+    製造日の調理表献立をメモリ上に保持し、検索するクラス。
+    DBの検索(.first())と同じ結果になるよう、同じ条件の料理は先に登録したもの(IDの小さいもの)を返す。
+    """
+    def __init__(self, cooking_day, plates=None):
+        self.cooking_day = cooking_day
+        # key:(喫食日, 食事区分, インデックス, 基本食かどうか)
+        self.index_dict = {}
+        # key:(喫食日, 食事区分, 基本食かどうか, 料理名)。喫食日を指定しない検索はNoneをキーにする
+        self.name_dict = {}
+
+        if plates is None:
+            plates = CookingDirectionPlate.objects.filter(cooking_day=cooking_day).order_by('id')
+        self.extend(plates)
+
+    def extend(self, plates):
+        for plate in plates:
+            # 喫食日は文字列・日付のどちらでも指定されるため、文字列で比較する
+            eating_day = str(plate.eating_day)
+            self.index_dict.setdefault((eating_day, plate.meal_name, plate.index, plate.is_basic_plate), plate)
+            self.name_dict.setdefault((eating_day, plate.meal_name, plate.is_basic_plate, plate.plate_name), plate)
+            self.name_dict.setdefault((None, plate.meal_name, plate.is_basic_plate, plate.plate_name), plate)
+
+    def get(self, eating_day, meal_name, index, is_basic_plate):
+        return self.index_dict.get((str(eating_day), meal_name, index, is_basic_plate), None)
+
+    def find(self, meal_name, is_basic_plate, plate_name, eating_day=None):
+        eating_day = str(eating_day) if eating_day else None
+        return self.name_dict.get((eating_day, meal_name, is_basic_plate, plate_name), None)
+
+
+class AllergenPlateRelationBuffer:
+    """
+    調理表読込で登録するアレルギー代替食の関連をメモリ上に保持し、まとめて登録するクラス。
+    製造日の関連は登録前に全て削除されているため、登録済みの検索もメモリ上で行う。
+    """
+    def __init__(self):
+        # 登録順の関連のリスト
+        self.relations = []
+        # key:(代替対象の料理のID, 食種)、value:関連のリスト
+        self.relation_dict = {}
+
+    def _get_key(self, source, code):
+        return (source.id if source else None, code)
+
+    def add(self, plate, source, code):
+        relation = AllergenPlateRelations(plate=plate, source=source, code=code)
+        self.relations.append(relation)
+        self.relation_dict.setdefault(self._get_key(source, code), []).append(relation)
+        return relation
+
+    def exists(self, source, code):
+        return bool(self.relation_dict.get(self._get_key(source, code), None))
+
+    def delete_empty(self, source, code):
+        """
+        代替先のない関連を削除する
+        """
+        key = self._get_key(source, code)
+        empty_list = [x for x in self.relation_dict.get(key, []) if x.plate is None]
+        if empty_list:
+            self.relation_dict[key] = [x for x in self.relation_dict[key] if not (x in empty_list)]
+            self.relations = [x for x in self.relations if not (x in empty_list)]
+
+    def get_or_create(self, code, source):
+        relation_list = self.relation_dict.get(self._get_key(source, code), [])
+        if len(relation_list) > 1:
+            raise MultipleObjectsReturned(f'{source}-{code}')
+        elif relation_list:
+            return relation_list[0], False
+        else:
+            return self.add(None, source, code), True
+
+    def save(self):
+        AllergenPlateRelations.objects.bulk_create(self.relations, batch_size=1000)
+        logger.info(f'アレルギー代替食関連登録:件数={len(self.relations)}')
+
+
 class CookingDirectionPlatesManager:
     """
     調理表上の料理を管理するクラス
@@ -150,9 +234,8 @@ class CookingDirectionPlatesManager:
     @classmethod
     def backup_relations(cls, cooking_day):
         now = datetime.datetime.now()
-        for bk_relation in BackupAllergenPlateRelations.objects.filter(cooking_day=cooking_day, backuped_at=None):
-            bk_relation.backuped_at = now
-            bk_relation.save()
+        BackupAllergenPlateRelations.objects.filter(cooking_day=cooking_day, backuped_at=None).update(
+            backuped_at=now, updated_at=timezone.now())
 
         # 不要な項目を整理(Backupに残す必要のない、不要なデータを削除)
         qs = AllergenPlateRelations.objects.filter(
@@ -160,14 +243,18 @@ class CookingDirectionPlatesManager:
         ).select_related('source', 'plate').order_by(
             'source__eating_day', 'source__seq_meal', 'source__index', 'code')
         if qs.exists():
+            delete_ids = []
             for key, group in groupby(qs, key=lambda x: (x.source.eating_day, x.source.seq_meal, x.source.index, x.code)):
                 dst_list = [(x.id, x.plate) for x in group]
                 if len(dst_list) > 1:
                     for r_id, plate in dst_list:
                         if not plate:
-                            AllergenPlateRelations.objects.filter(id=r_id).delete()
+                            delete_ids.append(r_id)
+            if delete_ids:
+                AllergenPlateRelations.objects.filter(id__in=delete_ids).delete()
 
         qs = AllergenPlateRelations.objects.filter(source__cooking_day=cooking_day).select_related('plate', 'source')
+        bk_list = []
         for relation in qs:
             bk = BackupAllergenPlateRelations(
                 cooking_day=relation.source.cooking_day,
@@ -177,7 +264,8 @@ class CookingDirectionPlatesManager:
                 source_name=relation.source.plate_name,
                 code=relation.code
             )
-            bk.save()
+            bk_list.append(bk)
+        BackupAllergenPlateRelations.objects.bulk_create(bk_list, batch_size=1000)
 
     @classmethod
     def _conatins_eating_list(cls, key, eating_list):
@@ -188,9 +276,20 @@ class CookingDirectionPlatesManager:
         return False
 
     @classmethod
+    def _filter_backups(cls, backup_list, meal_name, code, source_name):
+        """
+        前回バックアップから、食事区分・食種・代替対象の料理名が一致するものを取得する(登録順)
+        """
+        # 代替対象の料理名は、DBの検索と同様に文字列として比較する
+        source_name = str(source_name)
+        return [x for x in backup_list if (x.meal_name == meal_name) and (x.code == code) and (x.source_name == source_name)]
+
+    @classmethod
+    @transaction.atomic
     def save(cls, plate_dict_list, cooking_day):
         """
         料理の情報をDBに登録する。
+        料理は喫食日・食事区分単位、アレルギー代替食の関連は製造日単位でまとめて登録し、登録済みの料理はメモリ上で検索する。
         """
 
         # 対象製造日の全情報を削除(別の製造日の料理でアレルギーのリレーションが組まれることはない)
@@ -199,26 +298,30 @@ class CookingDirectionPlatesManager:
         AllergenPlateRelations.objects.filter(source__cooking_day=cooking_day).delete()
         CookingDirectionPlate.objects.filter(cooking_day=cooking_day).delete()
 
-        test = list(BackupAllergenPlateRelations.objects.filter(cooking_day=cooking_day, meal_name='朝食', backuped_at=None))
+        backup_list = list(BackupAllergenPlateRelations.objects.filter(cooking_day=cooking_day, backuped_at=None).order_by('id'))
+        plate_index = CookingDirectionPlateIndex(cooking_day, plates=[])
+        relations = AllergenPlateRelationBuffer()
 
         for plate_list in plate_dict_list:
             eating_day, meal = cls.parse_eating_meal(plate_list[0]['eating_meal'], cooking_day)
 
+            meal_name = meal.strip()
+            if meal_name == '朝食':
+                seq = 7
+            elif meal_name == '昼食':
+                seq = 8
+            elif meal_name == '夕食':
+                seq = 9
+            else:
+                seq = 10
+
             # plate_list:喫食日・食事区分単位
             # 調理表料理情報を登録
+            new_plates = []
             for index, target_plate in enumerate(plate_list):
                 if cls.is_ignore_plate(target_plate):
                     continue
 
-                meal_name = meal.strip()
-                if meal_name == '朝食':
-                    seq = 7
-                elif meal_name == '昼食':
-                    seq = 8
-                elif meal_name == '夕食':
-                    seq = 9
-                else:
-                    seq = 10
                 if 'is_mix_rice' in target_plate:
                     is_mix_rice_value = target_plate['is_mix_rice']
                 else:
@@ -235,13 +338,17 @@ class CookingDirectionPlatesManager:
                     is_allergen_plate=target_plate['is_allergen'],
                     is_mix_rice=is_mix_rice_value
                 )
-                plate.save()
-                target_plate['instance'] = plate
-
-                target_plate['model_id'] = plate.id
+                new_plates.append((target_plate, plate))
 
                 # アレルギーの元料理が先のインデックスの場合があるので、アレルギーは別ループで対応
 
+            # 登録したIDを取得するため、料理は喫食日・食事区分単位で登録する
+            CookingDirectionPlate.objects.bulk_create([plate for _, plate in new_plates])
+            for target_plate, plate in new_plates:
+                target_plate['instance'] = plate
+                target_plate['model_id'] = plate.id
+            plate_index.extend([plate for _, plate in new_plates])
+
             # バックアップに自動判定とは別の代替元が設定されていた場合の情報保持dict
             plate_dict = {}
 
@@ -259,27 +366,14 @@ class CookingDirectionPlatesManager:
                         if isinstance(value, str):
                             kind = cls.parse_kind(key)
                             # 代替元料理の取得
-                            base_plate = CookingDirectionPlate.objects.filter(
-                                cooking_day=cooking_day,
-                                eating_day=eating_day,
-                                meal_name=meal_name,
-                                is_basic_plate=True,
-                                plate_name=value
-                            ).first()
+                            base_plate = plate_index.find(meal_name, True, value, eating_day=eating_day)
 
                             key_plate_dict = plate_dict[key]
 
                             # 前回バックアップの取得
-                            bk_qs = BackupAllergenPlateRelations.objects.filter(
-                                cooking_day=cooking_day,
-                                meal_name=meal_name,
-                                code=kind,
-                                source_name=value,
-                                backuped_at=None
-                            )
-                            if bk_qs.exists():
+                            bk_list = cls._filter_backups(backup_list, meal_name, kind, value)
+                            if bk_list:
                                 bk = None
-                                bk_list = list(bk_qs)
                                 for x in bk_list:
                                     if x.plate_name == target_plate['plate']:
                                         bk = x
@@ -292,140 +386,64 @@ class CookingDirectionPlatesManager:
                                     logger.info(f'hit:{bk.plate_name}')
 
                                     # バックアップに保存された、代替先の情報
-                                    plate = CookingDirectionPlate.objects.filter(
-                                        cooking_day=cooking_day,
-                                        meal_name=meal_name,
-                                        eating_day=eating_day,
-                                        is_basic_plate=False,
-                                        plate_name=bk.plate_name
-                                    ).first()
+                                    plate = plate_index.find(meal_name, False, bk.plate_name, eating_day=eating_day)
                                 else:
                                     bk_alter = bk_list[0]
                                     logger.info('ヒットなし')
                                     if target_plate['plate'] in key_plate_dict:
-                                        plate = CookingDirectionPlate.objects.filter(
-                                            cooking_day=cooking_day,
-                                            eating_day=eating_day,
-                                            meal_name=meal_name,
-                                            is_basic_plate=False,
-                                            plate_name=target_plate['plate']
-                                        ).first()
+                                        plate = plate_index.find(meal_name, False, target_plate['plate'], eating_day=eating_day)
 
-                                        base_plate = CookingDirectionPlate.objects.filter(
-                                            cooking_day=cooking_day,
-                                            eating_day=eating_day,
-                                            meal_name=meal_name,
-                                            is_basic_plate=True,
-                                            plate_name=key_plate_dict[target_plate['plate']]
-                                        ).first()
+                                        base_plate = plate_index.find(meal_name, True, key_plate_dict[target_plate['plate']], eating_day=eating_day)
                                         logger.info(f"dictから取得({target_plate['plate']})-{key_plate_dict[target_plate['plate']]}:{plate}")
                                     elif bk_alter.plate_name:
                                         #名称変更で、今の調理表に存在しない(他の連携に使われているものを区別できないので、置き換え対象外にする)
                                         plate = None
                                         """
-                                        plate = CookingDirectionPlate.objects.filter(
-                                            cooking_day=cooking_day,
-                                            meal_name=meal_name,
-                                            is_basic_plate=False,
-                                            plate_name=target_plate['plate']
-                                        ).first()
+                                        plate = plate_index.find(meal_name, False, target_plate['plate'])
                                         """
                                     else:
                                         # 前回紐づけなしを選択
                                         plate = None
                             else:
                                 # 調理表からの判定で得られた代替先情報取得
-                                plate = CookingDirectionPlate.objects.filter(
-                                    cooking_day=cooking_day,
-                                    eating_day=eating_day,
-                                    meal_name=meal_name,
-                                    is_basic_plate=False,
-                                    plate_name=target_plate['plate']
-                                ).first()
+                                plate = plate_index.find(meal_name, False, target_plate['plate'], eating_day=eating_day)
 
                             if plate:
-                                relation = AllergenPlateRelations(
-                                    plate=plate, source=base_plate, code=kind
-                                )
-                                relation.save()
+                                relations.add(plate, base_plate, kind)
                                 logger.info(f'plate保存:{plate.id}')
 
                                 # 空のものがあったら削除
-                                del_relation = AllergenPlateRelations.objects.filter(
-                                    plate=None, source=base_plate, code=kind
-                                )
-                                if del_relation.exists():
-                                    del_relation.delete()
+                                relations.delete_empty(base_plate, kind)
                             else:
                                 # 他にない場合に登録
-                                other_relation = AllergenPlateRelations.objects.filter(
-                                    source=base_plate, code=kind
-                                ).first()
-                                if not other_relation:
-                                    relation = AllergenPlateRelations(
-                                        plate=plate, source=base_plate, code=kind
-                                    )
-                                    relation.save()
+                                if not relations.exists(base_plate, kind):
+                                    relations.add(plate, base_plate, kind)
                         else:
                             kind = cls.parse_kind(key)
                             for v in value:
-                                base_plate = CookingDirectionPlate.objects.filter(
-                                    cooking_day=cooking_day,
-                                    eating_day=eating_day,
-                                    meal_name=meal_name,
-                                    is_basic_plate=True,
-                                    plate_name=v
-                                ).first()
+                                base_plate = plate_index.find(meal_name, True, v, eating_day=eating_day)
 
-                                bk_qs = BackupAllergenPlateRelations.objects.filter(
-                                    cooking_day=cooking_day,
-                                    meal_name=meal_name,
-                                    code=kind,
-                                    source_name=value,
-                                    backuped_at=None
-                                )
-                                if bk_qs.exists():
-                                    bk_list = list(bk_qs)
+                                bk_list = cls._filter_backups(backup_list, meal_name, kind, value)
+                                if bk_list:
                                     logger.info(f'backup復元2:{cooking_day}-{meal_name}-{kind}')
                                     for x in bk_list:
                                         logger.info(x.plate_name)
                                     #bk = bk_qs.first()
-                                    bk = bk_qs[0]
+                                    bk = bk_list[0]
                                     if bk.plate_name:
-                                        plate = CookingDirectionPlate.objects.filter(
-                                            cooking_day=cooking_day,
-                                            eating_day=eating_day,
-                                            meal_name=meal_name,
-                                            is_basic_plate=False,
-                                            plate_name=bk.plate_name
-                                        ).first()
+                                        plate = plate_index.find(meal_name, False, bk.plate_name, eating_day=eating_day)
 
                                         if not plate:
                                             # 名称変更で、今の調理表に存在しない
-                                            plate = CookingDirectionPlate.objects.filter(
-                                                cooking_day=cooking_day,
-                                                eating_day=eating_day,
-                                                meal_name=meal_name,
-                                                is_basic_plate=False,
-                                                plate_name=target_plate['plate']
-                                            ).first()
+                                            plate = plate_index.find(meal_name, False, target_plate['plate'], eating_day=eating_day)
                                     else:
                                         # 前回紐づけなしを選択
                                         plate = None
                                 else:
                                     # 調理表からの判定で得られた代替先情報取得
-                                    plate = CookingDirectionPlate.objects.filter(
-                                        cooking_day=cooking_day,
-                                        eating_day=eating_day,
-                                        meal_name=meal_name,
-                                        is_basic_plate=False,
-                                        plate_name=target_plate['plate']
-                                    ).first()
+                                    plate = plate_index.find(meal_name, False, target_plate['plate'], eating_day=eating_day)
 
-                                relation = AllergenPlateRelations(
-                                    plate=plate, source=base_plate, code=kind
-                                )
-                                relation.save()
+                                relations.add(plate, base_plate, kind)
 
             # 手動編集用の代替情報登録・前回情報による上書き
             normal_unique_list = cls.get_unique_normal_kind_list(plate_list)
@@ -440,32 +458,20 @@ class CookingDirectionPlatesManager:
                             # 未登録の食種の連携情報を登録
                             base_plate = target_plate['instance']
 
-                            bk_qs = BackupAllergenPlateRelations.objects.filter(
-                                cooking_day=cooking_day,
-                                meal_name=meal_name,
-                                code=kind,
-                                source_name=target_plate['plate'],
-                                backuped_at=None
-                            )
-                            if bk_qs.exists():
-                                bk = bk_qs.first()
+                            bk_list = cls._filter_backups(backup_list, meal_name, kind, target_plate['plate'])
+                            if bk_list:
+                                bk = bk_list[0]
                                 if bk.plate_name:
-                                    plate = CookingDirectionPlate.objects.filter(
-                                        cooking_day=cooking_day,
-                                        meal_name=meal_name,
-                                        is_basic_plate=False,
-                                        plate_name=bk.plate_name
-                                    ).first()
+                                    plate = plate_index.find(meal_name, False, bk.plate_name)
                                 else:
                                     plate = None
                             else:
                                 plate = None
-                            r, is_create = AllergenPlateRelations.objects.get_or_create(
+                            r, is_create = relations.get_or_create(
                                 code=kind, source=base_plate
                             )
                             if is_create and plate:
                                 r.plate = plate
-                                r.save()
                 else:
                     eating_type_list = target_plate['eating_type_list']
                     for kind in normal_unique_list:
@@ -475,37 +481,31 @@ class CookingDirectionPlatesManager:
                             # 未登録の食種の連携情報を登録
                             base_plate = target_plate['instance']
 
-                            bk_qs = BackupAllergenPlateRelations.objects.filter(
-                                cooking_day=cooking_day,
-                                meal_name=meal_name,
-                                code=kind,
-                                source_name=target_plate['plate'],
-                                backuped_at=None
-                            )
-                            if bk_qs.exists():
-                                bk = bk_qs.first()
+                            bk_list = cls._filter_backups(backup_list, meal_name, kind, target_plate['plate'])
+                            if bk_list:
+                                bk = bk_list[0]
                                 if bk.plate_name:
-                                    plate = CookingDirectionPlate.objects.filter(
-                                        cooking_day=cooking_day,
-                                        meal_name=meal_name,
-                                        is_basic_plate=False,
-                                        plate_name=bk.plate_name
-                                    ).first()
+                                    plate = plate_index.find(meal_name, False, bk.plate_name)
                                 else:
                                     plate = None
                             else:
                                 plate = None
 
                             try:
-                                r, is_create = AllergenPlateRelations.objects.get_or_create(
+                                r, is_create = relations.get_or_create(
                                     code=kind, source=base_plate
                                 )
                                 if is_create and plate:
                                     r.plate = plate
-                                    r.save()
                             except MultipleObjectsReturned:
                                 pass
 
+        # アレルギー代替食の関連を登録
+        relations.save()
+
+        # 製造日・喫食日の対応を作成し直す(一括登録では料理の保存時の対応追加が行われないため、ここでまとめて作成する)
+        CookingCalendar.refresh(cooking_day)
+
     @classmethod
     def get_kind_menu_name(cls, code):
         """
@@ -627,22 +627,47 @@ class CookingDirectionPlatesManager:
         return False
 
     @classmethod
+    @transaction.atomic
     def save_p7_allergen(cls, plate_dict_list, cooking_day):
+        """
+        アレルギー食の袋数を登録する。
+        袋数情報は製造日単位でまとめて登録し、ラベル印刷用献立パッケージ・袋マスタ等の参照はメモリ上で行う。
+        """
+        # key:(喫食日, 食事区分, 献立種類, インデックス)、value:ラベル印刷用献立パッケージ(アレルギー食)
+        print_package_dict = {}
+        for print_package in PlatePackageForPrint.objects.filter(
+                cooking_day=cooking_day, is_basic_plate=False).order_by('id'):
+            key = (str(print_package.eating_day), print_package.meal_name, print_package.menu_name, print_package.index)
+            print_package_dict.setdefault(key, print_package)
+
+        # key:(献立種類, 料理名)、value:袋サイズ
+        tmp_package_dict = {}
+        for tmp_package in TmpPlateNamePackage.objects.filter(cooking_day=cooking_day).order_by('id'):
+            tmp_package_dict.setdefault((tmp_package.menu_name, tmp_package.plate_name), tmp_package)
+
+        package_masters = PackageMaster.objects.in_bulk()
+        allergen_dict = {}
+        updated_print_packages = {}
+        unit_packages = []
+
         a_index = 0
         for plate_list in plate_dict_list:
             eating_day, meal_name = cls.parse_eating_meal(plate_list[0]['eating_meal'], cooking_day)
             meal_name = meal_name.strip()
             allergen_plate_index_dict = {'常食': 0, 'ソフト': 0, 'ミキサー': 0, 'ゼリー': 0}
 
+            # 食数固定情報の取得
+            preserved_count = cls.get_preserved_count(meal_name)
+            count_50g = cls.get_50g_pack_count(meal_name)
+
+            # key:(アレルギー, 献立種類, 汁物かどうか)、value:注文(喫食日・食事区分単位)
+            order_dict = {}
+
             # plate_list:喫食日・食事区分単位
             for index, target_plate in enumerate(plate_list):
                 if not target_plate['is_allergen']:
                     continue
 
-                # 食数固定情報の取得
-                preserved_count = cls.get_preserved_count(meal_name)
-                count_50g = cls.get_50g_pack_count(meal_name)
-
                 plate_name = target_plate['plate']
                 # 食種から、常食/ソフト/ゼリー/ミキサーの食数を計算する
                 count_dict = {'常食': 0, 'ソフト': 0, 'ゼリー': 0, 'ミキサー': 0}
@@ -654,23 +679,29 @@ class CookingDirectionPlatesManager:
                     if cls.is_sample_plate_kind(eating_type):
                         continue
                     code = cls.parse_kind(eating_type)
-                    allergen_list, menu_name = cls.get_allergens_with_menu(code, cooking_day)
+                    if not (code in allergen_dict):
+                        allergen_dict[code] = cls.get_allergens_with_menu(code, cooking_day)
+                    allergen_list, menu_name = allergen_dict[code]
                     for allergen in allergen_list:
                         is_update = False
-                        if allergen == '個食':
+                        order_key = (getattr(allergen, 'id', allergen), menu_name, target_plate['is_soup'])
+                        if order_key in order_dict:
+                            # 同じアレルギーの注文は再検索しない(評価済みのクエリセットを使う)
+                            order_qs = order_dict[order_key]
+                        elif allergen == '個食':
                             order_qs = Order.objects.filter(
                                 eating_day=eating_day, allergen__allergen_name='なし', quantity__gt=0,
                                 unit_name_id__in=settings.KOSHOKU_UNIT_IDS,
                                 meal_name__meal_name=meal_name, menu_name__menu_name=menu_name
                             ).exclude(unit_name__unit_code__range=[80001, 80008]).annotate(
-                                unit_quantity=Sum('quantity')).order_by('menu_name__seq_order', 'unit_name__unit_number')
+                                unit_quantity=Sum('quantity')).order_by('menu_name__seq_order', 'unit_name__unit_number').select_related('unit_name')
                         elif allergen == 'ﾌﾘｰｽﾞ':
                             order_qs = Order.objects.filter(
                                 eating_day=eating_day, allergen__allergen_name='なし', quantity__gt=0,
                                 unit_name_id__in=settings.FREEZE_UNIT_IDS,
                                 meal_name__meal_name=meal_name, menu_name__menu_name=menu_name
                             ).exclude(unit_name__unit_code__range=[80001, 80008]).annotate(
-                                unit_quantity=Sum('quantity')).order_by('menu_name__seq_order', 'unit_name__unit_number')
+                                unit_quantity=Sum('quantity')).order_by('menu_name__seq_order', 'unit_name__unit_number').select_related('unit_name')
                         else:
                             if target_plate['is_soup']:
                                 # 対象アレルギーを注文している施設を取得
@@ -679,14 +710,15 @@ class CookingDirectionPlatesManager:
                                     meal_name__meal_name=meal_name, menu_name__menu_name=menu_name,
                                     meal_name__filling=True
                                 ).exclude(unit_name__unit_code__range=[80001, 80008]).annotate(
-                                    unit_quantity=Sum('quantity')).order_by('menu_name__seq_order', 'unit_name__unit_number')
+                                    unit_quantity=Sum('quantity')).order_by('menu_name__seq_order', 'unit_name__unit_number').select_related('unit_name')
                             else:
                                 # 対象アレルギーを注文している施設を取得
                                 order_qs = Order.objects.filter(
                                     eating_day=eating_day, allergen=allergen, quantity__gt=0,
                                     meal_name__meal_name=meal_name, menu_name__menu_name=menu_name
                                 ).exclude(unit_name__unit_code__range=[80001, 80008]).annotate(
-                                    unit_quantity=Sum('quantity')).order_by('menu_name__seq_order', 'unit_name__unit_number')
+                                    unit_quantity=Sum('quantity')).order_by('menu_name__seq_order', 'unit_name__unit_number').select_related('unit_name')
+                        order_dict[order_key] = order_qs
 
                         for order in order_qs:
                             if order.quantity:
@@ -719,24 +751,19 @@ class CookingDirectionPlatesManager:
 
                     a_index = allergen_plate_index_dict[key]
                     is_roux = False
-                    plate_package_qs = PlatePackageForPrint.objects.filter(
-                        cooking_day=cooking_day, eating_day=eating_day,
-                        is_basic_plate=False, meal_name=meal_name, menu_name=key, index=a_index)
-                    if plate_package_qs.exists():
-                        plate_package = plate_package_qs.first()
+                    plate_package = print_package_dict.get((str(eating_day), meal_name, key, a_index), None)
+                    if plate_package:
                         plate_package.count = value
                         plate_package.count_one_p = value_1p + preserved_dict[key]
                         plate_package.count_one_50g = count_50g
-                        plate_package.save()
+                        updated_print_packages[plate_package.id] = plate_package
                         logger.info(f'save:{eating_day}-{meal_name}-{key}-{a_index}:{value}/{value_1p}/{preserved_dict[key]}')
 
                         allergen_plate_index_dict[key] += 1
 
                         #　カレールー嚥下対応
                         if cls.is_filling_and_sause_mix(plate_name) and key != '常食':
-                            roux_plate_package = PlatePackageForPrint.objects.filter(
-                                cooking_day=cooking_day, eating_day=eating_day,
-                                is_basic_plate=False, meal_name=meal_name, menu_name=key, index=a_index + 1).first()
+                            roux_plate_package = print_package_dict.get((str(eating_day), meal_name, key, a_index + 1), None)
                             if roux_plate_package:
                                 is_roux = True
 
@@ -744,15 +771,16 @@ class CookingDirectionPlatesManager:
                                 roux_plate_package.count = value
                                 roux_plate_package.count_one_p = value_1p + preserved_dict[key]
                                 roux_plate_package.count_one_50g = count_50g
-                                roux_plate_package.save()
+                                updated_print_packages[roux_plate_package.id] = roux_plate_package
                                 allergen_plate_index_dict[key] += 1
                     else:
-                        plate_package = None
                         logger.warn(f'not exists:{eating_day}-{meal_name}-{key}-{a_index}:{value}/{value_1p}/{preserved_dict[key]}')
 
                     # ピッキング指示書用の袋数を登録
                     if plate_package:
                         logger.info(f'UnitPackage登録対象:{target_plate}')
+                        # 嚥下2人袋は、その他の袋より先に登録する
+                        enge_2_list = []
                         bulk_insert_list = []
                         for order in unit_package_dict[key]:
                             logger.info(f'UnitPackage登録:{order.unit_name.calc_name}-{order.quantity}')
@@ -768,11 +796,11 @@ class CookingDirectionPlatesManager:
                                     meal_name=meal_name,
                                     menu_name=key,
                                     is_basic_plate=False,
-                                    package=PackageMaster.objects.get(id=settings.PICKING_PACKAGES['ENGE_2']),
+                                    package=package_masters[settings.PICKING_PACKAGES['ENGE_2']],
                                     count=1,
                                     cooking_direction_id=target_plate['model_id']
                                 )
-                                unit_package.save()
+                                enge_2_list.append(unit_package)
 
                                 if is_roux:
                                     roux_unit_package = UnitPackage(
@@ -785,11 +813,11 @@ class CookingDirectionPlatesManager:
                                         meal_name=meal_name,
                                         menu_name=key,
                                         is_basic_plate=False,
-                                        package=PackageMaster.objects.get(id=settings.PICKING_PACKAGES['ENGE_2']),
+                                        package=package_masters[settings.PICKING_PACKAGES['ENGE_2']],
                                         count=1,
                                         cooking_direction_id=target_plate['model_id']
                                     )
-                                    roux_unit_package.save()
+                                    enge_2_list.append(roux_unit_package)
 
                                 logger.info('嚥下2人袋登録')
                                 continue
@@ -811,13 +839,13 @@ class CookingDirectionPlatesManager:
                                 if key == '常食':
                                     if plate_package.plate_name[0] == '⑤':
                                         unit_package.package = \
-                                            PackageMaster.objects.get(id=settings.PICKING_PACKAGES['SOUP_1'])
+                                            package_masters[settings.PICKING_PACKAGES['SOUP_1']]
                                     else:
                                         unit_package.package = \
-                                            PackageMaster.objects.get(id=settings.PICKING_PACKAGES['BASIC_1'])
+                                            package_masters[settings.PICKING_PACKAGES['BASIC_1']]
                                 elif quantity == 1:
                                     unit_package.package = \
-                                        PackageMaster.objects.get(id=settings.PICKING_PACKAGES['ENGE_1'])
+                                        package_masters[settings.PICKING_PACKAGES['ENGE_1']]
                                 else:
                                     # 嚥下でちょうど1でない場合は、1人用を出力しない
                                     continue
@@ -851,13 +879,9 @@ class CookingDirectionPlatesManager:
                             if 'work_name' in target_plate:
                                 logger.info('1,2人袋以外登録処理')
 
-                                tmp_package_qs = TmpPlateNamePackage.objects.filter(
-                                    cooking_day=cooking_day,
-                                    menu_name=key if key == '常食' else '嚥下',
-                                    plate_name=target_plate['plate']
-                                )
-                                if tmp_package_qs.exists():
-                                    tmp_package = tmp_package_qs.first()
+                                tmp_package = tmp_package_dict.get(
+                                    (key if key == '常食' else '嚥下', target_plate['plate']), None)
+                                if tmp_package:
                                     q, r = divmod(quantity, tmp_package.size)
                                     logger.info(f'商：{q},余り:{r}')
                                     if q >= 1:
@@ -895,7 +919,7 @@ class CookingDirectionPlatesManager:
                                                 package_id = settings.PICKING_PACKAGES['ENGE_20']
                                             if r:
                                                 q += 1
-                                        unit_package.package = PackageMaster.objects.get(id=package_id)
+                                        unit_package.package = package_masters[package_id]
                                         unit_package.count = q
                                         bulk_insert_list.append(unit_package)
 
@@ -941,7 +965,7 @@ class CookingDirectionPlatesManager:
                                         else:
                                             package_id = settings.PICKING_PACKAGES['ENGE_20']
                                         logger.info(f'save-package-id:{package_id}')
-                                        unit_package.package = PackageMaster.objects.get(id=package_id)
+                                        unit_package.package = package_masters[package_id]
                                         unit_package.count = 1
                                         bulk_insert_list.append(unit_package)
 
@@ -968,10 +992,21 @@ class CookingDirectionPlatesManager:
                                 else:
                                     logger.warn(f'{target_plate["plate"]}')
 
-                        # 袋数情報を一括登録
+                        # 袋数情報は製造日単位で一括登録
+                        unit_packages += enge_2_list
                         if bulk_insert_list:
                             logger.info(f'一括登録対象:{[x for x in bulk_insert_list if x.id]}')
-                            UnitPackage.objects.bulk_create(bulk_insert_list)
+                            unit_packages += bulk_insert_list
+
+        # ラベル印刷用献立パッケージの袋数を更新(一括更新では更新日時が自動で設定されないため、ここで設定する)
+        now = timezone.now()
+        for print_package in updated_print_packages.values():
+            print_package.updated_at = now
+        PlatePackageForPrint.objects.bulk_update(
+            list(updated_print_packages.values()), ['count', 'count_one_p', 'count_one_50g', 'updated_at'], batch_size=1000)
+
+        UnitPackage.objects.bulk_create(unit_packages, batch_size=1000)
+        logger.info(f'アレルギー袋数登録:更新={len(updated_print_packages)},袋数={len(unit_packages)}')
 
 
 class PlateNameAnalizeUtil:
@@ -1016,30 +1051,14 @@ class PlateNameAnalizeUtil:
         """
         対象の料理の名称が味噌汁かどうかを判断する。スープかどうか(⑤がつくかどうか)のチェックは別途行うこと。
         """
-        if '味噌汁' in plate_name:
-            return True
-        elif 'みそ汁' in plate_name:
-            return True
-        elif 'みそしる' in plate_name:
-            return True
-        else:
-            return False
+        return PlateNameParser.parse(plate_name).is_miso_soup
 
     @classmethod
     def is_soup_liquid(cls, plate_name):
         """
         対象の料理の名称がスープの液(具以外)かどうかを判断する。スープかどうか(⑤がつくかどうか)のチェックは別途行うこと。
         """
-        if '具' in plate_name:
-            return False
-
-        # CCの記載のない汁もあるので、希釈だけで判断する
-        if '希釈' in plate_name:
-            return True
-        elif '水入れる' in plate_name:
-            return True
-        else:
-            return False
+        return PlateNameParser.parse(plate_name).is_soup_liquid
 
     @classmethod
     def is_raw_plate(cls, plate):
@@ -0,0 +1,228 @@
+import datetime as dt
+import hashlib
+import logging
+import os
+import shutil
+
+import numpy as np
+import openpyxl as excel
+import pandas as pd
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.utils import get_column_letter
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# ハッシュ計算時の読込単位(バイト)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 中間ファイル(セルの値)の形式のバージョン。read・_convert_cellの変換内容を変更した場合は更新する
+SHEET_FORMAT_VERSION = 1
+
+# 中間ファイル名の末尾。形式のバージョン・pandasのバージョンが異なる中間ファイルは使わない
+CACHE_FILE_SUFFIX = f'.v{SHEET_FORMAT_VERSION}-pandas{pd.__version__}.pkl'
+
+
+class CookingDirectionSheet:
+    """
+    アップロードされた調理表(Excel)の1シート目の値を保持するクラス。
+    調理表はread-onlyモードで1度だけ読み込み、ファイル内容のハッシュ毎に中間ファイル(pickle)として保存する。
+    同じ内容の調理表は中間ファイルから読み込むため、再アップロードで内容が変わった場合のみ読み直す。
+    中間ファイルは調理表のファイル名(製造日)毎のフォルダに保存し、古い内容・形式の中間ファイルは削除する。
+    設定値COOKING_DIRECTION_SHEET_RETENTION_DAYSの日数より前に更新されたフォルダも削除する。
+
+    シートの値は、調理表登録(DataFrame)と加熱加工記録簿(行単位)で読み方が異なるため、セルの値のまま保存する。
+    各処理で整形した内容は、save_frame・load_frameで同じフォルダに名前とバージョンを付けて保存する。
+    """
+    def __init__(self, values: pd.DataFrame, file_hash: str = None, cache_dir: str = None):
+        # 列:シートの列名(A, B, ...)、インデックス:シートの行番号(1始まり)、値のないセルは空文字列
+        self.values = values
+        self.file_hash = file_hash
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def get_file_hash(cls, path: str):
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    @classmethod
+    def get_cache_dir(cls, path: str):
+        return os.path.join(settings.COOKING_DIRECTION_SHEET_DIR, os.path.basename(path))
+
+    @classmethod
+    def get_cache_path(cls, cache_dir: str, file_hash: str, name: str = None, version: int = None):
+        if name:
+            return os.path.join(cache_dir, f'{file_hash}.{name}-v{version}{CACHE_FILE_SUFFIX}')
+        else:
+            return os.path.join(cache_dir, f'{file_hash}{CACHE_FILE_SUFFIX}')
+
+    @classmethod
+    def _read_pickle(cls, cache_path: str):
+        try:
+            return pd.read_pickle(cache_path)
+        except FileNotFoundError:
+            # 他のプロセスで古い中間ファイルとして削除された場合
+            return None
+
+    @classmethod
+    def _to_pickle(cls, df: pd.DataFrame, cache_path: str):
+        # 読込中の中間ファイルを使わないよう、別名で保存してから置き換える
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, cache_path)
+
+    @classmethod
+    def _remove(cls, path: str):
+        try:
+            os.remove(path)
+            logger.info(f'調理表中間ファイル削除:{os.path.basename(path)}')
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def prune(cls, cache_dir: str, file_hash: str):
+        """
+        同じファイル名の調理表の、他の内容(ハッシュ)・形式の中間ファイルを削除する
+        """
+        for file_name in os.listdir(cache_dir):
+            if not file_name.endswith('.pkl'):
+                continue
+            if file_name.startswith(f'{file_hash}.') and file_name.endswith(CACHE_FILE_SUFFIX):
+                continue
+            cls._remove(os.path.join(cache_dir, file_name))
+
+    @classmethod
+    def prune_dirs(cls, current_dir: str):
+        """
+        保持日数より前に更新された、調理表のファイル名毎のフォルダを削除する
+        """
+        limit = (dt.datetime.now() - dt.timedelta(days=settings.COOKING_DIRECTION_SHEET_RETENTION_DAYS)).timestamp()
+        for entry in os.scandir(settings.COOKING_DIRECTION_SHEET_DIR):
+            if entry.is_dir() and (entry.path != current_dir) and (entry.stat().st_mtime < limit):
+                shutil.rmtree(entry.path, ignore_errors=True)
+                logger.info(f'調理表中間ファイルフォルダ削除:{entry.name}')
+
+    @classmethod
+    def _convert_cell(cls, cell):
+        """
+        セルの値を、pandas.read_excelで読み込んだ場合と同じ値に変換する
+        """
+        if cell.value is None:
+            return ''
+        elif cell.data_type == TYPE_ERROR:
+            return np.nan
+        elif cell.data_type == TYPE_NUMERIC:
+            value = int(cell.value)
+            if value == cell.value:
+                return value
+
+        return cell.value
+
+    @classmethod
+    def read(cls, path: str, file_hash: str = None):
+        """
+        調理表を読み込む(中間ファイルは使わない)
+        """
+        workbook = excel.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+        try:
+            worksheet = workbook.worksheets[0]
+            worksheet.reset_dimensions()
+
+            rows = []
+            last_row_index = -1
+            for row_index, row in enumerate(worksheet.rows):
+                values = [cls._convert_cell(cell) for cell in row]
+                # 末尾の空のセルは除く
+                while values and values[-1] == '':
+                    values.pop()
+                if values:
+                    last_row_index = row_index
+                rows.append(values)
+        finally:
+            workbook.close()
+
+        # 末尾の空の行は除き、列数を揃える
+        rows = rows[:last_row_index + 1]
+        width = max([len(x) for x in rows], default=0)
+        values = pd.DataFrame(
+            [x + [''] * (width - len(x)) for x in rows], columns=[get_column_letter(i + 1) for i in range(width)],
+            index=range(1, len(rows) + 1), dtype=object)
+        return cls(values, file_hash)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        調理表を読み込む。同じ内容の調理表の中間ファイルがあれば、中間ファイルから読み込む
+        """
+        file_hash = cls.get_file_hash(path)
+        cache_dir = cls.get_cache_dir(path)
+        cache_path = cls.get_cache_path(cache_dir, file_hash)
+        if os.path.isfile(cache_path):
+            values = cls._read_pickle(cache_path)
+            if values is not None:
+                logger.info(f'調理表中間ファイル読込:{os.path.basename(path)}-{file_hash}')
+                return cls(values, file_hash, cache_dir)
+
+        sheet = cls.read(path, file_hash)
+        sheet.cache_dir = cache_dir
+
+        cls._to_pickle(sheet.values, cache_path)
+        cls.prune(cache_dir, file_hash)
+        cls.prune_dirs(cache_dir)
+        logger.info(f'調理表中間ファイル作成:{os.path.basename(path)}-{file_hash}:{len(sheet.values)}行')
+        return sheet
+
+    def load_frame(self, name: str, version: int):
+        """
+        save_frameで保存した、このシートの内容を整形したDataFrameを返す。同じバージョンで保存されていない場合はNone
+        """
+        if not (self.cache_dir and self.file_hash):
+            return None
+
+        cache_path = self.get_cache_path(self.cache_dir, self.file_hash, name, version)
+        if not os.path.isfile(cache_path):
+            return None
+        return self._read_pickle(cache_path)
+
+    def save_frame(self, name: str, version: int, df: pd.DataFrame):
+        """
+        このシートの内容を整形したDataFrameを、名前とバージョン(整形内容を変更した場合に更新する)を付けて
+        中間ファイルに保存する。同じ名前の他のバージョンの中間ファイルは削除する
+        """
+        if not (self.cache_dir and self.file_hash):
+            return
+
+        cache_path = self.get_cache_path(self.cache_dir, self.file_hash, name, version)
+        self._to_pickle(df, cache_path)
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.startswith(f'{self.file_hash}.{name}-v') and file_name.endswith('.pkl') \
+                    and (file_name != os.path.basename(cache_path)):
+                self._remove(os.path.join(self.cache_dir, file_name))
+        logger.info(f'調理表中間ファイル作成:{os.path.basename(cache_path)}:{len(df)}行')
+
+    def iter_rows(self, min_row: int = 1):
+        """
+        指定行以降の各行の値のリストを返す
+        """
+        for row in self.values.loc[min_row:].itertuples(index=False):
+            yield list(row)
+
+    def to_frame(self):
+        """
+        pandas.read_excel(1行目を列名とする)で読み込んだ場合と同じ内容のDataFrameを返す
+        """
+        data = self.values.values.tolist()
+        if not data:
+            return pd.DataFrame()
+
+        try:
+            return TextParser(data, header=0, skip_blank_lines=False).read()
+        except EmptyDataError:
+            return pd.DataFrame()
@@ -1,34 +1,192 @@
 import datetime as dt
+from bisect import bisect_right
+from functools import lru_cache
 
-from dateutil.relativedelta import relativedelta
+import numpy as np
+import pandas as pd
 
 from django.conf import settings
 
 
+# 1970-01-01(datetime64の基準日)の序数
+EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+
+
+def to_datetime64_days(days):
+    """
+    日付の配列を、datetime64[D]の配列に変換する
+    """
+    if isinstance(days, np.ndarray) and np.issubdtype(days.dtype, np.datetime64):
+        return days.astype('datetime64[D]')
+
+    days = list(days)
+    if days and all(isinstance(x, dt.date) for x in days):
+        # 日付オブジェクトは、序数を経由した方が高速に変換できる
+        ordinals = np.fromiter((x.toordinal() for x in days), dtype='int64', count=len(days))
+        return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+    return np.asarray(days, dtype='datetime64[D]')
+
+
+class DateSettingsTable:
+    """
+    適用開始日付きの設定値(EATING_SALES_SETTINGS、ORDER_CHANGEABLE_SETTINGSなど)を、
+    適用開始日の昇順に並べて保持するクラス。指定日時点の設定値を二分探索で取得する。
+    """
+    def __init__(self, date_settings):
+        sorted_settings = sorted(
+            [(dt.datetime.strptime(x[1], '%Y-%m-%d').date(), x[0]) for x in date_settings], key=lambda x: x[0])
+        self.days = [x[0] for x in sorted_settings]
+        self.values = [x[1] for x in sorted_settings]
+
+        # 複数日付をまとめて取得する場合用
+        self.np_days = np.array(self.days, dtype='datetime64[D]')
+        self.np_values = np.array(self.values)
+
+    def get(self, day):
+        """
+        指定日時点の設定値を取得する。適用開始前の日付の場合はIndexError
+        """
+        if isinstance(day, dt.datetime):
+            day = day.date()
+
+        index = bisect_right(self.days, day)
+        if not index:
+            raise IndexError(f'{day}時点の設定がありません')
+        return self.values[index - 1]
+
+    def get_many(self, days):
+        """
+        複数日時点の設定値を配列で取得する
+        """
+        days = to_datetime64_days(days)
+        index = np.searchsorted(self.np_days, days, side='right') - 1
+        if len(index) and (index.min() < 0):
+            raise IndexError('設定の適用開始前の日付が含まれています')
+        return self.np_values[index]
+
+
+@lru_cache(maxsize=None)
+def _compile_date_settings(date_settings: tuple):
+    return DateSettingsTable(date_settings)
+
+
+def get_date_settings_table(date_settings):
+    """
+    設定値の一覧から、変換済みの設定を取得する(同じ設定内容は1度だけ変換する)
+    """
+    return _compile_date_settings(tuple((x[0], x[1]) for x in date_settings))
+
+
 class SalesDayUtil:
     """
     売上日操作クラス
     """
     @classmethod
     def get_by_eating_day(cls, eating_day, date_settings):
-        dt_list = [(x[0], dt.datetime.strptime(x[1], '%Y-%m-%d').date()) for x in date_settings]
-        dt_days = [y[0] for y in dt_list if y[1] <= eating_day][-1]
-        return eating_day - relativedelta(days=dt_days)
+        dt_days = get_date_settings_table(date_settings).get(eating_day)
+        return eating_day - dt.timedelta(days=dt_days)
 
     @classmethod
     def get_by_eating_day_by_settings(cls, eating_day):
         return cls.get_by_eating_day(eating_day, settings.EATING_SALES_SETTINGS)
 
+    @classmethod
+    def get_by_eating_days(cls, eating_days, date_settings):
+        """
+        複数の喫食日の売上日(標準)を、配列(datetime64[D])で取得する
+        """
+        eating_days = to_datetime64_days(eating_days)
+        dt_days = get_date_settings_table(date_settings).get_many(eating_days)
+        return eating_days - dt_days.astype('timedelta64[D]')
+
+    @classmethod
+    def get_by_eating_days_by_settings(cls, eating_days):
+        return cls.get_by_eating_days(eating_days, settings.EATING_SALES_SETTINGS)
+
     @classmethod
     def get_adjust_days(cls, day, date_settings):
-        dt_list = [(x[0], dt.datetime.strptime(x[1], '%Y-%m-%d').date()) for x in date_settings]
-        dt_days = [y[0] for y in dt_list if y[1] <= day][-1]
-        return dt_days
+        return get_date_settings_table(date_settings).get(day)
 
     @classmethod
     def get_adjust_days_settings(cls, day):
         return cls.get_adjust_days(day, settings.EATING_SALES_SETTINGS)
 
+    @classmethod
+    def get_adjust_days_many(cls, days, date_settings):
+        return get_date_settings_table(date_settings).get_many(days)
+
+
+class SalesDayCalculator:
+    """
+    注文の売上日をまとめて算出するクラス。
+    標準の売上日(喫食日-調整日数)に、ユニット毎の売上日調整(InvoiceException)を適用する。
+        - 金曜日: 遠隔地(is_far)の場合は1日前(木曜日)
+        - 土曜日: ng_saturday日調整
+        - 日曜日: ng_sunday日調整
+        - 月～木曜日: 業務委託(reduced_rate)の場合は喫食日=売上日
+    """
+    def __init__(self, exception_masters, date_settings=None):
+        self.date_settings = date_settings or settings.EATING_SALES_SETTINGS
+
+        # ユニットID->売上日調整
+        self.exception_dict = {}
+        for exception_master in exception_masters:
+            self.exception_dict.setdefault(exception_master.unit_name_id, exception_master)
+
+    def get_solid_days(self, eating_days):
+        """
+        標準の売上日を算出する
+        """
+        try:
+            return SalesDayUtil.get_by_eating_days(eating_days, self.date_settings)
+        except IndexError:
+            raise ValueError('売上日の設定がない喫食日が含まれています')
+
+    def calc(self, unit_ids, eating_days):
+        """
+        ユニットIDと喫食日の配列から、売上日の配列(datetime64[D])を算出する
+        """
+        eating_days = to_datetime64_days(eating_days)
+        solid_days = self.get_solid_days(eating_days)
+
+        exceptions = [self.exception_dict.get(x, None) for x in unit_ids]
+        has_exception = np.array([x is not None for x in exceptions], dtype=bool)
+        is_far = np.array([bool(x and x.is_far) for x in exceptions], dtype=bool)
+        reduced_rate = np.array([bool(x and x.reduced_rate) for x in exceptions], dtype=bool)
+        ng_saturday = np.array([x.ng_saturday if x else 0 for x in exceptions], dtype='int64')
+        ng_sunday = np.array([x.ng_sunday if x else 0 for x in exceptions], dtype='int64')
+
+        # 1970-01-01は木曜日のため、月曜日が0〜日曜日が6になるよう補正
+        week_days = (solid_days.astype('int64') + 3) % 7
+
+        sales_days = solid_days.copy()
+        friday = has_exception & (week_days == 4) & is_far
+        sales_days[friday] = solid_days[friday] - np.timedelta64(1, 'D')
+        saturday = has_exception & (week_days == 5)
+        sales_days[saturday] = solid_days[saturday] + ng_saturday[saturday].astype('timedelta64[D]')
+        sunday = has_exception & (week_days == 6)
+        sales_days[sunday] = solid_days[sunday] + ng_sunday[sunday].astype('timedelta64[D]')
+        reduced = has_exception & (week_days < 4) & reduced_rate
+        sales_days[reduced] = eating_days[reduced]
+
+        return sales_days
+
+    def calc_frame(self, df, unit_column='unit_name_id', day_column='eating_day'):
+        """
+        DataFrameのユニットID列・喫食日列から、売上日(date)のSeriesを算出する
+        """
+        sales_days = self.calc(df[unit_column].tolist(), df[day_column].tolist())
+        return pd.Series(sales_days.astype(object), index=df.index)
+
+    def generate(self, orders):
+        """
+        注文と売上日(date)の組を順に返す
+        """
+        orders = list(orders)
+        sales_days = self.calc([x.unit_name_id for x in orders], [x.eating_day for x in orders])
+        for order, sales_day in zip(orders, sales_days.astype(object)):
+            yield order, sales_day
+
 
 class OrderChangableDayUtil:
     """
@@ -38,11 +196,24 @@ class OrderChangableDayUtil:
     @classmethod
     def get_rule_version(cls, current_day, hour, date_settings):
         if hour >= 10:
-            current_day += relativedelta(days=1)
-        dt_list = [(x[0], dt.datetime.strptime(x[1], '%Y-%m-%d').date()) for x in date_settings]
-        dt_ver = [y[0] for y in dt_list if y[1] <= current_day][-1]
-        return dt_ver
+            current_day += dt.timedelta(days=1)
+        return get_date_settings_table(date_settings).get(current_day)
 
     @classmethod
     def get_rule_version_by_settings(cls, current_day):
         return cls.get_rule_version(current_day.date(), current_day.hour, settings.ORDER_CHANGEABLE_SETTINGS)
+
+    @classmethod
+    def get_rule_versions(cls, current_days, hours, date_settings):
+        """
+        複数日時のルールバージョンを配列で取得する
+        """
+        current_days = to_datetime64_days(current_days)
+        current_days = current_days + (np.asarray(hours) >= 10).astype('timedelta64[D]')
+        return get_date_settings_table(date_settings).get_many(current_days)
+
+    @classmethod
+    def get_rule_versions_by_settings(cls, current_datetimes):
+        return cls.get_rule_versions(
+            [x.date() for x in current_datetimes], [x.hour for x in current_datetimes],
+            settings.ORDER_CHANGEABLE_SETTINGS)
@@ -0,0 +1,221 @@
+import io
+import logging
+import os
+import socket
+import time
+import traceback
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import BatchJob
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJobDefinition:
+    """
+    バッチ処理として登録可能なコマンドの定義
+    """
+    def __init__(self, label: str, list_url_name: str = '', processes_setting: str = None):
+        self.label = label
+        self.list_url_name = list_url_name
+
+        # コマンド内でプロセスプールを使う場合の、プロセス数の設定値名
+        self.processes_setting = processes_setting
+
+    def is_atomic(self, job):
+        """
+        コマンドをトランザクション内で実行するかどうか。
+        複数プロセスで実行する場合は、子プロセスが登録済みの内容を参照できるよう、トランザクションを使わない
+        """
+        if not self.processes_setting:
+            return True
+
+        processes = job.options.get('processes', None) or getattr(settings, self.processes_setting)
+        return processes <= 1
+
+
+# コマンド名とその定義
+BATCH_JOB_DEFINITIONS = {
+    'aggregation': BatchJobDefinition('食数集計表の出力', 'web_order:cooking_files'),
+    'agg_measure': BatchJobDefinition('計量表の出力', 'web_order:measure_files'),
+    'gen_invoice_label': BatchJobDefinition('請求データ集計', 'web_order:invoice_files'),
+    'gen_transfer_label': BatchJobDefinition('配送ラベル出力', 'web_order:label_files'),
+    'calc_sales_price': BatchJobDefinition('売価計算表出力', 'web_order:sales_price_files'),
+    'gen_setout_direction': BatchJobDefinition('盛付指示書出力', 'web_order:setout_files_manage'),
+    'kakiokoshi_output': BatchJobDefinition('書き起こし票出力', 'web_order:kakiokoshi_list'),
+    'cooking_direction': BatchJobDefinition('調理表登録・計量表出力', 'web_order:measure_files', 'MEASURE_TABLE_PROCESSES'),
+}
+
+ACTIVE_STATUSES = ('waiting', 'running')
+
+
+class BatchJobResult:
+    """
+    実行中のバッチ処理の出力先を記録するクラス。
+    ワーカープロセスは1度に1件のみ実行するため、プロセス内で実行中のジョブの出力先を保持する。
+    ワーカー以外(コマンドの直接実行など)から呼ばれた場合は何もしない。
+    """
+    _paths = None
+
+    @classmethod
+    def start(cls):
+        cls._paths = []
+
+    @classmethod
+    def add(cls, *paths):
+        """
+        出力したファイル、または出力先のフォルダを記録する
+        """
+        if cls._paths is not None:
+            cls._paths.extend(paths)
+
+    @classmethod
+    def finish(cls):
+        paths = cls._paths or []
+        cls._paths = None
+        return paths
+
+
+class BatchJobManager:
+    """
+    バッチ処理の登録を行うクラス
+    """
+    @classmethod
+    def get_definition(cls, command_name: str):
+        return BATCH_JOB_DEFINITIONS[command_name]
+
+    @classmethod
+    def get_active(cls, command_name: str, target: str):
+        return BatchJob.objects.filter(
+            command_name=command_name, target=target, status__in=ACTIVE_STATUSES).order_by('id').first()
+
+    @classmethod
+    def enqueue(cls, command_name: str, target: str, *args, requested_by: str = '', **options):
+        """
+        バッチ処理を登録する。同一コマンド・同一対象の未完了の処理があれば、新規登録せずにそれを返す。
+        戻り値は(ジョブ, 新規登録したかどうか)
+        """
+        if command_name not in BATCH_JOB_DEFINITIONS:
+            raise ValueError(f'バッチ処理として登録できないコマンドです:{command_name}')
+
+        active_job = cls.get_active(command_name, target)
+        if active_job:
+            return active_job, False
+
+        try:
+            # ATOMIC_REQUESTS内でも一意制約違反を回復できるよう、セーブポイントを作成する
+            with transaction.atomic():
+                job = BatchJob.objects.create(
+                    command_name=command_name,
+                    target=target,
+                    arguments=[str(x) for x in args],
+                    options=options,
+                    requested_by=requested_by
+                )
+        except IntegrityError:
+            # 同時に登録された場合は、先に登録された方を使用する
+            return cls.get_active(command_name, target), False
+
+        logger.info(f'バッチ処理登録:{job.command_name}({job.target})-id={job.id}')
+        return job, True
+
+
+class BatchJobWorker:
+    """
+    待機中のバッチ処理を取り出して実行するクラス
+    """
+    def __init__(self, name: str = None):
+        self.name = name or f'{socket.gethostname()}-{os.getpid()}'
+
+    def claim(self):
+        """
+        待機中のバッチ処理を1件取り出し、実行中にする。他ワーカーがロック中のものは対象外。
+        """
+        with transaction.atomic():
+            job = BatchJob.objects.select_for_update(skip_locked=True) \
+                .filter(status='waiting').order_by('created_at', 'id').first()
+            if not job:
+                return None
+
+            job.status = 'running'
+            job.worker_name = self.name
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'worker_name', 'started_at'])
+        return job
+
+    def _get_result_files(self, job, paths):
+        """
+        ジョブが記録した出力先から、実行中に更新された出力ファイルを取得する
+        """
+        started = job.started_at.timestamp()
+        result = set()
+        for path in paths:
+            if os.path.isfile(path):
+                files = [path]
+            else:
+                files = [os.path.join(root, file) for root, _, names in os.walk(path) for file in names]
+
+            for file in files:
+                if os.path.getmtime(file) >= started:
+                    result.add(os.path.relpath(file, settings.MEDIA_ROOT).replace(os.sep, '/'))
+        return sorted(result)
+
+    def execute(self, job):
+        stdout = io.StringIO()
+        logger.info(f'バッチ処理開始:{job.command_name}({job.target})-id={job.id}')
+        BatchJobResult.start()
+        try:
+            definition = BATCH_JOB_DEFINITIONS.get(job.command_name)
+            if (not definition) or definition.is_atomic(job):
+                # 画面から直接実行していた時と同様、コマンド内の更新は全て成功した場合のみ反映する
+                with transaction.atomic():
+                    result = call_command(job.command_name, *job.arguments, stdout=stdout, **job.options)
+            else:
+                result = call_command(job.command_name, *job.arguments, stdout=stdout, **job.options)
+            job.status = 'done'
+            job.message = result or stdout.getvalue()
+            logger.info(f'バッチ処理完了:{job.command_name}({job.target})-id={job.id}')
+        except BaseException as e:
+            job.status = 'error'
+            job.message = f'{e}\n{traceback.format_exc()}'
+            logger.error(f'バッチ処理失敗:{job.command_name}({job.target})-id={job.id}')
+            logger.error(traceback.format_exc())
+            if isinstance(e, (KeyboardInterrupt, SystemExit)):
+                self._finish(job)
+                raise
+
+        self._finish(job)
+        return job
+
+    def _finish(self, job):
+        paths = BatchJobResult.finish()
+        try:
+            job.result_files = self._get_result_files(job, paths)
+        except OSError:
+            job.result_files = []
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'message', 'result_files', 'finished_at'])
+
+    def run(self, poll_interval: int = None, exit_when_empty: bool = False):
+        poll_interval = poll_interval or settings.BATCH_JOB_POLL_INTERVAL
+        while True:
+            job = self.claim()
+            if job:
+                self.execute(job)
+                continue
+
+            if exit_when_empty:
+                return
+            time.sleep(poll_interval)
+
+    @classmethod
+    def reset_running(cls):
+        """
+        ワーカー停止により実行中のまま残ったバッチ処理をエラーにする
+        """
+        return BatchJob.objects.filter(status='running').update(
+            status='error', message='ワーカー停止により中断されました', finished_at=timezone.now())
@@ -4,12 +4,11 @@ import os
 import shutil
 import datetime as dt
 import platform
-import openpyxl as excel
 
 from django.conf import settings
 
-from web_order.models import TmpPlateNamePackage
 from web_order.p7 import P7Util
+from web_order.jobs import BatchJobResult
 from web_order.picking import PlatePackageRegister, RawPlatePackageRegisterFactory
 from .utils import AggEngePackageMixin, AggFixedOrderRule, ExcelOutputMixin, AggFixedOrderRuleForBasic
 from web_order.cooking_direction_plates import PlateNameAnalizeUtil
@@ -630,6 +629,7 @@ class AggMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
         measure_output_dir = os.path.join(settings.OUTPUT_DIR, 'measure')
         new_dir_path = os.path.join(measure_output_dir, '計量表_' + in_cook + '_製造')
         os.makedirs(new_dir_path, exist_ok=True)  # 上書きOK
+        BatchJobResult.add(new_dir_path)
 
         if self.fixed_order.is_use_unit_package:
             measure_template = os.path.join(settings.STATICFILES_DIRS[0], 'excel/measure_unit.xlsx')  # 計量表のテンプレート
@@ -683,7 +683,7 @@ class AggMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_menu == '朝食':
 
-            book_b = excel.load_workbook(measure_template)
+            book_b = self.load_template(measure_template)
 
             # 基本食(常食)
             df_bj = manager.get_df_basic()
@@ -757,7 +757,7 @@ class AggMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_menu == '昼食':
 
-            book_l = excel.load_workbook(measure_template)
+            book_l = self.load_template(measure_template)
 
             # 基本食(常食)
             df_lj = manager.get_df_basic()
@@ -836,7 +836,7 @@ class AggMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_menu == '夕食':
 
-            book_d = excel.load_workbook(measure_template)
+            book_d = self.load_template(measure_template)
 
             # 基本食(常食)
             df_dj = manager.get_df_basic()
@@ -917,14 +917,14 @@ class AggMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
         if (self.in_index == -1) and self.before_name:
             logger.info(f'tmp-name:{self.before_name}')
             if self.package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=self.before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.package_size,
                     menu_name='常食'
                 )
             if self.enge_package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=self.before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.enge_package_size,
@@ -1,6 +1,8 @@
 import datetime as dt
 import logging
 import re
+from collections import OrderedDict
+import pandas as pd
 from django.core.management import call_command
 from django.conf import settings
 from django_pandas.io import read_frame
@@ -11,10 +13,11 @@ from .agg_miso_soup import MisoSoupMeasureWriter
 from .agg_miso_soup_devide import MisoSoupDevideMeasureWriter
 from .agg_other_soup import OtherSoupMeasureWriter
 from .agg_other_soup_devide import OtherSoupDevideMeasureWriter
+from .utils import PackageSplitUtil
 
 from web_order.picking import PlatePackageRegister, RawPlatePackageRegisterFactory
 from web_order.cooking_direction_plates import PlateNameAnalizeUtil
-from web_order.models import Order, OrderEveryday, UnitPackage, TmpPlateNamePackage, MixRiceDay
+from web_order.models import Order, OrderEveryday, MixRiceDay
 from web_order.p7 import P7Util
 
 logger = logging.getLogger(__name__)
@@ -982,7 +985,7 @@ class AggMeasureMixRiceParts(AggMeasurePlate):
 
     def call_command(self, enge_adjust_status, manager):
         if self.index == -1:
-            TmpPlateNamePackage.objects.get_or_create(
+            PlatePackageRegister.register_tmp_plate_name(
                 plate_name=self.before_name,
                 cooking_day=self.cooking_day,
                 size=10,
@@ -1049,39 +1052,95 @@ class AggMeasureMixRiceParts(AggMeasurePlate):
             P7Util.save_package_count_for_print(self.cooking_day, self.eating_day, enge_soup_index, 0, 0,
                                                 'ミキサー', self.meal)
             # UnitPackageも削除する
-            qs = UnitPackage.objects.filter(cooking_day=self.cooking_day, eating_day=self.eating_day, meal_name=self.meal,
-                                       index=enge_soup_index, menu_name__in=['ソフト', 'ゼリー', 'ミキサー']).delete()
+            PlatePackageRegister.delete_unit_packages(self.cooking_day, self.eating_day, self.meal,
+                                                      enge_soup_index, ['ソフト', 'ゼリー', 'ミキサー'])
+
+
+def _to_eating_day(eating_day):
+    """
+    喫食日を日付に変換する(文字列の場合は、YYYY-MM-DDの形式)
+    """
+    if isinstance(eating_day, str):
+        return dt.datetime.strptime(eating_day, '%Y-%m-%d').date()
+    return eating_day
+
+
+class AggMeasureOrderSnapshot:
+    """
+    計量表出力時の注文情報のスナップショット。
+    対象の喫食日の全ての食事区分・献立種類の注文と、食数固定注文の数量を1回で読み込み、
+    喫食日・食事区分毎の注文内容は、読み込んだ内容から切り出して返す。
+    """
+    # 注文の取得項目(各集計で使う項目は、この中から切り出す)
+    ORDER_FIELDS = ('unit_name__unit_number', 'unit_name__calc_name',
+                    'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
+                    'menu_name', 'menu_name__id', 'menu_name__menu_name', 'menu_name__group',
+                    'allergen', 'quantity', 'eating_day', 'unit_name__username__dry_cold_type')
+
+    def __init__(self, eating_days):
+        self.eating_days = set([_to_eating_day(x) for x in eating_days])
+
+        qs = Order.objects\
+            .filter(eating_day__in=self.eating_days, quantity__gt=0)\
+            .values(*self.ORDER_FIELDS)\
+            .exclude(unit_name__unit_code__range=[80001, 80008])\
+            .order_by('unit_name__unit_number', 'meal_name__seq_order',
+                      'menu_name__seq_order', 'allergen__seq_order')
+        self.orders = read_frame(qs)
+        self.fixed_quantities = dict(OrderEveryday.objects.values_list('id', 'quantity'))
+        self.nbytes = int(self.orders.memory_usage(deep=True).sum())
+
+    def __str__(self):
+        return f'喫食日数={len(self.eating_days)},注文件数={len(self.orders)},使用メモリ={self.nbytes}'
+
+    def contains(self, eating_day) -> bool:
+        return eating_day in self.eating_days
+
+    def get_orders(self, eating_day, meal: str, columns, **conditions):
+        """
+        喫食日・食事区分の注文のうち、条件(項目名=値)に一致するものを、指定した項目だけ切り出す
+        """
+        df = self.orders
+        mask = (df['eating_day'] == eating_day) & (df['meal_name__meal_name'] == meal)
+        for name, value in conditions.items():
+            mask &= (df[name] == value)
+        if not mask.any():
+            # 注文がない場合は、注文を個別に取得した場合(read_frame)と同じ、項目のみの内容を返す
+            return pd.DataFrame(columns=list(columns))
+        return df.loc[mask, list(columns)].reset_index(drop=True)
+
+    def get_fixed_quantity(self, id: int):
+        return self.fixed_quantities.get(id, 0)
 
 
 class AggMeasureOrdersManager:
     """
     計量表出力時の注文情報を管理する。
+    注文情報は製造日毎のスナップショット(AggMeasureOrderSnapshot)から取得し、集計した注文内容は喫食日・食事区分毎に保持する。
+    スナップショットと保持内容の使用メモリが上限を超えた場合は、使われていない期間の長い喫食日・食事区分のものから破棄する。
     """
-
-    def __init__(self):
+    # 注文内容の集計に使う項目
+    ORDER_COLUMNS = ('unit_name__unit_number', 'unit_name__calc_name',
+                     'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
+                     'menu_name', 'menu_name__group',
+                     'allergen', 'quantity', 'eating_day', 'unit_name__username__dry_cold_type')
+    SOUP_COLUMNS = ORDER_COLUMNS[:-1]
+    RAW_COLUMNS = ('unit_name__unit_number', 'unit_name__calc_name',
+                   'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
+                   'menu_name__menu_name', 'menu_name__group',
+                   'allergen', 'quantity', 'eating_day', 'unit_name__username__dry_cold_type')
+
+    def __init__(self, max_bytes: int = None):
         self.eating_day = None
         self.meal = None
 
-        # 注文内容
-        self.df_basic = None
-        self.df_soft = None
-        self.df_jelly = None
-        self.df_mixer = None
-
-        self.df_filling_basic = None
-        self.df_filling_soft = None
-        self.df_filling_jelly = None
-        self.df_filling_mixer = None
+        self.max_bytes = max_bytes or settings.MEASURE_ORDER_SNAPSHOT_MAX_BYTES
+        self.snapshot = None
 
-        self.df_soup = None
-        self.df_other_soup = None
-        self.df_soup_soft = None
-        self.df_soup_jelly = None
-        self.df_soup_mixer = None
-
-        self.df_raw = None
-        self.df_soup_raw = None
-        self.df_filling_raw = None
+        # 喫食日・食事区分毎の注文内容(key:(喫食日, 食事区分)、value:注文内容の種類をキーにしたdict)
+        self.frames = OrderedDict()
+        self.frame_bytes = {}
+        self.eviction_count = 0
 
         # 食数固定内容
         # -針刺し用
@@ -1100,7 +1159,30 @@ class AggMeasureOrdersManager:
         # -保存用(50g)
         self.preserve_50g_orders = None
 
+    def load_snapshot(self, eating_days):
+        """
+        指定した喫食日の注文情報を読み込む。製造日の計量表出力の開始時に、対象の全ての喫食日を指定する。
+        使用メモリが上限を超える場合は保持せず、喫食日毎に読み込む
+        """
+        if not eating_days:
+            return
+
+        snapshot = AggMeasureOrderSnapshot(eating_days)
+        if snapshot.nbytes > self.max_bytes:
+            logger.warning(f'計量表注文スナップショット上限超過:{snapshot}')
+            self.snapshot = None
+        else:
+            logger.info(f'計量表注文スナップショット:{snapshot}')
+            self.snapshot = snapshot
+
+    def get_snapshot(self):
+        if (self.snapshot is None) or (not self.snapshot.contains(self.eating_day)):
+            self.snapshot = AggMeasureOrderSnapshot([self.eating_day])
+        return self.snapshot
+
     def set_eating(self, eating_day, meal: str):
+        eating_day = _to_eating_day(eating_day)
+
         # 変化がなければ何もしない
         if (self.eating_day == eating_day) and (self.meal == meal):
             return
@@ -1108,42 +1190,12 @@ class AggMeasureOrdersManager:
         self.eating_day = eating_day
         self.meal = meal
 
-        # dataframeの解放・初期化
-        del self.df_basic
-        self.df_basic = None
-        del self.df_soft
-        self.df_soft = None
-        del self.df_jelly
-        self.df_jelly = None
-        del self.df_mixer
-        self.df_mixer = None
-
-        del self.df_filling_basic
-        self.df_filling_basic = None
-        del self.df_filling_soft
-        self.df_filling_soft = None
-        del self.df_filling_jelly
-        self.df_filling_jelly = None
-        del self.df_filling_mixer
-        self.df_filling_mixer = None
-
-        del self.df_soup
-        self.df_soup = None
-        del self.df_other_soup
-        self.df_other_soup = None
-        del self.df_soup_soft
-        self.df_soup_soft = None
-        del self.df_soup_jelly
-        self.df_soup_jelly = None
-        del self.df_soup_mixer
-        self.df_soup_mixer = None
-
-        del self.df_soup_raw
-        self.df_soup_raw = None
-        del self.df_filling_raw
-        self.df_filling_raw = None
-        del self.df_raw
-        self.df_raw = None
+        # 集計済みの注文内容は残し、最後に使ったものとして扱う
+        key = (eating_day, meal)
+        if key in self.frames:
+            self.frames.move_to_end(key)
+        else:
+            self.frames[key] = {}
 
         # 食数固定内容
         # -針刺し用
@@ -1162,8 +1214,32 @@ class AggMeasureOrdersManager:
         # -保存用(50g)
         self.preserve_50g_orders = None
 
-    def make_dataframe(self, queryset):
-        dataframe = read_frame(queryset)
+    def _evict_frames(self):
+        """
+        使用メモリの上限を超えている間、使われていない期間の長い喫食日・食事区分の注文内容を破棄する
+        """
+        snapshot_bytes = self.snapshot.nbytes if self.snapshot else 0
+        while (len(self.frames) > 1) and (snapshot_bytes + sum(self.frame_bytes.values()) > self.max_bytes):
+            key, _ = self.frames.popitem(last=False)
+            self.frame_bytes.pop(key, None)
+            self.eviction_count += 1
+
+    def _get_frame(self, name: str, make, columns, **conditions):
+        """
+        現在の喫食日・食事区分の注文内容を取得する。未集計の場合は、スナップショットから切り出して集計する
+        name: 注文内容の種類、make: 集計処理、columns: 集計に使う項目、conditions: 切り出し条件
+        """
+        key = (self.eating_day, self.meal)
+        frames = self.frames[key]
+        df = frames.get(name, None)
+        if df is None:
+            df = make(self.get_snapshot().get_orders(self.eating_day, self.meal, columns, **conditions))
+            frames[name] = df
+            self.frame_bytes[key] = self.frame_bytes.get(key, 0) + int(df.memory_usage(deep=True).sum())
+            self._evict_frames()
+        return df
+
+    def make_dataframe(self, dataframe):
 
         dataframe = dataframe.groupby(['unit_name__unit_number',
                                        'unit_name__calc_name',
@@ -1180,53 +1256,12 @@ class AggMeasureOrdersManager:
                                               'quantity': '注文数',
                                               'unit_name__username__dry_cold_type': '乾燥冷凍区分'})
 
-        for idx, data in dataframe.iterrows():
-
-            # ----------------------------------------------
-            res = divmod(data['注文数'], 10)
-            dataframe.loc[idx, '単位袋10'] = res[0]
-
-            if res[1] == 1:
-                dataframe.loc[idx, '10の端数袋・入数'] = 0
-                dataframe.loc[idx, '10の1人用袋'] = 1
-            else:
-                dataframe.loc[idx, '10の端数袋・入数'] = res[1]
-                dataframe.loc[idx, '10の1人用袋'] = 0
-
-            # ----------------------------------------------
-            res = divmod(data['注文数'], 7)
-            dataframe.loc[idx, '単位袋7'] = res[0]
-
-            if res[1] == 1:
-                dataframe.loc[idx, '7の端数袋・入数'] = 0
-                dataframe.loc[idx, '7の1人用袋'] = 1
-            else:
-                dataframe.loc[idx, '7の端数袋・入数'] = res[1]
-                dataframe.loc[idx, '7の1人用袋'] = 0
-
-            # ----------------------------------------------
-            res = divmod(data['注文数'], 5)
-            dataframe.loc[idx, '単位袋5'] = res[0]
-
-            if res[1] == 1:
-                dataframe.loc[idx, '5の端数袋・入数'] = 0
-                dataframe.loc[idx, '5の1人用袋'] = 1
-            else:
-                dataframe.loc[idx, '5の端数袋・入数'] = res[1]
-                dataframe.loc[idx, '5の1人用袋'] = 0
-
-        dataframe = dataframe.astype({'単位袋10': 'int64',
-                                      '10の端数袋・入数': 'int64',
-                                      '単位袋7': 'int64',
-                                      '7の端数袋・入数': 'int64',
-                                      '単位袋5': 'int64',
-                                      '5の端数袋・入数': 'int64'
-                                      })
+        # 袋のサイズ毎の袋数
+        dataframe = PackageSplitUtil.add_columns(dataframe)
 
         return dataframe
 
-    def make_dataframe_raw(self, queryset):
-        dataframe = read_frame(queryset)
+    def make_dataframe_raw(self, dataframe):
 
         dataframe = dataframe.groupby(['unit_name__unit_number',
                                        'unit_name__calc_name',
@@ -1251,80 +1286,27 @@ class AggMeasureOrdersManager:
         """
         基本食(常食)の注文内容を取得する
         """
-        if self.df_basic is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day', 'unit_name__username__dry_cold_type')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=1)
-            self.df_basic = self.make_dataframe(qs_plate)
-
-        return self.df_basic
+        return self._get_frame('basic', self.make_dataframe, self.ORDER_COLUMNS, menu_name__id=1)
 
     def get_df_soft(self):
         """
         ソフト食の注文内容を取得する
         """
-        if self.df_soft is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day', 'unit_name__username__dry_cold_type')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=5)
-            self.df_soft = self.make_dataframe(qs_plate)
-
-        return self.df_soft
+        return self._get_frame('soft', self.make_dataframe, self.ORDER_COLUMNS, menu_name__id=5)
 
     def get_df_jelly(self):
         """
         ゼリー食の注文内容を取得する
         """
-        if self.df_jelly is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day', 'unit_name__username__dry_cold_type')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=3)
-            self.df_jelly = self.make_dataframe(qs_plate)
-
-        return self.df_jelly
+        return self._get_frame('jelly', self.make_dataframe, self.ORDER_COLUMNS, menu_name__id=3)
 
     def get_df_mixer(self):
         """
         ミキサー食の注文内容を取得する
         """
-        if self.df_mixer is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day', 'unit_name__username__dry_cold_type')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=4)
-            self.df_mixer = self.make_dataframe(qs_plate)
-
-        return self.df_mixer
-
-    def make_df_filling(self, queryset):
-        dataframe = read_frame(queryset)
+        return self._get_frame('mixer', self.make_dataframe, self.ORDER_COLUMNS, menu_name__id=4)
+
+    def make_df_filling(self, dataframe):
 
         dataframe = dataframe.groupby(['unit_name__unit_number',
                                        'unit_name__calc_name',
@@ -1343,8 +1325,7 @@ class AggMeasureOrdersManager:
 
         return dataframe
 
-    def make_df_soup(self, queryset):
-        dataframe = read_frame(queryset)
+    def make_df_soup(self, dataframe):
 
         dataframe = dataframe.groupby(['unit_name__unit_number',
                                        'unit_name__calc_name',
@@ -1361,32 +1342,12 @@ class AggMeasureOrdersManager:
                                               'menu_name__menu_name': '献立種類',
                                               'quantity': '注文数'})
 
-        for idx, data in dataframe.iterrows():
-            res = divmod(data['注文数'], 10)
-
-            dataframe.loc[idx, '単位袋10'] = res[0]
-            dataframe.loc[idx, '10の端数袋・入数'] = res[1]
-
-            res = divmod(data['注文数'], 7)
-            dataframe.loc[idx, '単位袋7'] = res[0]
-            dataframe.loc[idx, '7の端数袋・入数'] = res[1]
-
-            res = divmod(data['注文数'], 5)
-            dataframe.loc[idx, '単位袋5'] = res[0]
-            dataframe.loc[idx, '5の端数袋・入数'] = res[1]
-
-        dataframe = dataframe.astype({'単位袋10': 'int64',
-                                      '10の端数袋・入数': 'int64',
-                                      '単位袋7': 'int64',
-                                      '7の端数袋・入数': 'int64',
-                                      '単位袋5': 'int64',
-                                      '5の端数袋・入数': 'int64'
-                                      })
+        # 袋のサイズ毎の袋数(1人用袋は使わない)
+        dataframe = PackageSplitUtil.add_columns(dataframe, is_use_one_pack=False)
 
         return dataframe
 
-    def make_df_other_soup(self, queryset):
-        dataframe = read_frame(queryset)
+    def make_df_other_soup(self, dataframe):
 
         dataframe = dataframe.groupby(['unit_name__unit_number',
                                        'unit_name__calc_name',
@@ -1401,231 +1362,60 @@ class AggMeasureOrdersManager:
                                               'unit_name__calc_name': 'ユニット名',
                                               'quantity': '注文数'})
 
-        for idx, data in dataframe.iterrows():
-            # ----------------------------------------------
-            res = divmod(data['注文数'], 10)
-            dataframe.loc[idx, '単位袋10'] = res[0]
-
-            if res[1] == 1:
-                dataframe.loc[idx, '10の端数袋・入数'] = 0
-                dataframe.loc[idx, '10の1人用袋'] = 1
-            else:
-                dataframe.loc[idx, '10の端数袋・入数'] = res[1]
-                dataframe.loc[idx, '10の1人用袋'] = 0
-
-            # ----------------------------------------------
-            res = divmod(data['注文数'], 7)
-            dataframe.loc[idx, '単位袋7'] = res[0]
+        # 袋のサイズ毎の袋数
+        dataframe = PackageSplitUtil.add_columns(dataframe)
 
-            if res[1] == 1:
-                dataframe.loc[idx, '7の端数袋・入数'] = 0
-                dataframe.loc[idx, '7の1人用袋'] = 1
-            else:
-                dataframe.loc[idx, '7の端数袋・入数'] = res[1]
-                dataframe.loc[idx, '7の1人用袋'] = 0
-
-            # ----------------------------------------------
-            res = divmod(data['注文数'], 5)
-            dataframe.loc[idx, '単位袋5'] = res[0]
-
-            if res[1] == 1:
-                dataframe.loc[idx, '5の端数袋・入数'] = 0
-                dataframe.loc[idx, '5の1人用袋'] = 1
-            else:
-                dataframe.loc[idx, '5の端数袋・入数'] = res[1]
-                dataframe.loc[idx, '5の1人用袋'] = 0
-
-        """
-        dataframe = dataframe.astype({'単位袋10': 'int64',
-                                      '10の端数袋・入数': 'int64',
-                                      '単位袋7': 'int64',
-                                      '7の端数袋・入数': 'int64',
-                                      '単位袋5': 'int64',
-                                      '5の端数袋・入数': 'int64'
-                                      })
-        """
         return dataframe
 
     def get_def_miso_raw_soup(self):
-        if self.df_soup is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name__group='常食', meal_name__soup=True)
-
-            # 味噌汁と他の汁・スープは被ることがない前提
-            self.df_soup = self.make_df_soup(qs_raw_plate)
-        return self.df_soup
+        # 味噌汁と他の汁・スープは被ることがない前提
+        return self._get_frame('soup', self.make_df_soup, self.SOUP_COLUMNS,
+                               menu_name__group='常食', meal_name__soup=True)
 
     def get_def_miso_soup(self):
-        if self.df_soup is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name__group='常食', meal_name__soup=True)
-
-            # 味噌汁と他の汁・スープは被ることがない前提
-            self.df_soup = self.make_df_soup(qs_raw_plate)
-        return self.df_soup
+        # 味噌汁と他の汁・スープは被ることがない前提
+        return self._get_frame('soup', self.make_df_soup, self.SOUP_COLUMNS,
+                               menu_name__group='常食', meal_name__soup=True)
 
     def get_def_other_soup(self):
-        if self.df_other_soup is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name__menu_name='常食', meal_name__soup=True)
-
-            # 味噌汁と他の汁・スープは被ることがない前提
-            self.df_other_soup = self.make_df_other_soup(qs_raw_plate)
-        return self.df_other_soup
+        # 味噌汁と他の汁・スープは被ることがない前提
+        return self._get_frame('other_soup', self.make_df_other_soup, self.SOUP_COLUMNS,
+                               menu_name__menu_name='常食', meal_name__soup=True)
 
     def get_def_other_soup_enge(self, menu_name):
-        if menu_name == 'ソフト':
-            df = self.df_soup_soft
-        elif menu_name == 'ミキサー':
-            df = self.df_soup_mixer
-        elif menu_name == 'ゼリー':
-            df = self.df_soup_jelly
-        if df is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name__menu_name=menu_name, meal_name__soup=True)
-
-            # 味噌汁と他の汁・スープは被ることがない前提
-            df = self.make_df_other_soup(qs_raw_plate)
-        return df
+        # 味噌汁と他の汁・スープは被ることがない前提
+        return self._get_frame(f'other_soup_{menu_name}', self.make_df_other_soup, self.SOUP_COLUMNS,
+                               menu_name__menu_name=menu_name, meal_name__soup=True)
 
     def get_def_miso_raw_filling(self):
-        if self.df_filling_raw is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=1, meal_name__filling=True)
-
-            # 味噌汁と他の汁・スープは被ることがない前提
-            self.df_filling_raw = self.make_df_filling(qs_raw_plate)
-        return self.df_filling_raw
+        # 味噌汁と他の汁・スープは被ることがない前提
+        return self._get_frame('filling_raw', self.make_df_filling, self.SOUP_COLUMNS,
+                               menu_name__id=1, meal_name__filling=True)
 
     def get_def_miso_filling(self):
-        if self.df_filling_basic is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=1, meal_name__filling=True)  # 常食 具あり
-
-            self.df_filling_basic = self.make_df_filling(qs_raw_plate)
-        return self.df_filling_basic
+        return self._get_frame('filling_basic', self.make_df_filling, self.SOUP_COLUMNS,
+                               menu_name__id=1, meal_name__filling=True)  # 常食 具あり
 
     def get_def_miso_soft_filling(self):
-        if self.df_filling_soft is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=5, meal_name__filling=True)  # ソフト 具あり
-
-            self.df_filling_soft = self.make_df_filling(qs_raw_plate)
-        return self.df_filling_soft
+        return self._get_frame('filling_soft', self.make_df_filling, self.SOUP_COLUMNS,
+                               menu_name__id=5, meal_name__filling=True)  # ソフト 具あり
 
     def get_def_miso_mixer_filling(self):
-        if self.df_filling_mixer is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=4, meal_name__filling=True)  # ソフト 具あり
-
-            self.df_filling_mixer = self.make_df_filling(qs_raw_plate)
-        return self.df_filling_mixer
+        return self._get_frame('filling_mixer', self.make_df_filling, self.SOUP_COLUMNS,
+                               menu_name__id=4, meal_name__filling=True)  # ミキサー 具あり
 
     def get_def_miso_jelly_filling(self):
-        if self.df_filling_jelly is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal, menu_name=3, meal_name__filling=True)  # ソフト 具あり
-
-            self.df_filling_jelly = self.make_df_filling(qs_raw_plate)
-        return self.df_filling_jelly
+        return self._get_frame('filling_jelly', self.make_df_filling, self.SOUP_COLUMNS,
+                               menu_name__id=3, meal_name__filling=True)  # ゼリー 具あり
 
     def get_df_raw(self):
         """
         原体の注文内容を取得する。
         """
-        if self.df_raw is None:
-            qs = Order.objects\
-                .filter(eating_day=self.eating_day, quantity__gt=0)\
-                .values('unit_name__unit_number', 'unit_name__calc_name',
-                        'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
-                        'menu_name__menu_name', 'menu_name__group',
-                        'allergen', 'quantity', 'eating_day', 'unit_name__username__dry_cold_type')\
-                .exclude(unit_name__unit_code__range=[80001, 80008])\
-                .order_by('unit_name__unit_number', 'meal_name__seq_order',
-                          'menu_name__seq_order', 'allergen__seq_order')
-            qs_raw_plate = qs.filter(meal_name__meal_name=self.meal)
-            self.df_raw = self.make_dataframe_raw(qs_raw_plate)
-
-        return self.df_raw
+        return self._get_frame('raw', self.make_dataframe_raw, self.RAW_COLUMNS)
 
     def get_fixed_quantity(self, id: int):
-        qs_fix = OrderEveryday.objects.filter(id=id).values('quantity')
-        if qs_fix.exists():
-            return qs_fix.first()['quantity']
-        else:
-            return 0
+        return self.get_snapshot().get_fixed_quantity(id)
 
     def get_needle_orders(self):
         if not self.needle_orders:
@@ -4,13 +4,12 @@ import os
 import shutil
 import datetime as dt
 import platform
-import openpyxl as excel
 
 from django.conf import settings
 from django_pandas.io import read_frame
 from django.core.management.base import BaseCommand
 
-from web_order.models import Order, OrderEveryday, UnitPackage, TmpPlateNamePackage
+from web_order.models import Order, OrderEveryday, UnitPackage
 from .utils import AggEngePackageMixin, AggFixedOrderRule, ExcelOutputMixin
 from web_order.cooking_direction_plates import PlateNameAnalizeUtil
 from web_order.p7 import P7Util
@@ -270,7 +269,7 @@ class AggEngeMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_menu == '朝食':
 
-            book_b = excel.load_workbook(measure_template)
+            book_b = self.load_template(measure_template)
 
             # ソフト
             df_bs = manager.get_df_soft()
@@ -331,7 +330,7 @@ class AggEngeMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_menu == '昼食':
 
-            book_l = excel.load_workbook(measure_template)
+            book_l = self.load_template(measure_template)
 
             df_ls = manager.get_df_soft()
             if self.in_is_soup_enge:
@@ -394,7 +393,7 @@ class AggEngeMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_menu == '夕食':
 
-            book_d = excel.load_workbook(measure_template)
+            book_d = self.load_template(measure_template)
 
             df_ds = manager.get_df_soft()
             if self.in_is_soup_enge:
@@ -457,7 +456,7 @@ class AggEngeMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
             self.save_with_select(book_d, dinner_output_file)
 
         if self.in_index == -1:
-            TmpPlateNamePackage.objects.get_or_create(
+            PlatePackageRegister.register_tmp_plate_name(
                 plate_name=self.in_before_name,
                 cooking_day=self.in_cooking_day,
                 size=self.package_size,
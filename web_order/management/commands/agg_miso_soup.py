@@ -4,13 +4,12 @@ import shutil
 import datetime as dt
 from decimal import Decimal, ROUND_HALF_UP
 import platform
-import openpyxl as excel
 
 from django.conf import settings
 from django_pandas.io import read_frame
 from django.core.management.base import BaseCommand
 
-from web_order.models import Order, OrderEveryday, PlatePackageForPrint, UnitPackage, TmpPlateNamePackage
+from web_order.models import Order, OrderEveryday, PlatePackageForPrint, UnitPackage
 from .utils import AggEngePackageMixin, ExcelOutputMixin
 from web_order.p7 import P7Util
 from web_order.picking import PlatePackageRegister, RawPlatePackageRegisterFactory
@@ -392,7 +391,7 @@ class MisoSoupMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
         # 常食（j）薄味（u）ソフト（s）ミキサー（m）ゼリー（z）
         # 具（g） 汁（s）
         # ------------------------------------------------------------------------------
-        book_bm = excel.load_workbook(miso_template)
+        book_bm = self.load_template(miso_template)
         j_items_quantity = self.read_excel_items_quantity(book_bm["汁_常食"], liquid_quantity)
         u_items_quantity = self.read_excel_items_quantity(book_bm["汁_薄味"], liquid_quantity)
         j_total = 0
@@ -489,14 +488,14 @@ class MisoSoupMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.index == -1:
             if self.package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.package_size,
                     menu_name='常食'
                 )
             if self.enge_package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.enge_package_size,
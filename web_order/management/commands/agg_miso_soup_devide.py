@@ -4,13 +4,12 @@ import shutil
 import datetime as dt
 from decimal import Decimal, ROUND_HALF_UP
 import platform
-import openpyxl as excel
 
 from django.conf import settings
 from django_pandas.io import read_frame
 from django.core.management.base import BaseCommand
 
-from web_order.models import Order, OrderEveryday, PlatePackageForPrint, UnitPackage, TmpPlateNamePackage
+from web_order.models import Order, OrderEveryday, PlatePackageForPrint, UnitPackage
 from .utils import AggEngePackageMixin, ExcelOutputMixin
 from web_order.p7 import P7Util
 from web_order.picking import PlatePackageRegister, RawPlatePackageRegisterFactory
@@ -410,7 +409,7 @@ class MisoSoupDevideMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
             miso_enge_template = os.path.join(settings.STATICFILES_DIRS[0],
                                               'excel/measure_miso_enge.xlsx')  # 味噌汁用の具(嚥下)・汁の計量表テンプレ
 
-        book_bm = excel.load_workbook(miso_enge_template)
+        book_bm = self.load_template(miso_enge_template)
         j_items_quantity = self.read_excel_items_quantity(book_bm["汁_常食"], liquid_quantity)
         u_items_quantity = self.read_excel_items_quantity(book_bm["汁_薄味"], liquid_quantity)
         if self.in_menu == '朝食':
@@ -544,7 +543,7 @@ class MisoSoupDevideMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
         # ------------------------------------------------------------------------------
 
         # 具(個数)用
-        book_bm = excel.load_workbook(miso_filling_template)
+        book_bm = self.load_template(miso_filling_template)
         if self.in_menu == '朝食':
             # 基本食(常食)-具
             df_bj_g = manager.get_def_miso_filling()
@@ -605,7 +604,7 @@ class MisoSoupDevideMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
             self.save_with_select(book_bm, dinner_output_miso_ko)
         # ------------------------------------------------------------------------------
         # g用
-        book_bm = excel.load_workbook(miso_filling_template)
+        book_bm = self.load_template(miso_filling_template)
         if self.in_menu == '朝食':
             # 基本食(常食)-具
             self.create_excel_miso_from_filling_template(
@@ -663,14 +662,14 @@ class MisoSoupDevideMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_index == -1:
             if self.package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.package_size,
                     menu_name='常食'
                 )
             if self.enge_package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.enge_package_size,
@@ -9,7 +9,7 @@ from django.conf import settings
 from django.db.models import Sum
 from django_pandas.io import read_frame
 
-from web_order.models import Order, OrderRice, MixRicePackageMaster, TmpPlateNamePackage, OrderEveryday
+from web_order.models import Order, OrderRice, MixRicePackageMaster, OrderEveryday
 from .utils import ExcelOutputMixin
 from web_order.p7 import P7Util
 from web_order.picking import PlatePackageRegister
@@ -68,7 +68,7 @@ class MixRiceMeasureWriter(ExcelOutputMixin):
 
             # アレルギー袋登録用の処理は実施する。
             if self.agg_mix_rice.index == -1:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=self.agg_mix_rice.before_name,
                     cooking_day=self.agg_mix_rice.cooking_day,
                     size=10,
@@ -96,7 +96,7 @@ class MixRiceMeasureWriter(ExcelOutputMixin):
             .exclude(unit_name__unit_code__range=[80001, 80008]) \
             .order_by('unit_name__unit_number')
 
-        book_b = excel.load_workbook(measure_template)
+        book_b = self.load_template(measure_template)
         df = self.make_dataframe(qs)
 
         temp_dir_path = "tmp"
@@ -185,7 +185,7 @@ class MixRiceMeasureWriter(ExcelOutputMixin):
 
         try:
             # 袋数出力のため、読込
-            book_b2 = excel.load_workbook(output_file)
+            book_b2 = self.load_output(output_file)
             ws2 = book_b2["合数一覧"]
 
             pack_50g_count = self._get_50g_pack_count(self.agg_mix_rice.meal)
@@ -299,7 +299,7 @@ class MixRiceMeasureWriter(ExcelOutputMixin):
             book_b2.close()
 
             # 合数ログとの比較用に、計算後の内容を読み取る
-            book_b3 = excel.load_workbook(output_file)
+            book_b3 = self.load_output(output_file)
             pd_ws = book_b3['材料配分']
             pd_ws.column_dimensions["Y"].hidden = False
             pd_ws.sheet_view.selection[0].activeCell = "Y5"
@@ -313,7 +313,7 @@ class MixRiceMeasureWriter(ExcelOutputMixin):
             pass
 
         if self.agg_mix_rice.index == -1:
-            TmpPlateNamePackage.objects.get_or_create(
+            PlatePackageRegister.register_tmp_plate_name(
                 plate_name=self.agg_mix_rice.before_name,
                 cooking_day=self.agg_mix_rice.cooking_day,
                 size=10,
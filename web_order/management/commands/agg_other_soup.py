@@ -5,13 +5,12 @@ import shutil
 import datetime as dt
 from decimal import Decimal, ROUND_HALF_UP
 import platform
-import openpyxl as excel
 
 from django.conf import settings
 from django_pandas.io import read_frame
 from django.core.management.base import BaseCommand
 
-from web_order.models import Order, OrderEveryday, PlatePackageForPrint, UnitPackage, TmpPlateNamePackage
+from web_order.models import Order, OrderEveryday, PlatePackageForPrint, UnitPackage
 from .utils import AggEngePackageMixin, AggFixedOrderRule, ExcelOutputMixin
 from web_order.p7 import P7Util
 from web_order.picking import PlatePackageRegister, RawPlatePackageRegisterFactory
@@ -525,7 +524,7 @@ class OtherSoupMeasureWriter( AggEngePackageMixin, ExcelOutputMixin):
         # 常食（j）薄味（u）ソフト（s）ミキサー（m）ゼリー（z）
         # 具（g） 汁（s）
         # ------------------------------------------------------------------------------
-        book_bm = excel.load_workbook(agg_template)
+        book_bm = self.load_template(agg_template)
         needle_j_fo = soup_fixed_order.get_needle_j()
         needle_u_fo = soup_fixed_order.get_needle_u()
         preserve_j_fo = soup_fixed_order.get_preserve_j()
@@ -739,14 +738,14 @@ class OtherSoupMeasureWriter( AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_index == -1:
             if self.package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=self.before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.package_size,
                     menu_name='常食'
                 )
             if self.enge_package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=self.before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.enge_package_size,
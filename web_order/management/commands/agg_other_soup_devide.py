@@ -6,13 +6,12 @@ import shutil
 import datetime as dt
 from decimal import Decimal, ROUND_HALF_UP
 import platform
-import openpyxl as excel
 
 from django.conf import settings
 from django_pandas.io import read_frame
 from django.core.management.base import BaseCommand
 
-from web_order.models import Order, OrderEveryday, PlatePackageForPrint, UnitPackage, TmpPlateNamePackage
+from web_order.models import Order, OrderEveryday, PlatePackageForPrint, UnitPackage
 from .utils import AggEngePackageMixin, AggFixedOrderRule, ExcelOutputMixin
 from web_order.p7 import P7Util
 from web_order.picking import PlatePackageRegister, RawPlatePackageRegisterFactory
@@ -546,7 +545,7 @@ class OtherSoupDevideMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
         # 嚥下用
         # soup_enge_template = os.path.join(settings.STATICFILES_DIRS[0], 'excel/measure_soup_enge.xlsx')  # 味噌汁以外のスープ用の具(嚥下)・汁の計量表テンプレ
 
-        book_bm = excel.load_workbook(agg_template)
+        book_bm = self.load_template(agg_template)
         needle_j_fo = soup_fixed_order.get_needle_j()
         needle_u_fo = soup_fixed_order.get_needle_u()
         preserve_j_fo = soup_fixed_order.get_preserve_j()
@@ -730,7 +729,7 @@ class OtherSoupDevideMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
         soup_filling_template = os.path.join(settings.STATICFILES_DIRS[0],
                                              'excel/measure_miso_filling.xlsx')  # 味噌汁以外のスープ用の具(常食・薄味)の計量表テンプレ(みそ汁と同じものを使う)
         # 具(個数)用
-        book_bm = excel.load_workbook(soup_filling_template)
+        book_bm = self.load_template(soup_filling_template)
         if self.in_menu == '朝食':
             # 基本食(常食)-具
             df_bj_g = manager.get_def_miso_filling()
@@ -795,7 +794,7 @@ class OtherSoupDevideMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
             self.save_with_select(book_bm, dinner_output_soup_ko)
         # ------------------------------------------------------------------------------
         # g用
-        book_bm = excel.load_workbook(soup_filling_template)
+        book_bm = self.load_template(soup_filling_template)
         if self.in_menu == '朝食':
             self.create_excel_filling(
                 df_bj_g, book_bm["具_常食"], '△ 朝', False, in_name_g, in_qty_g, in_unit_g, needle_j_fo, preserve_j_fo, self.pre_1pack_j, self.photo, [bs_total, bm_total, bz_total])
@@ -853,14 +852,14 @@ class OtherSoupDevideMeasureWriter(AggEngePackageMixin, ExcelOutputMixin):
 
         if self.in_index == -1:
             if self.package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=self.before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.package_size,
                     menu_name='常食'
                 )
             if self.enge_package_size:
-                TmpPlateNamePackage.objects.get_or_create(
+                PlatePackageRegister.register_tmp_plate_name(
                     plate_name=self.before_name,
                     cooking_day=self.in_cooking_day,
                     size=self.enge_package_size,
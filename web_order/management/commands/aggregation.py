@@ -12,6 +12,12 @@ from django.conf import settings
 
 from web_order.models import Order, OrderEveryday, RakukonShortname, MenuMaster, AllergenMaster, CommonAllergen
 from web_order.models import UncommonAllergen
+from web_order.jobs import BatchJobResult
+from web_order.pipeline_trace import PipelineTrace, add_trace_argument
+
+
+# AllergenCount.countsの位置(間食は集計しない)
+MEAL_COUNT_INDEX = {"朝食": 0, "昼食": 1, "夕食": 2}
 
 
 class AllergenCount:
@@ -22,18 +28,30 @@ class AllergenCount:
         # 朝・昼・夕のカウント
         self.counts = [0, 0, 0]
 
+    def add(self, meal, quantity):
+        index = MEAL_COUNT_INDEX.get(meal, None)
+        if index is not None:
+            self.counts[index] += quantity
+
+
 class AllergenAnalyzer:
+    """
+    アレルギーの注文をらくらく献立の食種(頻発アレルギー・散発アレルギー)毎に集計するクラス。
+    頻発・散発アレルギーのマスタは最初にまとめて読み込み、検索用の対応表を作成しておく。
+    """
+    FREEZE_CODE = "ﾌﾘｰｽﾞ"
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
 
-        self.commons = list(CommonAllergen.objects.all().order_by('seq_order'))
+        self.commons = list(CommonAllergen.objects.all().select_related('allergen', 'menu_name').order_by('seq_order'))
         self.uncommons = list(UncommonAllergen.objects.all().select_related('allergen', 'menu_name').order_by('seq_order'))
         self.quantity_list_common = []
         self.quantity_list_uncommon = []
         self.preserved_uncommons = [] # 更新予定の散発アレルギー
         self.chenged_uncommons = []
 
-        self.quantity_list_common.append(AllergenCount("ﾌﾘｰｽﾞ", "フリーズ", 0))
+        self.quantity_list_common.append(AllergenCount(self.FREEZE_CODE, "フリーズ", 0))
         # らくらく献立の食種は、散発アレルギー->頻発アレルギーの順
         for uc in self.uncommons:
             self.quantity_list_uncommon.append(AllergenCount(uc.code, uc.name, uc.seq_order))
@@ -41,13 +59,42 @@ class AllergenAnalyzer:
             cm = group.__next__()
             self.quantity_list_common.append(AllergenCount(key, cm.name, cm.seq_order))
 
+        # 短縮名->食数カウント。同じ短縮名が複数ある場合は、先頭のものに加算する
+        self.common_count_dict = {}
+        for count in self.quantity_list_common:
+            self.common_count_dict.setdefault(count.code, count)
+        self.uncommon_count_dict = {}
+        for count in self.quantity_list_uncommon:
+            self.uncommon_count_dict.setdefault(count.code, count)
+
+        # (献立種類名, アレルギー名)->頻発アレルギー(表示順で先頭のもの)
+        self.common_dict = {}
+        for common in self.commons:
+            self.common_dict.setdefault((common.menu_name.menu_name, common.allergen.allergen_name), common)
+        self.kosyoku_common = next((x for x in self.commons if x.allergen.allergen_name == '個食'), None)
+
+        # アレルギー名->アレルギーマスタ
+        self.allergen_dict = {}
+        for allergen in AllergenMaster.objects.all().order_by('id'):
+            self.allergen_dict.setdefault(allergen.allergen_name, allergen)
+
+        # 献立種類名->散発アレルギーのリスト(表示順)、短縮名->散発アレルギー
+        self.uncommon_menu_dict = {}
+        self.uncommon_code_dict = {}
+        for uc in self.uncommons:
+            self.uncommon_menu_dict.setdefault(uc.menu_name.menu_name, []).append(uc)
+            self.uncommon_code_dict.setdefault(uc.code, uc)
+        self.menu_dict = {}
+
     def _get_uncommon_allergen(self, allergen, menu, meal, quantity):
-        ucs = sorted([x for x in self.uncommons if x.menu_name.menu_name == menu], key=lambda uc: uc.last_use_date)
-        for uncommon in ucs:
-            if uncommon.name == allergen.get_rakukon_name():
-                # 使用日時を更新する
-                uncommon.save()
-                return uncommon
+        rakukon_name = allergen.get_rakukon_name()
+        ucs = [x for x in self.uncommon_menu_dict.get(menu, []) if x.name == rakukon_name]
+        if ucs:
+            # 最終使用日時が最も古いもの(同じ日時の場合は表示順で先のもの)
+            uncommon = min(ucs, key=lambda uc: uc.last_use_date)
+            # 使用日時を更新する
+            uncommon.save()
+            return uncommon
 
         # 散発アレルギーの切り替え用に予約
         self.preserved_uncommons.append((allergen, menu, meal, quantity))
@@ -55,26 +102,31 @@ class AllergenAnalyzer:
 
     def _get_common_allergen(self, name, menu, menu_group):
         if '個食' in name:
-            commons = [x for x in self.commons if x.allergen.allergen_name == '個食']
-            return commons[0]
+            return self.kosyoku_common
 
-        commons = [x for x in self.commons if x.menu_name.menu_name == menu]
-        for common in commons:
-            if common.allergen.allergen_name == name:
-                self.logger.info(f'Allergen name:{name}(order:{common.seq_order})')
-                return common
+        common = self.common_dict.get((menu, name), None)
+        if common:
+            return common
 
         # 見つからなかった場合、嚥下を常食に含める対応
-        commons = [x for x in self.commons if x.menu_name.menu_name == menu_group]
-        for common in commons:
-            if common.allergen.allergen_name == name:
-                self.logger.info(f'Allergen name:{name}(order:{common.seq_order})')
-                return common
+        common = self.common_dict.get((menu_group, name), None)
+        if common:
+            return common
 
         # 通常ありえないはず
         self.logger.warning(f'Allergen name:{name}(menu:{menu}) common allergen not exist.')
         return None
 
+    def get_common_code(self, name, menu, menu_group):
+        """
+        頻発アレルギーとして集計する食種の短縮名を取得する。対応する頻発アレルギーがない場合はNone
+        """
+        if name == "フリーズ":
+            return self.FREEZE_CODE
+
+        common = self._get_common_allergen(name, menu, menu_group)
+        return common.code if common else None
+
     def add_common_for_kizawa(self, meal, quantity):
         kizawa_code = settings.KIZAWA_RAKUKON_CODE
 
@@ -82,61 +134,34 @@ class AllergenAnalyzer:
         if not kizawa_code:
             return
 
-        matches = [x for x in self.quantity_list_common if x.code == kizawa_code]
-        if matches:
-            counts = matches[0].counts
-            if meal == "朝食":
-                counts[0] += quantity
-            elif meal == "昼食":
-                counts[1] += quantity
-            elif meal == "夕食":
-                counts[2] += quantity
+        count = self.common_count_dict.get(kizawa_code, None)
+        if count:
+            count.add(meal, quantity)
+
+    def add_common_by_code(self, code, meal, quantity):
+        count = self.common_count_dict.get(code, None)
+        if count:
+            count.add(meal, quantity)
 
     def add_common(self, name, menu, menu_group, meal, quantity):
         # 頻発アレルギーは、らくらく献立アレルギー名の比較は行わない(CommonAllergenのcodeに正しい短縮名が入っていればよい)
-
-        if name == "フリーズ":
-            freeze_count = self.quantity_list_common[0].counts
-            if meal == "朝食":
-                freeze_count[0] += quantity
-            elif meal == "昼食":
-                freeze_count[1] += quantity
-            elif meal == "夕食":
-                freeze_count[2] += quantity
+        code = self.get_common_code(name, menu, menu_group)
+        if code:
+            self.add_common_by_code(code, meal, quantity)
         else:
-            common = self._get_common_allergen(name, menu, menu_group)
-            if common:
-                self.logger.info(f'Add Common:{common.name}(order:{common.seq_order})')
-                matches = [x for x in self.quantity_list_common if x.code == common.code]
-                if matches:
-                    counts = matches[0].counts
-                    if meal == "朝食":
-                        counts[0] += quantity
-                    elif meal == "昼食":
-                        counts[1] += quantity
-                    elif meal == "夕食":
-                        counts[2] += quantity
-            else:
-                # 対応する頻発アレルギーが存在しなかったら、取りこぼしのないよう、散発アレルギーとして集計しておく
-                self.add_uncommon(name, menu, meal, quantity)
+            # 対応する頻発アレルギーが存在しなかったら、取りこぼしのないよう、散発アレルギーとして集計しておく
+            self.add_uncommon(name, menu, meal, quantity)
 
     def _add_uncommon_order_count(self, code, meal, quantity):
-        matches = [x for x in self.quantity_list_uncommon if x.code == code]
-        if matches:
-            counts = matches[0].counts
-            if meal == "朝食":
-                counts[0] += quantity
-            elif meal == "昼食":
-                counts[1] += quantity
-            elif meal == "夕食":
-                counts[2] += quantity
+        count = self.uncommon_count_dict.get(code, None)
+        if count:
+            count.add(meal, quantity)
 
     def add_uncommon(self, name, menu, meal, quantity):
         # らくらく献立側に散発アレルギーを使いまわしてもらう(=食種情報を更新してもらう)ため、
         # らくらく献立のアレルギー名で比較を行う
-        allergen_list = AllergenMaster.objects.filter(allergen_name=name)
-        if allergen_list:
-            allergen = allergen_list[0]
+        allergen = self.allergen_dict.get(name, None)
+        if allergen:
             uncommon = self._get_uncommon_allergen(allergen, menu, meal, quantity)
             if uncommon:
                 self._add_uncommon_order_count(uncommon.code, meal, quantity)
@@ -145,25 +170,59 @@ class AllergenAnalyzer:
             # 画面からの操作では、ここには到達しない想定
             pass
 
+    def add_orders(self, df):
+        """
+        献立種類・アレルギー・食事区分毎に集計した注文を、食種毎に加算する。
+        頻発アレルギーは短縮名と食事区分でまとめて加算し、散発アレルギー(対応する頻発アレルギーがないものを含む)は
+        使用日時の更新順を保つため、行の順に加算する。
+        """
+        if df.empty:
+            return
+
+        # 頻発アレルギーの行について、(アレルギー, 献立種類, 献立種類グループ)の組み合わせ毎に短縮名を求める
+        df_common = df[df['is_common'].astype(bool)]
+        keys = list(zip(df_common['allergen'], df_common['menu_name'], df_common['menu_name__group']))
+        code_dict = {key: self.get_common_code(*key) for key in dict.fromkeys(keys)}
+        codes = pd.Series([code_dict[key] for key in keys], index=df_common.index, dtype=object) \
+            .reindex(df.index)
+
+        is_common = codes.notnull()
+        df_common = df[is_common].assign(code=codes[is_common])
+        for (code, meal), quantity in df_common.groupby(['code', 'meal_name__meal_name'])['quantity'].sum().items():
+            self.add_common_by_code(code, meal, quantity)
+
+        df_uncommon = df[~is_common]
+        for name, menu, meal, quantity in zip(
+                df_uncommon['allergen'], df_uncommon['menu_name'], df_uncommon['meal_name__meal_name'],
+                df_uncommon['quantity']):
+            self.add_uncommon(name, menu, meal, quantity)
+
+    def _get_menu(self, menu):
+        menu_master = self.menu_dict.get(menu, None)
+        if not menu_master:
+            menu_master = MenuMaster.objects.get(menu_name=menu)
+            self.menu_dict[menu] = menu_master
+        return menu_master
+
     def change_uncommon(self):
         for allergen, menu, meal, quantity in self.preserved_uncommons:
-            ucs = sorted(self.uncommons, key=lambda x: x.last_use_date)
-            for uc in ucs:
-                # 献立種類(常食/薄味/ソフト/ゼリー/ミキサー)が等しいものを取得
-                if menu == uc.menu_name.menu_name:
-                    # 散発アレルギーの切り替え(データの更新)
+            # 献立種類(常食/薄味/ソフト/ゼリー/ミキサー)が等しいもののうち、最終使用日時が最も古いものを取得
+            ucs = [x for x in self.uncommons if menu == x.menu_name.menu_name]
+            if ucs:
+                uc = min(ucs, key=lambda x: x.last_use_date)
+
+                # 散発アレルギーの切り替え(データの更新)
 
-                    # 更新前の情報を退避
-                    self.chenged_uncommons.append((uc.code, uc.name))
+                # 更新前の情報を退避
+                self.chenged_uncommons.append((uc.code, uc.name))
 
-                    uc.name = allergen.get_rakukon_name()
-                    uc.menu_name = MenuMaster.objects.get(menu_name=menu)
-                    uc.allergen = allergen
-                    uc.save()
+                uc.name = allergen.get_rakukon_name()
+                uc.menu_name = self._get_menu(menu)
+                uc.allergen = allergen
+                uc.save()
 
-                    # 食数の加算
-                    self._add_uncommon_order_count(uc.code, meal, quantity)
-                    break
+                # 食数の加算
+                self._add_uncommon_order_count(uc.code, meal, quantity)
 
     def get_autoinput(self):
         prefix_list = []    # フリーズの食数情報
@@ -189,10 +248,7 @@ class AllergenAnalyzer:
         return prefix_list, result_list
 
     def _get_uncommon_list_item(self, short_name):
-        for uc in self.uncommons:
-            if short_name == uc.code:
-                return uc
-        return None
+        return self.uncommon_code_dict.get(short_name, None)
 
     def _get_chenged_uncommon(self, short_name):
         for tpl in self.chenged_uncommons:
@@ -225,6 +281,7 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('date', nargs='+', type=str)
+        add_trace_argument(parser)
 
     def write_csv_sjis(self, df, path):
         with open(path, mode="w",
@@ -232,20 +289,33 @@ class Command(BaseCommand):
             # Windwows環境だと、余分な改行(空白行)が挿入される?
             df.to_csv(f, index=False)
 
+    def trace_csv(self, trace, dir_path, name, df):
+        """
+        中間ファイル(CSV)を出力する。出力の有無は出力レベル(--trace、設定値PIPELINE_TRACE_LEVEL)による
+        """
+        trace.dump(name, df, os.path.join(dir_path, name + '.csv'), index=False)
+
     def exclude_fzreeze_order(self, df):
         """
         Dataframeの中から、フリーズの注文を除く。フリーズは、ユニット名に「フリーズ」を含むものを指すものとする。
         """
-        exclude_list = []
-        i = 0
-        for index, row in df.iterrows():
-            if 'フリーズ' in row.unit_name:
-                exclude_list.append(i)
-            i += 1
-        excluded = df.drop(index=df.index[exclude_list])
-        return excluded
+        return df[~self.get_freeze_mask(df)]
+
+    def get_freeze_mask(self, df):
+        """
+        フリーズの注文(ユニット名に「フリーズ」を含む)の行を示すマスク
+        """
+        return df.unit_name.str.contains('フリーズ', regex=False)
 
     def handle(self, *args, **options):
+        with PipelineTrace('aggregation', options['trace']) as trace:
+            new_dir_path = self.aggregate(options['date'][0], trace)  # 呼び出し時の引数1つ目
+
+        # 中間ファイルの書き込み完了後に圧縮する
+        shutil.make_archive(new_dir_path, 'zip', root_dir=new_dir_path)
+        BatchJobResult.add(new_dir_path, new_dir_path + '.zip')
+
+    def aggregate(self, in_date, trace):
 
         #######################################################
         # らくらく献立に食数を入力するため、食種別に集計する処理（新しい方式）
@@ -253,7 +323,6 @@ class Command(BaseCommand):
 
         # 集計日時を喫食日で指定する
         # in_date = '2022-04-01'
-        in_date = options['date'][0]  # 呼び出し時の引数1つ目
 
         aggregation_day = dt.datetime.strptime(in_date, '%Y-%m-%d')
         aggregation_day = aggregation_day.date()  # 時刻部分を除外
@@ -290,6 +359,7 @@ class Command(BaseCommand):
 
         # ------------------------------------------------------------------------------
         # 当日の全データ
+        # 中間ファイルの行の並び(と、それに依存する集計値)を実行計画に左右されないよう、登録順に取得する
         # ------------------------------------------------------------------------------
         qs_all = Order.objects\
             .filter(eating_day=aggregation_day, quantity__gt=0)\
@@ -297,10 +367,11 @@ class Command(BaseCommand):
                     'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
                     'menu_name', 'menu_name__group',
                     'allergen', 'quantity', 'eating_day')\
-            .exclude(unit_name__unit_code__range=[80001, 80008])
+            .exclude(unit_name__unit_code__range=[80001, 80008])\
+            .order_by('id')
         df_all = read_frame(qs_all)
 
-        df_all.to_csv(new_dir_path + "/A-1-1_注文データ_アレルギー込.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-1-1_注文データ_アレルギー込', df_all)
 
         shokusu = df_all['quantity'].sum()
         aggregation_log.loc[len(aggregation_log)] = ['A-1-1_注文データ_アレルギー込', len(df_all), shokusu]
@@ -317,7 +388,8 @@ class Command(BaseCommand):
                     'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling',
                     'menu_name', 'menu_name__group',
                     'allergen', 'quantity', 'eating_day')\
-            .exclude(unit_name__unit_name='サンシティあい 検食用')
+            .exclude(unit_name__unit_name='サンシティあい 検食用')\
+            .order_by('id')
 
         df_everyday = read_frame(qs_everyday)
 
@@ -327,23 +399,19 @@ class Command(BaseCommand):
         df_everyday = df_everyday.fillna({'unit_name__unit_number': 999, 'eating_day': aggregation_day})
         df_everyday = df_everyday.astype({'unit_name__unit_number': 'int64'})
 
-        df_everyday.to_csv(new_dir_path + "/A-1-pre2_食数固定製造分(置き換え前).csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-1-pre2_食数固定製造分(置き換え前)', df_everyday)
 
         # 薄味の固定分を置き換え
         if basic_plate_enable:
             # 薄味読込
-            drop_index_list = []
-            for index, row in df_everyday.iterrows():
-                if (row['unit_name__unit_number'] == 999) and (row['menu_name'] == '薄味'):
-                    if row['unit_name'] == '保存':
-                        df_everyday.loc[index, 'menu_name'] = '常食'
-                        df_everyday.loc[index, 'menu_name__group'] = '常食'
-                    elif row['unit_name'] == '保存1人袋':
-                        drop_index_list.append(index)
-
-            df_everyday = df_everyday.drop(index=df_everyday.index[drop_index_list])
-
-        df_everyday.to_csv(new_dir_path + "/A-1-2_食数固定製造分.csv", index=False)
+            is_fixed_usuaji = (df_everyday['unit_name__unit_number'] == 999) & (df_everyday['menu_name'] == '薄味')
+            replace_mask = is_fixed_usuaji & (df_everyday['unit_name'] == '保存')
+            drop_mask = is_fixed_usuaji & (df_everyday['unit_name'] == '保存1人袋')
+
+            df_everyday.loc[replace_mask, ['menu_name', 'menu_name__group']] = '常食'
+            df_everyday = df_everyday[~drop_mask]
+
+        self.trace_csv(trace, new_dir_path, 'A-1-2_食数固定製造分', df_everyday)
         aggregation_log.loc[len(aggregation_log)] = ['A-1-2_食数固定製造分', len(df_everyday), shokusu]
 
 
@@ -352,26 +420,17 @@ class Command(BaseCommand):
 
         shokusu = df_all_everyday['quantity'].sum()
 
-        df_all_everyday.to_csv(new_dir_path + "/A-1-3_注文データ＋食数固定.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-1-3_注文データ＋食数固定', df_all_everyday)
         aggregation_log.loc[len(aggregation_log)] = ['A-1-3_注文データ＋食数固定↓', len(df_all_everyday), shokusu]
 
 
-        for index, row in df_all_everyday.iterrows():
+        # 汁・具のある食事区分の食数(ない場合は0)
+        df_all_everyday['quantity_soup'] = \
+            df_all_everyday['quantity'].where(df_all_everyday['meal_name__soup'] == True, 0).astype('int64')
+        df_all_everyday['quantity_filling'] = \
+            df_all_everyday['quantity'].where(df_all_everyday['meal_name__filling'] == True, 0).astype('int64')
 
-            if row['meal_name__soup'] is True:
-                df_all_everyday.loc[index, 'quantity_soup'] = row['quantity']
-            else:
-                df_all_everyday.loc[index, 'quantity_soup'] = 0
-
-            if row['meal_name__filling'] is True:
-                df_all_everyday.loc[index, 'quantity_filling'] = row['quantity']
-            else:
-                df_all_everyday.loc[index, 'quantity_filling'] = 0
-
-        df_all_everyday = df_all_everyday.astype({'quantity_soup': 'int64'})
-        df_all_everyday = df_all_everyday.astype({'quantity_filling': 'int64'})
-
-        df_all_everyday.to_csv(new_dir_path + "/A-1-4_注文データ＋食数固定_味噌汁食数列追加.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-1-4_注文データ＋食数固定_味噌汁食数列追加', df_all_everyday)
 
         # ------------------------------------------------------------------------------
         # 食数内訳の出力(汁具は常食/薄味共通)
@@ -469,7 +528,7 @@ class Command(BaseCommand):
         self.write_csv_sjis(df_kizawa, new_dir_path + "/50_木沢個食_内訳.csv")
 
         aggregation_log.loc[len(aggregation_log)] = ['A-1-4_注文データ＋食数固定↓_味噌汁食数列追加', len(df_all_everyday), '']
-        df_without_allergen.to_csv(new_dir_path + "/A-1-5_注文データ＋食数固定_味噌汁食数列追加_アレルギーなし.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-1-5_注文データ＋食数固定_味噌汁食数列追加_アレルギーなし', df_without_allergen)
 
 
         # ------------------------------------------------------------------------------
@@ -480,18 +539,9 @@ class Command(BaseCommand):
         # ------------------------------------------------------------------------------
 
         # フリーズの集計(現在はユニットとして換算する仕様)
-        f_b = f_l = f_k = f_d = 0
-        for index, row in df_all_everyday.iterrows():
-            name = row['unit_name']
-            if name.find("フリーズ") != -1:
-                if row['meal_name__meal_name'] == "朝食":
-                    f_b += row['quantity']
-                elif row['meal_name__meal_name'] == "昼食":
-                    f_l += row['quantity']
-                elif row['meal_name__meal_name'] == "間食":
-                    f_k += row['quantity']
-                elif row['meal_name__meal_name'] == "夕食":
-                    f_d += row['quantity']
+        df_freeze = df_all_everyday[self.get_freeze_mask(df_all_everyday)]
+        freeze_quantities = df_freeze.groupby('meal_name__meal_name')['quantity'].sum()
+        f_b, f_l, f_k, f_d = [freeze_quantities.get(meal, 0) for meal in ("朝食", "昼食", "間食", "夕食")]
         freeze_input = [f_b, f_l, f_k, f_d]
 
         df_all_everyday = df_all_everyday.groupby(['menu_name__group', 'meal_name__meal_name']).sum().reset_index()
@@ -501,7 +551,7 @@ class Command(BaseCommand):
         shokusu_g = df_without_allergen['quantity_filling'].sum()
         shokusu_s = df_without_allergen['quantity_soup'].sum()
 
-        df_all_everyday.to_csv(new_dir_path + "/A-2_注文データ_集計後.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-2_注文データ_集計後', df_all_everyday)
         aggregation_log.loc[len(aggregation_log)] = ['A-2_注文データ_集計後', len(df_all_everyday), shokusu]
         aggregation_log.loc[len(aggregation_log)] = ['味噌汁の具 総数', '', shokusu_g]
         aggregation_log.loc[len(aggregation_log)] = ['味噌汁の汁 総数', '', shokusu_s]
@@ -547,57 +597,35 @@ class Command(BaseCommand):
         # らくらく献立に自動入力する順番に合わせて、集計したものを「朝・昼・間・夕」に並び替える
         # ------------------------------------------------------------------------------
 
-        j_b = j_l = j_k = j_d = 0
-        j_b_g = j_l_g = j_d_g = 0
-        j_b_s = j_l_s = j_d_s = 0
-
-        u_b = u_l = u_k = u_d = 0
-        u_b_g = u_l_g = u_d_g = 0
-        u_b_s = u_l_s = u_d_s = 0
-
-        for index, row in df_all_everyday.iterrows():
-            if row['menu_name__group'] == "常食":
-                if row['meal_name__meal_name'] == "朝食":
-                    j_b = row['quantity']               # 常食・朝食
-                elif row['meal_name__meal_name'] == "昼食":
-                    j_l = row['quantity']               # 常食・昼食
-                elif row['meal_name__meal_name'] == "間食":
-                    j_k = row['quantity']               # 常食・間食
-                elif row['meal_name__meal_name'] == "夕食":
-                    j_d = row['quantity']               # 常食・夕食
-
-            elif row['menu_name__group'] == "薄味":
-                if row['meal_name__meal_name'] == "朝食":
-                    u_b = row['quantity']               # 薄味・朝食
-                elif row['meal_name__meal_name'] == "昼食":
-                    u_l = row['quantity']               # 薄味・昼食
-                elif row['meal_name__meal_name'] == "間食":
-                    u_k = row['quantity']
-                elif row['meal_name__meal_name'] == "夕食":
-                    u_d = row['quantity']               # 薄味・夕食
-
-        for index, row in df_all_everyday.iterrows():
-            if row['menu_name__group'] == "常食":
-                if row['meal_name__meal_name'] == "朝食":
-                    j_b_g = row['quantity_filling']   # 常食・朝食・具
-                    j_b_s = row['quantity_soup']      # 常食・朝食・汁
-                elif row['meal_name__meal_name'] == "昼食":
-                    j_l_g = row['quantity_filling']   # 常食・昼食・具
-                    j_l_s = row['quantity_soup']      # 常食・昼食・汁
-                elif row['meal_name__meal_name'] == "夕食":
-                    j_d_g = row['quantity_filling']   # 常食・夕食・具
-                    j_d_s = row['quantity_soup']      # 常食・夕食・汁
-
-            elif row['menu_name__group'] == "薄味":
-                if row['meal_name__meal_name'] == "朝食":
-                    u_b_g = row['quantity_filling']   # 薄味・朝食・具
-                    u_b_s = row['quantity_soup']      # 薄味・朝食・汁
-                elif row['meal_name__meal_name'] == "昼食":
-                    u_l_g = row['quantity_filling']   # 薄味・昼食・具
-                    u_l_s = row['quantity_soup']      # 薄味・昼食・汁
-                elif row['meal_name__meal_name'] == "夕食":
-                    u_d_g = row['quantity_filling']   # 薄味・夕食・具
-                    u_d_s = row['quantity_soup']      # 薄味・夕食・汁
+        # (献立種類グループ, 食事区分)->集計値
+        totals = df_all_everyday.set_index(['menu_name__group', 'meal_name__meal_name'])
+        quantities = totals['quantity'].to_dict()
+        fillings = totals['quantity_filling'].to_dict()
+        soups = totals['quantity_soup'].to_dict()
+
+        j_b = quantities.get(("常食", "朝食"), 0)       # 常食・朝食
+        j_l = quantities.get(("常食", "昼食"), 0)       # 常食・昼食
+        j_k = quantities.get(("常食", "間食"), 0)       # 常食・間食
+        j_d = quantities.get(("常食", "夕食"), 0)       # 常食・夕食
+
+        u_b = quantities.get(("薄味", "朝食"), 0)       # 薄味・朝食
+        u_l = quantities.get(("薄味", "昼食"), 0)       # 薄味・昼食
+        u_k = quantities.get(("薄味", "間食"), 0)
+        u_d = quantities.get(("薄味", "夕食"), 0)       # 薄味・夕食
+
+        j_b_g = fillings.get(("常食", "朝食"), 0)       # 常食・朝食・具
+        j_b_s = soups.get(("常食", "朝食"), 0)          # 常食・朝食・汁
+        j_l_g = fillings.get(("常食", "昼食"), 0)       # 常食・昼食・具
+        j_l_s = soups.get(("常食", "昼食"), 0)          # 常食・昼食・汁
+        j_d_g = fillings.get(("常食", "夕食"), 0)       # 常食・夕食・具
+        j_d_s = soups.get(("常食", "夕食"), 0)          # 常食・夕食・汁
+
+        u_b_g = fillings.get(("薄味", "朝食"), 0)       # 薄味・朝食・具
+        u_b_s = soups.get(("薄味", "朝食"), 0)          # 薄味・朝食・汁
+        u_l_g = fillings.get(("薄味", "昼食"), 0)       # 薄味・昼食・具
+        u_l_s = soups.get(("薄味", "昼食"), 0)          # 薄味・昼食・汁
+        u_d_g = fillings.get(("薄味", "夕食"), 0)       # 薄味・夕食・具
+        u_d_s = soups.get(("薄味", "夕食"), 0)          # 薄味・夕食・汁
 
         b_g = j_b_g + u_b_g
         l_g = j_l_g + u_l_g
@@ -621,7 +649,7 @@ class Command(BaseCommand):
 
         qs_allergen = qs_all.filter(allergen_id__gte=2)
         df_allergen = read_frame(qs_allergen)
-        df_allergen.to_csv(new_dir_path + "/A-4_注文_アレルギーあり.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-4_注文_アレルギーあり', df_allergen)
         aggregation_log.loc[len(aggregation_log)] = ['A-4_注文_アレルギーあり', len(df_allergen), '']
 
 
@@ -637,7 +665,7 @@ class Command(BaseCommand):
                                            'menu_name',
                                            'allergen',
                                            'meal_name__meal_name']).sum().reset_index()
-        df_allergen.to_csv(new_dir_path + "/A-5-1_集計_アレルギーあり.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-5-1_集計_アレルギーあり', df_allergen)
 
 
         # ------------------------------------------------------------------------------
@@ -648,7 +676,7 @@ class Command(BaseCommand):
 
         # 結合するために列名を変更
         df_menu_seq = df_menu_seq.rename(columns={'menu_name': 'menu_name__group'})
-        df_menu_seq.to_csv(new_dir_path + "/A-5-2_献立種類順.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-5-2_献立種類順', df_menu_seq)
 
         # 結合
         allergen_menu_seq = pd.merge(df_allergen, df_menu_seq, on='menu_name__group', how='left')
@@ -662,14 +690,14 @@ class Command(BaseCommand):
 
         # 結合するために列名を変更
         df_allergen_seq = df_allergen_seq.rename(columns={'allergen_name': 'allergen'})
-        df_allergen_seq.to_csv(new_dir_path + "/A-5-3_アレルギー順.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-5-3_アレルギー順', df_allergen_seq)
 
         # 結合
         allergen_seq = pd.merge(allergen_menu_seq, df_allergen_seq, on='allergen', how='left')
 
         allergen_seq = allergen_seq.sort_values(['seq_order_y', 'allergen', 'seq_order_x'])
 
-        allergen_seq.to_csv(new_dir_path + "/A-5-4_集計_アレルギーあり_ソート.csv", index=False)
+        self.trace_csv(trace, new_dir_path, 'A-5-4_集計_アレルギーあり_ソート', allergen_seq)
 
 
         # ------------------------------------------------------------------------------
@@ -682,20 +710,12 @@ class Command(BaseCommand):
         auto_input_a = []  # 散発アレルギー+頻発アレルギーの朝・昼・夕の食数を連結したもの
 
         analyzer = AllergenAnalyzer()
-        for index, row in allergen_seq.iterrows():
-            # if row['menu_name__group'] == menu_prev and row['allergen'] == allergen_prev:
-            # ------------------------------------------------------------------
-            # 献立種類とアレルギーの組み合わせが「同じ場合」は食数のみ反映させる
-            # ------------------------------------------------------------------
-            if row['is_common']:
-                analyzer.add_common(row['allergen'], row['menu_name'], row['menu_name__group'], row['meal_name__meal_name'], row['quantity'])
-            else:
-                analyzer.add_uncommon(row['allergen'], row['menu_name'], row['meal_name__meal_name'], row['quantity'])
+        analyzer.add_orders(allergen_seq)
         analyzer.change_uncommon()
 
         # 木沢個食の集計(頻発アレルギーとして登録する)
-        for index, row in df_kizawa.iterrows():
-            analyzer.add_common_for_kizawa(row['meal_name__meal_name'], row['quantity'])
+        for meal, quantity in df_kizawa.groupby('meal_name__meal_name')['quantity'].sum().items():
+            analyzer.add_common_for_kizawa(meal, quantity)
 
         prefix_auto_input_a, auto_input_a = analyzer.get_autoinput()
 
@@ -705,6 +725,7 @@ class Command(BaseCommand):
         wb = excel.load_workbook(allergen_template)
         analyzer.write_uncommon_list(wb['アレルギー一覧'], aggregation_day)
         wb.save(uncommon_aggregation_file)
+        BatchJobResult.add(uncommon_aggregation_file)
 
         # ------------------------------------------------------------------
         # 食数自動入力用ファイルの出力
@@ -737,6 +758,7 @@ class Command(BaseCommand):
         # ローカルで実行する際に参照できるようmediaフォルダに書き出す
 
         df_auto_input.to_csv(auto_input_file, header=False, index=False)
+        BatchJobResult.add(auto_input_file)
 
         df_auto_input.to_csv(new_dir_path + "/A-3_らく献_自動入力.csv", header=False, index=False)
 
@@ -746,4 +768,4 @@ class Command(BaseCommand):
 
         # ログを出力
         aggregation_log.to_csv(aggregation_file, index=False, mode='a')
-        shutil.make_archive(new_dir_path, 'zip', root_dir=new_dir_path)
+        return new_dir_path
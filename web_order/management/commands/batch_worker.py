@@ -0,0 +1,70 @@
+import logging
+import multiprocessing
+import os
+import socket
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from web_order.jobs import BatchJobWorker
+
+logger = logging.getLogger(__name__)
+
+
+def run_worker(name: str, poll_interval: int, exit_when_empty: bool):
+    # spawn方式(Windows)で起動された場合に備えて、Djangoを初期化する
+    django.setup()
+
+    worker = BatchJobWorker(name)
+    try:
+        worker.run(poll_interval=poll_interval, exit_when_empty=exit_when_empty)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """
+    コントロールパネルから登録されたバッチ処理を、複数プロセスで実行する
+    """
+    help = 'バッチ処理ワーカーを起動する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='ワーカープロセス数')
+        parser.add_argument('--interval', type=int, default=None, help='待機中ジョブの確認間隔(秒)')
+        parser.add_argument('--once', action='store_true', help='待機中のジョブがなくなったら終了する')
+        parser.add_argument('--reset-running', action='store_true', help='実行中のまま残ったジョブをエラーにしてから起動する')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or settings.BATCH_JOB_WORKERS
+        interval = options['interval'] or settings.BATCH_JOB_POLL_INTERVAL
+        exit_when_empty = options['once']
+
+        if options['reset_running']:
+            count = BatchJobWorker.reset_running()
+            logger.warning(f'中断されたバッチ処理をエラーにしました:{count}件')
+
+        # 子プロセスにDB接続を引き継がないよう、起動前に閉じておく
+        connections.close_all()
+
+        host = socket.gethostname()
+        processes = []
+        for i in range(workers):
+            name = f'{host}-{os.getpid()}-{i + 1}'
+            process = multiprocessing.Process(target=run_worker, args=(name, interval, exit_when_empty), name=name)
+            process.start()
+            processes.append(process)
+        logger.info(f'バッチ処理ワーカー起動:{workers}プロセス')
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+        logger.info('バッチ処理ワーカー終了')
@@ -0,0 +1,78 @@
+import datetime as dt
+import timeit
+
+from dateutil.relativedelta import relativedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from web_order.date_management import SalesDayUtil, OrderChangableDayUtil
+
+
+def get_by_eating_day_parse_each(eating_day, date_settings):
+    """
+    設定値を呼び出し毎に変換する、従来の売上日算出(比較用)
+    """
+    dt_list = [(x[0], dt.datetime.strptime(x[1], '%Y-%m-%d').date()) for x in date_settings]
+    dt_days = [y[0] for y in dt_list if y[1] <= eating_day][-1]
+    return eating_day - relativedelta(days=dt_days)
+
+
+def get_rule_version_parse_each(current_day, hour, date_settings):
+    """
+    設定値を呼び出し毎に変換する、従来のルールバージョン取得(比較用)
+    """
+    if hour >= 10:
+        current_day += relativedelta(days=1)
+    dt_list = [(x[0], dt.datetime.strptime(x[1], '%Y-%m-%d').date()) for x in date_settings]
+    return [y[0] for y in dt_list if y[1] <= current_day][-1]
+
+
+class Command(BaseCommand):
+    """
+    売上日・食数変更ルールの設定値参照の処理時間を計測する
+    """
+    help = '日付設定参照のマイクロベンチマーク'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=10000, help='計測する日数')
+        parser.add_argument('--repeat', type=int, default=5, help='計測回数(最速値を採用)')
+
+    def measure(self, func, repeat):
+        return min(timeit.repeat(func, number=1, repeat=repeat))
+
+    def write_result(self, label, seconds, count):
+        self.stdout.write(f'{label}: 合計={seconds * 1000:.2f}ms, 1件あたり={seconds / count * 1000000:.3f}us')
+
+    def handle(self, *args, **options):
+        count = options['days']
+        repeat = options['repeat']
+
+        sales_settings = settings.EATING_SALES_SETTINGS
+        change_settings = settings.ORDER_CHANGEABLE_SETTINGS
+        start = dt.date(2023, 1, 1)
+        days = [start + dt.timedelta(days=i % 1000) for i in range(count)]
+        hours = [i % 24 for i in range(count)]
+
+        self.stdout.write(f'件数={count}')
+        self.write_result(
+            '売上日(従来)',
+            self.measure(lambda: [get_by_eating_day_parse_each(x, sales_settings) for x in days], repeat), count)
+        self.write_result(
+            '売上日(変換済み)',
+            self.measure(lambda: [SalesDayUtil.get_by_eating_day(x, sales_settings) for x in days], repeat), count)
+        self.write_result(
+            '売上日(一括)',
+            self.measure(lambda: SalesDayUtil.get_by_eating_days(days, sales_settings), repeat), count)
+
+        self.write_result(
+            'ルールバージョン(従来)',
+            self.measure(lambda: [get_rule_version_parse_each(x, y, change_settings) for x, y in zip(days, hours)],
+                         repeat), count)
+        self.write_result(
+            'ルールバージョン(変換済み)',
+            self.measure(lambda: [OrderChangableDayUtil.get_rule_version(x, y, change_settings)
+                                  for x, y in zip(days, hours)], repeat), count)
+        self.write_result(
+            'ルールバージョン(一括)',
+            self.measure(lambda: OrderChangableDayUtil.get_rule_versions(days, hours, change_settings), repeat), count)
@@ -10,7 +10,9 @@ from django.core.management.base import BaseCommand
 from django_pandas.io import read_frame
 
 from web_order.date_management import SalesDayUtil
-from web_order.models import Order, MenuDisplay, InvoiceException, MonthlySalesPrice, NewUnitPrice
+from web_order.models import Order, MenuDisplay, InvoiceException, MonthlySalesPrice
+from web_order.jobs import BatchJobResult
+from web_order.prices import PriceResolver
 
 class Command(BaseCommand):
     def __init__(self):
@@ -192,14 +194,14 @@ class Command(BaseCommand):
         del append_selling_exception
         other_new_price_dict = {}
         enge_new_price_dict = {}
+        price_resolver = PriceResolver()
         for index, data in df_all_sales.iterrows():
             e_day = data['sales_date']
             e_youbi = e_day.weekday()
 
-            price_qs = NewUnitPrice.objects.filter(
-                username__username=data['unit_name__username'], eating_day__lte=e_day).order_by('-eating_day')
-            if price_qs.exists():
-                for new_price in price_qs:
+            new_prices = price_resolver.get_user_new_prices(data['unit_name__username'], e_day)
+            if new_prices:
+                for new_price in new_prices:
                     is_enge = (new_price.menu_name == 'ソフト') or (new_price.menu_name == 'ゼリー') or (new_price.menu_name == 'ミキサー')
                     if is_enge:
                         if not data['unit_name__username__facility_name'] in enge_new_price_dict:
@@ -724,6 +726,7 @@ class Command(BaseCommand):
         # ファイル保存
         output_path = os.path.join(new_dir_path, in_target_month + '_売価計算表.xlsx')
         workbook.save(output_path)
+        BatchJobResult.add(output_path)
         workbook.close()
 
         # ------------------------------------------------------------------------------
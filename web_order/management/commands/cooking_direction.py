@@ -9,24 +9,90 @@ from decimal import Decimal
 
 import numpy as np
 import openpyxl as excel
-import pandas as pd
 
 from django.conf import settings
 from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from web_order.models import AggMeasureSoupMaster, AggMeasureMixRiceMaster, PlatePackageForPrint, UnitPackage, TmpPlateNamePackage
+from web_order.models import MixRiceDay
 from .agg_measure_analyzed import AggMeasureTarget, AggMeasurePlate, AggMeasurePlateWithDensity, AggMeasurePlateKoGram
 from .agg_measure_analyzed import AggMeasurePlateKoGramDensity, AggMeasurePlateGramGram, AggMeasurePlateWithAnotherUnit
 from .agg_measure_analyzed import AggMeasureMisoDevide, AggMeasureSoupDevide, AggMeasureMiso, AggMeasureSoupFilling
 from .agg_measure_analyzed import AggMeasureSoupLiquid, AggMeasureMisoNone, AggMeasureSoupNone, AggMeasureLiquidSeasoning
 from .agg_measure_analyzed import AggMeasureMixRice, AggMeasureMixRiceParts, AggMeasureOrdersManager, AggMeasurePlateKoGramPercent
 from .agg_mix_rice import MixRiceMeasureWriter
+from .utils import MeasureWriterTimer
 from web_order.cooking_direction_plates import CookingDirectionPlatesManager, PlateNameAnalizeUtil
+from web_order.cooking_direction_sheet import CookingDirectionSheet
+from web_order.jobs import BatchJobResult
+from web_order.picking import PlatePackageRegister, UnitPackageBuffer
+from web_order.pipeline_trace import PipelineTrace, add_trace_argument, TRACE_SUMMARY
+from web_order.process_pool import DatabaseProcessPool
+from web_order.plate_name_parser import PlateNameParser, PlateNameParseResult, NORMALIZE_TABLE
+from web_order.plate_name_parser import KIND_SOUP_KO_GRAM, KIND_SOUP_GRAM, KIND_SOUP_KO
+from web_order.plate_name_parser import KIND_SEASONING_SMALL, KIND_SEASONING, KIND_UNIT, KIND_CHO, KIND_KO_LIQUID
+from web_order.plate_name_parser import KIND_KO_GRAM_DENSITY, KIND_KO_GRAM_INNER_PERCENT, KIND_KO_GRAM_PERCENT
+from web_order.plate_name_parser import KIND_KO_GRAM_INNER_DENSITY, KIND_KO_GRAM, KIND_GRAM_GRAM_PERCENT
+from web_order.plate_name_parser import KIND_GRAM_GRAM_DENSITY, KIND_KO, KIND_GRAM
 
 
 logger = logging.getLogger(__name__)
 
+# 計量表の出力を(嚥下調整状態, 注文情報)の順の引数で呼び出す解析結果の種類(それ以外は(注文情報, 嚥下調整状態)の順)
+MEASURE_TYPES = (
+    AggMeasureMisoDevide, AggMeasureSoupDevide, AggMeasureMiso, AggMeasureSoupFilling, AggMeasureSoupLiquid,
+    AggMeasureLiquidSeasoning, AggMeasureMixRice, AggMeasureMixRiceParts, AggMeasurePlate, AggMeasurePlateWithDensity,
+    AggMeasurePlateKoGram, AggMeasurePlateKoGramPercent, AggMeasurePlateKoGramDensity, AggMeasurePlateGramGram,
+    AggMeasurePlateWithAnotherUnit,
+)
+
+# 書き起こし票で混ぜご飯として扱う解析結果の種類
+MIX_RICE_TYPES = (AggMeasureMixRice, AggMeasureMixRiceParts)
+
+# 調理表の中間ファイルに保存する、整形後の内容の名前とバージョン
+# normalize_directionsの整形内容を変更した場合は、バージョンを更新する(古いバージョンの中間ファイルは使わない)
+NORMALIZED_FRAME_NAME = 'normalized'
+NORMALIZED_FRAME_VERSION = 1
+
+
+def write_measure_tables(tasks):
+    """
+    計量表を出力し、料理毎の出力結果((料理の番号, 味噌汁の分量, 成否)のリスト)と、ピッキング指示書用袋数を返す。
+    tasks: (料理の番号, 解析結果, 嚥下調整状態)のリスト(同じ喫食日・食事区分の料理は、同じリストで順に出力する)
+    プロセスプールから呼び出すため、モジュールの関数として定義する
+    """
+    buffer = UnitPackageBuffer()
+    PlatePackageRegister.set_buffer(buffer)
+    MeasureWriterTimer.clear()
+    order_manager = AggMeasureOrdersManager()
+    order_manager.load_snapshot(set([analyzed.eating_day for sequence, analyzed, enge_adjust_status in tasks]))
+    results = []
+    try:
+        for sequence, analyzed, enge_adjust_status in tasks:
+            logger.info(f'measure_start:{analyzed.name}')
+            buffer.sequence = sequence
+            try:
+                message = None
+                if type(analyzed) is AggMeasureMixRice:
+                    writer = MixRiceMeasureWriter(analyzed)
+                    writer.write()
+                if type(analyzed) in MEASURE_TYPES:
+                    message = analyzed.call_command(enge_adjust_status, order_manager)
+                else:
+                    analyzed.call_command(order_manager, enge_adjust_status)
+                results.append((sequence, message, True))
+            except Exception:
+                logger.error(analyzed.name)
+                logger.info(traceback.format_exc())
+                results.append((sequence, None, False))
+    finally:
+        PlatePackageRegister.set_buffer(None)
+
+    logger.info(f'計量表ブック読込・保存:{MeasureWriterTimer.get_summary()}')
+    return results, buffer
+
 
 class MisoSoupAggregation:
     """
@@ -135,6 +201,7 @@ class PrintPlatePackageManager:
         self.regex_pattern = re.compile('■(\d+)/(\d+)(\D+)')
         self.adjust_sause_mix = 0
         self.adjust_timing = None
+        self.packages = []  # 登録対象の袋数情報(save_newで一括登録)
 
     def _parse_eating_meal(self, eating_meal: str, cooking_date):
         """
@@ -178,7 +245,7 @@ class PrintPlatePackageManager:
             is_basic_plate=is_basic_plate,
             index=index
         )
-        package.save()
+        self.packages.append(package)
 
         if self.adjust_timing:
             ad_eating_day, ad_meal = self.adjust_timing
@@ -197,7 +264,7 @@ class PrintPlatePackageManager:
             is_basic_plate=is_basic_plate,
             index=enge_index
         )
-        package.save()
+        self.packages.append(package)
 
         # ゼリー
         package = PlatePackageForPrint(
@@ -209,7 +276,7 @@ class PrintPlatePackageManager:
             is_basic_plate=is_basic_plate,
             index=enge_index
         )
-        package.save()
+        self.packages.append(package)
 
         # ミキサー
         package = PlatePackageForPrint(
@@ -221,7 +288,7 @@ class PrintPlatePackageManager:
             is_basic_plate=is_basic_plate,
             index=enge_index
         )
-        package.save()
+        self.packages.append(package)
 
         if self._is_filling_and_sause_mix(name):
             # ソフト
@@ -234,7 +301,7 @@ class PrintPlatePackageManager:
                 is_basic_plate=is_basic_plate,
                 index=enge_index + 1
             )
-            package.save()
+            self.packages.append(package)
 
             # ゼリー
             package = PlatePackageForPrint(
@@ -246,7 +313,7 @@ class PrintPlatePackageManager:
                 is_basic_plate=is_basic_plate,
                 index=enge_index + 1
             )
-            package.save()
+            self.packages.append(package)
 
             # ミキサー
             package = PlatePackageForPrint(
@@ -258,7 +325,7 @@ class PrintPlatePackageManager:
                 is_basic_plate=is_basic_plate,
                 index=enge_index + 1
             )
-            package.save()
+            self.packages.append(package)
 
             self.adjust_timing = (eating_day, meal)
             self.adjust_sause_mix += 1
@@ -298,7 +365,7 @@ class PrintPlatePackageManager:
                 is_basic_plate=is_basic_plate,
                 index=index_dict['常食']
             )
-            package.save()
+            self.packages.append(package)
 
             index_dict['常食'] += 1
 
@@ -313,7 +380,7 @@ class PrintPlatePackageManager:
                 is_basic_plate=is_basic_plate,
                 index=index_dict['ソフト']
             )
-            package.save()
+            self.packages.append(package)
             index_dict['ソフト'] += 1
 
             if self._is_filling_and_sause_mix(name):
@@ -327,7 +394,7 @@ class PrintPlatePackageManager:
                     is_basic_plate=is_basic_plate,
                     index=index_dict['ソフト']
                 )
-                package.save()
+                self.packages.append(package)
                 index_dict['ソフト'] += 1
 
         # ゼリー
@@ -341,7 +408,7 @@ class PrintPlatePackageManager:
                 is_basic_plate=is_basic_plate,
                 index=index_dict['ゼリー']
             )
-            package.save()
+            self.packages.append(package)
             index_dict['ゼリー'] += 1
 
             if self._is_filling_and_sause_mix(name):
@@ -355,7 +422,7 @@ class PrintPlatePackageManager:
                     is_basic_plate=is_basic_plate,
                     index=index_dict['ゼリー']
                 )
-                package.save()
+                self.packages.append(package)
                 index_dict['ゼリー'] += 1
 
         # ミキサー
@@ -369,7 +436,7 @@ class PrintPlatePackageManager:
                 is_basic_plate=is_basic_plate,
                 index=index_dict['ミキサー']
             )
-            package.save()
+            self.packages.append(package)
             index_dict['ミキサー'] += 1
 
             if self._is_filling_and_sause_mix(name):
@@ -383,16 +450,14 @@ class PrintPlatePackageManager:
                     is_basic_plate=is_basic_plate,
                     index=index_dict['ミキサー']
                 )
-                package.save()
+                self.packages.append(package)
                 index_dict['ミキサー'] += 1
 
     def save_new(self, cooking_date):
         """
         新規データとして、調理表から解析した内容で袋数情報を登録する。
         """
-        # 対象製造日の全データを削除
-        PlatePackageForPrint.objects.filter(cooking_day=cooking_date).delete()
-
+        self.packages = []
         prev_key = None
         basic_plate_index = 0   # 喫食日・食事区分の単位で採番
         allergen_plate_index_dict = {'常食': 0, 'ソフト': 0, 'ミキサー': 0, 'ゼリー': 0}    # 調理日全体で1つのインデックス
@@ -430,6 +495,12 @@ class PrintPlatePackageManager:
                     eating_type_list=package_dict['eating_type_list']
                 )
 
+        # 対象製造日の全データを削除し、解析した袋数情報を一括登録
+        with transaction.atomic():
+            PlatePackageForPrint.objects.filter(cooking_day=cooking_date).delete()
+            PlatePackageForPrint.objects.bulk_create(self.packages, batch_size=1000)
+        logger.info(f'PlatePackageForPrint一括登録:{len(self.packages)}件')
+
 
 class AggMeasureTargetAnalyzer:
     """
@@ -448,44 +519,13 @@ class AggMeasureTargetAnalyzer:
         self.finding_mix_rice = None
         self.mix_rice_list = [x for x in AggMeasureMixRiceMaster.objects.all()]
 
-        # 汁・スープの具の単位が個のみの場合の判定
-        self.regex_soup_ko = re.compile('(\D*)(\d+|\d+\.\d+)個')
-
-        # '③サラダ（枝豆・豆腐）1/2丁'
-        # ※/は本処理内で「÷」に置き換えられる
-        self.regex_cho = re.compile('(\d+|\d+÷\d+)丁')
-
-        self.regex_density_g = re.compile('(\+|＋)\s*(液同|液|汁|汁【しる】|)(\d+|\d+.\d+)g')
-        self.regex_density_p = re.compile('(\+|＋)\s*(液同|液|)(\d+|\d+.\d+)％')
-
-        self.regex_units = {}
-        for unit in settings.MEASURE_ENABLE_UNITS:
-            self.regex_units[unit] = [
-                re.compile(f'(\d+){unit}'),
-                re.compile(f'{unit}\s*(\d+|\d+.\d+)g\s*(\+|＋)')
-            ]
-
-        # 〇個 ●g + ▲%
-        # のg数を取得する正規表現
-        self.regex_inner_quantity_ko = re.compile('個\s*(\d*|\d*.\d*)g\s*(\+|＋)')
-        self.regex_inner_quantity_cho = re.compile('丁\s*(\d*|\d*.\d*)g\s*(\+|＋)')
-
-    def _is_miso_soup(self, name: str):
-        if 'みそ汁' in name:
-            return True
-        elif '味噌汁' in name:
-            return True
-        elif 'みそしる' in name:
-            return True
-        else:
-            return False
-
-    def _get_soup(self, name: str):
-        if '具' in name:
+    def _get_soup(self, parsed: PlateNameParseResult):
+        name = parsed.numberless_name
+        if parsed.has_filling:
             # 「具」が入っていれば汁具とみなす
             return None
 
-        if ('スープ' in name) or ('汁' in name):
+        if parsed.has_soup_word:
             return AggMeasureSoupMaster(name=name, search_word='')
         else:
             # 「スープ」「汁」がつかないが、スープ・汁扱いになるもの(現在はお吸い物のみ)
@@ -497,18 +537,6 @@ class AggMeasureTargetAnalyzer:
 
         return None
 
-    def _get_percentage(self, name: str):
-        res_unit_percentage = re.findall('(\d*|\d*\.\d*)％', name)
-        if res_unit_percentage:
-            # 2個以上の想定例：
-            # ①かぼちゃの煮物2個+(赤キャップ4.5％＋水10.5％)で15％
-            if len(res_unit_percentage) >= 3:
-                return float(res_unit_percentage[-1])
-            else:
-                return float(res_unit_percentage[0])
-        else:
-            return 0
-
     def add_cook(self, index, name, eating_day, meal, items, before_name):
         eating_day_meal = eating_day + meal
         eating_day_meal_analyzed = self.analyzed_dict.get(eating_day_meal, None)
@@ -522,10 +550,6 @@ class AggMeasureTargetAnalyzer:
         if type(analyzed) in [AggMeasureMisoDevide, AggMeasureMiso]:
             self.is_first_miso_soup = False
 
-    def is_same_thickness(self, name):
-        # 「液同」は濃さの指定以外に使われない前提
-        return '液同' in name
-
     def generate_analyzed(self):
         # 汁具と汁の関連の設定
         for key in self.analyzed_dict.keys():
@@ -577,24 +601,21 @@ class AggMeasureTargetAnalyzer:
         return density
 
     def analyze(self, index, name, eating_day, meal, items):
+        parsed = PlateNameParser.parse(name)
+        numberless_name = parsed.numberless_name
+
         # -------------------------------------------------------------
         # 味噌汁、スープなどの計量表
         # -------------------------------------------------------------
-        res = re.findall('⑤', name)  # 先頭に⑤があるとき
-
-        if res:
+        if parsed.is_soup:  # 先頭に⑤があるとき
             self.finding_mix_rice = None
 
-            # 先頭の丸数字を除外
-            numberless_name = name[1:]
-
             # ---------------------------------------------------------
             # ⑤味噌汁（里芋2個・さつま揚げ5g）
             # ---------------------------------------------------------
-            res_ko_gram = re.findall('(\D*)(\d+)個(\D*)(\d+|\d+\.\d+)g', numberless_name)
-
-            if res_ko_gram:
-                if self._is_miso_soup(numberless_name):
+            if parsed.kind == KIND_SOUP_KO_GRAM:
+                res_ko_gram = parsed.soup_ko_gram
+                if parsed.is_miso_soup:
                     return AggMeasureMisoDevide(
                         index, self.cooking_day,
                         eating_day,
@@ -632,18 +653,14 @@ class AggMeasureTargetAnalyzer:
             # ⑤ポタージュスープ　16g　水150g
             # ---------------------------------------------------------
             #　g指定のある献立
-            res_gram = re.findall('(\D*)(\d+|\d+\.\d+)g', numberless_name)
-
-            # 個指定のある献立
-            res_soup_ko = self.regex_soup_ko.findall(numberless_name)
-
-            if res_gram:
+            if parsed.kind == KIND_SOUP_GRAM:
+                res_gram = parsed.soup_gram
                 # 味噌汁
-                if self._is_miso_soup(numberless_name):
+                if parsed.is_miso_soup:
                     return AggMeasureMiso(index, self.cooking_day, eating_day, meal, numberless_name, res_gram[0][1], 'g', self.is_first_miso_soup)
                 # それ以外
                 else:
-                    soup = self._get_soup(numberless_name)
+                    soup = self._get_soup(parsed)
                     if soup:
                         return AggMeasureSoupLiquid(
                             index, self.cooking_day, eating_day, meal, numberless_name, res_gram[0][1], 'g', soup)
@@ -653,13 +670,14 @@ class AggMeasureTargetAnalyzer:
             # ---------------------------------------------------------
             # ⑤スープ具（ギョーザ）1個
             # ---------------------------------------------------------
-            elif res_soup_ko:
+            elif parsed.kind == KIND_SOUP_KO:
+                res_soup_ko = parsed.soup_ko
                 # 味噌汁
-                if self._is_miso_soup(numberless_name):
+                if parsed.is_miso_soup:
                     return AggMeasureMiso(index, self.cooking_day, eating_day, meal, numberless_name, res_soup_ko[0][1], '個', self.is_first_miso_soup)
                 # それ以外
                 else:
-                    soup = self._get_soup(numberless_name)
+                    soup = self._get_soup(parsed)
                     if soup:
                         return AggMeasureSoupLiquid(
                             index, self.cooking_day, eating_day, meal, numberless_name, res_soup_ko[0][1], '個', soup)
@@ -671,21 +689,19 @@ class AggMeasureTargetAnalyzer:
                 # ⑤味噌汁30cc 希釈140
                 # ⑤みそ汁30cc 希釈130
                 # 味噌汁
-                if self._is_miso_soup(numberless_name):
+                if parsed.is_miso_soup:
                     return AggMeasureMisoNone(index, self.cooking_day, eating_day, meal, numberless_name, None)
                 # それ以外
                 else:
                     return AggMeasureSoupNone(index, self.cooking_day, eating_day, meal, numberless_name, None)
 
-        # 先頭の丸数字を除外
-        number = name[0]
-        numberless_name = name[1:] if number in ['⑩', '①', '②', '③', '④', '⑤'] else name
+        number = parsed.number
 
         # -------------------------------------------------------------
         # 共通パラメータ(出汁の量(g)、%)
         # -------------------------------------------------------------
-        res_has_soup_stock_g = self.regex_density_g.findall(numberless_name)
-        res_has_soup_stock_p = self.regex_density_p.findall(numberless_name)
+        res_has_soup_stock_g = parsed.density_g
+        res_has_soup_stock_p = parsed.density_p
 
         # -------------------------------------------------------------
         # 混ぜご飯判定(本体)
@@ -695,23 +711,18 @@ class AggMeasureTargetAnalyzer:
                 if mix_rice_master.search_word in numberless_name:
                     mix_rice_unit = 'g'
                     quantity = 0
-                    for key, value in self.regex_units.items():
-                        res_unit = value[0].findall(numberless_name)
-                        if res_unit:
-                            mix_rice_unit = key
-                            quantity = res_unit[0]
-                            break
+                    if parsed.unit:
+                        mix_rice_unit = parsed.unit
+                        quantity = parsed.unit_quantities[0]
 
                     if mix_rice_unit == 'g':
-                        res_mr_ko = re.findall('(\d+)個', numberless_name)
-                        if res_mr_ko:
+                        if parsed.ko:
                             mix_rice_unit = '個'
-                            quantity = res_mr_ko[0]
+                            quantity = parsed.ko[0]
 
                     if mix_rice_unit == 'g':
-                        res_mr = re.findall('(\d+|\d+\.\d+)g', numberless_name)
-                        if res_mr:
-                            quantity = res_mr[0]
+                        if parsed.grams:
+                            quantity = parsed.grams[0]
                         else:
                             self.logger.info(f'混ぜご飯計量_数量不明({numberless_name})')
                             quantity = 0
@@ -742,13 +753,11 @@ class AggMeasureTargetAnalyzer:
         # -------------------------------------------------------------
         if self.finding_mix_rice and (number == '④'):
             # 混ぜご飯検出中の④は無条件で混ぜご飯の一部と判断
-            res_mr_parts = re.findall('(\d+|\d+\.\d+)g', numberless_name)
-            if res_mr_parts:
-                return AggMeasureMixRiceParts(index, self.cooking_day, eating_day, meal, numberless_name, res_mr_parts[0], 'g', number, items)
+            if parsed.grams:
+                return AggMeasureMixRiceParts(index, self.cooking_day, eating_day, meal, numberless_name, parsed.grams[0], 'g', number, items)
             else:
-                res_mr_ko_parts = re.findall('(\d+|\d+\.\d+)個', numberless_name)
-                if res_mr_ko_parts:
-                    return AggMeasureMixRiceParts(index, self.cooking_day, eating_day, meal, numberless_name, res_mr_ko_parts[0],
+                if parsed.ko_decimals:
+                    return AggMeasureMixRiceParts(index, self.cooking_day, eating_day, meal, numberless_name, parsed.ko_decimals[0],
                                                   '個', number, items)
                 else:
                     self.logger.info(f'混ぜご飯計量_数量不明({numberless_name})')
@@ -756,38 +765,44 @@ class AggMeasureTargetAnalyzer:
 
         self.finding_mix_rice = None
 
+        kind = parsed.kind
+
         # -------------------------------------------------------------
         # ④■ポン酢7g
         # -------------------------------------------------------------
-        res_small = re.findall('■\D*(\d+|\d+\.\d+)g', numberless_name)
-
-        if res_small:
+        if kind == KIND_SEASONING_SMALL:
             # 具なし固定
-            return AggMeasureLiquidSeasoning(index, self.cooking_day, eating_day, meal, numberless_name[1:], res_small[0], 'g', number, False)
+            return AggMeasureLiquidSeasoning(index, self.cooking_day, eating_day, meal, numberless_name[1:], parsed.small[0], 'g', number, False)
 
         # -------------------------------------------------------------
         # ④タルタルソース7g
         # -------------------------------------------------------------
-        res_liquid = re.findall('\D*(\d+|\d+\.\d+)g', numberless_name)
-        res_has_gu = re.findall('\[(.*)\]', numberless_name)
-        sub_liquid = re.sub('\[.*\]', '', numberless_name)
-        sub_liquid = re.sub('(\d*|\d*\.\d*)g', '', sub_liquid)
-        res_end_liquid = re.findall('ソース$', sub_liquid)
-
-        if res_liquid and res_end_liquid:
-            has_gu = True if res_has_gu else False
-            return AggMeasureLiquidSeasoning(index, self.cooking_day, eating_day, meal, numberless_name, res_liquid[0], 'g', number, has_gu)
+        if kind == KIND_SEASONING:
+            return AggMeasureLiquidSeasoning(index, self.cooking_day, eating_day, meal, numberless_name, parsed.liquid[0], 'g', number, parsed.has_gu)
 
         # -------------------------------------------------------------
         # ①鮭の塩焼き60ｇ1尾
         # ①鰆照り焼き1切れ
         # ④いんげん2本
         # -------------------------------------------------------------
-        for key, value in self.regex_units.items():
-            res_unit = value[0].findall(numberless_name)
-            if res_unit:
-                if res_has_soup_stock_g:
-                    density = float(res_has_soup_stock_g[0][2]) / int(res_unit[0]) * 100
+        if kind == KIND_UNIT:
+            key = parsed.unit
+            res_unit = parsed.unit_quantities
+            if res_has_soup_stock_g:
+                density = float(res_has_soup_stock_g[0][2]) / int(res_unit[0]) * 100
+                return AggMeasurePlateWithDensity(
+                    index, self.cooking_day,
+                    eating_day,
+                    meal,
+                    numberless_name,
+                    res_unit[0],
+                    key, number,
+                    density, res_has_soup_stock_g[0][1] == '液同', True)
+            elif res_has_soup_stock_p:
+                inner = parsed.unit_inner
+                if inner:
+                    # 出汁の数に対する割合を計算
+                    density = self.get_inner_density(res_has_soup_stock_p[0][2], inner[0][0], res_unit[0])
                     return AggMeasurePlateWithDensity(
                         index, self.cooking_day,
                         eating_day,
@@ -795,29 +810,7 @@ class AggMeasureTargetAnalyzer:
                         numberless_name,
                         res_unit[0],
                         key, number,
-                        density, res_has_soup_stock_g[0][1] == '液同', True)
-                elif res_has_soup_stock_p:
-                    inner = value[1].findall(numberless_name)
-                    if inner:
-                        # 出汁の数に対する割合を計算
-                        density = self.get_inner_density(res_has_soup_stock_p[0][2], inner[0][0], res_unit[0])
-                        return AggMeasurePlateWithDensity(
-                            index, self.cooking_day,
-                            eating_day,
-                            meal,
-                            numberless_name,
-                            res_unit[0],
-                            key, number,
-                            density, res_has_soup_stock_p[0][1] == '液同', True, inner=inner[0][0])
-                    else:
-                        return AggMeasurePlateWithDensity(
-                            index, self.cooking_day,
-                            eating_day,
-                            meal,
-                            numberless_name,
-                            res_unit[0],
-                            key, number,
-                            self._get_percentage(numberless_name), res_has_soup_stock_p[0][1] == '液同')
+                        density, res_has_soup_stock_p[0][1] == '液同', True, inner=inner[0][0])
                 else:
                     return AggMeasurePlateWithDensity(
                         index, self.cooking_day,
@@ -826,14 +819,22 @@ class AggMeasureTargetAnalyzer:
                         numberless_name,
                         res_unit[0],
                         key, number,
-                        self._get_percentage(numberless_name), self.is_same_thickness(numberless_name))
+                        parsed.get_percentage(), res_has_soup_stock_p[0][1] == '液同')
+            else:
+                return AggMeasurePlateWithDensity(
+                    index, self.cooking_day,
+                    eating_day,
+                    meal,
+                    numberless_name,
+                    res_unit[0],
+                    key, number,
+                    parsed.get_percentage(), parsed.is_same_thickness)
 
         # -------------------------------------------------------------
         # ③サラダ（枝豆・豆腐）1/2丁
         # -------------------------------------------------------------
-        res_unit_cho = self.regex_cho.findall(numberless_name)
-        if res_unit_cho:
-            cho_values = res_unit_cho[0].split('÷')
+        if kind == KIND_CHO:
+            cho_values = parsed.cho[0].split('÷')
             if len(cho_values) == 2:
                 numerator = float(cho_values[0])
                 denominator = float(cho_values[1])
@@ -852,7 +853,7 @@ class AggMeasureTargetAnalyzer:
                     '丁', number,
                     density, res_has_soup_stock_g[0][1] == '液同', True)
             elif res_has_soup_stock_p:
-                inner = self.regex_inner_quantity_cho.findall(numberless_name)
+                inner = parsed.cho_inner
                 if inner:
                     # 出汁の本数に対する割合を計算
                     density = self.get_inner_density(res_has_soup_stock_p[0][2], inner[0][0], cho_value_float)
@@ -874,7 +875,7 @@ class AggMeasureTargetAnalyzer:
                         numberless_name,
                         cho_value_float,
                         '丁', number,
-                        self._get_percentage(numberless_name), res_has_soup_stock_p[0][1] == '液同')
+                        parsed.get_percentage(), res_has_soup_stock_p[0][1] == '液同')
             else:
                 return AggMeasurePlateWithDensity(
                     index, self.cooking_day,
@@ -883,17 +884,15 @@ class AggMeasureTargetAnalyzer:
                     numberless_name,
                     cho_value_float,
                     '丁', number,
-                    self._get_percentage(numberless_name), self.is_same_thickness(numberless_name))
+                    parsed.get_percentage(), parsed.is_same_thickness)
 
         # -------------------------------------------------------------
         # ①トマトソース煮込みハンバーグ1個 + 液20g
         # -------------------------------------------------------------
-        res_ko_gram_fill = re.findall('(\d+)個\D*液(\d+|\d+\.\d+)g', numberless_name)
-
         # ％がある場合は除く(次の判定で処理する)
-        if res_ko_gram_fill and (self._get_percentage(numberless_name) == 0):
+        if kind == KIND_KO_LIQUID:
             # 液量が1個あたりの%になるように計算
-            count, gram = res_ko_gram_fill[0]
+            count, gram = parsed.ko_liquid[0]
             density = float(gram) / int(count) * 100
             return AggMeasurePlateWithDensity(
                 index, self.cooking_day,
@@ -902,14 +901,13 @@ class AggMeasureTargetAnalyzer:
                 numberless_name,
                 count,
                 '個', number,
-                density, self.is_same_thickness(numberless_name), True)
+                density, parsed.is_same_thickness, True)
 
         # -------------------------------------------------------------
         # ②煮物（肉団子3個＋小松菜36g）+液60g
         # -------------------------------------------------------------
-        res_unit_ko_g_den = re.findall('(\D+)\s(\D+)(\d+)個＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)g', numberless_name)
-
-        if res_unit_ko_g_den:
+        if kind == KIND_KO_GRAM_DENSITY:
+            res_unit_ko_g_den = parsed.ko_gram_density
             names = [res_unit_ko_g_den[0][0], res_unit_ko_g_den[0][1], res_unit_ko_g_den[0][3]]
 
             return AggMeasurePlateKoGramDensity(
@@ -920,15 +918,14 @@ class AggMeasureTargetAnalyzer:
                 res_unit_ko_g_den[0][2],
                 number,
                 res_unit_ko_g_den[0][5], numberless_name,
-                res_unit_ko_g_den[0][4], self.is_same_thickness(numberless_name)
+                res_unit_ko_g_den[0][4], parsed.is_same_thickness
                 )
 
         # -------------------------------------------------------------
         # ②煮物（肉団子3個(10g)＋小松菜36g）+10％
         # -------------------------------------------------------------
-        res_unit_ko_g_den_p = re.findall('(\D+)\s(\D+)(\d+)個\s(\d+|\d+\.\d+)g\s＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)％', numberless_name)
-
-        if res_unit_ko_g_den_p:
+        if kind == KIND_KO_GRAM_INNER_PERCENT:
+            res_unit_ko_g_den_p = parsed.ko_gram_inner_percent
             names = [res_unit_ko_g_den_p[0][0], res_unit_ko_g_den_p[0][1], res_unit_ko_g_den_p[0][4]]
             quantity_g1 = float(res_unit_ko_g_den_p[0][3])
             quantity_g2 = float(res_unit_ko_g_den_p[0][5])
@@ -942,15 +939,14 @@ class AggMeasureTargetAnalyzer:
                 res_unit_ko_g_den_p[0][2],
                 number,
                 density, numberless_name,
-                res_unit_ko_g_den_p[0][5], self.is_same_thickness(numberless_name), res_unit_ko_g_den_p[0][3]
+                res_unit_ko_g_den_p[0][5], parsed.is_same_thickness, res_unit_ko_g_den_p[0][3]
                 )
 
         # -------------------------------------------------------------
         # ②れんこん煮物（れんこん1個+いんげん4ｇ）+9%
         # -------------------------------------------------------------
-        res_unit_ko_g_p = re.findall('(\D+)\s(\D+)(\d+)個\s*＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)％', numberless_name)
-
-        if res_unit_ko_g_p:
+        if kind == KIND_KO_GRAM_PERCENT:
+            res_unit_ko_g_p = parsed.ko_gram_percent
             names = [res_unit_ko_g_p[0][0], res_unit_ko_g_p[0][1], res_unit_ko_g_p[0][3]]
             quantity_ko = int(res_unit_ko_g_p[0][2])
             quantity_g = float(res_unit_ko_g_p[0][4])
@@ -965,15 +961,14 @@ class AggMeasureTargetAnalyzer:
                 number,
                 density,
                 numberless_name,
-                quantity_g, self.is_same_thickness(numberless_name)
+                quantity_g, parsed.is_same_thickness
                 )
 
         # -------------------------------------------------------------
         # ②煮物（肉団子3個(10g)＋小松菜36g）+10g
         # -------------------------------------------------------------
-        res_unit_ko_g_den_g = re.findall('(\D+)\s(\D+)(\d+)個\s(\d+|\d+\.\d+)g\s＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)g', numberless_name)
-
-        if res_unit_ko_g_den_g:
+        if kind == KIND_KO_GRAM_INNER_DENSITY:
+            res_unit_ko_g_den_g = parsed.ko_gram_inner_density
             names = [res_unit_ko_g_den_g[0][0], res_unit_ko_g_den_g[0][1], res_unit_ko_g_den_g[0][4]]
 
             return AggMeasurePlateKoGramDensity(
@@ -984,15 +979,14 @@ class AggMeasureTargetAnalyzer:
                 res_unit_ko_g_den_g[0][2],
                 number,
                 res_unit_ko_g_den_g[0][6], numberless_name,
-                res_unit_ko_g_den_g[0][5], self.is_same_thickness(numberless_name), res_unit_ko_g_den_g[0][3]
+                res_unit_ko_g_den_g[0][5], parsed.is_same_thickness, res_unit_ko_g_den_g[0][3]
                 )
 
         # -------------------------------------------------------------
         # ①食【た】べるスープの具【ぐ】（団子4個+具60ｇ）
         # -------------------------------------------------------------
-        res_unit_ko_g_den_z = re.findall('(\D+)\s(\D+)(\d+)個＋(\D+)(\d+|\d+\.\d+)g', numberless_name)
-
-        if res_unit_ko_g_den_z:
+        if kind == KIND_KO_GRAM:
+            res_unit_ko_g_den_z = parsed.ko_gram
             names = [res_unit_ko_g_den_z[0][0], res_unit_ko_g_den_z[0][1], res_unit_ko_g_den_z[0][3]]
 
             return AggMeasurePlateKoGramDensity(
@@ -1003,15 +997,14 @@ class AggMeasureTargetAnalyzer:
                 res_unit_ko_g_den_z[0][2],
                 number,
                 0, numberless_name,
-                res_unit_ko_g_den_z[0][4], self.is_same_thickness(numberless_name)
+                res_unit_ko_g_den_z[0][4], parsed.is_same_thickness
                 )
 
         # -------------------------------------------------------------
         # ②麻婆豆腐（豆腐90g+ミンチ22g）+25％
         # -------------------------------------------------------------
-        res_unit_g_g_per = re.findall('(\D+)\s(\D+)(\d+|\d+\.\d+)g＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)％', numberless_name)
-
-        if res_unit_g_g_per:
+        if kind == KIND_GRAM_GRAM_PERCENT:
+            res_unit_g_g_per = parsed.gram_gram_percent
             names = [res_unit_g_g_per[0][0], res_unit_g_g_per[0][1], res_unit_g_g_per[0][3]]
             quantity_g1 = float(res_unit_g_g_per[0][2])
             quantity_g2 = float(res_unit_g_g_per[0][4])
@@ -1025,15 +1018,14 @@ class AggMeasureTargetAnalyzer:
                 quantity_g1,
                 number,
                 density, numberless_name,
-                quantity_g2, self.is_same_thickness(numberless_name)
+                quantity_g2, parsed.is_same_thickness
                 )
 
         # -------------------------------------------------------------
         # ②麻婆豆腐（豆腐90g+ミンチ22g）+液25g
         # -------------------------------------------------------------
-        res_unit_g_g_g = re.findall('(\D+)\s(\D+)(\d+|\d+\.\d+)g＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)g', numberless_name)
-
-        if res_unit_g_g_g:
+        if kind == KIND_GRAM_GRAM_DENSITY:
+            res_unit_g_g_g = parsed.gram_gram_density
             names = [res_unit_g_g_g[0][0], res_unit_g_g_g[0][1], res_unit_g_g_g[0][3]]
             quantity_g1 = float(res_unit_g_g_g[0][2])
             quantity_g2 = float(res_unit_g_g_g[0][4])
@@ -1047,15 +1039,14 @@ class AggMeasureTargetAnalyzer:
                 quantity_g1,
                 number,
                 density, numberless_name,
-                quantity_g2, self.is_same_thickness(numberless_name)
+                quantity_g2, parsed.is_same_thickness
                 )
 
         # -------------------------------------------------------------
         # ①白身フライ60g1個
         # -------------------------------------------------------------
-        res_unit_ko = re.findall('(\d+)個', numberless_name)
-
-        if res_unit_ko:
+        if kind == KIND_KO:
+            res_unit_ko = parsed.ko
             if res_has_soup_stock_g:
                 density = float(res_has_soup_stock_g[0][2]) / int(res_unit_ko[0]) * 100
                 return AggMeasurePlateWithDensity(
@@ -1067,7 +1058,7 @@ class AggMeasureTargetAnalyzer:
                     '個', number,
                     density, res_has_soup_stock_g[0][1] == '液同', True)
             elif res_has_soup_stock_p:
-                inner = self.regex_inner_quantity_ko.findall(numberless_name)
+                inner = parsed.ko_inner
                 if inner:
                     # 出汁の個数に対する割合を計算
                     density = self.get_inner_density(res_has_soup_stock_p[0][2], inner[0][0], res_unit_ko[0])
@@ -1089,7 +1080,7 @@ class AggMeasureTargetAnalyzer:
                         numberless_name,
                         res_unit_ko[0],
                         '個', number,
-                        self._get_percentage(numberless_name), res_has_soup_stock_p[0][1] == '液同')
+                        parsed.get_percentage(), res_has_soup_stock_p[0][1] == '液同')
             else:
                 return AggMeasurePlateWithDensity(
                     index, self.cooking_day,
@@ -1098,15 +1089,14 @@ class AggMeasureTargetAnalyzer:
                     numberless_name,
                     res_unit_ko[0],
                     '個', number,
-                    self._get_percentage(numberless_name), self.is_same_thickness(numberless_name))
+                    parsed.get_percentage(), parsed.is_same_thickness)
 
         # -------------------------------------------------------------
         # ①すきやき76g+48g
         # ②ほうれん草山葵和え42.75g+10％
         # -------------------------------------------------------------
-        res_unit_gram = re.findall('(\d+|\d+\.\d+)g', numberless_name)
-
-        if len(res_unit_gram) > 0:
+        if kind == KIND_GRAM:
+            res_unit_gram = parsed.grams
             if len(res_unit_gram) > 1:
                 quantity2 = res_unit_gram[1]
                 unit2 = 'g'
@@ -1120,8 +1110,8 @@ class AggMeasureTargetAnalyzer:
                 numberless_name,
                 res_unit_gram[0],
                 'g', number,
-                self._get_percentage(numberless_name),
-                quantity2, unit2, self.is_same_thickness(numberless_name)
+                parsed.get_percentage(),
+                quantity2, unit2, parsed.is_same_thickness
             )
 
         return AggMeasureTarget(index, self.cooking_day, eating_day, meal, numberless_name, 0, None)
@@ -1165,6 +1155,10 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('filename', nargs='+', type=str)
+        parser.add_argument('--processes', type=int, default=None,
+                            help='計量表を同時に出力するプロセス数(省略時は設定値MEASURE_TABLE_PROCESSES)')
+        # 中間ファイル(tmp/C-*.csv)は調査用のため、--trace fullを指定した場合のみ出力する
+        add_trace_argument(parser, TRACE_SUMMARY)
 
     def is_miso_soup(self, name: str):
         if 'みそ汁' in name:
@@ -1576,46 +1570,56 @@ class Command(BaseCommand):
 
 
     def handle(self, *args, **options):
+        with PipelineTrace('cooking_direction', options['trace']) as trace:
+            # 呼び出し時の引数1つ目「調理表_YYYY.MM.DD_施設給食.xls」
+            return self.output_directions(options['filename'][0], trace, options['processes'])
 
-        # 呼び出し時の引数1つ目「調理表_YYYY.MM.DD_施設給食.xls」
-        in_file = options['filename'][0]
-
-        # ファイル名から日時をYYYY-MM-DD形式で抽出
-        cooking_day = re.sub('.*(\d{4})\.(\d{2})\.(\d{2}).*', '\\1-\\2-\\3', in_file)
-
-        cook_direc_file = os.path.join(settings.MEDIA_ROOT, 'upload', in_file)
-        cook_direc = pd.read_excel(cook_direc_file)
-
-        # ------------------------------------------------------------------------------
-        # 『2022年5月11日(水) 調理』のように月と日は0埋めされていない形式
-        cooking_year = cook_direc.iloc[3, 5][0:4]
-        cooking_month = cook_direc.iloc[3, 5][5:7]  # 「1月」〜「9月」、「10」「11」「12」のどれか
-
-        # ７行目まで削除
-        cook_direc = cook_direc.drop(index=cook_direc.index[[0, 1, 2, 3, 4, 5, 6]])
-        cook_direc = cook_direc.replace(np.nan, '', regex=True)  # NaNを空文字列に変更しておく
-
-        # 材料読込
-        self.read_plate_items(cook_direc)
-        self.store_miso_items()
-
-        # 袋出力用情報読込
-        plates_for_package = self.read_plate_for_package(cook_direc)
-        logger.info(f'plates_for_package={plates_for_package}')
-        analyzed_plates = self.allergen_anarize(plates_for_package)
-        package_manager = PrintPlatePackageManager(plates_for_package)
-        package_manager.save_new(cooking_day)
-
+    def write_measure_tables_parallel(self, tasks, processes: int):
+        """
+        計量表を喫食日・食事区分毎にプロセスプールで出力する
+        """
+        # 同じ喫食日・食事区分の料理は、袋数等の登録内容が前の料理に依存するため、同じプロセスで順に出力する
+        groups = [list(group) for _, group in groupby(tasks, key=lambda x: (x[1].eating_day, x[1].meal))]
+        processes = min(processes, len(groups))
+        if (processes > 1) and not DatabaseProcessPool.is_available():
+            # 子プロセスからはトランザクション内の未コミットの内容(印刷用袋数等)を参照できないため、プロセスを分けずに出力する
+            self.logger.warning('トランザクション内のため、計量表を1プロセスで出力します')
+            processes = 1
+        if processes <= 1:
+            return write_measure_tables(tasks)
+
+        results = []
+        buffers = []
+        with DatabaseProcessPool.create(processes) as executor:
+            for group_results, group_buffer in executor.map(write_measure_tables, groups):
+                results += group_results
+                buffers.append(group_buffer)
+
+        buffer = UnitPackageBuffer()
+        buffer.merge(buffers)
+
+        # 混ぜご飯の内容は喫食日単位のため、全ての出力後に料理の順に保存し直す
+        analyzed_dict = {x[0]: x[1] for x in tasks}
+        for sequence, _, is_success in results:
+            analyzed = analyzed_dict[sequence]
+            if is_success and (type(analyzed) is AggMeasureMixRice):
+                MixRiceDay.objects.update_or_create(
+                    eating_day=analyzed.eating_day,
+                    defaults={'eating_day': analyzed.eating_day, 'mix_rice_name': analyzed.mix_rice.name})
+        return results, buffer
+
+    def normalize_directions(self, cook_direc, cooking_year: str, cooking_month: str, trace):
+        """
+        調理表の内容を、計量表の出力対象の料理(喫食日・食事区分・料理名)の一覧に整形する
+        """
         # B列削除、E列以降L以外削除
         cook_direc = cook_direc.drop(columns=cook_direc.columns[[1, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14]])
 
-        # cook_direc.to_csv("tmp/C-1.csv", index=False)
+        trace.dump('C-1', cook_direc, "tmp/C-1.csv", index=False)
 
         # ------------------------------------------------------------------------------
         # cook_direc = cook_direc.replace(np.nan, '', regex=True)  # NaNを空文字列に変更しておく
         c_direc = cook_direc.copy()
-        del cook_direc
-        del cook_direc_file
 
         date_now = menu_now = ""
 
@@ -1633,7 +1637,7 @@ class Command(BaseCommand):
 
             menu_now = row['Unnamed: 3']
 
-        # c_direc.to_csv("tmp/C-2.csv", index=False)
+        trace.dump('C-2', c_direc, "tmp/C-2.csv", index=False)
 
         # ------------------------------------------------------------------------------
         for index, row in c_direc.iterrows():
@@ -1683,7 +1687,7 @@ class Command(BaseCommand):
             else:
                 row['eating_day'] = cooking_year + row['eating_day']
 
-        # c_direc.to_csv("tmp/C-3.csv", index=False)
+        trace.dump('C-3', c_direc, "tmp/C-3.csv", index=False)
 
         # 調理表の登場順を再現するためのリストの取得
         sort_order_list = self.backup_parts_order_list(c_direc)
@@ -1697,7 +1701,7 @@ class Command(BaseCommand):
             if row['short_name'][0] == '2':
                 c_direc.drop(index=[index], axis=0, inplace=True)
 
-        # c_direc.to_csv("tmp/C-4.csv", index=False)
+        trace.dump('C-4', c_direc, "tmp/C-4.csv", index=False)
 
         # ------------------------------------------------------------------------------
         c_direc = c_direc.groupby(['eating_day', 'meal_name__meal_name', 'parts_name']).count().reset_index()
@@ -1709,30 +1713,57 @@ class Command(BaseCommand):
         # group byすると集計したshort_nameの列が追加されてしまうのでreindexする
         c_direc = c_direc.reindex(columns=['eating_day', 'meal_name__meal_name', 'parts_name'])
 
-        # c_direc.to_csv("tmp/C-5_工程5.csv", index=False)
+        trace.dump('C-5_工程5', c_direc, "tmp/C-5_工程5.csv", index=False)
 
         # ------------------------------------------------------------------------------
         # 変換前の名称を記憶
         c_direc['before_name'] = c_direc['parts_name']
 
-        # 全角のｇを半角のgに揃える
-        c_direc['parts_name'] = c_direc['parts_name'].str.replace('ｇ', 'g', regex=True)
+        # 表記揺れを統一する(全角のｇ→半角のg、半角の%→全角の％、半角の+→全角の＋、括弧→半角スペース、/→÷)
+        c_direc['parts_name'] = c_direc['parts_name'].str.translate(NORMALIZE_TABLE)
 
-        # 半角の%を全角の％に揃える
-        c_direc['parts_name'] = c_direc['parts_name'].str.replace('%', '％', regex=True)
+        return c_direc
 
-        # 半角の+を全角の＋に揃える
-        c_direc['parts_name'] = c_direc['parts_name'].str.replace('+', '＋', regex=True)
+    def output_directions(self, in_file, trace, processes: int = None):
 
-        # 半角の()を半角スペースにする
-        c_direc['parts_name'] = c_direc['parts_name'].str.replace('(', ' ', regex=True)
-        c_direc['parts_name'] = c_direc['parts_name'].str.replace(')', ' ', regex=True)
+        # ファイル名から日時をYYYY-MM-DD形式で抽出
+        cooking_day = re.sub('.*(\d{4})\.(\d{2})\.(\d{2}).*', '\\1-\\2-\\3', in_file)
+
+        cook_direc_file = os.path.join(settings.MEDIA_ROOT, 'upload', in_file)
+        # 調理表の読込内容は中間ファイルに保存し、加熱加工記録簿等の出力でも使う
+        sheet = CookingDirectionSheet.load(cook_direc_file)
+        cook_direc = sheet.to_frame()
+
+        # ------------------------------------------------------------------------------
+        # 『2022年5月11日(水) 調理』のように月と日は0埋めされていない形式
+        cooking_year = cook_direc.iloc[3, 5][0:4]
+        cooking_month = cook_direc.iloc[3, 5][5:7]  # 「1月」〜「9月」、「10」「11」「12」のどれか
 
-        # 全角の（）を半角スペースにする
-        c_direc['parts_name'] = c_direc['parts_name'].str.replace('（', ' ', regex=True)
-        c_direc['parts_name'] = c_direc['parts_name'].str.replace('）', ' ', regex=True)
+        # ７行目まで削除
+        cook_direc = cook_direc.drop(index=cook_direc.index[[0, 1, 2, 3, 4, 5, 6]])
+        cook_direc = cook_direc.replace(np.nan, '', regex=True)  # NaNを空文字列に変更しておく
 
-        c_direc['parts_name'] = c_direc['parts_name'].str.replace('/', '÷', regex=True)
+        # 材料読込
+        self.read_plate_items(cook_direc)
+        self.store_miso_items()
+
+        # 袋出力用情報読込
+        plates_for_package = self.read_plate_for_package(cook_direc)
+        logger.info(f'plates_for_package={plates_for_package}')
+        analyzed_plates = self.allergen_anarize(plates_for_package)
+        package_manager = PrintPlatePackageManager(plates_for_package)
+        package_manager.save_new(cooking_day)
+
+        # 整形後の内容は調理表の内容だけで決まるため、同じ内容の調理表では中間ファイルから読み込む
+        # (中間ファイル(tmp/C-*.csv)を出力する場合は、毎回整形する)
+        c_direc = None if trace.is_full else sheet.load_frame(NORMALIZED_FRAME_NAME, NORMALIZED_FRAME_VERSION)
+        if c_direc is None:
+            c_direc = self.normalize_directions(cook_direc, cooking_year, cooking_month, trace)
+            sheet.save_frame(NORMALIZED_FRAME_NAME, NORMALIZED_FRAME_VERSION, c_direc)
+        else:
+            logger.info(f'調理表整形済み中間ファイル読込:{in_file}')
+        del cook_direc
+        del cook_direc_file
 
         # 既存のフォルダをクリア
         measure_output_dir = os.path.join(settings.OUTPUT_DIR, 'measure')
@@ -1779,11 +1810,12 @@ class Command(BaseCommand):
         plate_generator = self.generate_eating_meal_list(analyzed_plates)
         enge_adjust_status = 0
         enge_adjust_timing = None
-        order_manager = AggMeasureOrdersManager()
         store_first_miso_flag = False
-        for index, analyzed in enumerate(analyzer.generate_analyzed()):
-            self.logger.info(f'measure_start:{analyzed.name}')
 
+        # 1.計量表の出力内容の決定(料理の順に、嚥下調整状態・味噌汁の初回を決める)
+        tasks = []
+        plate_dicts = {}
+        for index, analyzed in enumerate(analyzer.generate_analyzed()):
             # 前回ループでstatusが1になっていた場合は、2へ移行
             if enge_adjust_status == 1:
                 enge_adjust_status = 2
@@ -1818,107 +1850,41 @@ class Command(BaseCommand):
                 if enge_adjust_status == 0:
                     enge_adjust_timing = (analyzed.eating_day, analyzed.meal)
                     enge_adjust_status = 1
-            try:
-                if type(analyzed) is AggMeasureMisoDevide:
-                    analyzed.items = self.miso_liquid_quantity
-                    if store_first_miso_flag:
-                        analyzed.is_first = True
-                        store_first_miso_flag = False
-                    message = analyzed.call_command(enge_adjust_status, order_manager)
-                    aggregation.add_soup_quantity(message, analyzed.eating_day, analyzed.meal)
 
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasureSoupDevide:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasureMiso:
-                    analyzed.items = self.miso_liquid_quantity
-                    if store_first_miso_flag:
-                        analyzed.is_first = True
-                        store_first_miso_flag = False
-                    message = analyzed.call_command(enge_adjust_status, order_manager)
-                    aggregation.add_soup_quantity(message, analyzed.eating_day, analyzed.meal)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasureSoupFilling:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasureSoupLiquid:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasureLiquidSeasoning:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasureMixRice:
-                    writer = MixRiceMeasureWriter(analyzed)
-                    writer.write()
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = True
-                    continue
-                elif type(analyzed) is AggMeasureMixRiceParts:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = True
-                    continue
-                elif type(analyzed) is AggMeasurePlate:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasurePlateWithDensity:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasurePlateKoGram:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasurePlateKoGramPercent:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasurePlateKoGramDensity:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasurePlateGramGram:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                elif type(analyzed) is AggMeasurePlateWithAnotherUnit:
-                    analyzed.call_command(enge_adjust_status, order_manager)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-                else:
-                    analyzed.call_command(order_manager, enge_adjust_status)
-                    if plate_dict_for_kakiokoshi:
-                        plate_dict_for_kakiokoshi['is_mix_rice'] = False
-                    continue
-            except Exception as e:
-                self.logger.error(analyzed.name)
-                self.logger.info(traceback.format_exc())
+            if type(analyzed) in [AggMeasureMisoDevide, AggMeasureMiso]:
+                analyzed.items = self.miso_liquid_quantity
+                if store_first_miso_flag:
+                    analyzed.is_first = True
+                    store_first_miso_flag = False
+
+            tasks.append((index, analyzed, enge_adjust_status))
+            plate_dicts[index] = plate_dict_for_kakiokoshi
+
+        # 2.計量表の出力
+        processes = processes or settings.MEASURE_TABLE_PROCESSES
+        if processes > 1:
+            results, package_buffer = self.write_measure_tables_parallel(tasks, processes)
+        else:
+            results, package_buffer = write_measure_tables(tasks)
+
+        # ピッキング指示書用袋数をまとめて登録
+        package_buffer.save()
+
+        analyzed_dict = {x[0]: x[1] for x in tasks}
+        for sequence, message, is_success in results:
+            analyzed = analyzed_dict[sequence]
+            if not is_success:
                 error_list.append(analyzed.name)
+                continue
+
+            if type(analyzed) in [AggMeasureMisoDevide, AggMeasureMiso]:
+                aggregation.add_soup_quantity(message, analyzed.eating_day, analyzed.meal)
+
+            plate_dict_for_kakiokoshi = plate_dicts[sequence]
+            if plate_dict_for_kakiokoshi:
+                plate_dict_for_kakiokoshi['is_mix_rice'] = type(analyzed) in MIX_RICE_TYPES
 
         del plate_generator
-        del order_manager
         self.logger.info('メインループ終了')
 
         # 調理表の料理情報を保存
@@ -1934,6 +1900,7 @@ class Command(BaseCommand):
         self.logger.info('miso-output-end')
 
         shutil.make_archive(new_dir_path, 'zip', root_dir=new_dir_path)
+        BatchJobResult.add(new_dir_path, new_dir_path + '.zip')
         self.logger.info('zipped-end')
 
         if error_list:
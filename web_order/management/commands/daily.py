@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
-from web_order.models import UnitMaster, MenuDisplay, MealDisplay, Order
-from accounts.models import User
+from web_order.models import UnitMaster, Order
+from web_order.order_slots import OrderSlotGenerator
 import datetime as dt
 from datetime import timedelta
 import logging
@@ -9,6 +9,9 @@ import logging
 
 class Command(BaseCommand):
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='作成せずに件数と処理時間のみ出力する')
+
     def handle(self, *args, **options):
 
         logger = logging.getLogger(__name__)
@@ -52,11 +55,13 @@ class Command(BaseCommand):
 
         unit_list = UnitMaster.objects.filter(is_active=True)
 
+        # 直近の週次バッチの週のレコードがないユニット(新規ユニット)のみ作成する
+        created_unit_ids = set(Order.objects.filter(unit_name__in=unit_list, eating_day=weekly_start_day)
+                               .values_list('unit_name_id', flat=True))
+        target_units = []
         for unt in unit_list:
 
-            order_exists = Order.objects.filter(unit_name=unt, eating_day=weekly_start_day)
-
-            if (order_exists):
+            if unt.id in created_unit_ids:
                 log_message = str(unt.username) + ',' + str(unt.unit_name)
                 log_message += ',' + str(weekly_start_day) + ',の週のレコードは作成済みです'
                 logger.warning(log_message)
@@ -66,19 +71,8 @@ class Command(BaseCommand):
                 log_message += ',の注文フォームを,'
                 log_message += str(start_day) + ',の週から35日分を作成しました'
                 logger.info(log_message)
+                target_units.append(unt)
 
-                men_list = MenuDisplay.objects.filter(username=unt.username).order_by('id')
-                for men in men_list:
-
-                    mel_list = MealDisplay.objects.filter(username=unt.username).order_by('id')
-                    for mel in mel_list:
-
-                        for day in date_list:
-
-                            Order.objects.create(
-                                    unit_name_id=unt.id,
-                                    menu_name_id=men.menu_name_id,
-                                    meal_name_id=mel.meal_name_id,
-                                    eating_day=day,
-                                    allergen_id=1,
-                            )
+        generator = OrderSlotGenerator(skip_abolished=False)
+        summary = generator.generate(target_units, [date_list], dry_run=options['dry_run'])
+        self.stdout.write(str(summary))
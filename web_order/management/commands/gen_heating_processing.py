@@ -10,6 +10,7 @@ import shutil
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
+from web_order.cooking_direction_sheet import CookingDirectionSheet
 from .utils import ExcelOutputMixin, ExcelHellper
 
 class AllergenPlateDetail:
@@ -268,8 +269,8 @@ class Command(BaseCommand, ExcelOutputMixin):
         # ------------------------------------------------------------------------------
         # 調理表の読み込み
         # ------------------------------------------------------------------------------
-        workbook = excel.load_workbook(cook_direc_file)
-        worksheet = workbook.worksheets[0]
+        # 調理表登録時の読込内容(中間ファイル)があれば、そちらを使う
+        sheet = CookingDirectionSheet.load(cook_direc_file)
 
         plate_list = []
         plate = None
@@ -277,14 +278,14 @@ class Command(BaseCommand, ExcelOutputMixin):
         is_allergen = False
         row_index = 9
         menu_list = []
-        for row in worksheet.iter_rows(min_row=row_index):
+        for row in sheet.iter_rows(min_row=row_index):
             # 食種(A列)に値
-            if row[0].value:
+            if row[0]:
                 if plate:
                     plate_list.append(plate)
-                plate = CookPlate(row[0].value)
+                plate = CookPlate(row[0])
             # 料理名(D列)に値
-            if row[3].value:
+            if row[3]:
                 # 献立切り替え
                 if current_plate_name:
                     # 処理中の料理の解析を終了する処理
@@ -293,24 +294,24 @@ class Command(BaseCommand, ExcelOutputMixin):
                     else:
                         plate.add_normal_plate(current_plate_name)
 
-                current_plate_name = row[3].value
+                current_plate_name = row[3]
                 is_allergen = True
                 menu_list = []
 
                 # 内訳の内容チェック(アレルギー対応代替食でないことが確定するかどうか)
-                if row[2].value:
-                    if self.is_not_allergen(row[2].value):
+                if row[2]:
+                    if self.is_not_allergen(row[2]):
                         is_allergen = False
                     else:
-                        menu = self.get_menu_from_detail(row[2].value)
+                        menu = self.get_menu_from_detail(row[2])
                         menu_list.append(menu)
-            elif row[2].value:
+            elif row[2]:
                 # 内訳の内容チェック(アレルギー対応代替食でないことが確定するかどうか)
                 if is_allergen:
-                    if self.is_not_allergen(row[2].value):
+                    if self.is_not_allergen(row[2]):
                         is_allergen = False
                     else:
-                        menu = self.get_menu_from_detail(row[2].value)
+                        menu = self.get_menu_from_detail(row[2])
                         if not (menu in menu_list):
                             menu_list.append(menu)
             else:
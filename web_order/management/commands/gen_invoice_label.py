@@ -10,7 +10,9 @@ from django_pandas.io import read_frame
 
 from web_order.date_management import SalesDayUtil
 from web_order.models import Order, OrderEveryday, ProductMaster, MenuDisplay, TaxEverydaySellingSetting
-from web_order.models import InvoiceException, SerialCount, EverydaySelling, NewUnitPrice, InvoiceDataHistory, TaxSetting
+from web_order.models import InvoiceException, SerialCount, EverydaySelling, InvoiceDataHistory, TaxSetting
+from web_order.jobs import BatchJobResult
+from web_order.prices import PriceResolver
 
 
 class Command(BaseCommand):
@@ -243,13 +245,13 @@ class Command(BaseCommand):
         df_price = read_frame(qs_price)
 
         # 単価変更の反映###############################
+        price_resolver = PriceResolver()
         for index, data in df_price.iterrows():
             menu_name = data['menu_name']
             sales_day = self.get_sales_day(order_kenshoku_exception, data['username__username'])
             if sales_day:
-                qs_unit_price = NewUnitPrice.objects.filter(username__username=data['username__username'], menu_name=menu_name, eating_day__lte=sales_day).order_by('-eating_day')
-                if qs_unit_price.exists():
-                    unit_price = qs_unit_price.first()
+                unit_price = price_resolver.get_new_price(data['username__username'], menu_name, sales_day)
+                if unit_price:
                     df_price.loc[index, 'price_breakfast'] = unit_price.price_breakfast
                     df_price.loc[index, 'price_lunch'] = unit_price.price_lunch
                     df_price.loc[index, 'price_dinner'] = unit_price.price_dinner
@@ -472,6 +474,7 @@ class Command(BaseCommand):
 
         # 販売大将取り込み用請求データの完成
         invoice_data.to_csv(invoice_output_file, index=False, encoding='cp932')
+        BatchJobResult.add(invoice_output_file)
 
         # ログを出力
         aggregation_log.to_csv("tmp/gen_invoice_label_log.csv", index=False, mode='a')
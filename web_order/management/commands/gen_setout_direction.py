@@ -11,6 +11,7 @@ from openpyxl.worksheet.pagebreak import Break
 from django.conf import settings
 from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from web_order.jobs import BatchJobResult
 from web_order.models import FoodPhoto, MonthlyMenu, EngeDirection, EngeFoodDirection, SetoutDuration
 
 """
@@ -55,6 +56,7 @@ class Command(BaseCommand):
         else:
             is_create = True
         os.makedirs(setout_output_dir, exist_ok=True)  # 上書きOK
+        BatchJobResult.add(setout_output_dir)
         output_file = os.path.join(setout_output_dir, setout_name + '.xlsx')
 
         xls_template = os.path.join(settings.STATICFILES_DIRS[0], 'excel/setout.xlsx')  # 指示書のテンプレート
@@ -356,6 +358,7 @@ class Command(BaseCommand):
 
             setout_output_dir_osechi = os.path.join(settings.OUTPUT_DIR, 'setout', f'{setout_name}(おせち用)')
             os.makedirs(setout_output_dir_osechi, exist_ok=True)  # 上書きOK
+            BatchJobResult.add(setout_output_dir_osechi)
             osechi_output_file = os.path.join(setout_output_dir_osechi, setout_name + '(おせち用).xlsx')
 
             osechi_book.save(osechi_output_file)
@@ -373,6 +376,7 @@ class Command(BaseCommand):
         # ------------------------------------------------------------------------------
         setout_output_dir_1p = os.path.join(settings.OUTPUT_DIR, 'setout', f'{setout_name}(一枚表示)')
         os.makedirs(setout_output_dir_1p, exist_ok=True)  # 上書きOK
+        BatchJobResult.add(setout_output_dir_1p)
         output_file_1p = os.path.join(setout_output_dir_1p, f'{setout_name}(一枚表示).xlsx')
 
         xls_templat_1p = os.path.join(settings.STATICFILES_DIRS[0], 'excel/setout_1p.xlsx')  # 指示書のテンプレート
@@ -11,7 +11,9 @@ from django_pandas.io import read_frame
 
 from web_order.models import Order, OrderEveryday, ProductMaster, MenuDisplay
 from web_order.models import InvoiceException, SerialCount, EverydaySelling
+from web_order.jobs import BatchJobResult
 from web_order.picking import QrCodeUtil
+from web_order.qr_assets import QrImageCache
 
 
 logger = logging.getLogger(__name__)
@@ -469,6 +471,7 @@ class Command(BaseCommand):
         # ------------------------------------------------------------------------------
 
         book = excel.load_workbook(label_template)
+        qr_cache = QrImageCache()
 
         unit_prev = meal_prev = ''
         i = 5
@@ -500,9 +503,9 @@ class Command(BaseCommand):
                     image_path = QrCodeUtil.get_transfer_imege_path_v2(row['unit_number'], row['meal_name'], aggregation_day.day)
                     logger.info(f"{row['unit_number']}-{row['meal_name']}-{aggregation_day.day}")
                     logger.info(image_path)
-                    qr_image = excel.drawing.image.Image(image_path)
-                    qr_image.width = 160
-                    qr_image.height = 160
+                    qr_value = QrCodeUtil.get_all_in_value_from_number_v2(
+                        row['unit_number'], QrCodeUtil.convert_to_t_meal_value(row['meal_name']), aggregation_day.day)
+                    qr_image = qr_cache.get_image(qr_value, image_path, 160, 160)
                     sheet.add_image(qr_image, sheet.cell(1, 5).coordinate)
                     #sheet.cell(3, 2, f"{row['unit_number']}-{row['meal_name']}-{aggregation_day.day}")
 
@@ -521,6 +524,8 @@ class Command(BaseCommand):
         book.remove(book["原本"])
         book.remove(book["119 □ 夕_原本"])
         book.save(label_output_file)
+        BatchJobResult.add(label_output_file)
+        logger.info(f'QRコード画像:{qr_cache}')
 
         # ログを出力
         aggregation_log.to_csv("tmp/gen_transfer_label_log.csv", index=False, mode='a')
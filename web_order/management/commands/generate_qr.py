@@ -1,13 +1,9 @@
-import datetime as dt
-from datetime import timedelta
 import logging
-import os
-import qrcode
 
-from django.conf import settings
 from django.core.management.base import BaseCommand
 from web_order.models import UnitMaster
 from web_order.picking import QrCodeUtil
+from web_order.qr_assets import QrImageStore, STORE_TYPES
 
 class Command(BaseCommand):
     PICKING_MEAL_VALUES = {
@@ -24,58 +20,48 @@ class Command(BaseCommand):
 
     logger = logging.getLogger(__name__)
 
+    def add_arguments(self, parser):
+        parser.add_argument('--units', type=str, default=None, help='作成対象のユニットのID(カンマ区切り。省略時は全ユニット)')
+        parser.add_argument('--processes', type=int, default=None, help='画像作成の同時実行プロセス数(省略時は設定値QR_IMAGE_PROCESSES)')
+        parser.add_argument('--store', choices=STORE_TYPES, default=None, help='画像の保存形式(省略時は設定値QR_IMAGE_STORE)')
+        parser.add_argument('--rebuild', action='store_true', help='作成済み画像の一覧(マニフェスト)を保存先から作り直す')
 
-    def handle(self, *args, **options):
-        # 画像ファイル保存先
-        image_dir_path = QrCodeUtil.get_image_path_root()
-        os.makedirs(image_dir_path, exist_ok=True)  # 上書きOK
+    def get_targets(self, unit):
+        """
+        ユニットのQRコード画像のファイル名とQRコード値を取得する
+        """
+        targets = {}
+
+        # 中袋、ピッキング指示書用の画像
+        for meal in self.PICKING_MEAL_VALUES:
+            for picking_type in self.PICKING_TYPE_VALUES:
+                # 喫食日ごとのQRコードを出力
+                for day in range(1, 32):
+                    qr_value = QrCodeUtil.get_value_v2(unit, meal, picking_type, day)
+                    targets[QrCodeUtil.get_file_name_by_value(qr_value)] = qr_value
+
+            # 配送リスト(配送用段ボールに使用)用の画像
+            for day in range(1, 32):
+                qr_transfer_value = QrCodeUtil.get_all_in_value_v2(unit, meal, day)
+                targets[QrCodeUtil.get_file_name_by_prefix_all_value_v2(qr_transfer_value, day)] = qr_transfer_value
 
+        return targets
+
+    def handle(self, *args, **options):
         unt_list = UnitMaster.objects.filter(is_active=True).exclude(unit_code__range=[80001, 80008]).order_by('id')  # id順にすべきか？
+        if options['units']:
+            unt_list = unt_list.filter(id__in=options['units'].split(','))
+
+        targets = {}
         for unt in unt_list:
             log_message = str(unt.username) + ',' + str(unt.unit_name)
             log_message += ',QRコード画像を作成します。'
             self.logger.info(log_message)
+            targets.update(self.get_targets(unt))
 
-            # 中袋、ピッキング指示書用の画像を作成
-            for meal in self.PICKING_MEAL_VALUES:
-                for picking_type in self.PICKING_TYPE_VALUES:
-                    # 喫食日ごとのQRコードを出力
-                    for day in range(1, 32):
-                        qr_value = QrCodeUtil.get_value_v2(unt, meal, picking_type, day)
-                        path = os.path.join(image_dir_path, QrCodeUtil.get_file_name_by_value(qr_value))
-                        if not os.path.isfile(path):
-                            # 既存は上書きしない
-                            qr = qrcode.QRCode(
-                                version=2,
-                                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                                box_size=2,
-                                border=4
-                            )
-
-                            qr.add_data(qr_value)
-                            qr.make()
-
-                            img = qr.make_image(fill_color="black", back_color="#ffffff")
-                            img.save(path)
-
-                        # 配送リスト(配送用段ボールに使用)用の画像を作成
-                        qr_transfer_value = QrCodeUtil.get_all_in_value_v2(unt, meal, day)
-                        path = os.path.join(image_dir_path, QrCodeUtil.get_file_name_by_prefix_all_value_v2(qr_transfer_value, day))
-                        if not os.path.isfile(path):
-                            qr = qrcode.QRCode(
-                                version=2,
-                                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                                box_size=2,
-                                border=4
-                            )
-                            self.logger.debug('配送リスト(配送用段ボールに使用)用の画像')
-                            self.logger.debug(qr_transfer_value)
-                            qr.add_data(qr_transfer_value)
-                            qr.make()
-
-                            # 既存は上書きしない
-                            img = qr.make_image(fill_color="black", back_color="#ffffff")
-                            img.save(path)
+        # 作成済みの画像は、マニフェストで判定して上書きしない
+        store = QrImageStore(QrCodeUtil.get_image_path_root(), options['store'])
+        store.generate(targets, processes=options['processes'], rebuild=options['rebuild'])
 
         """
         log_message = 'サンシティ混ぜご飯用QRコード画像を作成します。'
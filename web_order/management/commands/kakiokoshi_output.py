@@ -17,6 +17,7 @@ from django.db.models import Sum
 from django_pandas.io import read_frame
 
 from web_order.models import CookingDirectionPlate, AllergenPlateRelations, Order, CommonAllergen, UncommonAllergen, UncommonAllergenHistory
+from web_order.jobs import BatchJobResult
 from web_order.p7 import P7Util
 from web_order.cooking_direction_plates import PlateNameAnalizeUtil
 
@@ -719,4 +720,5 @@ class Command(BaseCommand):
         os.makedirs(output_dir, exist_ok=True)  # 上書きOK
         save_path = os.path.join(output_dir, f'書き起こし票_{str(cooking_day)}_製造.xlsx')
         workbook.save(save_path)
+        BatchJobResult.add(save_path)
         workbook.close()
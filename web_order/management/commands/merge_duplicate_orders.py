@@ -0,0 +1,82 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min
+
+from web_order.models import Order
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    アレルギーなしの注文(仮注文入力画面の入力枠)の重複を報告し、1件にまとめる。
+    一意制約(unique_order_slot)の追加前に実行すること。
+
+    まとめる際は、仮注文入力画面の並びを崩さないよう最も古いID(最小ID)のレコードを残し、
+    食数は最後に更新された(食数入力のある)レコードの値を採用する。
+    """
+    help = 'アレルギーなしの注文の重複を報告・統合する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='from_date', type=str, default=None, help='対象喫食日(開始)')
+        parser.add_argument('--to', dest='to_date', type=str, default=None, help='対象喫食日(終了)')
+        parser.add_argument('--dry-run', action='store_true', help='統合せずに重複の報告のみ行う')
+
+    def get_duplicated_keys(self, from_date, to_date):
+        qs = Order.objects.filter(allergen_id=1)
+        if from_date:
+            qs = qs.filter(eating_day__gte=from_date)
+        if to_date:
+            qs = qs.filter(eating_day__lte=to_date)
+
+        return qs.values('eating_day', 'unit_name_id', 'meal_name_id', 'menu_name_id') \
+            .annotate(count=Count('id'), min_id=Min('id')) \
+            .filter(count__gt=1) \
+            .order_by('eating_day', 'unit_name_id', 'meal_name_id', 'menu_name_id')
+
+    def merge(self, key):
+        orders = list(Order.objects.filter(
+            allergen_id=1, eating_day=key['eating_day'], unit_name_id=key['unit_name_id'],
+            meal_name_id=key['meal_name_id'], menu_name_id=key['menu_name_id']).order_by('id'))
+
+        keep = orders[0]
+        inputs = [x for x in orders if x.quantity is not None]
+        if inputs:
+            latest = max(inputs, key=lambda x: (x.updated_at, x.id))
+            quantity = latest.quantity
+        else:
+            quantity = None
+
+        delete_ids = [x.id for x in orders[1:]]
+        Order.objects.filter(id__in=delete_ids).delete()
+        if keep.quantity != quantity:
+            # 更新日時は統合前の入力日時を残す
+            Order.objects.filter(id=keep.id).update(quantity=quantity)
+
+        return keep, quantity, [x.quantity for x in orders], delete_ids
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        keys = list(self.get_duplicated_keys(options['from_date'], options['to_date']))
+
+        if not keys:
+            self.stdout.write('重複した注文はありません')
+            return
+
+        for key in keys:
+            message = f'{key["eating_day"]},unit={key["unit_name_id"]},meal={key["meal_name_id"]},' \
+                      f'menu={key["menu_name_id"]},件数={key["count"]}'
+            self.stdout.write(message)
+
+        if dry_run:
+            self.stdout.write(f'重複:{len(keys)}件(dry-run)')
+            return
+
+        with transaction.atomic():
+            for key in keys:
+                keep, quantity, quantities, delete_ids = self.merge(key)
+                logger.info(f'重複注文統合:id={keep.id},食数={quantities}->{quantity},削除id={delete_ids}')
+
+        self.stdout.write(f'重複:{len(keys)}件を統合しました')
@@ -1,5 +1,15 @@
+import logging
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+import openpyxl as excel
 from openpyxl.styles.borders import Border, Side
 
+logger = logging.getLogger(__name__)
+
 
 class AggEngePackageMixin():
     def get_gram_package(self, quantity):
@@ -194,12 +204,120 @@ class AggFixedOrderRuleForBasic(AggFixedOrderRule):
         return 12
 
 
+class PackageSplitUtil:
+    """
+    注文数を袋のサイズ毎に分割した袋数(単位袋・端数袋・1人用袋)を、注文の列単位でまとめて計算するクラス
+    """
+    # 計量表で使う袋のサイズ(出力する列の順)
+    PACKAGE_SIZES = (10, 7, 5)
+
+    @staticmethod
+    def split(quantities, size: int, is_use_one_pack: bool = True):
+        """
+        注文数を袋のサイズで分割し、(単位袋数, 端数袋の入数, 1人用袋数)の配列を返す。
+        is_use_one_pack: Trueの場合、端数が1人分なら端数袋は使わず、1人用袋とする
+        """
+        units, fractions = np.divmod(np.asarray(quantities, dtype='int64'), size)
+        if is_use_one_pack:
+            one_packs = (fractions == 1).astype('int64')
+            fractions = np.where(one_packs == 1, 0, fractions)
+        else:
+            one_packs = np.zeros_like(units)
+        return units, fractions, one_packs
+
+    @classmethod
+    def add_columns(cls, dataframe, is_use_one_pack: bool = True, quantity_column: str = '注文数'):
+        """
+        注文数の列から、袋のサイズ毎の単位袋・端数袋(・1人用袋)の列を追加した内容を返す
+        """
+        columns = {}
+        for size in cls.PACKAGE_SIZES:
+            units, fractions, one_packs = cls.split(dataframe[quantity_column], size, is_use_one_pack)
+            columns[f'単位袋{size}'] = units
+            columns[f'{size}の端数袋・入数'] = fractions
+            if is_use_one_pack:
+                columns[f'{size}の1人用袋'] = one_packs
+        return dataframe.assign(**columns)
+
+
+class MeasureTemplateCache:
+    """
+    計量表テンプレートの読込内容を、プロセス内で保持するクラス。
+    テンプレートの解析は1回だけ行い、解析したブックを直列化した内容から、計量表毎のブックを作成する。
+    (出力されるブックの書式一覧は重複が除かれるが、各セルの書式は変わらない)
+    """
+    # key:(テンプレートのパス, 更新日時)、value:直列化したブック
+    _snapshots = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def load_workbook(cls, path: str):
+        key = (path, os.path.getmtime(path))
+        snapshot = cls._snapshots.get(key, None)
+        if snapshot is None:
+            snapshot = pickle.dumps(excel.load_workbook(path), protocol=pickle.HIGHEST_PROTOCOL)
+            with cls._lock:
+                cls._snapshots[key] = snapshot
+        return pickle.loads(snapshot)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._snapshots.clear()
+
+
+class MeasureWriterTimer:
+    """
+    計量表出力クラス毎の、ブックの読込・保存の回数と処理時間を集計するクラス
+    """
+    LOAD = '読込'
+    SAVE = '保存'
+
+    # key:(出力クラス名, 処理)、value:[回数, 処理時間]
+    _counters = {}
+
+    @classmethod
+    def add(cls, writer_name: str, kind: str, seconds: float):
+        counter = cls._counters.setdefault((writer_name, kind), [0, 0.0])
+        counter[0] += 1
+        counter[1] += seconds
+
+    @classmethod
+    def clear(cls):
+        cls._counters.clear()
+
+    @classmethod
+    def get_summary(cls):
+        return ','.join([f'{name}-{kind}={count}回/{seconds:.2f}秒'
+                         for (name, kind), (count, seconds) in sorted(cls._counters.items())])
+
+
 class ExcelOutputMixin():
+    def load_template(self, path: str):
+        """
+        テンプレートからブックを作成する(テンプレートの解析はプロセス内で1回のみ)
+        """
+        start = time.perf_counter()
+        wb = MeasureTemplateCache.load_workbook(path)
+        MeasureWriterTimer.add(type(self).__name__, MeasureWriterTimer.LOAD, time.perf_counter() - start)
+        return wb
+
+    def load_output(self, path: str):
+        """
+        出力済みのブックを読み込む
+        """
+        start = time.perf_counter()
+        wb = excel.load_workbook(path)
+        MeasureWriterTimer.add(type(self).__name__, MeasureWriterTimer.LOAD, time.perf_counter() - start)
+        return wb
+
     def save_with_select(self, wb, path: str):
+        start = time.perf_counter()
         for ws in wb.worksheets:
             ws.sheet_view.tabSelected = True
         wb.save(path)
         wb.close()
+        MeasureWriterTimer.add(type(self).__name__, MeasureWriterTimer.SAVE, time.perf_counter() - start)
 
 
 class ExcelHellper:
@@ -1,11 +1,15 @@
 from django.core.management.base import BaseCommand
-from web_order.models import UnitMaster, MenuDisplay, MealDisplay, Order
+from web_order.models import UnitMaster
+from web_order.order_slots import OrderSlotGenerator
 import datetime as dt
 from datetime import timedelta
 import logging
 
 class Command(BaseCommand):
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='作成せずに件数と処理時間のみ出力する')
+
     def handle(self, *args, **options):
 
         logger = logging.getLogger(__name__)
@@ -32,21 +36,6 @@ class Command(BaseCommand):
             log_message += str(start_day) + ',の週から7日分を作成しました'
             logger.info(log_message)
 
-            men_list = MenuDisplay.objects.filter(username=unt.username).order_by('menu_name__seq_order')
-            for men in men_list:
-                if men.menu_name.menu_name == '薄味':
-                    logger.info('薄味は廃止のためスキップします。')
-                    continue
-
-                mel_list = MealDisplay.objects.filter(username=unt.username).order_by('id')
-                for mel in mel_list:
-
-                    for day in date_list:
-
-                        Order.objects.create(
-                                unit_name_id=unt.id,
-                                menu_name_id=men.menu_name_id,
-                                meal_name_id=mel.meal_name_id,
-                                eating_day=day,
-                                allergen_id=1,
-                        )
+        generator = OrderSlotGenerator(menu_order='menu_name__seq_order')
+        summary = generator.generate(unt_list, [date_list], dry_run=options['dry_run'])
+        self.stdout.write(str(summary))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from web_order.models import UnitMaster, MenuDisplay, MealDisplay, Order
+from web_order.models import UnitMaster
+from web_order.order_slots import OrderSlotGenerator
 import datetime as dt
 from datetime import timedelta
 import logging
@@ -9,6 +10,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('date', nargs='+', type=str)
         parser.add_argument('units', nargs='+', type=str)
+        parser.add_argument('--dry-run', action='store_true', help='作成せずに件数と処理時間のみ出力する')
 
     def handle(self, *args, **options):
 
@@ -29,14 +31,18 @@ class Command(BaseCommand):
         if end_day < hoge_day:
             end_day = hoge_day
 
-        date_list = []
         sp = in_units.split(',')
         unit_ids = [int(x) for x in sp]
+        unt_list = list(UnitMaster.objects.filter(is_active=True, id__in=unit_ids).order_by('id'))  # id順にすべきか？
+
+        # 週毎に入力枠を作成する(仮注文入力画面は週単位でID順に並べるため)
+        date_blocks = []
         while start_day <= end_day:
+            date_list = []
             for i in range(7):  # 7日分を作成する
                 date_list.append(start_day + timedelta(days=i))
+            date_blocks.append(date_list)
 
-            unt_list = UnitMaster.objects.filter(is_active=True, id__in=unit_ids).order_by('id')  # id順にすべきか？
             for unt in unt_list:
 
                 log_message = str(unt.username) + ',' + str(unt.unit_name)
@@ -44,24 +50,8 @@ class Command(BaseCommand):
                 log_message += str(start_day) + ',の週から7日分を作成しました'
                 logger.info(log_message)
 
-                men_list = MenuDisplay.objects.filter(username=unt.username).order_by('id')
-                for men in men_list:
-                    if men.menu_name.menu_name == '薄味':
-                        logger.info('薄味は廃止のためスキップします。')
-                        continue
-
-                    mel_list = MealDisplay.objects.filter(username=unt.username).order_by('id')
-                    for mel in mel_list:
-
-                        for day in date_list:
-
-                            Order.objects.create(
-                                    unit_name_id=unt.id,
-                                    menu_name_id=men.menu_name_id,
-                                    meal_name_id=mel.meal_name_id,
-                                    eating_day=day,
-                                    allergen_id=1,
-                            )
-
-            date_list.clear()
             start_day += dt.timedelta(days=7)
+
+        generator = OrderSlotGenerator()
+        summary = generator.generate(unt_list, date_blocks, dry_run=options['dry_run'])
+        self.stdout.write(str(summary))
@@ -126,6 +126,22 @@ class Order(models.Model):
 
     class Meta:
         verbose_name = verbose_name_plural = '注文データ_食数一覧'
+        indexes = [
+            # 喫食日(範囲・一致)とユニット・食事区分・アレルギーの組み合わせでの検索用
+            models.Index(fields=['eating_day', 'unit_name'], name='order_day_unit_idx'),
+            models.Index(fields=['eating_day', 'meal_name'], name='order_day_meal_idx'),
+            models.Index(fields=['eating_day', 'allergen'], name='order_day_allergen_idx'),
+            models.Index(fields=['unit_name', 'allergen', 'eating_day'], name='order_unit_allergen_day_idx'),
+
+            # 食数の入っている注文のみを集計する処理用
+            models.Index(fields=['eating_day', 'meal_name', 'menu_name'], condition=models.Q(quantity__gt=0),
+                         name='order_day_positive_qty_idx'),
+        ]
+        constraints = [
+            # アレルギーなしの注文(仮注文入力画面の入力枠)は、喫食日・ユニット・食事区分・献立種類毎に1件のみ
+            models.UniqueConstraint(fields=['eating_day', 'unit_name', 'meal_name', 'menu_name', 'allergen'],
+                                    condition=models.Q(allergen=1), name='unique_order_slot'),
+        ]
 
 
 class OrderBackup(models.Model):
@@ -779,6 +795,22 @@ class CookingDirectionPlate(models.Model):
         verbose_name = verbose_name_plural = '調理表献立'
 
 
+class CookingEatingDay(models.Model):
+    """
+    製造日に作成する喫食日・食事区分(調理表献立から作成する)
+    """
+    cooking_day = models.DateField(verbose_name='製造日')
+    eating_day = models.DateField(verbose_name='喫食日')
+    meal_name = models.CharField(verbose_name='食事区分', max_length=8)
+    updated_at = models.DateTimeField(verbose_name='更新日', auto_now=True)
+
+    class Meta:
+        verbose_name = verbose_name_plural = '製造日_喫食日対応'
+        constraints = [
+            models.UniqueConstraint(fields=['cooking_day', 'eating_day', 'meal_name'], name='unique_cooking_eating_day'),
+        ]
+
+
 class AllergenPlateRelations(models.Model):
     """
     アレルギー代替食の関連
@@ -874,6 +906,9 @@ fs_pick = FileSystemStorage(location=settings.MEDIA_ROOT)
 class PickingResult(models.Model):
     document_file = models.FileField(upload_to='upload/picking/', storage=fs_pick, verbose_name='ファイル名')
     updated_at = models.DateTimeField(verbose_name='更新日', auto_now=True)
+    inserted_count = models.IntegerField(verbose_name='登録件数', default=0)
+    duplicate_count = models.IntegerField(verbose_name='重複件数', default=0)
+    rejected_count = models.IntegerField(verbose_name='対象外件数', default=0)
 
     class Meta:
         verbose_name = verbose_name_plural = 'インポート_ピッキング結果'
@@ -1024,6 +1059,12 @@ class PickingResultRaw(models.Model):
 
     class Meta:
         verbose_name = verbose_name_plural = 'ピッキング_照合結果'
+        constraints = [
+            # 同じ読み取り結果は1件のみ(同じファイルを再アップロードした場合に重複させない)
+            models.UniqueConstraint(
+                fields=['menu_file_no', 'menu_no', 'terminal_no', 'picking_date', 'qr_value', 'result', 'picking_phase'],
+                name='unique_picking_result'),
+        ]
 
     def __str__(self):
         return f'{self.terminal_no}-{self.picking_date}'
@@ -1278,3 +1319,44 @@ class UnitGosuLogging(models.Model):
 
     class Meta:
         verbose_name = verbose_name_plural = 'ユニット別合数計算ログ'
+
+
+batch_job_status_choices = (
+    ('waiting', '待機中'),
+    ('running', '実行中'),
+    ('done', '完了'),
+    ('error', 'エラー'),
+)
+class BatchJob(models.Model):
+    """
+    コントロールパネルから登録されたバッチ処理(管理コマンド)の実行要求。
+    ワーカー(batch_workerコマンド)が取り出して実行する。
+    """
+    command_name = models.CharField(verbose_name='コマンド名', max_length=50)
+    target = models.CharField(verbose_name='対象(日付・ファイル名)', max_length=256)
+    arguments = models.JSONField(verbose_name='引数', default=list, blank=True)
+    options = models.JSONField(verbose_name='オプション引数', default=dict, blank=True)
+    status = models.CharField(verbose_name='状態', max_length=10, choices=batch_job_status_choices, default='waiting')
+    message = models.TextField(verbose_name='実行結果メッセージ', blank=True, default='')
+    result_files = models.JSONField(verbose_name='出力ファイル', default=list, blank=True)
+    requested_by = models.CharField(verbose_name='登録ユーザー', max_length=150, blank=True, default='')
+    worker_name = models.CharField(verbose_name='実行ワーカー', max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(verbose_name='登録日時', auto_now_add=True)
+    started_at = models.DateTimeField(verbose_name='開始日時', null=True, blank=True)
+    finished_at = models.DateTimeField(verbose_name='終了日時', null=True, blank=True)
+
+    class Meta:
+        verbose_name = verbose_name_plural = 'バッチ処理実行要求'
+        constraints = [
+            # 同一コマンド・同一対象の未完了ジョブは1件のみ(二重登録防止)
+            models.UniqueConstraint(fields=['command_name', 'target'],
+                                    condition=models.Q(status__in=['waiting', 'running']),
+                                    name='unique_active_batch_job'),
+        ]
+
+    def __str__(self):
+        return f'{self.command_name}({self.target})'
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'error')
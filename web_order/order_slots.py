@@ -0,0 +1,132 @@
+import logging
+import time
+from itertools import groupby
+
+from django.db import transaction
+
+from .models import MenuDisplay, MealDisplay, Order
+
+logger = logging.getLogger(__name__)
+
+
+class OrderSlotSummary:
+    """
+    注文枠作成の結果
+    """
+    def __init__(self):
+        self.unit_count = 0
+        self.planned_count = 0
+        self.exists_count = 0
+        self.created_count = 0
+
+        self.load_seconds = 0.0
+        self.build_seconds = 0.0
+        self.write_seconds = 0.0
+
+    @property
+    def total_seconds(self):
+        return self.load_seconds + self.build_seconds + self.write_seconds
+
+    def __str__(self):
+        return f'ユニット数={self.unit_count},作成対象={self.planned_count},作成済み={self.exists_count},' \
+               f'作成={self.created_count},' \
+               f'読込={self.load_seconds:.3f}s,構築={self.build_seconds:.3f}s,書込={self.write_seconds:.3f}s,' \
+               f'合計={self.total_seconds:.3f}s'
+
+
+class OrderSlotGenerator:
+    """
+    仮注文入力画面の入力枠(アレルギーなしの注文レコード)を一括作成するクラス。
+    仮注文入力画面は注文レコードのID順で入力欄を並べるため、
+    日付ブロック毎に ユニット→献立種類→食事区分→日付 の順で作成する。
+    """
+    # 廃止済みのため作成しない献立種類
+    ABOLISHED_MENU_NAMES = ('薄味',)
+
+    def __init__(self, menu_order: str = 'id', skip_abolished: bool = True, chunk_size: int = 1000):
+        self.menu_order = menu_order
+        self.skip_abolished = skip_abolished
+        self.chunk_size = chunk_size
+
+    def _load_displays(self, units):
+        """
+        対象ユニットの施設の献立種類・食事区分の表示設定をまとめて取得する
+        """
+        user_ids = {x.username_id for x in units}
+
+        menu_qs = MenuDisplay.objects.filter(username_id__in=user_ids) \
+            .select_related('menu_name').order_by('username_id', self.menu_order)
+        menus_dict = {key: list(group) for key, group in groupby(menu_qs, key=lambda x: x.username_id)}
+
+        meal_qs = MealDisplay.objects.filter(username_id__in=user_ids).order_by('username_id', 'id')
+        meals_dict = {key: [x.meal_name_id for x in group] for key, group in groupby(meal_qs, key=lambda x: x.username_id)}
+
+        return menus_dict, meals_dict
+
+    def _get_slot_queryset(self, units, date_blocks):
+        unit_ids = [x.id for x in units]
+        days = {day for block in date_blocks for day in block}
+        return Order.objects.filter(unit_name_id__in=unit_ids, eating_day__in=days, allergen_id=1)
+
+    def _load_exists(self, units, date_blocks):
+        qs = self._get_slot_queryset(units, date_blocks) \
+            .values_list('unit_name_id', 'menu_name_id', 'meal_name_id', 'eating_day')
+        return set(qs)
+
+    def build(self, units, date_blocks, menus_dict, meals_dict, exists):
+        orders = []
+        exists_count = 0
+        for date_list in date_blocks:
+            for unit in units:
+                for menu in menus_dict.get(unit.username_id, []):
+                    if self.skip_abolished and (menu.menu_name.menu_name in self.ABOLISHED_MENU_NAMES):
+                        continue
+
+                    for meal_id in meals_dict.get(unit.username_id, []):
+                        for day in date_list:
+                            if (unit.id, menu.menu_name_id, meal_id, day) in exists:
+                                exists_count += 1
+                                continue
+
+                            orders.append(Order(
+                                unit_name_id=unit.id,
+                                menu_name_id=menu.menu_name_id,
+                                meal_name_id=meal_id,
+                                eating_day=day,
+                                allergen_id=1,
+                            ))
+        return orders, exists_count
+
+    def generate(self, units, date_blocks, dry_run: bool = False):
+        """
+        注文枠を作成する。作成済みの枠はスキップする。
+        date_blocks: 日付リストのリスト(週単位など、ID順を揃える単位)
+        """
+        summary = OrderSlotSummary()
+        units = list(units)
+        summary.unit_count = len(units)
+
+        start = time.perf_counter()
+        menus_dict, meals_dict = self._load_displays(units)
+        exists = self._load_exists(units, date_blocks)
+        summary.load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        orders, summary.exists_count = self.build(units, date_blocks, menus_dict, meals_dict, exists)
+        summary.planned_count = len(orders) + summary.exists_count
+        summary.build_seconds = time.perf_counter() - start
+
+        if not dry_run:
+            start = time.perf_counter()
+            with transaction.atomic():
+                before_count = self._get_slot_queryset(units, date_blocks).count()
+                for i in range(0, len(orders), self.chunk_size):
+                    # 同時実行などで作成済みになった枠は、一意制約(unique_order_slot)により作成をスキップする
+                    Order.objects.bulk_create(orders[i:i + self.chunk_size], ignore_conflicts=True)
+
+                # ignore_conflictsでスキップされた枠は含めないよう、作成前後の件数から作成数を求める
+                summary.created_count = self._get_slot_queryset(units, date_blocks).count() - before_count
+            summary.write_seconds = time.perf_counter() - start
+
+        logger.info(f'注文枠作成{"(dry-run)" if dry_run else ""}:{summary}')
+        return summary
@@ -0,0 +1,142 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderHistory
+
+logger = logging.getLogger(__name__)
+
+
+class OrderChangeSummary:
+    """
+    食数入力の保存結果
+    """
+    def __init__(self):
+        self.form_count = 0
+        self.skipped_count = 0
+        self.created_count = 0
+        self.deleted_count = 0
+
+        # 食数を変更した注文と変更前の食数
+        self.changes = []
+
+    @property
+    def changed_count(self):
+        return len(self.changes)
+
+    @property
+    def quantity_delta(self):
+        """
+        変更による食数の増減
+        """
+        return sum((order.quantity or 0) - (prev or 0) for order, prev in self.changes)
+
+    @property
+    def has_changes(self):
+        return bool(self.changes or self.created_count or self.deleted_count)
+
+    def __str__(self):
+        return f'入力欄={self.form_count},変更={self.changed_count},対象外={self.skipped_count},' \
+               f'作成={self.created_count},削除={self.deleted_count},食数増減={self.quantity_delta:+d}'
+
+
+class OrderQuantityUpdater:
+    """
+    食数入力フォームセットの保存を行うクラス。
+    食数の変わった注文のみを、1トランザクションでまとめて更新(bulk_update)し、
+    変更履歴(OrderHistory)もまとめて登録する。
+    """
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+
+    @classmethod
+    def new_history(cls, order, prev):
+        return OrderHistory(
+            eating_day=order.eating_day,
+            unit_name_id=order.unit_name_id,
+            meal_name_id=order.meal_name_id,
+            menu_name_id=order.menu_name_id,
+            allergen_id=order.allergen_id,
+            quantity=order.quantity,
+            prev=prev,
+        )
+
+    def collect_changes(self, formset, summary, skip=None):
+        """
+        フォームセットから、食数の変わった注文を取得する。
+        skip: 保存対象外とする注文を判定する関数(Trueを返した注文は保存しない)
+        """
+        now = timezone.now()
+        for form in formset.forms:
+            summary.form_count += 1
+            if not form.has_changed():
+                continue
+
+            # 検証済みのフォームのinstanceには入力値が反映されているため、変更前の値は初期値から取得する
+            prev = form.initial.get('quantity', None)
+            order = form.save(commit=False)
+            if skip and skip(order):
+                summary.skipped_count += 1
+                continue
+            if order.quantity == prev:
+                continue
+
+            # bulk_updateでは自動更新されないため、更新日時を設定する
+            order.updated_at = now
+            summary.changes.append((order, prev))
+
+    def write(self, summary, creates=None, delete_ids=None, extra_changes=None):
+        """
+        集めた変更内容をまとめて保存する
+        creates: 新規作成する注文のリスト
+        delete_ids: 削除する注文のIDのリスト
+        extra_changes: フォームセット以外で変更した注文と変更前の食数のリスト(更新対象項目は全項目)
+        """
+        creates = creates or []
+        delete_ids = delete_ids or []
+        extra_changes = extra_changes or []
+
+        histories = [self.new_history(order, prev) for order, prev in summary.changes + extra_changes]
+        histories += [self.new_history(order, None) for order in creates]
+
+        with transaction.atomic():
+            if delete_ids:
+                deleted_orders = list(Order.objects.filter(id__in=delete_ids))
+                for order in deleted_orders:
+                    prev = order.quantity
+                    order.quantity = None
+                    histories.append(self.new_history(order, prev))
+                Order.objects.filter(id__in=delete_ids).delete()
+                summary.deleted_count += len(deleted_orders)
+
+            if summary.changes:
+                Order.objects.bulk_update(
+                    [order for order, _ in summary.changes], ['quantity', 'updated_at'], batch_size=self.batch_size)
+            if extra_changes:
+                now = timezone.now()
+                for order, _ in extra_changes:
+                    order.updated_at = now
+                Order.objects.bulk_update(
+                    [order for order, _ in extra_changes],
+                    ['unit_name', 'meal_name', 'menu_name', 'allergen', 'quantity', 'updated_at'],
+                    batch_size=self.batch_size)
+                summary.changes += extra_changes
+            if creates:
+                Order.objects.bulk_create(creates, batch_size=self.batch_size)
+                summary.created_count += len(creates)
+
+            if histories:
+                OrderHistory.objects.bulk_create(histories, batch_size=self.batch_size)
+
+    def save(self, formset, skip=None):
+        """
+        食数入力フォームセットを保存し、保存結果を返す
+        """
+        summary = OrderChangeSummary()
+        self.collect_changes(formset, summary, skip)
+        if summary.changes:
+            self.write(summary)
+
+        logger.info(f'食数更新:{summary}')
+        return summary
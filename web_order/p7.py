@@ -11,6 +11,8 @@ from django.conf import settings
 from django_pandas.io import read_frame
 
 from web_order.models import PlateMenuForPrint, PlatePackageForPrint, OutputSampleP7
+from web_order.pipeline_trace import PipelineTrace
+from web_order.plate_name_parser import PlateNameParser
 
 
 logger = logging.getLogger(__name__)
@@ -33,9 +35,7 @@ class P7Plate:
         self.date = dt.date(int(self.raw_date[:4]), int(self.raw_date[4:6]), int(self.raw_date[6:8]))
 
     def get_plate_name(self):
-        replaced = self.name.replace('▲', '')
-        replaced = replaced.replace('●', '')
-        return replaced
+        return PlateNameParser.remove_print_marks(self.name)
 
 
 class P7SourceFileReader:
@@ -206,8 +206,11 @@ class P7SourceFileReader:
         return invalid_plate_list
 
 class P7CsvFileWriter:
-    def __init__(self):
-        pass
+    def __init__(self, trace_level: str = None):
+        """
+        trace_level: 中間ファイル(tmp/Plate-*.csv)の出力レベル。Noneの場合は設定値PIPELINE_TRACE_LEVEL
+        """
+        self.trace_level = trace_level
 
     def get_plate_number(self, menu, cooking_day, index, type_name):
         """
@@ -290,6 +293,10 @@ class P7CsvFileWriter:
         """
         P7対応のCSVファイルを出力する
         """
+        with PipelineTrace('p7', self.trace_level) as trace:
+            return self._write_csv(cooking_day, trace)
+
+    def _write_csv(self, cooking_day, trace):
         logger.info('●P7-CSVファイル出力開始')
         logger.info(f'出力対象製造日={cooking_day}')
 
@@ -298,7 +305,7 @@ class P7CsvFileWriter:
         package_first = package_qs.filter(is_basic_plate=True).first()
         package_df = read_frame(package_qs)
         basic_package_df = package_df[package_df.is_basic_plate == True]
-        basic_package_df.to_csv("tmp/Plate-0.csv", index=False)
+        trace.dump('Plate-0', basic_package_df, "tmp/Plate-0.csv", quantity_column='count', index=False)
 
         # 献立情報取得のため、対象製造日に紐づく喫食委、食事区分を判断
         distinct_qs = PlatePackageForPrint.objects.filter(
@@ -316,7 +323,7 @@ class P7CsvFileWriter:
         qs = PlateMenuForPrint.objects.filter(
             eating_day__in=eating_day_list, type_name__in=['通常', 'アレルギー']).order_by('eating_day', 'meal_name', 'index')
         plate_menu_df = read_frame(qs)
-        plate_menu_df.to_csv("tmp/Plate-1.csv", index=False)
+        trace.dump('Plate-1', plate_menu_df, "tmp/Plate-1.csv", quantity_column='count', index=False)
 
         # id列を削除
         plate_menu_no_id_df = plate_menu_df.drop(columns=plate_menu_df.columns[[0,]])
@@ -334,7 +341,7 @@ class P7CsvFileWriter:
                     delete_index_list.append(index)
 
         plate_menu_no_id_df = plate_menu_no_id_df.drop(plate_menu_no_id_df.index[delete_index_list]).reset_index()
-        plate_menu_no_id_df.to_csv("tmp/Plate-1_1.csv", index=False)
+        trace.dump('Plate-1_1', plate_menu_no_id_df, "tmp/Plate-1_1.csv", quantity_column='count', index=False)
 
         menu_first = plate_menu_no_id_df.iloc[0]
         is_same_eating_time = \
@@ -346,12 +353,12 @@ class P7CsvFileWriter:
             menu_first_df = plate_menu_no_id_df[
                 (plate_menu_no_id_df.eating_day == package_first.eating_day) & (plate_menu_no_id_df.type_name == '通常') &
                 (plate_menu_no_id_df.meal_name == package_first.meal_name) & (plate_menu_no_id_df.menu_name == '常食')]
-            menu_first_df.to_csv("tmp/Plate-1_1_menu.csv", index=False)
+            trace.dump('Plate-1_1_menu', menu_first_df, "tmp/Plate-1_1_menu.csv", quantity_column='count', index=False)
 
             package_first_df = basic_package_df[
                 (basic_package_df.eating_day == package_first.eating_day) &
                 (basic_package_df.meal_name == package_first.meal_name) & (basic_package_df.menu_name == '常食')]
-            package_first_df.to_csv("tmp/Plate-1_1_pack.csv", index=False)
+            trace.dump('Plate-1_1_pack', package_first_df, "tmp/Plate-1_1_pack.csv", quantity_column='count', index=False)
 
             prev_delete_index_list = self.adjust_index(
                 menu_first_df, package_first_df, plate_menu_no_id_df,
@@ -361,12 +368,12 @@ class P7CsvFileWriter:
             menu_first_df = plate_menu_no_id_df[
                 (plate_menu_no_id_df.eating_day == package_first.eating_day) & (plate_menu_no_id_df.type_name == '通常') &
                 (plate_menu_no_id_df.meal_name == package_first.meal_name) & (plate_menu_no_id_df.menu_name == 'ソフト')]
-            menu_first_df.to_csv("tmp/Plate-1_1E_menu.csv", index=False)
+            trace.dump('Plate-1_1E_menu', menu_first_df, "tmp/Plate-1_1E_menu.csv", quantity_column='count', index=False)
 
             package_first_df = basic_package_df[
                 (basic_package_df.eating_day == package_first.eating_day) &
                 (basic_package_df.meal_name == package_first.meal_name) & (basic_package_df.menu_name == 'ソフト')]
-            package_first_df.to_csv("tmp/Plate-1_1E_pack.csv", index=False)
+            trace.dump('Plate-1_1E_pack', package_first_df, "tmp/Plate-1_1E_pack.csv", quantity_column='count', index=False)
 
             prev_delete_index_list += self.adjust_index(
                 menu_first_df, package_first_df, plate_menu_no_id_df,
@@ -428,7 +435,7 @@ class P7CsvFileWriter:
             if prev_delete_index_list:
                 plate_menu_no_id_df = plate_menu_no_id_df.drop(plate_menu_no_id_df.index[prev_delete_index_list])
 
-                plate_menu_no_id_df.to_csv("tmp/Plate-1_2.csv", index=False)
+                trace.dump('Plate-1_2', plate_menu_no_id_df, "tmp/Plate-1_2.csv", quantity_column='count', index=False)
         else:
             logger.info(f'package_first.eating_day:{package_first.eating_day}')
             logger.info(f'menu_first_eating_day:{menu_first["eating_day"]}')
@@ -436,10 +443,10 @@ class P7CsvFileWriter:
             logger.info(f'menu_first_meal_name:{menu_first["meal_name"]}')
 
         # 献立と袋数情報の結合
-        basic_package_df.to_csv("tmp/Plate-1_3_p.csv", index=False)
+        trace.dump('Plate-1_3_p', basic_package_df, "tmp/Plate-1_3_p.csv", quantity_column='count', index=False)
         merged_df = pd.merge(plate_menu_no_id_df, basic_package_df, on=['eating_day', 'index', 'meal_name', 'menu_name'], how='left')
         merged_df.fillna(0)
-        merged_df.to_csv("tmp/Plate-1_3.csv", index=False)
+        trace.dump('Plate-1_3', merged_df, "tmp/Plate-1_3.csv", quantity_column='count', index=False)
 
         # 製造日再設定
         for index, data in merged_df.iterrows():
@@ -453,7 +460,7 @@ class P7CsvFileWriter:
                     d_indexes.append(index)
         if d_indexes:
             merged_df = merged_df.drop(merged_df.index[d_indexes])
-        merged_df.to_csv("tmp/Plate-1_3_a.csv", index=False)
+        trace.dump('Plate-1_3_a', merged_df, "tmp/Plate-1_3_a.csv", quantity_column='count', index=False)
 
         # アレルギーの袋数の修正
         prev_c_day = None
@@ -491,7 +498,7 @@ class P7CsvFileWriter:
                 merged_df.loc[index, 'count_one_p'] = 0
                 merged_df.loc[index, 'count_one_50g'] = 0
 
-        merged_df.to_csv("tmp/Plate-2.csv", index=False)
+        trace.dump('Plate-2', merged_df, "tmp/Plate-2.csv", quantity_column='count', index=False)
 
         # ソート用の項目を追加
         for index, data in merged_df.iterrows():
@@ -535,13 +542,13 @@ class P7CsvFileWriter:
             else:
                 merged_df.loc[index, 'sort_2'] = '9'
 
-        merged_df.to_csv("tmp/Plate-2-0.csv", index=False)
+        trace.dump('Plate-2-0', merged_df, "tmp/Plate-2-0.csv", quantity_column='count', index=False)
 
         # level_0列を削除
         merged_df = merged_df.drop(columns=merged_df.columns[[0,]])
 
         merged_df2 = merged_df.sort_values(['sort_1', 'eating_day', 'sort_2', 'index']).reset_index()
-        merged_df2.to_csv("tmp/Plate-2-1.csv", index=False)
+        trace.dump('Plate-2-1', merged_df2, "tmp/Plate-2-1.csv", quantity_column='count', index=False)
 
         # 固定列の追加、番号の付与
         target = None
@@ -577,7 +584,7 @@ class P7CsvFileWriter:
 
         # 不要列の削除
         merged_df_converted = merged_df2.drop(columns=merged_df2.columns[[0, 2, 3, 4, 12, 13, 14, 15, 16, 17, 21, 22, 23, 24]])
-        merged_df_converted.to_csv("tmp/Plate-3.csv", index=False)
+        trace.dump('Plate-3', merged_df_converted, "tmp/Plate-3.csv", quantity_column='count', index=False)
 
         for index, data in merged_df_converted.iterrows():
             merged_df_converted.loc[index, 'blank1'] = ''
@@ -587,7 +594,7 @@ class P7CsvFileWriter:
         reindex_df = merged_df_converted.reindex(
             columns=['number', 'name', 'notice', 'count', 'measure', 'additive', 'allergen', 'cal',
                      'protein', 'fat', 'carbohydrates', 'salt', 'blank1', 'count_one_p', 'count_one_50g', 'total'])
-        reindex_df.to_csv("tmp/Plate-4.csv", index=False)
+        trace.dump('Plate-4', reindex_df, "tmp/Plate-4.csv", quantity_column='count', index=False)
 
         # 味噌汁の抽出・集計(袋数(count)で集計)
         miso_soup_df = reindex_df[reindex_df.number.isin(miso_id_list)]
@@ -604,19 +611,19 @@ class P7CsvFileWriter:
         reindex_miso_soup_df = miso_soup_sum_df.reindex(
             columns=['number', 'name', 'notice', 'count', 'measure', 'additive', 'allergen', 'cal',
                      'protein', 'fat', 'carbohydrates', 'salt', 'blank1', 'count_one_p', 'count_one_50g', 'total'])
-        reindex_miso_soup_df.to_csv("tmp/Plate-5.csv", index=False)
+        trace.dump('Plate-5', reindex_miso_soup_df, "tmp/Plate-5.csv", quantity_column='count', index=False)
 
         append_df = reindex_miso_soup_df.append(['', '', '', '', ''])
         append_df = append_df.reindex(
             columns=['number', 'name', 'notice', 'count', 'measure', 'additive', 'allergen', 'cal',
                      'protein', 'fat', 'carbohydrates', 'salt', 'blank1', 'count_one_p', 'count_one_50g', 'total'])
-        append_df.to_csv("tmp/Plate-6.csv", index=False)
+        trace.dump('Plate-6', append_df, "tmp/Plate-6.csv", quantity_column='count', index=False)
 
         # 基本食(常食)の内容を出力
         without_miso_df = reindex_df[reindex_df.name != '味噌汁']
         basic_df = without_miso_df.query('number.str.startswith("10")', engine='python')
         append_df = append_df.append(basic_df)
-        append_df.to_csv("tmp/Plate-7.csv", index=False)
+        trace.dump('Plate-7', append_df, "tmp/Plate-7.csv", quantity_column='count', index=False)
 
         # ソフトの内容を出力
         append_df = append_df.append([''])
@@ -625,7 +632,7 @@ class P7CsvFileWriter:
             columns=['number', 'name', 'notice', 'count', 'measure', 'additive', 'allergen', 'cal',
                      'protein', 'fat', 'carbohydrates', 'salt', 'blank1', 'count_one_p', 'count_one_50g', 'total'])
         append_df = append_df.append(for_soft_df)
-        append_df.to_csv("tmp/Plate-8.csv", index=False)
+        trace.dump('Plate-8', append_df, "tmp/Plate-8.csv", quantity_column='count', index=False)
 
         # ゼリー
         append_df = append_df.append([''])
@@ -634,7 +641,7 @@ class P7CsvFileWriter:
             columns=['number', 'name', 'notice', 'count', 'measure', 'additive', 'allergen', 'cal',
                      'protein', 'fat', 'carbohydrates', 'salt', 'blank1', 'count_one_p', 'count_one_50g', 'total'])
         append_df = append_df.append(for_jelly_df)
-        append_df.to_csv("tmp/Plate-9.csv", index=False)
+        trace.dump('Plate-9', append_df, "tmp/Plate-9.csv", quantity_column='count', index=False)
 
         # ミキサー
         append_df = append_df.append([''])
@@ -643,7 +650,7 @@ class P7CsvFileWriter:
             columns=['number', 'name', 'notice', 'count', 'measure', 'additive', 'allergen', 'cal',
                      'protein', 'fat', 'carbohydrates', 'salt', 'blank1', 'count_one_p', 'count_one_50g', 'total'])
         append_df = append_df.append(for_mixer_df)
-        append_df.to_csv("tmp/Plate-A.csv", index=False)
+        trace.dump('Plate-A', append_df, "tmp/Plate-A.csv", quantity_column='count', index=False)
 
         # アレルギー
         append_df = append_df.append([''])
@@ -679,8 +686,8 @@ class P7CsvFileWriter:
             eating_day__in=eating_day_list, type_name='サンプル').order_by('id')
         if sample_qs.exists():
             sample_df = read_frame(sample_qs)
-            sample_df.to_csv("tmp/Plate-S.csv", index=False)
-            append_df.to_csv("tmp/Plate-B2.csv", index=False, encoding='cp932')
+            trace.dump('Plate-S', sample_df, "tmp/Plate-S.csv", quantity_column='count', index=False)
+            trace.dump('Plate-B2', append_df, "tmp/Plate-B2.csv", quantity_column='count', index=False, encoding='cp932')
 
             delete_index_list = []
             output_sample_list = []
@@ -762,7 +769,7 @@ class P7CsvFileWriter:
                 else:
                     sample_df.loc[index, 'sort_2'] = '9'
 
-            sample_df.to_csv("tmp/Plate-S2.csv", index=False, encoding='cp932')
+            trace.dump('Plate-S2', sample_df, "tmp/Plate-S2.csv", quantity_column='count', index=False, encoding='cp932')
 
             if len(sample_df):
                 sample_df = sample_df.sort_values(['sort_1', 'eating_day', 'sort_2', 'index']).reset_index()
@@ -793,7 +800,7 @@ class P7CsvFileWriter:
                     columns=['number', 'name', 'notice', 'count', 'measure', 'additive', 'allergen', 'cal',
                              'protein', 'fat', 'carbohydrates', 'salt', 'blank1', 'count_one_p', 'count_one_50g', 'total'])
 
-                sample_df.to_csv("tmp/Plate-S3.csv", index=False)
+                trace.dump('Plate-S3', sample_df, "tmp/Plate-S3.csv", quantity_column='count', index=False)
 
                 append_df = append_df.append([''])
                 sample_basic_df = sample_df.query('number.str.startswith("19")', engine='python')
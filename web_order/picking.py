@@ -8,33 +8,167 @@ import math
 import numpy as np
 import os
 import re
-
+import time
 import openpyxl as excel
+import pandas as pd
 from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.styles.borders import Border, Side
 from openpyxl.worksheet.pagebreak import Break
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q, Sum
+from django.utils import timezone
 from django.utils.functional import cached_property
 
-from .cooking_direction_plates import CookingDirectionPlatesManager, PlateNameAnalizeUtil
+from .cooking_calendar import CookingCalendar
+from .cooking_direction_plates import CookingDirectionPlateIndex, CookingDirectionPlatesManager, PlateNameAnalizeUtil
 from .meal import MealUtil
 from .models import RawPlatePackageMaster, UnitMaster, PickingRawPlatePackage, MealMaster, CookingDirectionPlate
-from .models import Order, MealDisplay, AllergenPlateRelations, UnitPackage, PackageMaster
+from .models import Order, MealDisplay, AllergenPlateRelations, UnitPackage, PackageMaster, TmpPlateNamePackage
 from .models import PickingResultRaw
+from .plate_name_parser import PlateNameParser
+from .process_pool import DatabaseProcessPool
+from .qr_assets import QrImageCache
 
 from web_order.cooking_direction_plates import PlateNameAnalizeUtil
 logger = logging.getLogger(__name__)
 
 
+class UnitPackageBuffer:
+    """
+    計量表出力で登録するピッキング指示書用袋数(UnitPackage・TmpPlateNamePackage)をメモリ上に保持し、
+    まとめて登録するクラス。製造日の袋数は出力前に全て削除されているため、登録済みの検索もメモリ上で行う。
+    """
+    # 文字列・日付のどちらでも指定されるため、文字列で比較する項目
+    DATE_FIELDS = ('cooking_day', 'eating_day')
+
+    def __init__(self):
+        # 出力中の料理の番号(複数プロセスの登録内容を、料理の順に並べ直すために使う)
+        self.sequence = 0
+        # (料理の番号, UnitPackage)のリスト(登録順)
+        self.unit_packages = []
+        # key:(料理名, 製造日, 袋サイズ, 献立種類)、value:TmpPlateNamePackage
+        self.tmp_plate_names = {}
+
+    def _is_match(self, unit_package, filters):
+        for key, value in filters.items():
+            if key in self.DATE_FIELDS:
+                if str(getattr(unit_package, key)) != str(value):
+                    return False
+            elif getattr(unit_package, key) != value:
+                return False
+        return True
+
+    def filter_unit_packages(self, exclude_unit_name=None, **filters):
+        return [x for _, x in self.unit_packages
+                if self._is_match(x, filters) and ((exclude_unit_name is None) or (x.unit_name != exclude_unit_name))]
+
+    def add_unit_package(self, unit_package):
+        self.unit_packages.append((self.sequence, unit_package))
+
+    def delete_unit_packages(self, menu_names, **filters):
+        self.unit_packages = [(seq, x) for seq, x in self.unit_packages
+                              if not (self._is_match(x, filters) and (x.menu_name in menu_names))]
+
+    def add_tmp_plate_name(self, plate_name, cooking_day, size, menu_name):
+        key = (plate_name, str(cooking_day), size, menu_name)
+        if not (key in self.tmp_plate_names):
+            self.tmp_plate_names[key] = TmpPlateNamePackage(
+                plate_name=plate_name, cooking_day=cooking_day, size=size, menu_name=menu_name)
+
+    def merge(self, buffers):
+        """
+        複数プロセスで保持した登録内容を、料理の順に並べて追加する
+        """
+        unit_packages = list(self.unit_packages)
+        for buffer in buffers:
+            unit_packages += buffer.unit_packages
+            for key, tmp_package in buffer.tmp_plate_names.items():
+                self.tmp_plate_names.setdefault(key, tmp_package)
+
+        # 同じ料理の袋数は同じプロセスで登録しているため、安定ソートで登録順を保つ
+        self.unit_packages = sorted(unit_packages, key=lambda x: x[0])
+
+    def save(self):
+        UnitPackage.objects.bulk_create([x for _, x in self.unit_packages], batch_size=1000)
+        TmpPlateNamePackage.objects.bulk_create(list(self.tmp_plate_names.values()), batch_size=1000)
+        logger.info(f'ピッキング指示書用袋数登録:袋数={len(self.unit_packages)},料理名={len(self.tmp_plate_names)}')
+
+
 class PlatePackageRegister:
+    # 設定されている場合、袋数をDBに登録せず、メモリ上に保持する
+    buffer = None
+    # バッファ使用中に参照する調理表献立・袋マスタ(登録の度にDBを検索しないよう、メモリ上に保持する)
+    plate_index = None
+    package_masters = {}
+
+    @classmethod
+    def set_buffer(cls, buffer: UnitPackageBuffer = None):
+        cls.buffer = buffer
+        cls.plate_index = None
+        cls.package_masters = {}
+
+    @classmethod
+    def _filter_unit_packages(cls, exclude_unit_name, **filters):
+        if cls.buffer:
+            return cls.buffer.filter_unit_packages(exclude_unit_name, **filters)
+        else:
+            return list(UnitPackage.objects.filter(**filters).exclude(unit_name=exclude_unit_name).order_by('id'))
+
+    @classmethod
+    def _save_unit_package(cls, unit_package, is_new: bool = True):
+        if not cls.buffer:
+            unit_package.save()
+        elif is_new:
+            cls.buffer.add_unit_package(unit_package)
+
+    @classmethod
+    def delete_unit_packages(cls, cooking_day, eating_day, meal_name, index, menu_names):
+        if cls.buffer:
+            cls.buffer.delete_unit_packages(
+                menu_names, cooking_day=cooking_day, eating_day=eating_day, meal_name=meal_name, index=index)
+        else:
+            UnitPackage.objects.filter(cooking_day=cooking_day, eating_day=eating_day, meal_name=meal_name,
+                                       index=index, menu_name__in=menu_names).delete()
+
+    @classmethod
+    def register_tmp_plate_name(cls, plate_name, cooking_day, size, menu_name):
+        if cls.buffer:
+            cls.buffer.add_tmp_plate_name(plate_name, cooking_day, size, menu_name)
+        else:
+            TmpPlateNamePackage.objects.get_or_create(
+                plate_name=plate_name,
+                cooking_day=cooking_day,
+                size=size,
+                menu_name=menu_name
+            )
+
     @classmethod
     def get_package_master(cls, name):
+        if cls.buffer and (name in cls.package_masters):
+            return cls.package_masters[name]
+
         qs = PackageMaster.objects.filter(name=name)
         if qs.exists():
-            return qs.first()
+            package_master = qs.first()
         else:
-            return None
+            package_master = None
+        if cls.buffer:
+            cls.package_masters[name] = package_master
+        return package_master
+
+    @classmethod
+    def _get_cooking_direction(cls, cooking_day, eating_day, meal_name, index, is_basic_plate):
+        if cls.buffer:
+            # 製造日の調理表献立をまとめて読み込み、メモリ上で検索する
+            if (not cls.plate_index) or (str(cls.plate_index.cooking_day) != str(cooking_day)):
+                cls.plate_index = CookingDirectionPlateIndex(cooking_day)
+            return cls.plate_index.get(eating_day, meal_name, index, is_basic_plate)
+        else:
+            return CookingDirectionPlate.objects.filter(
+                cooking_day=cooking_day, eating_day=eating_day, meal_name=meal_name, index=index,
+                is_basic_plate=is_basic_plate).order_by('id').first()
 
     @classmethod
     def register_unit_package(cls, cooking_day, eating_day, meal_name, index,
@@ -51,13 +185,11 @@ class PlatePackageRegister:
             logger.warning(f'package is none:{master_name}')
             return
 
-        cooking_direction_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, eating_day=eating_day,
-                                                                meal_name=meal_name, index=index, is_basic_plate=is_basic_plate)
-        if not cooking_direction_qs.exists():
+        cooking_direction = cls._get_cooking_direction(cooking_day, eating_day, meal_name, index, is_basic_plate)
+        if not cooking_direction:
             logger.warning(f'plate for cooking direction is none:{cooking_day}-{eating_day}-{meal_name}-{index}')
             return
 
-        cooking_direction = cooking_direction_qs.first()
         if is_soup_parts:
             if '◆' in cooking_direction.plate_name:
                 res = re.findall('具(\d+|\d+\.\d+)[g|ｇ]\s*\D液(\d+|\d+\.\d+)[g|ｇ]', cooking_direction.plate_name)
@@ -73,7 +205,8 @@ class PlatePackageRegister:
         # 個食の数値は、元のユニットに加算する
         if count and package_master:
             if '個食' in unit_name:
-                qs = UnitPackage.objects.filter(
+                qs = cls._filter_unit_packages(
+                    unit_name,
                     cooking_day=cooking_day,
                     unit_number=unit_number,
                     plate_name=cooking_direction.plate_name,
@@ -84,19 +217,17 @@ class PlatePackageRegister:
                     is_basic_plate=is_basic_plate,
                     mix_rice_type=mix_rice_type,
                     soup_type=soup_type
-                ).exclude(
-                    unit_name=unit_name
                 )
-                if qs.exists():
+                if qs:
                     # 「個食」でないユニットにパウチ数を加算。通常個食だけ注文はない
-                    up = qs.filter(package=package_master).first()
+                    up = next((x for x in qs if x.package_id == package_master.id), None)
                     if up:
                         # 対象のサイズの袋が存在する場合
                         up.count += count
-                        up.save()
+                        cls._save_unit_package(up, is_new=False)
                     else:
                         # 対象のサイズの袋が存在しない場合
-                        up = qs.first()
+                        up = qs[0]
 
                         # 対象の袋サイズでデータ登録
                         unit_package = UnitPackage(
@@ -114,7 +245,7 @@ class PlatePackageRegister:
                             mix_rice_type=mix_rice_type,
                             soup_type=soup_type
                         )
-                        unit_package.save()
+                        cls._save_unit_package(unit_package)
                 else:
                     logger.warning(f'{unit_name}のメイン側の袋情報未登録')
                     # 「個食」でないユニットにパウチ数を加算。通常個食だけ注文はない
@@ -134,7 +265,7 @@ class PlatePackageRegister:
                         mix_rice_type=mix_rice_type,
                         soup_type=soup_type
                     )
-                    unit_package.save()
+                    cls._save_unit_package(unit_package)
             else:
                 plate_name = f'{cooking_direction.plate_name}(ルー)' if is_curry_soup else cooking_direction.plate_name
                 if soup_type == 'soup' and ('具' in plate_name):
@@ -155,7 +286,7 @@ class PlatePackageRegister:
                         mix_rice_type=mix_rice_type,
                         soup_type=soup_type
                     )
-                    unit_package.save()
+                    cls._save_unit_package(unit_package)
 
 
 class RawPlatePackageRegisterBase:
@@ -352,6 +483,12 @@ class QrCodeUtil:
         day_str = str(day).zfill(2)
         return f'{qr_number}{meal_value}{picking_type_value}{day_str}'
 
+    @classmethod
+    def get_all_in_value_from_number_v2(cls, number: int, meal_value: str, day: int):
+        qr_number = str(number).zfill(3)
+        day_str = str(day).zfill(2)
+        return ''.join([f'{qr_number}{meal_value}{x}{day_str}' for x in ['01', '02', '03', '04']])
+
     @classmethod
     def get_transfer_value(cls, unit: UnitMaster, meal: str):
         number = str(unit.unit_number).zfill(3)
@@ -687,6 +824,8 @@ class PickingDirectionWriter:
     def __init__(self, chillers):
         self.chillers = chillers
         self.workbook = None
+        self.package_matrix = None
+        self.qr_cache = None
 
     def write(self, eating_day, meal_list, cooking_eating_dict):
         pass
@@ -694,19 +833,33 @@ class PickingDirectionWriter:
     def get_package_list(self, eating_day, meal, chiller):
         pass
 
+    def get_package_matrix(self, cooking_day):
+        """
+        製造日の注文数を取得する。読込済みの場合は、読み込んだ内容を使用する
+        """
+        if (not self.package_matrix) or (self.package_matrix.cooking_day != cooking_day):
+            self.package_matrix = PackageCountMatrix(cooking_day)
+        return self.package_matrix
+
     def get_plate_list(self, eating_day, meal):
         pass
 
     def write_excel(self):
         pass
 
-    def get_qr_image(self, unit: UnitMaster, meal_name, picking_type_value, day: int):
-        path = QrCodeUtil.get_imege_path_v2(unit, QrCodeUtil.convert_to_meal_value(meal_name), picking_type_value, day)
-        qr_image = excel.drawing.image.Image(path)
-        qr_image.width = 100
-        qr_image.height = 100
+    def get_qr_cache(self):
+        """
+        QRコード画像の保持内容を取得する。出力管理クラスから共有されていない場合は、書込クラス内で保持する
+        """
+        if not self.qr_cache:
+            self.qr_cache = QrImageCache()
+        return self.qr_cache
 
-        return qr_image
+    def get_qr_image(self, unit: UnitMaster, meal_name, picking_type_value, day: int):
+        meal_value = QrCodeUtil.convert_to_meal_value(meal_name)
+        qr_value = QrCodeUtil.get_value_v2(unit, meal_value, picking_type_value, day)
+        path = QrCodeUtil.get_imege_path_v2(unit, meal_value, picking_type_value, day)
+        return self.get_qr_cache().get_image(qr_value, path, 100, 100)
 
     def save(self, ws, cooking_day, type_name: str):
         output_dir = os.path.join(settings.OUTPUT_DIR, 'picking')
@@ -1036,12 +1189,10 @@ class BasicPickingDirectionWriter(PickingDirectionWriter):
         return False, None, None
 
     def get_qr_image_for_mix_rice_agg(self, meal_name, picking_type_value):
-        path = QrCodeUtil.get_imege_path_for_mix_rice_agg(QrCodeUtil.convert_to_meal_value(meal_name), picking_type_value)
-        qr_image = excel.drawing.image.Image(path)
-        qr_image.width = 100
-        qr_image.height = 100
-
-        return qr_image
+        meal_value = QrCodeUtil.convert_to_meal_value(meal_name)
+        qr_value = QrCodeUtil.get_value_from_number(4, meal_value, picking_type_value)
+        path = QrCodeUtil.get_imege_path_for_mix_rice_agg(meal_value, picking_type_value)
+        return self.get_qr_cache().get_image(qr_value, path, 100, 100)
 
     def write_mixrice_aggregate_unit(self, ws, meal, mix_rice_plates, unit_number, row, aggreate_unit_package, tmp_row, page_start_row):
         aup = [x for x in aggreate_unit_package.unit_package_list if (x is not None)]
@@ -1108,7 +1259,8 @@ class BasicPickingDirectionWriter(PickingDirectionWriter):
     def write(self, cooking_day, meal_list):
         logger.info('基本食のピッキング指示書を出力')
 
-        cooking_eating_dict = EatingManagement.get_meals_dict_by_cooking_day(cooking_day)
+        matrix = self.get_package_matrix(cooking_day)
+        cooking_eating_dict = matrix.get_meals_dict()
 
         for chiller in self.chillers:
             if chiller.no != self.chiller_no:
@@ -1182,12 +1334,8 @@ class BasicPickingDirectionWriter(PickingDirectionWriter):
                         unit_start_row = row
 
                         # 対象喫食日・食事区分にユニットの注文があるか確認
-                        unit_order_qs = Order.objects.filter(
-                            eating_day=eating_day, meal_name__meal_name=meal, quantity__gt=0,
-                            unit_name=unit
-                        )
                         is_kizawa_special = False
-                        if not unit_order_qs.exists():
+                        if not matrix.has_order(unit.id, eating_day, meal):
                             logger.info(f'注文無し：{unit.unit_number}-{eating_day}-{meal}')
 
                             # 自ユニットの注文は0でも、混ぜご飯集約の対象の可能性があるので、チェック
@@ -1230,7 +1378,7 @@ class BasicPickingDirectionWriter(PickingDirectionWriter):
 
                             # ユニットの注文がないならこれ以上の処理は不要
                             if unit.unit_number == 31:
-                                if Order.objects.filter(eating_day=eating_day, meal_name__meal_name=meal, quantity__gt=0, unit_name__unit_number=unit.unit_number).exclude(unit_name=unit).exists():
+                                if matrix.has_other_unit_order(unit, eating_day, meal):
                                     logger.info(f'木沢個特別対応')
                                     is_kizawa_special = True
                                 else:
@@ -1242,7 +1390,7 @@ class BasicPickingDirectionWriter(PickingDirectionWriter):
                         if is_kizawa_special:
                             is_only_allergen = False
                         else:
-                            is_only_allergen = (not unit_order_qs.filter(allergen__allergen_name='なし').exists())
+                            is_only_allergen = (not matrix.has_order(unit.id, eating_day, meal, allergen_name='なし'))
 
                         # 袋数情報の取得
                         unit_pacage_qs = UnitPackage.objects.filter(
@@ -1728,7 +1876,8 @@ class EngePickingDirectionWriter(PickingDirectionWriter):
 
         # 全体まとめて出力->種類ごと(基本食はさらにチラー毎)に出力になったため、個別でworkbookを扱う
         self.open_workbook()
-        cooking_eating_dict = EatingManagement.get_meals_dict_by_cooking_day(cooking_day)
+        matrix = self.get_package_matrix(cooking_day)
+        cooking_eating_dict = matrix.get_meals_dict()
 
         break_list = []
         row = 3
@@ -1775,7 +1924,7 @@ class EngePickingDirectionWriter(PickingDirectionWriter):
                         eating_day=eating_day, meal_name__meal_name=meal, quantity__gt=0,
                         unit_name=unit, menu_name__menu_name__in=self.ENGE_MENU_NAME_LIST
                     )
-                    if not unit_order_qs.exists():
+                    if not matrix.has_order(unit.id, eating_day, meal, menu_names=self.ENGE_MENU_NAME_LIST):
                         logger.debug(f'嚥下注文無し：{unit.unit_number}-{eating_day}-{meal}')
                         continue
 
@@ -1802,13 +1951,13 @@ class EngePickingDirectionWriter(PickingDirectionWriter):
 
                         # 汁なしの施設に汁の料理を表示しないように対応
                         if plate.is_soup and (not '具' in plate.plate_name):
-                            if unit_order_qs.filter(meal_name__soup=True).exists():
+                            if matrix.has_order(unit.id, eating_day, meal, menu_names=self.ENGE_MENU_NAME_LIST, soup=True):
                                 pass
                             else:
                                 continue
 
                         for enge_menu in self.ENGE_MENU_NAME_LIST:
-                            if unit_order_qs.filter(menu_name__menu_name=enge_menu).exists():
+                            if matrix.has_order(unit.id, eating_day, meal, menu_names=[enge_menu]):
                                 plate_unit_package = self.get_unit_package(plate.index, unit_package_list)
                                 is_add_row = self.write_plate(ws, row, plate, enge_menu, plate_unit_package, eating_day, unit)
                                 if is_add_row:
@@ -2076,7 +2225,8 @@ class SoupPickingDirectionWriter(PickingDirectionWriter):
 
         # 全体まとめて出力->種類ごと(基本食はさらにチラー毎)に出力になったため、個別でworkbookを扱う
         self.open_workbook()
-        cooking_eating_dict = EatingManagement.get_meals_dict_by_cooking_day(cooking_day)
+        matrix = self.get_package_matrix(cooking_day)
+        cooking_eating_dict = matrix.get_meals_dict()
 
         break_list = []
         row = 3
@@ -2117,7 +2267,7 @@ class SoupPickingDirectionWriter(PickingDirectionWriter):
                         eating_day=eating_day, meal_name__meal_name=meal, quantity__gt=0,
                         unit_name=unit, meal_name__filling=True
                     )
-                    if not unit_order_qs.exists():
+                    if not matrix.has_order(unit.id, eating_day, meal, filling=True):
                         logger.debug(f'汁・汁具注文無し：{unit.unit_number}-{eating_day}-{meal}')
                         continue
 
@@ -2144,7 +2294,7 @@ class SoupPickingDirectionWriter(PickingDirectionWriter):
                     # 料理の出力
                     for plate in meal_plats_qs:
                         if PlateNameAnalizeUtil.is_soup_liquid(plate.plate_name):
-                            if not unit_order_qs.filter(meal_name__soup=True).exists():
+                            if not matrix.has_order(unit.id, eating_day, meal, soup=True, filling=True):
                                 # スープの注文がないユニットには、スープ・汁の料理は出さない
                                 continue
                         plate_unit_package = self.get_unit_package(plate.index, unit_package_list)
@@ -2266,7 +2416,7 @@ class RawPlatePickingDirectionWriter(PickingDirectionWriter):
 
         word_index = converted.find('原体')
         search_name = converted[:word_index]
-        res = re.findall('(\D+)(\d|\s)+', search_name)
+        res = PlateNameParser.find_name_parts(search_name)
 
         base_name = res[0][0]
         if ('(' in base_name) or ('（' in base_name):
@@ -2386,7 +2536,8 @@ class RawPlatePickingDirectionWriter(PickingDirectionWriter):
 
         # 全体まとめて出力->種類ごと(基本食はさらにチラー毎)に出力になったため、個別でworkbookを扱う
         self.open_workbook()
-        cooking_eating_dict = EatingManagement.get_meals_dict_by_cooking_day(cooking_day)
+        matrix = self.get_package_matrix(cooking_day)
+        cooking_eating_dict = matrix.get_meals_dict()
 
         break_list = []
         row = 3
@@ -2448,11 +2599,7 @@ class RawPlatePickingDirectionWriter(PickingDirectionWriter):
                     unit_start_row = row
 
                     # 対象喫食日・食事区分にユニットの注文があるか確認
-                    unit_order_qs = Order.objects.filter(
-                        eating_day=eating_day, meal_name__meal_name=meal, quantity__gt=0,
-                        unit_name=unit,
-                    ).select_related('menu_name')
-                    if not unit_order_qs.exists():
+                    if not matrix.has_order(unit.id, eating_day, meal):
                         logger.debug(f'原体注文無し：{unit.unit_number}.{unit.unit_name}-{eating_day}-{meal}')
                         continue
 
@@ -2463,11 +2610,8 @@ class RawPlatePickingDirectionWriter(PickingDirectionWriter):
 
                     # 嚥下製造対象のみ、かつ献立種類が嚥下のみなら出力しない
                     if has_raw_enge_only:
-                        basic_menu_list = [x for x in unit_order_qs if x.menu_name.menu_name == '常食']
-                        if not basic_menu_list:
+                        if not matrix.has_order(unit.id, eating_day, meal, menu_names=['常食']):
                             logger.info(f'嚥下製造対象-基本食なし：{unit.unit_number}-{eating_day}-{meal}')
-                            basic_menu_list.clear()
-                            del basic_menu_list
                             continue
 
                     if (unit.unit_number, unit.calc_name) in write_list:
@@ -2578,15 +2722,42 @@ class RawPlatePickingDirectionWriter(PickingDirectionWriter):
         self.save(ws, cooking_day, '原体')
 
 
+def write_picking_direction(cooking_day, chillers, picking_type: str, package_matrix):
+    """
+    1種類(基本食はチラー毎)のピッキング指示書を出力し、処理時間とQRコード画像の読込結果を返す。
+    プロセスプールから呼び出すため、モジュールの関数として定義する
+    """
+    management = PickingDirectionOutputManagement(cooking_day, chillers)
+    management.package_matrix = package_matrix
+    management._write_serial([picking_type])
+
+    qr_cache = management.qr_cache
+    return picking_type, management.timings[picking_type], (qr_cache.request_count, qr_cache.load_count)
+
+
 class PickingDirectionOutputManagement:
     """
     ピッキング指示書出力管理クラス
     """
+    # 全ての種類を出力する場合の種類の値と、出力する種類(基本食はチラー毎)
+    PICKING_TYPE_ALL = '00'
+    PICKING_TYPES = ['011', '012', '013', '014', '02', '03', '04']
+
     def __init__(self, cooking_day, chillers):
         self.cooking_day = cooking_day
         self.meal_list = MealUtil.get_name_list_without_snak()
         self.chillers = chillers
 
+        # 製造日の注文数(種類間で共有する)
+        self.package_matrix = None
+
+        # QRコード画像の保持内容(種類間で共有する)
+        self.qr_cache = QrImageCache()
+
+        # key:種類、value:処理時間(秒)
+        self.timings = {}
+        self.elapsed_seconds = 0.0
+
     def _get_writer(self, picking_type: str):
         if picking_type == '011':
             return BasicPickingDirectionWriter(self.chillers, 1)
@@ -2603,71 +2774,345 @@ class PickingDirectionOutputManagement:
         elif picking_type == '04':
             return RawPlatePickingDirectionWriter(self.chillers)
 
-    def write_directions(self, picking_type: str):
+    def get_picking_types(self, picking_type: str):
+        if picking_type == self.PICKING_TYPE_ALL:
+            return self.PICKING_TYPES
+        elif picking_type in self.PICKING_TYPES:
+            return [picking_type]
+        else:
+            return []
+
+    def get_package_matrix(self):
+        if not self.package_matrix:
+            self.package_matrix = PackageCountMatrix(self.cooking_day)
+        return self.package_matrix
+
+    def _write_serial(self, picking_types):
+        for picking_type in picking_types:
+            start = time.perf_counter()
+            writer = self._get_writer(picking_type)
+            writer.package_matrix = self.get_package_matrix()
+            writer.qr_cache = self.qr_cache
+            writer.write(self.cooking_day, self.meal_list)
+            self.timings[picking_type] = time.perf_counter() - start
+            logger.info(f'帳票出力完了(ピッキング指示書)-{self.cooking_day}製造-({picking_type})')
+        logger.info(f'QRコード画像:{self.qr_cache}')
+
+    def _write_parallel(self, picking_types, processes: int):
+        # 注文数等の共有データは親プロセスで読み込み、各プロセスに渡す
+        package_matrix = self.get_package_matrix()
+        package_matrix.preload()
+
+        request_count = load_count = 0
+        with DatabaseProcessPool.create(processes) as executor:
+            futures = [executor.submit(write_picking_direction, self.cooking_day, self.chillers, x, package_matrix)
+                       for x in picking_types]
+            for future in futures:
+                picking_type, seconds, qr_counts = future.result()
+                self.timings[picking_type] = seconds
+                request_count += qr_counts[0]
+                load_count += qr_counts[1]
+                logger.info(f'帳票出力完了(ピッキング指示書)-{self.cooking_day}製造-({picking_type})')
+        logger.info(f'QRコード画像:要求={request_count},読込={load_count},読込省略={request_count - load_count}')
+
+    def write_directions(self, picking_type: str, processes: int = None):
         """
         対象製造日のピッキング指示書を出力
+        processes: 同時に出力するプロセス数(省略時は設定値PICKING_DIRECTION_PROCESSES。1の場合はプロセスを分けない)
         """
-        writer = self._get_writer(picking_type)
-        if writer:
-            writer.write(self.cooking_day, self.meal_list)
-            logger.info(f'帳票出力完了(ピッキング指示書)-{self.cooking_day}製造-({picking_type})')
+        picking_types = self.get_picking_types(picking_type)
+        if not picking_types:
+            return False
 
-            return True
+        processes = min(processes or settings.PICKING_DIRECTION_PROCESSES, len(picking_types))
+        if (processes > 1) and not DatabaseProcessPool.is_available():
+            # 子プロセスからはトランザクション内の未コミットの内容を参照できないため、プロセスを分けずに出力する
+            logger.warning('トランザクション内のため、ピッキング指示書を1プロセスで出力します')
+            processes = 1
 
-        return False
+        start = time.perf_counter()
+        if processes > 1:
+            self._write_parallel(picking_types, processes)
+        else:
+            self._write_serial(picking_types)
+        self.elapsed_seconds = time.perf_counter() - start
+
+        timings = ','.join([f'{key}={value:.2f}' for key, value in self.timings.items()])
+        logger.info(f'ピッキング指示書出力:製造日={self.cooking_day},プロセス数={processes},'
+                    f'処理時間={self.elapsed_seconds:.2f}秒({timings})')
+        return True
 
 
 class EatingManagement:
     """
-    喫食日情報を管理するクラス
+    喫食日情報を管理するクラス(製造日と喫食日の対応は、CookingCalendarで保持した内容を使用する)
     """
     @classmethod
     def get_dict_by_cooking_day(cls, cooking_day):
         """
         製造日に作成する喫食日・食事区分のdict(key:食事区分、value:喫食日リスト)を返す。
         """
-        distinct_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day).distinct().values_list('eating_day', 'meal_name')
-        eating_day_dict = {'朝食': [], '昼食': [], '夕食': []}
-        for x in distinct_qs:
-            eating_day = x[0]
-            meal_name = x[1]
-            eating_day_dict[meal_name].append(eating_day)
-
-        return eating_day_dict
+        return CookingCalendar.get().get_dict_by_cooking_day(cooking_day)
 
     @classmethod
     def get_meals_dict_by_cooking_day(cls, cooking_day):
         """
         製造日に作成する喫食日・食事区分のdict(key:喫食日、value:食事区分リスト)を返す。
         """
-        distinct_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day).distinct().values_list('eating_day', 'meal_name')
-        meal_dict = {}
-        for x in distinct_qs:
-            eating_day = x[0]
-            meal_name = x[1]
-            if eating_day in meal_dict:
-                meal_dict[eating_day].append(meal_name)
-            else:
-                meal_dict[eating_day] = [meal_name,]
-
-        return meal_dict
+        return CookingCalendar.get().get_meals_dict_by_cooking_day(cooking_day)
 
     @classmethod
     def get_meal_dict_by_cooking_day(cls, cooking_day):
+        """
+        製造日に作成する喫食日のリスト(昇順)を返す。
+        """
+        return CookingCalendar.get().get_eating_days(cooking_day)
+
+
+class PackageCountMatrix:
+    """
+    製造日の注文数を、施設(呼出番号)・喫食日・食事区分・中袋種類毎に保持するクラス。
+    注文(Order)・袋数(UnitPackage)・料理(CookingDirectionPlate)は、それぞれ1回の集計クエリで読み込み、
+    ピッキング指示書の出力・中袋数の計算では、読み込んだ内容を参照する。
+    """
+    BASIC_MENU_NAME = '常食'
+    ENGE_MENU_NAME_LIST = ['ソフト', 'ゼリー', 'ミキサー']
+
+    # 中袋種類
+    PICKING_TYPE_BASIC = '01'
+    PICKING_TYPE_ENGE = '02'
+
+    def __init__(self, cooking_day, eating_days=None):
+        self.cooking_day = cooking_day
+
+        # 製造日の料理(喫食日, 食事区分, 料理名, 汁かどうか, 混ぜご飯かどうか)
+        self.plates = list(CookingDirectionPlate.objects.filter(cooking_day=cooking_day).values_list(
+            'eating_day', 'meal_name', 'plate_name', 'is_soup', 'is_mix_rice').order_by('id'))
+        self.eating_days = sorted({x[0] for x in self.plates} | set(eating_days or []))
+
+        # key:(呼出番号, 喫食日, 食事区分, 中袋種類)、value:注文数
+        self.order_counts = {}
+        # key:(ユニットID, 喫食日, 食事区分)、value:注文のある(献立種類, アレルギー名, 汁, 汁具)のset
+        self.unit_orders = {}
+        # key:(呼出番号, 喫食日, 食事区分)、value:注文のあるユニットIDのset
+        self.number_units = {}
+        # key:(呼出番号, 喫食日, 食事区分)、value:(最初の注文のID, 汁, 汁具)
+        self.first_orders = {}
+        self._load_orders()
+
+        # key:(呼出番号, 食事区分)、value:袋数のある献立種類のset
+        self.package_menus = {}
+        # key:食事区分、value:袋数のある喫食日のset
+        self.package_eating_days = {}
+        self._load_packages()
+
+        self._user_meals = None
+        self._user_filling_quantities = {}
+
+    def get_meals_dict(self):
         """
         製造日に作成する喫食日・食事区分のdict(key:喫食日、value:食事区分リスト)を返す。
+        EatingManagement.get_meals_dict_by_cooking_dayと同じ内容を、読込済みの料理から作成する
         """
-        distinct_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day).distinct().values_list('eating_day', 'meal_name')
         meal_dict = {}
-        for x in distinct_qs:
-            eating_day = x[0]
-            meal_name = x[1]
-            if eating_day in meal_dict:
-                meal_dict[eating_day].append(meal_name)
+        for eating_day, meal_name, _, _, _ in self.plates:
+            meal_list = meal_dict.setdefault(eating_day, [])
+            if not (meal_name in meal_list):
+                meal_list.append(meal_name)
+        return meal_dict
+
+    def preload(self):
+        """
+        必要になった時点で読み込む内容を、全て読み込む(別プロセスに渡す前に使用する)
+        """
+        self.raw_plate_masters
+        self._first_units
+        if self._user_meals is None:
+            self._load_user_meals()
+
+    @classmethod
+    def get_picking_type(cls, menu_name: str):
+        if menu_name == cls.BASIC_MENU_NAME:
+            return cls.PICKING_TYPE_BASIC
+        elif menu_name in cls.ENGE_MENU_NAME_LIST:
+            return cls.PICKING_TYPE_ENGE
+        else:
+            return None
+
+    @classmethod
+    def is_miso_soup_name(cls, name: str):
+        return ('みそ汁' in name) or ('味噌汁' in name) or ('みそしる' in name)
+
+    def _load_orders(self):
+        qs = Order.objects.filter(eating_day__in=self.eating_days).values(
+            'unit_name_id', 'unit_name__unit_number', 'eating_day', 'meal_name__meal_name',
+            'meal_name__soup', 'meal_name__filling', 'menu_name__menu_name', 'allergen__allergen_name'
+        ).annotate(quantity_sum=Sum('quantity'), first_id=Min('id')).order_by()
+        for x in qs:
+            key = (x['unit_name__unit_number'], x['eating_day'], x['meal_name__meal_name'])
+
+            # 食数0の注文も含めて、最初に登録された注文を保持する
+            first = self.first_orders.get(key, None)
+            if (not first) or (x['first_id'] < first[0]):
+                self.first_orders[key] = (x['first_id'], x['meal_name__soup'], x['meal_name__filling'])
+
+            quantity = x['quantity_sum'] or 0
+            if quantity <= 0:
+                continue
+
+            unit_key = (x['unit_name_id'], x['eating_day'], x['meal_name__meal_name'])
+            self.unit_orders.setdefault(unit_key, set()).add(
+                (x['menu_name__menu_name'], x['allergen__allergen_name'], x['meal_name__soup'], x['meal_name__filling']))
+            self.number_units.setdefault(key, set()).add(x['unit_name_id'])
+
+            picking_type = self.get_picking_type(x['menu_name__menu_name'])
+            if picking_type:
+                count_key = key + (picking_type,)
+                self.order_counts[count_key] = self.order_counts.get(count_key, 0) + quantity
+
+    def _load_packages(self):
+        qs = UnitPackage.objects.filter(cooking_day=self.cooking_day, count__gt=0).values(
+            'unit_number', 'eating_day', 'meal_name', 'menu_name').distinct().order_by()
+        for x in qs:
+            self.package_menus.setdefault((x['unit_number'], x['meal_name']), set()).add(x['menu_name'])
+            self.package_eating_days.setdefault(x['meal_name'], set()).add(x['eating_day'])
+
+    def get_order_count(self, unit_number: int, eating_days, meal_name: str, picking_type: str):
+        """
+        施設(呼出番号)の、喫食日(複数指定可)・食事区分・中袋種類(基本食・嚥下)の注文数を取得する
+        """
+        return sum([self.order_counts.get((unit_number, x, meal_name, picking_type), 0) for x in eating_days])
+
+    def has_order(self, unit_id: int, eating_day, meal_name: str,
+                  menu_names=None, allergen_name=None, soup=None, filling=None):
+        """
+        ユニットの喫食日・食事区分に、条件に合う注文(食数1以上)があるかどうか
+        """
+        for menu_name, order_allergen_name, order_soup, order_filling in \
+                self.unit_orders.get((unit_id, eating_day, meal_name), ()):
+            if (menu_names is not None) and (menu_name not in menu_names):
+                continue
+            if (allergen_name is not None) and (order_allergen_name != allergen_name):
+                continue
+            if (soup is not None) and (order_soup != soup):
+                continue
+            if (filling is not None) and (order_filling != filling):
+                continue
+            return True
+        return False
+
+    def has_other_unit_order(self, unit, eating_day, meal_name: str):
+        """
+        同じ呼出番号の他のユニットに、喫食日・食事区分の注文(食数1以上)があるかどうか
+        """
+        unit_ids = self.number_units.get((unit.unit_number, eating_day, meal_name), set())
+        return bool(unit_ids - {unit.id})
+
+    def get_first_order_flags(self, unit_number: int, eating_days, meal_name: str):
+        """
+        施設の喫食日(複数指定可)・食事区分の最初の注文の、汁・汁具の有無を取得する。注文がない場合はNone
+        """
+        orders = [self.first_orders[key] for key in [(unit_number, x, meal_name) for x in eating_days]
+                  if key in self.first_orders]
+        if orders:
+            first = min(orders)
+            return first[1], first[2]
+        else:
+            return None
+
+    def get_plates(self, meal_name: str, eating_day=None):
+        return [x for x in self.plates if (x[1] == meal_name) and ((eating_day is None) or (x[0] == eating_day))]
+
+    def has_mix_rice(self, meal_name: str, eating_day=None):
+        return any([x[4] for x in self.get_plates(meal_name, eating_day)])
+
+    def has_soup(self, meal_name: str, eating_day=None):
+        return any([x[3] for x in self.get_plates(meal_name, eating_day)])
+
+    def has_miso_soup(self, meal_name: str, eating_day=None):
+        return any([x[3] and self.is_miso_soup_name(x[2]) for x in self.get_plates(meal_name, eating_day)])
+
+    def get_raw_plate_names(self, meal_name: str, eating_day=None):
+        """
+        原体送りの料理名(汁以外)を取得する
+        """
+        return [x[2] for x in self.get_plates(meal_name, eating_day) if (not x[3]) and ('原体' in x[2])]
+
+    @cached_property
+    def raw_plate_masters(self):
+        return list(RawPlatePackageMaster.objects.all())
+
+    def find_raw_plate_master(self, plate_name: str):
+        for raw_plate in self.raw_plate_masters:
+            if raw_plate.base_name in plate_name:
+                return raw_plate
+
+        # 見つからなかった場合
+        return None
+
+    @cached_property
+    def _first_units(self):
+        units = {}
+        for unit in UnitMaster.objects.filter(unit_number__isnull=False).select_related('username').order_by('id'):
+            units.setdefault(unit.unit_number, unit)
+            units.setdefault((unit.unit_number, unit.short_name), unit)
+        return units
+
+    def get_first_unit(self, unit_number: int, short_name=False):
+        """
+        呼出番号の最初のユニットを取得する。short_nameを指定した場合は、省略名称の一致するユニットから取得する
+        """
+        if short_name is False:
+            return self._first_units.get(unit_number, None)
+        else:
+            return self._first_units.get((unit_number, short_name), None)
+
+    def _load_user_meals(self):
+        # 契約内容変更により、顧客別～の設定値と実際の注文の食事区分が異なる場合があるため、全期間の注文から取得する
+        qs = Order.objects.filter(Q(meal_name__soup=True) | Q(meal_name__filling=True)).values(
+            'unit_name__username_id', 'meal_name__meal_name', 'meal_name__soup', 'meal_name__filling'
+        ).annotate(first_positive_id=Min('id', filter=Q(quantity__gt=0))).order_by()
+
+        user_meals = {}
+        for x in qs:
+            key = (x['unit_name__username_id'], x['meal_name__meal_name'])
+            user_meals.setdefault(key, []).append(
+                (x['meal_name__soup'], x['meal_name__filling'], x['first_positive_id']))
+        self._user_meals = user_meals
+
+    def has_user_meal(self, username, meal_name: str, soup: bool, filling=None):
+        """
+        施設が、汁・汁具の条件に合う食事区分の注文をしたことがあるかどうか
+        """
+        if self._user_meals is None:
+            self._load_user_meals()
+
+        for order_soup, order_filling, _ in self._user_meals.get((username, meal_name), []):
+            if (order_soup == soup) and ((filling is None) or (order_filling == filling)):
+                return True
+        return False
+
+    def get_user_filling_quantity(self, username, meal_name: str):
+        """
+        施設の具のみの食事区分の、最初の注文(食数1以上)の食数を取得する。注文がない場合はNone
+        """
+        if self._user_meals is None:
+            self._load_user_meals()
+
+        key = (username, meal_name)
+        if key not in self._user_filling_quantities:
+            ids = [x[2] for x in self._user_meals.get(key, []) if (not x[0]) and x[1] and x[2]]
+            if ids:
+                self._user_filling_quantities[key] = Order.objects.get(id=min(ids)).quantity
             else:
-                meal_dict[eating_day] = [meal_name,]
+                self._user_filling_quantities[key] = None
+        return self._user_filling_quantities[key]
 
-        return sorted([key for key in meal_dict.keys()])
+    def get_package_menus(self, unit_number: int, meal_name: str):
+        """
+        施設の食事区分で、袋数のある献立種類を取得する
+        """
+        return self.package_menus.get((unit_number, meal_name), set())
 
 
 class InnerPackageManagement:
@@ -2680,18 +3125,31 @@ class InnerPackageManagement:
     # 中袋1枚に収納可能な注文数(汁・汁具)
     ORDER_COUNT_PER_SOUP_PACKAGE = 90
 
-    def __init__(self, cooking_eating_dict):
+    def __init__(self, cooking_eating_dict, package_matrix=None):
         self.cooking_eating_dict = cooking_eating_dict
+        self.package_matrix = package_matrix
+
+    def _get_eating_days(self):
+        eating_days = set()
+        for key, value in self.cooking_eating_dict.items():
+            if isinstance(key, str):
+                # key:食事区分、value:喫食日リストの場合
+                eating_days.update(value)
+            else:
+                # key:喫食日、value:食事区分リストの場合
+                eating_days.add(key)
+        return eating_days
+
+    def get_package_matrix(self, cooking_day):
+        """
+        製造日の注文数を取得する。読込済みの場合は、読み込んだ内容を使用する
+        """
+        if (not self.package_matrix) or (self.package_matrix.cooking_day != cooking_day):
+            self.package_matrix = PackageCountMatrix(cooking_day, self._get_eating_days())
+        return self.package_matrix
 
     def _is_miso_soup(self, name: str):
-        if 'みそ汁' in name:
-            return True
-        elif '味噌汁' in name:
-            return True
-        elif 'みそしる' in name:
-            return True
-        else:
-            return False
+        return PlateNameAnalizeUtil.is_miso_soup(name)
 
     def _is_raw_plate(self, plate):
         """
@@ -2700,14 +3158,10 @@ class InnerPackageManagement:
         return '原体' in plate.plate_name
 
     def has_mix_rice(self, cooking_day, eating_day, meal):
-        plates = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, eating_day=eating_day, meal_name=meal, is_mix_rice=True)
-        return plates.exists()
+        return self.get_package_matrix(cooking_day).has_mix_rice(meal, eating_day)
 
     def has_soup(self, cooking_day, eating_day, meal):
-        plates = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, eating_day=eating_day, meal_name=meal,
-                                                      is_soup=True)
-
-        return plates.exists()
+        return self.get_package_matrix(cooking_day).has_soup(meal, eating_day)
 
     def get_mixrice_agg_counts(self):
         date_count_dict = {}
@@ -2764,34 +3218,8 @@ class InnerPackageManagement:
         計量表出力時の同様の料理名へ変換する。
         """
 
-        # 先頭の番号以降を対象
-        converted = source[1:]
-
-        # ※下記内容は、cooking_direction.pyの料理名変換処理に合わせること
-        # 全角のｇを半角のgに揃える
-        converted = converted.replace('ｇ', 'g')
-
-        # 半角の%を全角の％に揃える
-        converted = converted.replace('%', '％')
-
-        # 半角の+を全角の＋に揃える
-        converted = converted.replace('+', '＋')
-
-        # 半角の()を半角スペースにする
-        converted = converted.replace('(', ' ')
-        converted = converted.replace(')', ' ')
-
-        # 全角の（）を半角スペースにする
-        converted = converted.replace('（', ' ')
-        converted = converted.replace('）', ' ')
-
-        converted = converted.replace('/', '÷')
-
-        res = re.findall('(\D+)(\d|\s)+', converted)
-        if res:
-            return res[0][0].strip()
-        else:
-            raise ValueError('名称不正')
+        # 先頭の番号以降を対象(表記揺れの統一はcooking_direction.pyの料理名変換処理と共通)
+        return PlateNameParser.parse(source[1:]).get_base_name()
 
     def _convert_package_counts(self, dict):
         for inner_dict in dict.values():
@@ -2826,7 +3254,10 @@ class InnerPackageManagement:
                     if input_meal == "03":
                         yield eating_day, meal_name
 
-    def has_plate_miso_soup(self, eating_day, meal_name):
+    def has_plate_miso_soup(self, eating_day, meal_name, cooking_day=None):
+        if cooking_day:
+            return self.get_package_matrix(cooking_day).has_miso_soup(meal_name, eating_day)
+
         has_miso_soup = False
         plate_qs = CookingDirectionPlate.objects.filter(eating_day=eating_day, meal_name=meal_name,
                                                         is_soup=True).values('plate_name')
@@ -2838,15 +3269,13 @@ class InnerPackageManagement:
         return has_miso_soup
 
     def get_raw_plates(self, cooking_day, eating_day, meal_name):
-        converted = []
-        plate_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, eating_day=eating_day, meal_name=meal_name, is_soup=False)
-        for plate in plate_qs:
-            if self._is_raw_plate(plate):
-                # 嚥下製造対象であっても、常食は普通に原体処理が必要なので、ここでは絞り込まない
-                converted.append(self.convert_plate_name(plate.plate_name))
+        matrix = self.get_package_matrix(cooking_day)
+
+        # 嚥下製造対象であっても、常食は普通に原体処理が必要なので、ここでは絞り込まない
+        converted = [self.convert_plate_name(x) for x in matrix.get_raw_plate_names(meal_name, eating_day)]
 
         result_dict = {}
-        for raw_plate in RawPlatePackageMaster.objects.all():
+        for raw_plate in matrix.raw_plate_masters:
             for plate_name in converted:
                 if raw_plate.base_name in plate_name:
                     if raw_plate.id in result_dict:
@@ -2865,12 +3294,39 @@ class InnerPackageManagement:
         # 見つからなかった場合
         return None
 
+    def _has_raw_plate(self, matrix, meal_name, first_unit, is_convert=True):
+        """
+        施設に原体送り(直送以外)の料理があるかどうかを判断する。
+        """
+        for plate_name in matrix.get_raw_plate_names(meal_name):
+            # 原体マスタの参照
+            s_name = self.convert_plate_name(plate_name) if is_convert else plate_name
+            raw_plate = matrix.find_raw_plate_master(s_name)
+            if raw_plate:
+                if first_unit.username.dry_cold_type == "乾燥":
+                    is_direct = raw_plate.is_direct_dry
+                elif first_unit.username.dry_cold_type == "冷凍":
+                    is_direct = raw_plate.is_direct_cold
+                elif first_unit.username.dry_cold_type == "冷蔵":
+                    is_direct = raw_plate.is_direct_cold
+                else:
+                    logger.warn(f'施設の冷凍乾燥区分異常：{first_unit.username.dry_cold_type}')
+                    is_direct = False
+
+                # 原体送りの施設の区分が直送でないの場合、対象献立(基本 or 嚥下)のフラグを立てる
+                if not is_direct:
+                    return True
+            else:
+                logger.warn(f'原体マスタ未登録：{s_name}')
+
+        return False
+
     def get_package_counts(self, unit_number: int, short_name: str, cooking_day, input_meal):
         date_count_dict = {}
+        matrix = self.get_package_matrix(cooking_day)
 
         # ユニットの元施設を取得
-        first_unit = UnitMaster.objects.filter(unit_number=unit_number, short_name=short_name).first()
-        first_user = first_unit.username
+        first_unit = matrix.get_first_unit(unit_number, short_name)
 
         for meal_name, eating_day_list in self.cooking_eating_dict.items():
             if meal_name == '朝食':
@@ -2891,6 +3347,9 @@ class InnerPackageManagement:
             if not eating_day_list:
                 continue
 
+            # 原体の有無は喫食日に依らないため、食事区分毎に判断する
+            has_raw_plate = self._has_raw_plate(matrix, meal_name, first_unit)
+
             for eating_day in eating_day_list:
                 if eating_day in date_count_dict:
                     count_dict = date_count_dict[eating_day]
@@ -2904,87 +3363,30 @@ class InnerPackageManagement:
                     date_count_dict[eating_day] = count_dict
 
                 # 基本食の中袋数の計算
-                basic_count_qs = Order.objects.filter(
-                    unit_name__unit_number=unit_number, quantity__gt=0,
-                    eating_day=eating_day, meal_name__meal_name=meal_name, menu_name__menu_name='常食'
-                ).values('quantity')
-                basic_count = sum([x['quantity'] for x in basic_count_qs])
+                basic_count = matrix.get_order_count(unit_number, [eating_day], meal_name, matrix.PICKING_TYPE_BASIC)
                 count_dict['01'][meal_index] += basic_count
-                del basic_count_qs
 
                 # 嚥下の中袋数の計算
-                enge_count_qs = Order.objects.filter(
-                    unit_name__unit_number=unit_number, quantity__gt=0,
-                    eating_day=eating_day, meal_name__meal_name=meal_name,
-                    menu_name__menu_name__in=['ソフト', 'ゼリー', 'ミキサー']
-                ).values('quantity')
-                enge_count = sum([x['quantity'] for x in enge_count_qs])
+                enge_count = matrix.get_order_count(unit_number, [eating_day], meal_name, matrix.PICKING_TYPE_ENGE)
                 count_dict['02'][meal_index] += enge_count
-                del enge_count_qs
 
                 # 汁・味噌汁の中袋数の計算
-                # 契約内容変更により、顧客別～の設定値と実際の注文の食事区分が異なる場合があるため、Orderから取得する
-                first_meal = Order.objects.filter(
-                    unit_name__username=first_user, meal_name__meal_name=meal_name, meal_name__soup=True
-                ).first()
-                if first_meal:
+                if matrix.has_user_meal(first_unit.username_id, meal_name, soup=True):
                     # 汁なし、具のみの場合は、出力対象外。汁具ありの場合のみ以下の判断を行う
-
-                    # 料理に味噌汁があるかどうか
-                    has_miso_soup = False
-                    plate_qs = CookingDirectionPlate.objects.filter(eating_day=eating_day, meal_name=meal_name, is_soup=True).values('plate_name')
-                    for plate in plate_qs:
-                        if self._is_miso_soup(plate['plate_name']):
-                            has_miso_soup = True
-                            break
-                    del plate_qs
-
-                    if has_miso_soup:
-                        if first_meal.meal_name.soup:
-                            # 嚥下の味噌汁の汁は、汁・汁具の中袋に入れるため、基本食と嚥下の合計が必要
-                            soup_count = basic_count + enge_count
-                        else:
-                            # 嚥下の汁(味噌汁、それ以外の汁・スープ)の汁具は、嚥下の中袋に入れるため、汁・汁具の中袋は基本食のみ
-                            soup_count = basic_count
+                    if matrix.has_miso_soup(meal_name, eating_day):
+                        # 嚥下の味噌汁の汁は、汁・汁具の中袋に入れるため、基本食と嚥下の合計が必要
+                        soup_count = basic_count + enge_count
                     else:
                         # 嚥下の味噌汁以外の汁・汁具は嚥下の中袋に入れる
                         soup_count = basic_count
                     count_dict['03'][meal_index] += soup_count
                 else:
-                    filling_qs = Order.objects.filter(
-                        unit_name__username=first_user, meal_name__meal_name=meal_name, quantity__gt=0,
-                        meal_name__soup=False, meal_name__filling=True
-                    ).values('quantity')
                     # 具のみの場合は、中袋の計算外(汁の注文数で計算を行う)だが0は実体に合わないので数を設定
-                    if filling_qs.exists():
-                        filling = filling_qs.first()
-                        count_dict['03'][meal_index] += filling['quantity']
+                    filling_quantity = matrix.get_user_filling_quantity(first_unit.username_id, meal_name)
+                    if filling_quantity is not None:
+                        count_dict['03'][meal_index] += filling_quantity
 
                 # 原体の中袋数の計算
-                has_raw_plate = False
-                plate_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, meal_name=meal_name, is_soup=False)
-                for plate in plate_qs:
-                    if self._is_raw_plate(plate):
-                        # 原体マスタの参照
-                        s_name = self.convert_plate_name(plate.plate_name)
-                        raw_plate = self._in_plate(s_name)
-                        if raw_plate:
-                            if first_unit.username.dry_cold_type == "乾燥":
-                                is_direct = raw_plate.is_direct_dry
-                            elif first_unit.username.dry_cold_type == "冷凍":
-                                is_direct = raw_plate.is_direct_cold
-                            elif first_unit.username.dry_cold_type == "冷蔵":
-                                is_direct = raw_plate.is_direct_cold
-                            else:
-                                logger.warn(f'施設の冷凍乾燥区分異常：{first_unit.dry_cold_type}')
-                                is_direct = False
-
-                            # 原体送りの施設の区分が直送でないの場合、対象献立(基本 or 嚥下)のフラグを立てる
-                            if not is_direct:
-                                has_raw_plate = True
-                                break
-                        else:
-                            logger.warn(f'原体マスタ未登録：{s_name}')
                 raw_count = 0
                 raw_count += basic_count if has_raw_plate else 0
                 raw_count += enge_count if has_raw_plate else 0
@@ -3018,12 +3420,11 @@ class InnerPackageManagement:
         return None
 
     def get_inner_package_info(self, unit_number: int, meal_name: str, type_name: str, cooking_day):
+        matrix = self.get_package_matrix(cooking_day)
 
         # 対象ユニットの判定
-        first_unit = UnitMaster.objects.filter(unit_number=unit_number).first()
+        first_unit = matrix.get_first_unit(unit_number)
         if first_unit:
-            first_user = first_unit.username
-
             order_count = 0
             package_count = 0
             for eat_meal_name, eating_day_list in self.cooking_eating_dict.items():
@@ -3035,130 +3436,55 @@ class InnerPackageManagement:
                 if type_name == '基本食':
                     if unit_number == 904:
                         # 集約対象の先頭ユニットの場合
-                        plate_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day,
-                                                                        meal_name=meal_name,
-                                                                        is_mix_rice=True)
-                        if plate_qs.exists():
-                            basic_count_qs = Order.objects.filter(
-                                unit_name__unit_number__in=settings.MIX_RICE_AGGREGATE_UNITS, quantity__gt=0,
-                                eating_day__in=eating_day_list, meal_name__meal_name=meal_name,
-                                menu_name__menu_name='常食'
-                            )
-                            basic_count = sum([x.quantity for x in basic_count_qs])
+                        if matrix.has_mix_rice(meal_name):
+                            basic_count = sum([matrix.get_order_count(
+                                x, eating_day_list, meal_name, matrix.PICKING_TYPE_BASIC
+                            ) for x in settings.MIX_RICE_AGGREGATE_UNITS[0]])
                         else:
                             basic_count = 0
                     else:
-                        basic_count_qs = Order.objects.filter(
-                            unit_name__unit_number=unit_number, quantity__gt=0,
-                            eating_day__in=eating_day_list, meal_name__meal_name=meal_name, menu_name__menu_name='常食'
-                        )
-                        basic_count = sum([x.quantity for x in basic_count_qs])
+                        basic_count = matrix.get_order_count(
+                            unit_number, eating_day_list, meal_name, matrix.PICKING_TYPE_BASIC)
                         order_count += basic_count
                     package_count += math.ceil(basic_count / self.ORDER_COUNT_PER_PACKAGE)
 
                 elif type_name == '嚥下食':
-                    enge_count_qs = Order.objects.filter(
-                        unit_name__unit_number=unit_number, quantity__gt=0,
-                        eating_day__in=eating_day_list, meal_name__meal_name=meal_name,
-                        menu_name__menu_name__in=['ソフト', 'ゼリー', 'ミキサー']
-                    )
-                    enge_count = sum([x.quantity for x in enge_count_qs])
+                    enge_count = matrix.get_order_count(
+                        unit_number, eating_day_list, meal_name, matrix.PICKING_TYPE_ENGE)
                     order_count += enge_count
                     package_count += math.ceil(enge_count / self.ORDER_COUNT_PER_PACKAGE)
                 elif type_name == '汁・汁具':
                     # ユニット単位の取得のため、汁ありとなしが混在はありえない前提(嚥下も同様)
-                    basic_count_qs = Order.objects.filter(
-                        unit_name__unit_number=unit_number, quantity__gt=0,
-                        eating_day__in=eating_day_list, meal_name__meal_name=meal_name, menu_name__menu_name='常食'
-                    )
-                    basic_count = sum([x.quantity for x in basic_count_qs])
-
-                    enge_count_qs = Order.objects.filter(
-                        unit_name__unit_number=unit_number, quantity__gt=0,
-                        eating_day__in=eating_day_list, meal_name__meal_name=meal_name,
-                        menu_name__menu_name__in=['ソフト', 'ゼリー', 'ミキサー']
-                    )
-                    enge_count = sum([x.quantity for x in enge_count_qs])
+                    basic_count = matrix.get_order_count(
+                        unit_number, eating_day_list, meal_name, matrix.PICKING_TYPE_BASIC)
+                    enge_count = matrix.get_order_count(
+                        unit_number, eating_day_list, meal_name, matrix.PICKING_TYPE_ENGE)
 
                     # 汁・味噌汁の中袋数の計算
                     # 契約内容変更により、顧客別～の設定値と実際の注文の食事区分が異なる場合があるため、Orderから取得する
                     # ※同一喫食日、食事区分(朝・昼・夕)で汁・汁具の有無が異なることは運用上ない前提
-                    first_meal = Order.objects.filter(
-                        unit_name__username=first_user, meal_name__meal_name=meal_name, meal_name__soup=True
-                    ).first()
-                    if first_meal:
+                    if matrix.has_user_meal(first_unit.username_id, meal_name, soup=True):
                         # 汁なし、具のみの場合は、出力対象外。汁具の場合のみ以下の判断を行う
-
-                        # 料理に味噌汁があるかどうか
-                        has_miso_soup = False
-                        plate_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, meal_name=meal_name,
-                                                                        is_soup=True)
-                        for plate in plate_qs:
-                            if self._is_miso_soup(plate.plate_name):
-                                has_miso_soup = True
-                                break
-
-                        soup_count = 0
-                        if has_miso_soup:
-                            if first_meal.meal_name.soup:
-                                # 嚥下の味噌汁の汁は、汁・汁具の中袋に入れるため、基本食と嚥下の合計が必要
-                                soup_count += basic_count + enge_count
-                            else:
-                                # 嚥下の汁(味噌汁、それ以外の汁・スープ)の汁具は、嚥下の中袋に入れるため、汁・汁具の中袋は基本食のみ
-                                soup_count += basic_count
+                        if matrix.has_miso_soup(meal_name):
+                            # 嚥下の味噌汁の汁は、汁・汁具の中袋に入れるため、基本食と嚥下の合計が必要
+                            soup_count = basic_count + enge_count
                         else:
                             # 嚥下の味噌汁以外の汁・汁具は嚥下の中袋に入れる
-                            soup_count += basic_count
+                            soup_count = basic_count
                         order_count += soup_count
                         package_count += math.ceil(soup_count / self.ORDER_COUNT_PER_SOUP_PACKAGE)
                     else:
-                        filling_qs = Order.objects.filter(
-                            unit_name__username=first_user, meal_name__meal_name=meal_name,
-                            meal_name__soup=False, meal_name__filling=True
-                        )
                         # 具のみの場合は、中袋の計算外だが0は実体に合わないので1を設定
-                        if filling_qs.exists():
+                        if matrix.has_user_meal(first_unit.username_id, meal_name, soup=False, filling=True):
                             package_count += 1
 
                 elif type_name == '原体':
-                    basic_count_qs = Order.objects.filter(
-                        unit_name__unit_number=unit_number, quantity__gt=0,
-                        eating_day__in=eating_day_list, meal_name__meal_name=meal_name, menu_name__menu_name='常食'
-                    )
-                    basic_count = sum([x.quantity for x in basic_count_qs])
+                    basic_count = matrix.get_order_count(
+                        unit_number, eating_day_list, meal_name, matrix.PICKING_TYPE_BASIC)
+                    enge_count = matrix.get_order_count(
+                        unit_number, eating_day_list, meal_name, matrix.PICKING_TYPE_ENGE)
 
-                    enge_count_qs = Order.objects.filter(
-                        unit_name__unit_number=unit_number, quantity__gt=0,
-                        eating_day__in=eating_day_list, meal_name__meal_name=meal_name,
-                        menu_name__menu_name__in=['ソフト', 'ゼリー', 'ミキサー']
-                    )
-                    enge_count = sum([x.quantity for x in enge_count_qs])
-
-                    has_raw_plate = False
-                    plate_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, meal_name=meal_name,
-                                                                    is_soup=False)
-                    for plate in plate_qs:
-                        if self._is_raw_plate(plate):
-                            # 原体マスタの参照
-                            s_name = self.convert_plate_name(plate.plate_name)
-                            raw_plate = self._in_plate(s_name)
-                            if raw_plate:
-                                if first_unit.username.dry_cold_type == "乾燥":
-                                    is_direct = raw_plate.is_direct_dry
-                                elif first_unit.username.dry_cold_type == "冷凍":
-                                    is_direct = raw_plate.is_direct_cold
-                                elif first_unit.username.dry_cold_type == "冷蔵":
-                                    is_direct = raw_plate.is_direct_cold
-                                else:
-                                    logger.warn(f'施設の冷凍乾燥区分異常：{first_unit.dry_cold_type}')
-                                    is_direct = False
-
-                                # 原体送りの施設の区分が直送でないの場合、対象献立(基本 or 嚥下)のフラグを立てる
-                                if not is_direct:
-                                    has_raw_plate = True
-                                    break
-                            else:
-                                logger.warn(f'原体マスタ未登録：{s_name}')
+                    has_raw_plate = self._has_raw_plate(matrix, meal_name, first_unit)
                     raw_count = 0
                     raw_count += basic_count if has_raw_plate else 0
                     raw_count += enge_count if has_raw_plate else 0
@@ -3171,8 +3497,6 @@ class InnerPackageManagement:
                     order_count = 0
                     package_count = 0
 
-                # 原体の中袋数の計算
-
             return {
                 'unit_number': unit_number,
                 'unit_name': f'{unit_number}.{first_unit.calc_name}', 'meal_name': meal_name, 'type_name': type_name,
@@ -3198,12 +3522,11 @@ class InnerPackageManagement:
         """
         対象ユーザーの配送用段ボールでの照合情報を取得する。
         """
+        matrix = self.get_package_matrix(cooking_day)
 
         # 対象ユニットの判定
-        first_unit = UnitMaster.objects.filter(unit_number=unit_number).first()
+        first_unit = matrix.get_first_unit(unit_number)
         if first_unit:
-            first_user = first_unit.username
-
             order_count = 0
             package_count = 0
             for eat_meal_name, eating_day_list in self.cooking_eating_dict.items():
@@ -3212,95 +3535,43 @@ class InnerPackageManagement:
 
                 # 注文数、中袋数の取得
                 # 基本食の中袋数
-                basic_count_qs = Order.objects.filter(
-                    unit_name__unit_number=unit_number, quantity__gt=0,
-                    eating_day__in=eating_day_list, meal_name__meal_name=meal_name, menu_name__menu_name='常食'
-                )
-                basic_count = sum([x.quantity for x in basic_count_qs])
+                basic_count = matrix.get_order_count(
+                    unit_number, eating_day_list, meal_name, matrix.PICKING_TYPE_BASIC)
                 order_count += basic_count
                 package_count += math.ceil(basic_count / self.ORDER_COUNT_PER_PACKAGE)
 
                 if unit_number == settings.MIX_RICE_AGGREGATE_UNITS[0][0]:
                     # 混ぜご飯集約対象の先頭ユニットの場合
-                    plate_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day,
-                                                                    meal_name=meal_name,
-                                                                    is_mix_rice=True)
-                    if plate_qs.exists():
+                    if matrix.has_mix_rice(meal_name):
                         # 混ぜご飯集約の中袋を追加
                         package_count += 1
 
                 # 嚥下食の中袋数
-                enge_count_qs = Order.objects.filter(
-                    unit_name__unit_number=unit_number, quantity__gt=0,
-                    eating_day__in=eating_day_list, meal_name__meal_name=meal_name,
-                    menu_name__menu_name__in=['ソフト', 'ゼリー', 'ミキサー']
-                )
-                enge_count = sum([x.quantity for x in enge_count_qs])
+                enge_count = matrix.get_order_count(
+                    unit_number, eating_day_list, meal_name, matrix.PICKING_TYPE_ENGE)
                 order_count += enge_count
                 package_count += math.ceil(enge_count / self.ORDER_COUNT_PER_PACKAGE)
 
                 # 汁・汁具の中袋数
-                first_meal_order = Order.objects.filter(
-                    unit_name__unit_number=unit_number,
-                    eating_day__in=eating_day_list, meal_name__meal_name=meal_name,
-                ).first()
-                if first_meal_order:
-                    first_meal = first_meal_order.meal_name
-                    if first_meal.meal_name.soup:
+                first_meal_flags = matrix.get_first_order_flags(unit_number, eating_day_list, meal_name)
+                if first_meal_flags:
+                    is_soup, is_filling = first_meal_flags
+                    if is_soup:
                         # 汁なし、具のみの場合は、出力対象外。汁具の場合のみ以下の判断を行う
-
-                        # 料理に味噌汁があるかどうか
-                        has_miso_soup = False
-                        plate_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, meal_name=meal_name,
-                                                                        is_soup=True)
-                        for plate in plate_qs:
-                            if self._is_miso_soup(plate.plate_name):
-                                has_miso_soup = True
-                                break
-
-                        soup_count = 0
-                        if has_miso_soup:
-                            if first_meal.meal_name.soup:
-                                # 嚥下の味噌汁の汁は、汁・汁具の中袋に入れるため、基本食と嚥下の合計が必要
-                                soup_count += basic_count + enge_count
-                            else:
-                                # 嚥下の汁(味噌汁、それ以外の汁・スープ)の汁具は、嚥下の中袋に入れるため、汁・汁具の中袋は基本食のみ
-                                soup_count += basic_count
+                        if matrix.has_miso_soup(meal_name):
+                            # 嚥下の味噌汁の汁は、汁・汁具の中袋に入れるため、基本食と嚥下の合計が必要
+                            soup_count = basic_count + enge_count
                         else:
                             # 嚥下の味噌汁以外の汁・汁具は嚥下の中袋に入れる
-                            soup_count += basic_count
+                            soup_count = basic_count
                         # 基本食・嚥下食に含まれるので、食数カウントしない
                         package_count += math.ceil(soup_count / self.ORDER_COUNT_PER_SOUP_PACKAGE)
-                    elif first_meal.meal_name.filling:
+                    elif is_filling:
                         # 汁具でカウントするが、具のみも中袋に格納が必要なため、袋数を入れる
                         package_count += 1
 
                 # 原体袋数の計算
-                has_raw_plate = False
-                plate_qs = CookingDirectionPlate.objects.filter(cooking_day=cooking_day, meal_name=meal_name,
-                                                                is_soup=False)
-                for plate in plate_qs:
-                    if self._is_raw_plate(plate):
-                        # 原体マスタの参照
-                        raw_plate = self._in_plate(plate.plate_name)
-                        if raw_plate:
-                            if first_unit.username.dry_cold_type == "乾燥":
-                                is_direct = raw_plate.is_direct_dry
-                            elif first_unit.username.dry_cold_type == "冷凍":
-                                is_direct = raw_plate.is_direct_cold
-                            elif first_unit.username.dry_cold_type == "冷蔵":
-                                is_direct = raw_plate.is_direct_cold
-                            else:
-                                logger.warn(f'施設の冷凍乾燥区分異常：{first_unit.dry_cold_type}')
-                                is_direct = False
-
-                            # 原体送りの施設の区分が直送でないの場合、対象献立(基本 or 嚥下)のフラグを立てる
-                            if not is_direct:
-                                has_raw_plate = True
-                                break
-                        else:
-                            logger.warn(f'原体マスタ未登録：{plate.plate_name}')
-
+                has_raw_plate = self._has_raw_plate(matrix, meal_name, first_unit, is_convert=False)
                 raw_count = 0
                 raw_count += basic_count if has_raw_plate else 0
                 raw_count += enge_count if has_raw_plate else 0
@@ -3328,103 +3599,192 @@ class InnerPackageManagement:
         unit_number, meal_name, type_name = QrCodeUtil.perse_qr_value(qr_value)
         return self.get_inner_package_info(unit_number, meal_name, type_name, cooking_day)
 
+    def _get_soup_required_keys(self, cooking_day, unit_numbers):
+        """
+        汁・汁具の照合が必要な(呼出番号, 食事区分)のsetを取得する。
+        呼出番号の最初のユニットに、食事区分の最初の喫食日の具ありの注文があれば照合が必要とする。
+        """
+        first_package_ids = UnitPackage.objects.filter(cooking_day=cooking_day, count__gt=0).values(
+            'meal_name').annotate(first_id=Min('id')).values_list('first_id', flat=True)
+        meal_eating_days = dict(UnitPackage.objects.filter(id__in=list(first_package_ids)).values_list(
+            'meal_name', 'eating_day'))
+
+        first_unit_ids = dict(UnitMaster.objects.filter(unit_number__in=unit_numbers).values(
+            'unit_number').annotate(first_id=Min('id')).values_list('unit_number', 'first_id'))
+        unit_numbers = {value: key for key, value in first_unit_ids.items()}
+
+        filling_orders = Order.objects.filter(
+            unit_name_id__in=list(first_unit_ids.values()), eating_day__in=list(meal_eating_days.values()),
+            meal_name__filling=True
+        ).values_list('unit_name_id', 'eating_day', 'meal_name__meal_name').distinct()
+
+        return {(unit_numbers[unit_id], meal_name) for unit_id, eating_day, meal_name in filling_orders
+                if meal_eating_days.get(meal_name, None) == eating_day}
+
     def get_required_units(self, cooking_day):
         """
         照合が必要な施設・食事区分・種類・フェーズの一覧を取得する。
         """
         results = []
+        result_set = set()
+
+        def add_phases(unit_number, meal_name, type_name):
+            for phase in ['中袋', '段ボール']:
+                tpl = (unit_number, meal_name, type_name, phase)
+                if not (tpl in result_set):
+                    result_set.add(tpl)
+                    results.append(tpl)
 
         # 原体以外
-        required_units = UnitPackage.objects.filter(cooking_day=cooking_day, count__gt=0).values(
+        menu_dict = {}
+        required_units = UnitPackage.objects.filter(cooking_day=cooking_day, count__gt=0).values_list(
             'unit_number', 'meal_name', 'menu_name'
-        ).distinct()
-        for key, group in groupby(required_units, key=lambda x: (x['unit_number'], x['meal_name'])):
+        ).distinct().order_by('unit_number', 'meal_name')
+        for unit_number, meal_name, menu_name in required_units:
+            menu_dict.setdefault((unit_number, meal_name), set()).add(menu_name)
+
+        soup_keys = self._get_soup_required_keys(cooking_day, {x[0] for x in menu_dict.keys()})
+        for key, menu_set in menu_dict.items():
             # 基本食・嚥下食の抽出
             # (ダンボールの照合では、施設全体で1行。常食か嚥下のどちらかで有無が確定する。)
-            menu_list = [x['menu_name'] for x in group]
             is_hit = False
-            if '常食' in menu_list:
-                tpl = (key[0], key[1], '基本食', '中袋')
-                if not (tpl in results):
-                    results.append(tpl)
-
-                tpl_trans = (key[0], key[1], '基本食', '段ボール')
-                if not (tpl_trans in results):
-                    results.append(tpl_trans)
+            if '常食' in menu_set:
+                add_phases(key[0], key[1], '基本食')
                 is_hit = True
-            if ('ソフト' in menu_list) or ('ミキサー' in menu_list) or ('ゼリー' in menu_list):
-                tpl = (key[0], key[1], '嚥下食', '中袋')
-                if not (tpl in results):
-                    results.append(tpl)
-
-                tpl_trans = (key[0], key[1], '嚥下食', '段ボール')
-                if not (tpl_trans in results):
-                    results.append(tpl_trans)
+            if menu_set & {'ソフト', 'ミキサー', 'ゼリー'}:
+                add_phases(key[0], key[1], '嚥下食')
                 is_hit = True
 
             # 汁・汁具の抽出
-            if is_hit:
-                unit_number = key[0]
-                unit = UnitMaster.objects.filter(unit_number=unit_number).first()
-                if unit:
-                    eating_qs = UnitPackage.objects.filter(cooking_day=cooking_day, meal_name=key[1], count__gt=0).values(
-                        'eating_day'
-                    ).first()
-                    order = Order.objects.filter(unit_name=unit, eating_day=eating_qs['eating_day'],
-                                                 meal_name__meal_name=key[1],
-                                                 meal_name__filling=True).ordery_by('eating_day').first()
-                    # qs = MealDisplay.objects.filter(username=unit.username, meal_name__filling=True)
-                    if order.exists():
-                        tpl = (unit_number, key[1], '汁・汁具', '中袋')
-                        if not (tpl in results):
-                            results.append(tpl)
-
-                        tpl_trans = (unit_number, key[1], '汁・汁具', '段ボール')
-                        if not (tpl_trans in results):
-                            results.append(tpl_trans)
+            if is_hit and (key in soup_keys):
+                add_phases(key[0], key[1], '汁・汁具')
+
         # 原体
-        required_units_for_raw_plate = PickingRawPlatePackage.objects.filter(cooking_day=cooking_day, quantity__gt=0).values(
+        required_units_for_raw_plate = PickingRawPlatePackage.objects.filter(cooking_day=cooking_day, quantity__gt=0).values_list(
             'unit_name__unit_number', 'meal_name'
-        ).distinct()
-        for ru_rp in required_units_for_raw_plate:
-            tpl = (ru_rp['unit_name__unit_number'], ru_rp['meal_name'], '原体', '中袋')
-            if not (tpl in results):
-                results.append(tpl)
-
-            tpl_trans = (ru_rp['unit_name__unit_number'], ru_rp['meal_name'], '原体', '段ボール')
-            if not (tpl_trans in results):
-                results.append(tpl_trans)
+        ).distinct().order_by('unit_name__unit_number', 'meal_name')
+        for unit_number, meal_name in required_units_for_raw_plate:
+            add_phases(unit_number, meal_name, '原体')
 
         return results
 
+
+class PickingResultImportSummary:
+    """
+    ピッキング結果ファイルの取込結果
+    """
+    def __init__(self, upload_file_name: str):
+        self.upload_file_name = upload_file_name
+        self.row_count = 0
+        self.inserted_count = 0
+        self.duplicate_count = 0
+        self.rejected_count = 0
+
+    def __str__(self):
+        return f'{self.upload_file_name}:行数={self.row_count},登録={self.inserted_count},' \
+               f'重複={self.duplicate_count},対象外={self.rejected_count}'
+
+
 class PickingResultFileReader:
-    def __init__(self, df, upload_file_name: str):
+    """
+    ハンディターミナルのピッキング結果ファイル(CSV)を読み込み、読み取り結果(PickingResultRaw)に登録するクラス
+    """
+    # 読み取り結果を一意に特定する項目
+    KEY_FIELDS = ['menu_file_no', 'menu_no', 'terminal_no', 'picking_date', 'qr_value', 'result', 'picking_phase']
+
+    def __init__(self, df, upload_file_name: str, batch_size: int = 1000):
         self.df = df
         self.upload_file_name = upload_file_name
+        self.batch_size = batch_size
+
+    def clean(self, summary):
+        """
+        ファイルの内容を、登録する読み取り結果の形式に変換する。登録できない行は除く
+        """
+        df = self.df
+        summary.row_count = len(df)
+        if df.empty:
+            return pd.DataFrame(columns=self.KEY_FIELDS)
+
+        # QRコード値がない場合は表示に使えないので、除く
+        qr_value = df[5].astype('string').str.zfill(9)
+        enable = df[5].notna() & (df[5].astype('string').str.len() > 1) & (~qr_value.str.contains('nan').fillna(True))
+        enable = enable.fillna(False).astype(bool)
+
+        cleaned = pd.DataFrame({
+            'menu_file_no': pd.to_numeric(df[0], errors='coerce'),
+            'menu_no': pd.to_numeric(df[1], errors='coerce'),
+            'terminal_no': df[2],
+            'picking_date': pd.to_datetime(df[3] + ' ' + df[4], format='%Y/%m/%d %H:%M:%S', errors='coerce'),
+            'qr_value': qr_value.str[:9],
+            'result': df[7],
+            'picking_phase': np.where(df[1] == '1', '中袋', '段ボール'),
+        })
+        enable &= cleaned[['menu_file_no', 'menu_no', 'terminal_no', 'picking_date', 'result']].notna().all(axis=1)
+        cleaned = cleaned[enable].astype({'menu_file_no': 'int64', 'menu_no': 'int64', 'qr_value': 'object'})
+        summary.rejected_count = summary.row_count - len(cleaned)
+
+        # ファイル内の重複は1件にまとめる
+        deduplicated = cleaned.drop_duplicates(subset=self.KEY_FIELDS)
+        summary.duplicate_count += len(cleaned) - len(deduplicated)
+        return deduplicated
+
+    def _to_naive(self, value):
+        if timezone.is_aware(value):
+            return timezone.make_naive(value)
+        return value
+
+    def _get_range_queryset(self, df):
+        """
+        ファイルの読み取り日時・端末の範囲の読み取り結果を取得するクエリセット
+        """
+        return PickingResultRaw.objects.filter(
+            picking_date__range=[df['picking_date'].min().to_pydatetime(), df['picking_date'].max().to_pydatetime()],
+            terminal_no__in=df['terminal_no'].unique().tolist()
+        )
+
+    def get_exists_keys(self, df):
+        """
+        登録済みの読み取り結果のキーを取得する
+        """
+        if df.empty:
+            return set()
+
+        qs = self._get_range_queryset(df).values_list(*self.KEY_FIELDS)
+        return {x[:3] + (self._to_naive(x[3]),) + x[4:] for x in qs}
 
     def read_to_save(self):
-        for index, data in self.df.iterrows():
-            menu_file_no = data[0]
-            menu_no = data[1]
-            terminal = data[2]
-            date = dt.datetime.strptime(f'{data[3]} {data[4]}', '%Y/%m/%d %H:%M:%S')
-
-            # math.isnan()だと、正常時にエラーになるため注意
-            if repr(data[5]) == 'nan':
-                # QRコード値がない場合は表示に使えないので、除く
-                continue
-            if len(data[5]) <= 1:
-                # QRコード値がない場合は表示に使えないので、除く
-                continue
-            value = str(data[5]).zfill(9)
-            if 'nan' in value:
-                # QRコード値がない場合は表示に使えないので、除く
+        """
+        ファイルの内容を登録し、取込結果を返す
+        """
+        summary = PickingResultImportSummary(self.upload_file_name)
+        df = self.clean(summary)
+        exists_keys = self.get_exists_keys(df)
+
+        new_results = []
+        for menu_file_no, menu_no, terminal_no, picking_date, qr_value, result, picking_phase in \
+                df[self.KEY_FIELDS].itertuples(index=False, name=None):
+            picking_date = picking_date.to_pydatetime()
+            if (menu_file_no, menu_no, terminal_no, picking_date, qr_value, result, picking_phase) in exists_keys:
+                summary.duplicate_count += 1
                 continue
-            result = data[7]
-            result_raw, is_create = PickingResultRaw.objects.get_or_create(
-                menu_file_no=menu_file_no, menu_no=menu_no,
-                terminal_no=terminal, picking_date=date, qr_value=value[:9], result=result,
-                picking_phase='中袋' if menu_no == '1' else '段ボール')
-            if is_create:
-                result_raw.upload_file_name = self.upload_file_name
-                result_raw.save()
+
+            new_results.append(PickingResultRaw(
+                menu_file_no=menu_file_no, menu_no=menu_no, terminal_no=terminal_no, picking_date=picking_date,
+                qr_value=qr_value, result=result, picking_phase=picking_phase,
+                upload_file_name=self.upload_file_name))
+
+        if new_results:
+            with transaction.atomic():
+                file_qs = self._get_range_queryset(df).filter(upload_file_name=self.upload_file_name)
+                before_count = file_qs.count()
+
+                # 同時にアップロードされた場合の重複は、一意制約で除外する
+                PickingResultRaw.objects.bulk_create(new_results, batch_size=self.batch_size, ignore_conflicts=True)
+
+                # 一意制約で除外された件数は含めないよう、登録前後の件数から登録数を求める
+                summary.inserted_count = file_qs.count() - before_count
+            summary.duplicate_count += len(new_results) - summary.inserted_count
+
+        logger.info(f'ピッキング結果取込:{summary}')
+        return summary
@@ -0,0 +1,269 @@
+import logging
+import threading
+from collections import OrderedDict
+from itertools import groupby
+
+from dateutil.relativedelta import relativedelta
+
+from django.db.models import Count, Max
+
+from .models import PickingResultRaw, ReqirePickingPackage
+from .picking import QrCodeUtil
+
+logger = logging.getLogger(__name__)
+
+# 照合パターン(読み取り結果の値と画面表示名)
+PHASE_INNER = '中袋'
+PHASE_TRANSFER = '段ボール'
+PHASE_LABELS = {
+    PHASE_INNER: 'ピッキング指示書と中袋',
+    PHASE_TRANSFER: '配送用ダンボールと中袋',
+}
+
+# 照合結果の状態
+STATUS_OK = '-'
+STATUS_CORRECTED = '正常(NG訂正)'
+STATUS_NG = 'NG未解消'
+STATUS_SHORT = '読み取り件数不足'
+STATUS_DUPLICATE = '照合重複'
+STATUS_INVALID = 'データ不正'
+
+
+class PickingFilter:
+    """
+    ピッキング結果一覧の表示条件
+    """
+    def __init__(self, is_show_corrected: bool = False, visible_phase_code="", visible_meal_code="", visible_type_code=""):
+        if is_show_corrected:
+            self.hidden_status = [STATUS_OK]
+        else:
+            self.hidden_status = [STATUS_CORRECTED, STATUS_OK]
+
+        if visible_phase_code:
+            if visible_phase_code == "0":
+                self.phases = [PHASE_INNER]
+            else:
+                self.phases = [PHASE_TRANSFER]
+        else:
+            self.phases = [PHASE_INNER, PHASE_TRANSFER]
+
+        if visible_meal_code:
+            self.meals = {"1": ['朝食'], "2": ['昼食'], "3": ['夕食']}.get(visible_meal_code, [])
+        else:
+            self.meals = ['朝食', '昼食', '夕食']
+
+        if visible_type_code:
+            self.type_codes = {"1": ['01'], "2": ['02'], "3": ['03'], "4": ['04']}.get(visible_type_code, [])
+        else:
+            self.type_codes = ['01', '02', '03', '04']
+        self.types = [QrCodeUtil.parse_type(x) for x in self.type_codes]
+
+    @property
+    def phase_labels(self):
+        return [PHASE_LABELS[x] for x in self.phases]
+
+    def log(self):
+        logger.info('ピッキング結果表示条件:')
+        logger.info(self.hidden_status)
+        logger.info(self.phase_labels)
+        logger.info(self.meals)
+        logger.info(self.types)
+
+    def is_visible(self, record):
+        return (not (record['warning'] in self.hidden_status)) and \
+            (record['picking_phase'] in self.phase_labels) and \
+            (record['meal_name'] in self.meals) and \
+            (record['type'] in self.types)
+
+
+class PickingReconciliation:
+    """
+    製造日の照合が必要な中袋(ReqirePickingPackage)と、ピッキング実施日の読み取り結果(PickingResultRaw)の照合を行うクラス。
+    照合結果はプロセス内で保持し、読み取り結果・照合が必要な中袋が変わった場合に照合し直す。
+    表示条件の変更は、照合結果の絞り込みのみで行う。
+    """
+    # プロセス内で保持する照合結果の最大数
+    MAX_CACHE_SIZE = 8
+
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, cooking_day, picking_day):
+        self.cooking_day = cooking_day
+        self.picking_day = picking_day
+        self.stamp = None
+
+        # 照合が必要な中袋(呼出番号の順)
+        self.requires = []
+        # key:(呼出番号, 食事区分, 中袋種類, 喫食日の日)、value:照合が必要な中袋
+        self.require_dict = {}
+
+        # 読み取り結果毎の照合結果(端末番号・QRコード値・照合パターンの順)
+        self.records = []
+        # key:照合が必要な中袋のID、value:読み取り結果のある照合パターンのリスト
+        self.result_phases = {}
+
+        self.scan_count = 0
+        self.skip_count = 0
+
+    @classmethod
+    def get_stamp(cls, cooking_day, picking_day):
+        """
+        照合元データの更新有無を判断するための値を取得する
+        """
+        result_stamp = cls._get_result_qs(picking_day).aggregate(Count('id'), Max('id'), Max('created_at'))
+        require_stamp = cls._get_require_qs(cooking_day).aggregate(Count('id'), Max('id'), Max('created_at'))
+        return tuple(result_stamp.values()) + tuple(require_stamp.values())
+
+    @classmethod
+    def get(cls, cooking_day, picking_day):
+        """
+        照合結果を取得する。照合元データに変更がない場合は、保持している照合結果を返す
+        """
+        key = (cooking_day, picking_day)
+        stamp = cls.get_stamp(cooking_day, picking_day)
+        instance = cls._cache.get(key, None)
+        if instance and (instance.stamp == stamp):
+            return instance
+
+        instance = cls(cooking_day, picking_day)
+        instance.reconcile()
+        instance.stamp = stamp
+        with cls._lock:
+            cls._cache[key] = instance
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > cls.MAX_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return instance
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache.clear()
+
+    @classmethod
+    def _get_require_qs(cls, cooking_day):
+        return ReqirePickingPackage.objects.filter(cooking_day=cooking_day, package_count__gt=0)
+
+    @classmethod
+    def _get_result_qs(cls, picking_day):
+        max_date = picking_day + relativedelta(days=1)
+        return PickingResultRaw.objects.filter(picking_date__gte=picking_day, picking_date__lt=max_date)
+
+    @classmethod
+    def judge_result(cls, result_list, package_count):
+        if result_list:
+            last_result = result_list[-1]
+            if last_result == 'NG':
+                return STATUS_NG
+
+        result_len = len([x for x in result_list if x == 'OK'])
+        if (result_len == 0) or (package_count == 0):
+            return STATUS_INVALID
+        if package_count > result_len:
+            return STATUS_SHORT
+        elif package_count < result_len:
+            return STATUS_DUPLICATE
+        elif 'NG' in result_list:
+            return STATUS_CORRECTED
+        return STATUS_OK
+
+    def _load_requires(self):
+        self.requires = list(self._get_require_qs(self.cooking_day).order_by('unit_number'))
+        for require in self.requires:
+            key = (require.unit_number, require.meal_name, require.picking_type_code, require.eating_day.day)
+
+            # 同じ日の中袋が複数ある場合は、最初の中袋を照合対象とする
+            self.require_dict.setdefault(key, require)
+
+    def _new_record(self, require, terminal_no: str, qr_value: str, phase: str, result_list):
+        return {
+            'require_id': require.id,
+            'terminal_no': terminal_no,
+            'unit_number': require.unit_number,
+            'unit_name': require.short_name,
+            'picking_date': self.picking_day.strftime('%Y年%m月%d日'),
+            'qr_value': qr_value,
+            'meal_name': require.meal_name,
+            'type': QrCodeUtil.parse_type(require.picking_type_code),
+            'picking_phase': PHASE_LABELS.get(phase, PHASE_LABELS[PHASE_TRANSFER]),
+            'eating_day': require.eating_day,
+            'order_count': require.order_count,
+            'package_count': require.package_count,
+            'result_list': result_list,
+            'warning': self.judge_result(result_list, require.package_count),
+        }
+
+    def reconcile(self):
+        """
+        読み取り結果を1回の走査で照合する
+        """
+        self._load_requires()
+
+        result_qs = self._get_result_qs(self.picking_day).order_by(
+            'terminal_no', 'qr_value', 'picking_phase', 'created_at'
+        ).values_list('terminal_no', 'qr_value', 'picking_phase', 'result')
+        for key, group in groupby(result_qs.iterator(), key=lambda x: (x[0], x[1], x[2])):
+            terminal_no, qr_value, picking_phase = key
+            result_list = [x[3] for x in group]
+            self.scan_count += len(result_list)
+
+            try:
+                unit_number, meal_name, type_value, day = QrCodeUtil.perse_qr_value_v2(qr_value)
+            except Exception:
+                # 解析できない読み取り結果は照合しない
+                self.skip_count += 1
+                continue
+
+            require = self.require_dict.get((unit_number, meal_name, type_value, day), None)
+            if not require:
+                self.skip_count += 1
+                continue
+
+            self.records.append(self._new_record(require, terminal_no, qr_value, picking_phase, result_list))
+            self.result_phases.setdefault(require.id, []).append(picking_phase)
+
+        logger.info(f'ピッキング結果照合:製造日={self.cooking_day},実施日={self.picking_day},'
+                    f'中袋={len(self.requires)},読み取り={self.scan_count},照合={len(self.records)},対象外={self.skip_count}')
+
+    def _get_unread_records(self, picking_filter):
+        """
+        読み取り結果のない中袋を、読み取り件数不足として取得する
+        """
+        for require in self.requires:
+            exists_phase = self.result_phases.get(require.id, [])
+            if len(exists_phase) == 2:
+                # ピッキング指示書照合、段ボール照合両方取得済み
+                continue
+
+            # フィルタリング条件に合わないものを除外
+            if not (require.meal_name in picking_filter.meals):
+                continue
+            if not (require.picking_type_code in picking_filter.type_codes):
+                continue
+
+            for phase in [x for x in picking_filter.phases if not (x in exists_phase)]:
+                yield {
+                    'terminal_no': '-',
+                    'picking_date': self.picking_day.strftime('%Y年%m月%d日'),
+                    'eating_day': require.eating_day.strftime('%Y年%m月%d日'),
+                    'qr_value': '',
+                    'result_list': [],
+                    'type': QrCodeUtil.parse_type(require.picking_type_code),
+                    'picking_phase': PHASE_LABELS[phase],
+                    'warning': STATUS_SHORT,
+                    'unit_number': require.unit_number,
+                    'unit_name': require.short_name,
+                    'order_count': require.order_count,
+                    'package_count': require.package_count,
+                    'meal_name': require.meal_name,
+                }
+
+    def get_records(self, picking_filter):
+        """
+        表示条件に合う照合結果を取得する。画面表示時に編集されるため、複製を返す
+        """
+        object_list = [dict(x, result_list=list(x['result_list']))
+                       for x in self.records if picking_filter.is_visible(x)]
+        object_list += list(self._get_unread_records(picking_filter))
+        return object_list
@@ -0,0 +1,144 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TRACE_OFF = 'off'               # 中間ファイル・集計ログとも出力しない
+TRACE_SUMMARY = 'summary'       # 段階毎の行数・食数合計を1件のログに出力する
+TRACE_FULL = 'full'             # summaryに加え、中間ファイル(CSV)をバックグラウンドで出力する
+TRACE_LEVELS = (TRACE_OFF, TRACE_SUMMARY, TRACE_FULL)
+
+
+def add_trace_argument(parser, default: str = None):
+    """
+    管理コマンドに--traceオプションを追加する。
+    default: 省略時の出力レベル。Noneの場合は設定値PIPELINE_TRACE_LEVEL
+    """
+    parser.add_argument(
+        '--trace', choices=TRACE_LEVELS, default=default,
+        help=f'中間ファイルの出力レベル(省略時は{default or "設定値PIPELINE_TRACE_LEVEL"})')
+
+
+class TraceCsvWriter:
+    """
+    中間ファイル(CSV)を書き込むバックグラウンドスレッド
+    """
+    def __init__(self, name):
+        self.queue = queue.Queue()
+        self.written_count = 0
+        self.error_count = 0
+        self.thread = threading.Thread(target=self._run, name=f'trace-writer-{name}', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            df, path, kwargs = item
+            try:
+                df.to_csv(path, **kwargs)
+                self.written_count += 1
+            except Exception:
+                # 中間ファイルの出力失敗で本処理を止めない
+                logger.exception(f'中間ファイル出力エラー:{path}')
+                self.error_count += 1
+
+    def put(self, df, path, kwargs):
+        self.queue.put((df, path, kwargs))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+class PipelineTrace:
+    """
+    集計処理の中間データの記録を行うクラス。
+    出力レベル(off/summary/full)に応じて、段階毎の行数・食数合計の記録と、中間ファイル(CSV)の出力を行う。
+    中間ファイルは呼び出し時点の内容を複製し、バックグラウンドのスレッドで書き込む。
+    """
+    def __init__(self, name: str, level: str = None):
+        level = level or settings.PIPELINE_TRACE_LEVEL
+        if level not in TRACE_LEVELS:
+            raise ValueError(f'不正な出力レベル:{level}')
+
+        self.name = name
+        self.level = level
+        self.stages = []
+        self._writer = None
+        self._start = time.perf_counter()
+
+    @property
+    def is_summary(self):
+        return self.level in (TRACE_SUMMARY, TRACE_FULL)
+
+    @property
+    def is_full(self):
+        return self.level == TRACE_FULL
+
+    def _to_number(self, value):
+        return value.item() if hasattr(value, 'item') else value
+
+    def record(self, stage: str, df, quantity_column: str = 'quantity'):
+        """
+        段階の行数・食数合計を記録する
+        """
+        if not self.is_summary:
+            return
+
+        if quantity_column and (quantity_column in df.columns):
+            # 空行の追加などで文字列が混在する場合があるため、数値以外は除いて合計する
+            quantity = self._to_number(pd.to_numeric(df[quantity_column], errors='coerce').sum())
+        else:
+            quantity = None
+        self.stages.append({'stage': stage, 'rows': len(df), 'quantity': quantity})
+
+    def dump(self, stage: str, df, path: str, quantity_column: str = 'quantity', **kwargs):
+        """
+        段階の中間データを記録する。fullの場合は、DataFrame.to_csv(path, **kwargs)で中間ファイルを出力する
+        """
+        self.record(stage, df, quantity_column)
+        if not self.is_full:
+            return
+
+        if not self._writer:
+            self._writer = TraceCsvWriter(self.name)
+        self._writer.put(df.copy(), path, kwargs)
+
+    def close(self):
+        """
+        中間ファイルの書き込み完了を待ち、記録した内容をログに出力する
+        """
+        written_count = error_count = 0
+        if self._writer:
+            self._writer.close()
+            written_count = self._writer.written_count
+            error_count = self._writer.error_count
+            self._writer = None
+
+        if self.is_summary:
+            summary = {
+                'pipeline': self.name,
+                'level': self.level,
+                'stages': self.stages,
+                'written_files': written_count,
+                'write_errors': error_count,
+                'seconds': round(time.perf_counter() - self._start, 3),
+            }
+            logger.info(f'pipeline trace:{json.dumps(summary, ensure_ascii=False, default=str)}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -0,0 +1,319 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+# 解析結果を保持する料理名の件数
+PARSE_CACHE_SIZE = 4096
+
+# 料理名の表記揺れの統一(全角のｇ→半角のg、半角の%→全角の％、半角の+→全角の＋、括弧→半角スペース、/→÷)
+# ※調理表の料理名変換処理(cooking_direction.py)、ピッキング指示書の料理名変換処理で共通して使う
+NORMALIZE_TABLE = str.maketrans({
+    'ｇ': 'g',
+    '%': '％',
+    '+': '＋',
+    '(': ' ',
+    ')': ' ',
+    '（': ' ',
+    '）': ' ',
+    '/': '÷',
+})
+
+# 帳票(P7)の料理名で除外する記号
+PRINT_MARK_TABLE = str.maketrans({'▲': '', '●': ''})
+
+# 先頭の丸数字
+PLATE_NUMBERS = ['⑩', '①', '②', '③', '④', '⑤']
+
+# 解析結果の種類
+# -汁・スープ(⑤)
+KIND_SOUP_KO_GRAM = 'soup_ko_gram'              # ⑤味噌汁（里芋2個・さつま揚げ5g）
+KIND_SOUP_GRAM = 'soup_gram'                    # ⑤味噌汁具（玉葱・しめじ）16g
+KIND_SOUP_KO = 'soup_ko'                        # ⑤スープ具（ギョーザ）1個
+KIND_SOUP_NONE = 'soup_none'                    # ⑤スープの具（コーン）
+# -汁・スープ以外
+KIND_SEASONING_SMALL = 'seasoning_small'        # ④■ポン酢7g
+KIND_SEASONING = 'seasoning'                    # ④タルタルソース7g
+KIND_UNIT = 'unit'                              # ①鮭の塩焼き60ｇ1尾
+KIND_CHO = 'cho'                                # ③サラダ（枝豆・豆腐）1/2丁
+KIND_KO_LIQUID = 'ko_liquid'                    # ①トマトソース煮込みハンバーグ1個 + 液20g
+KIND_KO_GRAM_DENSITY = 'ko_gram_density'        # ②煮物（肉団子3個＋小松菜36g）+液60g
+KIND_KO_GRAM_INNER_PERCENT = 'ko_gram_inner_percent'    # ②煮物（肉団子3個(10g)＋小松菜36g）+10％
+KIND_KO_GRAM_PERCENT = 'ko_gram_percent'        # ②れんこん煮物（れんこん1個+いんげん4ｇ）+9%
+KIND_KO_GRAM_INNER_DENSITY = 'ko_gram_inner_density'    # ②煮物（肉団子3個(10g)＋小松菜36g）+10g
+KIND_KO_GRAM = 'ko_gram'                        # ①食【た】べるスープの具【ぐ】（団子4個+具60ｇ）
+KIND_GRAM_GRAM_PERCENT = 'gram_gram_percent'    # ②麻婆豆腐（豆腐90g+ミンチ22g）+25％
+KIND_GRAM_GRAM_DENSITY = 'gram_gram_density'    # ②麻婆豆腐（豆腐90g+ミンチ22g）+液25g
+KIND_KO = 'ko'                                  # ①白身フライ60g1個
+KIND_GRAM = 'gram'                              # ①すきやき76g+48g
+KIND_NONE = 'none'                              # 数量の指定なし
+
+# 汁・スープの料理名の解析
+REGEX_SOUP_KO_GRAM = re.compile(r'(\D*)(\d+)個(\D*)(\d+|\d+\.\d+)g')
+REGEX_SOUP_GRAM = re.compile(r'(\D*)(\d+|\d+\.\d+)g')
+REGEX_SOUP_KO = re.compile(r'(\D*)(\d+|\d+\.\d+)個')
+
+# 出汁の量(g、％)
+REGEX_DENSITY_G = re.compile(r'(\+|＋)\s*(液同|液|汁|汁【しる】|)(\d+|\d+.\d+)g')
+REGEX_DENSITY_P = re.compile(r'(\+|＋)\s*(液同|液|)(\d+|\d+.\d+)％')
+REGEX_PERCENTAGE = re.compile(r'(\d*|\d*\.\d*)％')
+
+# 汁・スープ以外の料理名の解析
+REGEX_SMALL = re.compile(r'■\D*(\d+|\d+\.\d+)g')
+REGEX_LIQUID = re.compile(r'\D*(\d+|\d+\.\d+)g')
+REGEX_HAS_GU = re.compile(r'\[(.*)\]')
+REGEX_GU_PART = re.compile(r'\[.*\]')
+REGEX_GRAM_PART = re.compile(r'(\d*|\d*\.\d*)g')
+REGEX_END_SAUCE = re.compile(r'ソース$')
+REGEX_CHO = re.compile(r'(\d+|\d+÷\d+)丁')
+REGEX_INNER_CHO = re.compile(r'丁\s*(\d*|\d*.\d*)g\s*(\+|＋)')
+REGEX_KO_LIQUID = re.compile(r'(\d+)個\D*液(\d+|\d+\.\d+)g')
+REGEX_KO_GRAM_DENSITY = re.compile(r'(\D+)\s(\D+)(\d+)個＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)g')
+REGEX_KO_GRAM_INNER_PERCENT = re.compile(
+    r'(\D+)\s(\D+)(\d+)個\s(\d+|\d+\.\d+)g\s＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)％')
+REGEX_KO_GRAM_PERCENT = re.compile(r'(\D+)\s(\D+)(\d+)個\s*＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)％')
+REGEX_KO_GRAM_INNER_DENSITY = re.compile(
+    r'(\D+)\s(\D+)(\d+)個\s(\d+|\d+\.\d+)g\s＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)g')
+REGEX_KO_GRAM = re.compile(r'(\D+)\s(\D+)(\d+)個＋(\D+)(\d+|\d+\.\d+)g')
+REGEX_GRAM_GRAM_PERCENT = re.compile(r'(\D+)\s(\D+)(\d+|\d+\.\d+)g＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)％')
+REGEX_GRAM_GRAM_DENSITY = re.compile(r'(\D+)\s(\D+)(\d+|\d+\.\d+)g＋(\D+)(\d+|\d+\.\d+)g\s＋\D*(\d+|\d+\.\d+)g')
+REGEX_KO = re.compile(r'(\d+)個')
+REGEX_INNER_KO = re.compile(r'個\s*(\d*|\d*.\d*)g\s*(\+|＋)')
+REGEX_KO_DECIMAL = re.compile(r'(\d+|\d+\.\d+)個')
+REGEX_GRAM = re.compile(r'(\d+|\d+\.\d+)g')
+REGEX_SHEET = re.compile(r'(\d+|\d+\.\d+)枚')
+
+# 料理名の数量より前の部分
+REGEX_NAME_PARTS = re.compile(r'(\D+)(\d|\s)+')
+
+
+@lru_cache(maxsize=None)
+def _compile_unit_patterns(units: tuple):
+    """
+    計量表出力有効単位毎の、(数量, 単位の後のg数)の正規表現を作成する
+    """
+    return [(unit, re.compile(f'(\\d+){unit}'), re.compile(f'{unit}\\s*(\\d+|\\d+.\\d+)g\\s*(\\+|＋)')) for unit in units]
+
+
+class PlateNameParseResult:
+    """
+    料理名の解析結果。
+    正規表現の一致内容はfindallの結果(tupleに変換したもの)をそのまま保持する。複数の処理で共有するため、変更しないこと。
+    """
+    def __init__(self, name: str, units: tuple):
+        self.name = name
+
+        # 料理名の分類
+        self.is_soup = '⑤' in name
+        self.is_miso_soup = ('味噌汁' in name) or ('みそ汁' in name) or ('みそしる' in name)
+        # 「具」が入っていれば汁具とみなす
+        self.has_filling = '具' in name
+        # CCの記載のない汁もあるので、希釈だけで判断する
+        self.is_soup_liquid = (not self.has_filling) and (('希釈' in name) or ('水入れる' in name))
+        self.has_soup_word = ('スープ' in name) or ('汁' in name)
+        self.is_same_thickness = '液同' in name
+
+        # 先頭の丸数字(汁・スープは先頭の1文字を除外する)
+        self.number = name[0] if name else ''
+        if self.is_soup or (self.number in PLATE_NUMBERS):
+            self.numberless_name = name[1:]
+        else:
+            self.numberless_name = name
+        numberless_name = self.numberless_name
+
+        self.name_parts = PlateNameParser.find_name_parts(name)
+        self.grams = tuple(REGEX_GRAM.findall(numberless_name))
+        self.sheets = tuple(REGEX_SHEET.findall(numberless_name))
+        self.percentages = tuple(REGEX_PERCENTAGE.findall(numberless_name))
+
+        self.soup_ko_gram = ()
+        self.soup_gram = ()
+        self.soup_ko = ()
+
+        self.density_g = ()
+        self.density_p = ()
+        self.unit = None
+        self.unit_quantities = ()
+        self.unit_inner = ()
+        self.small = ()
+        self.liquid = ()
+        self.has_gu = False
+        self.is_sauce = False
+        self.cho = ()
+        self.cho_inner = ()
+        self.ko_liquid = ()
+        self.ko_gram_density = ()
+        self.ko_gram_inner_percent = ()
+        self.ko_gram_percent = ()
+        self.ko_gram_inner_density = ()
+        self.ko_gram = ()
+        self.gram_gram_percent = ()
+        self.gram_gram_density = ()
+        self.ko = ()
+        self.ko_inner = ()
+        self.ko_decimals = ()
+
+        self._kind = None
+        if self.is_soup:
+            self._parse_soup(numberless_name)
+        else:
+            self._parse_plate(numberless_name, units)
+
+    def _parse_soup(self, name: str):
+        self.soup_ko_gram = tuple(REGEX_SOUP_KO_GRAM.findall(name))
+        self.soup_gram = tuple(REGEX_SOUP_GRAM.findall(name))
+        self.soup_ko = tuple(REGEX_SOUP_KO.findall(name))
+
+    def _parse_plate(self, name: str, units: tuple):
+        self.density_g = tuple(REGEX_DENSITY_G.findall(name))
+        self.density_p = tuple(REGEX_DENSITY_P.findall(name))
+
+        for unit, regex_quantity, regex_inner in _compile_unit_patterns(units):
+            quantities = regex_quantity.findall(name)
+            if quantities:
+                self.unit = unit
+                self.unit_quantities = tuple(quantities)
+                self.unit_inner = tuple(regex_inner.findall(name))
+                break
+
+        self.small = tuple(REGEX_SMALL.findall(name))
+        self.liquid = tuple(REGEX_LIQUID.findall(name))
+        self.has_gu = bool(REGEX_HAS_GU.findall(name))
+        sub_liquid = REGEX_GRAM_PART.sub('', REGEX_GU_PART.sub('', name))
+        self.is_sauce = bool(REGEX_END_SAUCE.findall(sub_liquid))
+        self.cho = tuple(REGEX_CHO.findall(name))
+        self.cho_inner = tuple(REGEX_INNER_CHO.findall(name))
+        self.ko_liquid = tuple(REGEX_KO_LIQUID.findall(name))
+        self.ko_gram_density = tuple(REGEX_KO_GRAM_DENSITY.findall(name))
+        self.ko_gram_inner_percent = tuple(REGEX_KO_GRAM_INNER_PERCENT.findall(name))
+        self.ko_gram_percent = tuple(REGEX_KO_GRAM_PERCENT.findall(name))
+        self.ko_gram_inner_density = tuple(REGEX_KO_GRAM_INNER_DENSITY.findall(name))
+        self.ko_gram = tuple(REGEX_KO_GRAM.findall(name))
+        self.gram_gram_percent = tuple(REGEX_GRAM_GRAM_PERCENT.findall(name))
+        self.gram_gram_density = tuple(REGEX_GRAM_GRAM_DENSITY.findall(name))
+        self.ko = tuple(REGEX_KO.findall(name))
+        self.ko_inner = tuple(REGEX_INNER_KO.findall(name))
+        self.ko_decimals = tuple(REGEX_KO_DECIMAL.findall(name))
+
+    @property
+    def kind(self):
+        """
+        解析結果の種類。判定時に％の値を変換するため、初回参照時に判定する
+        """
+        if self._kind is None:
+            self._kind = self._get_soup_kind() if self.is_soup else self._get_plate_kind()
+        return self._kind
+
+    def _get_soup_kind(self):
+        if self.soup_ko_gram:
+            return KIND_SOUP_KO_GRAM
+        elif self.soup_gram:
+            return KIND_SOUP_GRAM
+        elif self.soup_ko:
+            return KIND_SOUP_KO
+        else:
+            return KIND_SOUP_NONE
+
+    def _get_plate_kind(self):
+        # 計量表の判定順(調理表の解析処理と同じ順)
+        if self.small:
+            return KIND_SEASONING_SMALL
+        elif self.liquid and self.is_sauce:
+            return KIND_SEASONING
+        elif self.unit:
+            return KIND_UNIT
+        elif self.cho:
+            return KIND_CHO
+        elif self.ko_liquid and (self.get_percentage() == 0):
+            # ％がある場合は除く(次の判定で処理する)
+            return KIND_KO_LIQUID
+        elif self.ko_gram_density:
+            return KIND_KO_GRAM_DENSITY
+        elif self.ko_gram_inner_percent:
+            return KIND_KO_GRAM_INNER_PERCENT
+        elif self.ko_gram_percent:
+            return KIND_KO_GRAM_PERCENT
+        elif self.ko_gram_inner_density:
+            return KIND_KO_GRAM_INNER_DENSITY
+        elif self.ko_gram:
+            return KIND_KO_GRAM
+        elif self.gram_gram_percent:
+            return KIND_GRAM_GRAM_PERCENT
+        elif self.gram_gram_density:
+            return KIND_GRAM_GRAM_DENSITY
+        elif self.ko:
+            return KIND_KO
+        elif self.grams:
+            return KIND_GRAM
+        else:
+            return KIND_NONE
+
+    def __str__(self):
+        return f'{self.name}({self.kind})'
+
+    def get_percentage(self):
+        """
+        料理名の％の値を取得する。％が3個以上ある場合は最後の値(合計)を使う
+        """
+        # 2個以上の想定例：
+        # ①かぼちゃの煮物2個+(赤キャップ4.5％＋水10.5％)で15％
+        if self.percentages:
+            if len(self.percentages) >= 3:
+                return float(self.percentages[-1])
+            else:
+                return float(self.percentages[0])
+        else:
+            return 0
+
+    def get_base_name(self):
+        """
+        料理名の数量より前の部分を取得する
+        """
+        if self.name_parts:
+            return self.name_parts[0][0].strip()
+        else:
+            raise ValueError('名称不正')
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(name: str, units: tuple):
+    return PlateNameParseResult(name, units)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _find_name_parts(name: str):
+    return tuple(REGEX_NAME_PARTS.findall(name))
+
+
+class PlateNameParser:
+    """
+    料理名の解析を共通化するクラス。
+    料理名の表記揺れを統一してから解析し、解析結果は統一後の料理名毎に保持する。
+    """
+    @classmethod
+    def normalize(cls, name: str) -> str:
+        return name.translate(NORMALIZE_TABLE)
+
+    @classmethod
+    def parse(cls, name: str) -> PlateNameParseResult:
+        return _parse(cls.normalize(name), tuple(settings.MEASURE_ENABLE_UNITS))
+
+    @classmethod
+    def find_name_parts(cls, name: str):
+        """
+        料理名を(数量以外の部分, 数量の先頭の文字)に分割する(表記揺れの統一は行わない)
+        """
+        return _find_name_parts(name)
+
+    @classmethod
+    def remove_print_marks(cls, name: str) -> str:
+        return name.translate(PRINT_MARK_TABLE)
+
+    @classmethod
+    def cache_info(cls):
+        return _parse.cache_info()
+
+    @classmethod
+    def clear(cls):
+        _parse.cache_clear()
+        _find_name_parts.cache_clear()
@@ -0,0 +1,117 @@
+import datetime as dt
+import logging
+from bisect import bisect_right
+from itertools import groupby
+
+from .models import MenuDisplay, NewUnitPrice
+
+logger = logging.getLogger(__name__)
+
+
+class PriceResolver:
+    """
+    施設・献立種類毎の単価を取得するクラス。
+    献立種類の表示設定(MenuDisplay)と単価変更情報(NewUnitPrice)を最初にまとめて読み込み、
+    売上日時点で適用される単価を、単価変更の適用日(NewUnitPrice.eating_day)の二分探索で求める。
+    """
+    PRICE_FIELDS = {
+        '朝食': 'price_breakfast',
+        '昼食': 'price_lunch',
+        '夕食': 'price_dinner',
+        '間食': 'price_snack',
+    }
+
+    def __init__(self, usernames=None):
+        """
+        usernames: 対象施設のユーザー名(User.username)のリスト。Noneの場合は全施設を対象とする
+        """
+        display_qs = MenuDisplay.objects.all().select_related('menu_name').order_by('id')
+        new_price_qs = NewUnitPrice.objects.all().order_by('username_id', 'menu_name', 'eating_day', 'id')
+        if usernames is not None:
+            usernames = list(usernames)
+            display_qs = display_qs.filter(username_id__in=usernames)
+            new_price_qs = new_price_qs.filter(username_id__in=usernames)
+
+        # (施設, 献立種類ID)->献立種類の表示設定。重複登録がある場合は最初の登録を使用する
+        self.display_dict = {}
+        for menu_display in display_qs:
+            self.display_dict.setdefault((menu_display.username_id, menu_display.menu_name_id), menu_display)
+
+        # (施設, 献立種類名)->(適用日のリスト, 単価変更情報のリスト)。いずれも適用日の昇順
+        self.new_price_dict = {}
+        for key, group in groupby(new_price_qs, key=lambda x: (x.username_id, x.menu_name)):
+            new_prices = list(group)
+            self.new_price_dict[key] = ([x.eating_day for x in new_prices], new_prices)
+
+        # 施設->(適用日のリスト, 単価変更情報のリスト)。献立種類を問わない参照用
+        self.user_new_price_dict = {}
+        new_prices = sorted(
+            [x for _, prices in self.new_price_dict.values() for x in prices],
+            key=lambda x: (x.username_id, x.eating_day, x.id))
+        for username, group in groupby(new_prices, key=lambda x: x.username_id):
+            user_prices = list(group)
+            self.user_new_price_dict[username] = ([x.eating_day for x in user_prices], user_prices)
+
+    @classmethod
+    def for_units(cls, units):
+        """
+        ユニットの施設を対象として読み込む
+        """
+        return cls(usernames={x.username_id for x in units})
+
+    def _to_date(self, day):
+        if isinstance(day, dt.datetime):
+            return day.date()
+        elif isinstance(day, str):
+            return dt.datetime.strptime(day, '%Y-%m-%d').date()
+        return day
+
+    def get_menu_display(self, username: str, menu_name_id: int):
+        return self.display_dict.get((username, menu_name_id), None)
+
+    def get_new_price(self, username: str, menu_name: str, sales_day):
+        """
+        売上日時点で適用される単価変更情報を取得する。適用済みの単価変更がなければNone
+        """
+        if not sales_day:
+            return None
+
+        days, new_prices = self.new_price_dict.get((username, menu_name), ([], []))
+        index = bisect_right(days, self._to_date(sales_day))
+        if index:
+            return new_prices[index - 1]
+        else:
+            return None
+
+    def get_user_new_prices(self, username: str, sales_day):
+        """
+        売上日時点で適用済みの施設の単価変更情報を、適用日の新しい順に取得する
+        """
+        days, new_prices = self.user_new_price_dict.get(username, ([], []))
+        index = bisect_right(days, self._to_date(sales_day))
+        return new_prices[index - 1::-1] if index else []
+
+    def get_price(self, username: str, menu_name, meal_name: str, sales_day):
+        """
+        売上日時点の食事区分の単価を取得する。献立種類の表示設定がない場合はNone
+        menu_name: 献立種類(MenuMaster)
+        """
+        menu_display = self.get_menu_display(username, menu_name.id)
+        if not menu_display:
+            return None
+
+        field = self.PRICE_FIELDS.get(meal_name, None)
+        if not field:
+            return None
+
+        new_price = self.get_new_price(username, menu_name.menu_name, sales_day)
+        if new_price:
+            return getattr(new_price, field)
+        else:
+            return getattr(menu_display, field)
+
+    def get_order_price(self, order, sales_day):
+        """
+        注文の売上日時点の単価を取得する
+        """
+        return self.get_price(order.unit_name.username_id, order.menu_name, order.meal_name.meal_name, sales_day)
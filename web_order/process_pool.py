@@ -0,0 +1,44 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import connections
+
+# 子プロセスに引き継ぐ設定値(テスト時などに実行中に変更される出力先)
+INHERIT_SETTINGS = ('MEDIA_ROOT', 'OUTPUT_DIR')
+
+
+def init_process(databases: dict, inherit_settings: dict):
+    """
+    プロセスプールの子プロセスを初期化する。
+    Djangoを初期化し、親プロセスと同じ接続先(テスト実行時はテスト用DB)・出力先を使用する
+    """
+    django.setup()
+    for name, value in inherit_settings.items():
+        setattr(settings, name, value)
+    for alias, name in databases.items():
+        connections[alias].settings_dict['NAME'] = name
+
+
+class DatabaseProcessPool:
+    """
+    DBを参照する処理を実行するプロセスプール。
+    子プロセスは親プロセスのDB接続を引き継がないよう、spawn方式で起動して子プロセス毎に新しく接続する。
+    子プロセスからは親プロセスのトランザクション内の未コミットの更新を参照できないため、
+    トランザクションの外(更新をコミットした後)でのみ使用できる。
+    """
+    @classmethod
+    def is_available(cls, using: str = 'default'):
+        """
+        プロセスプールを使用できるかどうか(トランザクション内の場合は使用できない)
+        """
+        return not connections[using].in_atomic_block
+
+    @classmethod
+    def create(cls, processes: int):
+        databases = {alias: connections[alias].settings_dict['NAME'] for alias in connections}
+        inherit_settings = {name: getattr(settings, name) for name in INHERIT_SETTINGS}
+        return ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_process, initargs=(databases, inherit_settings))
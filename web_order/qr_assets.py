@@ -0,0 +1,305 @@
+import io
+import json
+import logging
+import os
+import shutil
+import time
+import zipfile
+from collections import OrderedDict
+
+import qrcode
+from openpyxl.drawing.image import Image
+
+from django.conf import settings
+
+from .process_pool import DatabaseProcessPool
+
+try:
+    import fcntl
+except ImportError:
+    # Windows(開発環境)
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+STORE_FILES = 'files'   # QRコード値毎に画像ファイル(png)を保存する
+STORE_ZIP = 'zip'       # 全ての画像を1つのアーカイブ(zip)に保存する
+STORE_TYPES = (STORE_FILES, STORE_ZIP)
+
+MANIFEST_FILE_NAME = 'manifest.json'
+ARCHIVE_FILE_NAME = 'qr_images.zip'
+LOCK_FILE_NAME = '.lock'
+
+# プロセスプールを使わずに作成する画像数の上限
+SERIAL_RENDER_LIMIT = 64
+
+
+def render_qr_png(value: str):
+    """
+    QRコード値の画像(png)を作成する。プロセスプールから呼び出すため、DBやモデルは参照しない
+    """
+    qr = qrcode.QRCode(
+        version=2,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=2,
+        border=4
+    )
+    qr.add_data(value)
+    qr.make()
+
+    img = qr.make_image(fill_color="black", back_color="#ffffff")
+    buffer = io.BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+class QrImageStoreLock:
+    """
+    保存先の画像・マニフェストを更新する間、他のプロセスの更新を待たせるためのロック(ロック用ファイルの排他ロック)
+    """
+    # Windowsでロックを取得できなかった場合の再試行間隔(秒)
+    RETRY_INTERVAL = 0.1
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a+b')
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(self.RETRY_INTERVAL)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+        return False
+
+
+class QrImageGenerateSummary:
+    """
+    QRコード画像の作成結果
+    """
+    def __init__(self, store: str):
+        self.store = store
+        self.target_count = 0
+        self.exists_count = 0
+        self.created_count = 0
+        self.processes = 1
+
+    def __str__(self):
+        return f'保存形式={self.store},対象={self.target_count},作成済={self.exists_count},' \
+               f'作成={self.created_count},プロセス数={self.processes}'
+
+
+class QrImageStore:
+    """
+    ピッキング用QRコード画像の保存・読込を行うクラス。
+    作成済みの画像はマニフェスト(manifest.json)で管理し、未作成の画像のみをプロセスプールで作成する。
+    ユニット登録と管理コマンドが同時に作成する場合に備え、作成はロック用ファイル(.lock)で1プロセスずつ行う。
+    zip形式の場合、読込中のプロセスに影響しないよう作成の度にアーカイブ全体を複製するため、
+    ユニット毎の追加が多い運用ではfiles形式を使う。
+    """
+    def __init__(self, root_dir: str = None, store: str = None):
+        self.root_dir = root_dir or os.path.join(settings.MEDIA_ROOT, 'qr')
+        self.store = store or settings.QR_IMAGE_STORE
+        if self.store not in STORE_TYPES:
+            raise ValueError(f'不正な保存形式:{self.store}')
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root_dir, MANIFEST_FILE_NAME)
+
+    @property
+    def archive_path(self):
+        return os.path.join(self.root_dir, ARCHIVE_FILE_NAME)
+
+    @property
+    def lock_path(self):
+        return os.path.join(self.root_dir, LOCK_FILE_NAME)
+
+    def _get_tmp_path(self, path: str):
+        # 他のプロセスの作成中のファイルと重ならないよう、プロセス毎に別名にする
+        return f'{path}.{os.getpid()}.tmp'
+
+    def _scan_file_names(self):
+        """
+        保存済みの画像ファイル名を取得する(マニフェストがない場合の初期化用)
+        """
+        if self.store == STORE_ZIP:
+            if not os.path.isfile(self.archive_path):
+                return []
+            with zipfile.ZipFile(self.archive_path) as z:
+                return z.namelist()
+        else:
+            return [x.name for x in os.scandir(self.root_dir) if x.is_file() and x.name.endswith('.png')]
+
+    def load_manifest(self, rebuild: bool = False):
+        """
+        作成済みの画像のファイル名を取得する。マニフェストがない(または保存形式が異なる)場合は、保存先から読み込む
+        """
+        if (not rebuild) and os.path.isfile(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('store', None) == self.store:
+                return set(manifest.get('files', []))
+
+        return set(self._scan_file_names())
+
+    def save_manifest(self, file_names):
+        tmp_path = self._get_tmp_path(self.manifest_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'store': self.store, 'files': sorted(file_names)}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def render(self, values, processes: int = None):
+        """
+        QRコード値の画像をまとめて作成する。件数が少ない場合・トランザクション内の場合は、プロセスプールを使わない
+        """
+        processes = processes or settings.QR_IMAGE_PROCESSES
+        if (processes > 1) and not DatabaseProcessPool.is_available():
+            logger.warning('トランザクション内のため、QRコード画像を1プロセスで作成します')
+            processes = 1
+        if (processes <= 1) or (len(values) <= SERIAL_RENDER_LIMIT):
+            return [render_qr_png(x) for x in values], 1
+
+        # 子プロセスが呼び出し元(画面・バッチ処理)のDB接続を引き継がないよう、spawn方式のプロセスプールを使う
+        chunk_size = max(len(values) // (processes * 4), 1)
+        with DatabaseProcessPool.create(processes) as executor:
+            return list(executor.map(render_qr_png, values, chunksize=chunk_size)), processes
+
+    def _write_files(self, images):
+        for file_name, data in images:
+            with open(os.path.join(self.root_dir, file_name), 'wb') as f:
+                f.write(data)
+
+    def _write_archive(self, images):
+        # 読込中のプロセスに影響しないよう、複製したアーカイブに追加してから置き換える
+        tmp_path = self._get_tmp_path(self.archive_path)
+        if os.path.isfile(self.archive_path):
+            shutil.copyfile(self.archive_path, tmp_path)
+            mode = 'a'
+        else:
+            mode = 'w'
+        with zipfile.ZipFile(tmp_path, mode, compression=zipfile.ZIP_STORED) as dst:
+            for file_name, data in images:
+                dst.writestr(file_name, data)
+        os.replace(tmp_path, self.archive_path)
+
+    def generate(self, targets, processes: int = None, rebuild: bool = False):
+        """
+        未作成のQRコード画像を作成する(既存は上書きしない)
+        targets: key:画像ファイル名、value:QRコード値のdict
+        """
+        os.makedirs(self.root_dir, exist_ok=True)  # 上書きOK
+
+        summary = QrImageGenerateSummary(self.store)
+        summary.target_count = len(targets)
+
+        # マニフェストの読込から保存までの間に、他のプロセスが画像・マニフェストを更新しないようにする
+        with QrImageStoreLock(self.lock_path):
+            exists_names = self.load_manifest(rebuild)
+            new_names = [x for x in targets.keys() if not (x in exists_names)]
+            summary.exists_count = summary.target_count - len(new_names)
+            if new_names:
+                images, summary.processes = self.render([targets[x] for x in new_names], processes)
+                if self.store == STORE_ZIP:
+                    self._write_archive(zip(new_names, images))
+                else:
+                    self._write_files(zip(new_names, images))
+                summary.created_count = len(new_names)
+
+                self.save_manifest(exists_names | set(new_names))
+            elif rebuild or (not os.path.isfile(self.manifest_path)):
+                self.save_manifest(exists_names)
+
+        logger.info(f'QRコード画像作成:{summary}')
+        return summary
+
+    def read(self, path: str):
+        """
+        QRコード画像の内容を取得する。path:画像ファイルのパス(QrCodeUtilで取得したもの)
+        """
+        if self.store == STORE_ZIP:
+            file_name = os.path.basename(path)
+            if os.path.isfile(self.archive_path):
+                with zipfile.ZipFile(self.archive_path) as z:
+                    try:
+                        return z.read(file_name)
+                    except KeyError:
+                        pass
+
+        # アーカイブにない画像(混ぜご飯集約用など)は、画像ファイルから読み込む
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+class QrImageCache:
+    """
+    1回の帳票出力で使うQRコード画像を、QRコード値をキーに保持するクラス。
+    同じ出力の全ての書込クラスで共有し、同じQRコード画像は保存先から読み直さない。
+    保持件数の上限を超えた場合は、使われていない期間の長いものから破棄する。
+    """
+    def __init__(self, store: QrImageStore = None, max_size: int = None):
+        self.store = store or QrImageStore()
+        self.max_size = max_size or settings.QR_IMAGE_CACHE_SIZE
+        self._images = OrderedDict()
+
+        self.request_count = 0
+        self.load_count = 0
+        self.eviction_count = 0
+
+    @property
+    def avoided_count(self):
+        """
+        保持していた内容を使い、読込を省略した件数
+        """
+        return self.request_count - self.load_count
+
+    def __str__(self):
+        return f'要求={self.request_count},読込={self.load_count},読込省略={self.avoided_count},破棄={self.eviction_count}'
+
+    def read(self, qr_value: str, path: str):
+        """
+        QRコード画像の内容を取得する
+        qr_value: QRコード値、path: 画像ファイルのパス(QrCodeUtilで取得したもの)
+        """
+        self.request_count += 1
+        data = self._images.get(qr_value, None)
+        if data is not None:
+            self._images.move_to_end(qr_value)
+            return data
+
+        data = self.store.read(path)
+        self.load_count += 1
+        self._images[qr_value] = data
+        while len(self._images) > self.max_size:
+            self._images.popitem(last=False)
+            self.eviction_count += 1
+        return data
+
+    def get_image(self, qr_value: str, path: str, width: int, height: int):
+        """
+        Excelに貼り付けるQRコード画像を取得する
+        """
+        # openpyxlは保存時に画像の内容を読み込んで閉じるため、画像毎に別のBytesIOを使う
+        qr_image = Image(io.BytesIO(self.read(qr_value, path)))
+        qr_image.width = width
+        qr_image.height = height
+        return qr_image
@@ -1856,3 +1856,1815 @@ class OrderChangeDates202212Tests(TestCase):
     def tearDownClass(cls):
         super().tearDownClass()
 
+
+
+from .jobs import BatchJobManager
+from .models import BatchJob
+class BatchJobManagerTests(TestCase):
+    def test_enqueue(self):
+        job, created = BatchJobManager.enqueue('aggregation', '2024-04-01', '2024-04-01', requested_by='admin')
+
+        self.assertTrue(created)
+        self.assertEqual(job.status, 'waiting')
+        self.assertEqual(job.arguments, ['2024-04-01'])
+
+    def test_enqueue_duplicated(self):
+        """
+        同一コマンド・同一日付の未完了ジョブは二重登録されない
+        """
+        job, _ = BatchJobManager.enqueue('aggregation', '2024-04-01', '2024-04-01')
+        job2, created = BatchJobManager.enqueue('aggregation', '2024-04-01', '2024-04-01')
+
+        self.assertFalse(created)
+        self.assertEqual(job.id, job2.id)
+        self.assertEqual(BatchJob.objects.count(), 1)
+
+    def test_enqueue_after_finished(self):
+        job, _ = BatchJobManager.enqueue('aggregation', '2024-04-01', '2024-04-01')
+        job.status = 'done'
+        job.save()
+
+        job2, created = BatchJobManager.enqueue('aggregation', '2024-04-01', '2024-04-01')
+
+        self.assertTrue(created)
+        self.assertNotEqual(job.id, job2.id)
+
+    def test_enqueue_other_command(self):
+        BatchJobManager.enqueue('aggregation', '2024-04-01', '2024-04-01')
+        _, created = BatchJobManager.enqueue('gen_invoice_label', '2024-04-01', '2024-04-01')
+
+        self.assertTrue(created)
+
+    def test_enqueue_invalid_command(self):
+        with self.assertRaises(ValueError):
+            BatchJobManager.enqueue('change_pass', '2024-04-01')
+
+
+import os
+import shutil
+import tempfile
+import time
+from django.test import override_settings
+from .jobs import BatchJobResult, BatchJobWorker
+class BatchJobWorkerTests(TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        BatchJobResult.finish()
+        shutil.rmtree(self.root_dir)
+
+    def write(self, *names):
+        path = os.path.join(self.root_dir, *names)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write('test')
+        return path
+
+    def test_result_files(self):
+        """
+        出力ファイルは、同じフォルダに同時に出力された他のジョブのファイルを含まない
+        """
+        job, _ = BatchJobManager.enqueue('agg_measure', '2024-04-08', '2024-04-08')
+        old_file = self.write('measure', '計量表_2024-04-08_製造', 'old.xlsx')
+        past = time.time() - 3600
+        os.utime(old_file, (past, past))
+
+        worker = BatchJobWorker('test')
+        job = worker.claim()
+        BatchJobResult.start()
+        new_dir = os.path.join(self.root_dir, 'measure', '計量表_2024-04-08_製造')
+        BatchJobResult.add(new_dir)
+        self.write('measure', '計量表_2024-04-08_製造', '2024-04-10_朝_常食.xlsx')
+        self.write('measure', '計量表_2024-04-09_製造', '2024-04-11_朝_常食.xlsx')
+
+        with override_settings(MEDIA_ROOT=self.root_dir):
+            job.status = 'done'
+            worker._finish(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.result_files, ['measure/計量表_2024-04-08_製造/2024-04-10_朝_常食.xlsx'])
+
+    def test_result_files_not_worker(self):
+        """
+        ワーカー以外から実行した場合は、出力先を記録しない
+        """
+        BatchJobResult.add(self.root_dir)
+        self.assertEqual(BatchJobResult.finish(), [])
+
+
+from accounts.models import User
+from .models import UnitMaster, MenuMaster, MealMaster, MenuDisplay, MealDisplay, AllergenMaster, Order
+from .order_slots import OrderSlotGenerator
+class OrderSlotGeneratorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        self.unit = UnitMaster.objects.create(
+            unit_name='テストユニット', group='テスト', seq_order=1, is_active=True, username=self.user, unit_code=10001)
+        self.joshoku = MenuMaster.objects.create(menu_name='常食', group='常食', seq_order=1)
+        self.usuaji = MenuMaster.objects.create(menu_name='薄味', group='常食', seq_order=2)
+        self.soft = MenuMaster.objects.create(menu_name='ソフト', group='嚥下', seq_order=3)
+        self.breakfast = MealMaster.objects.create(meal_name='朝食', soup=True, filling=True, miso_soup='汁具', seq_order=1)
+        self.lunch = MealMaster.objects.create(meal_name='昼食', soup=True, filling=True, miso_soup='汁具', seq_order=2)
+        AllergenMaster.objects.create(id=1, allergen_name='なし', is_common=False)
+        for menu in [self.joshoku, self.usuaji, self.soft]:
+            MenuDisplay.objects.create(username=self.user, menu_name=menu)
+        for meal in [self.breakfast, self.lunch]:
+            MealDisplay.objects.create(username=self.user, meal_name=meal)
+
+        start = dt.date(2024, 4, 2)
+        self.date_list = [start + dt.timedelta(days=i) for i in range(7)]
+
+    def test_generate(self):
+        summary = OrderSlotGenerator().generate([self.unit], [self.date_list])
+
+        # 薄味は作成しない
+        self.assertEqual(summary.created_count, 2 * 2 * 7)
+        self.assertFalse(Order.objects.filter(menu_name=self.usuaji).exists())
+
+        # 仮注文入力画面の並び(ID順)が、献立種類→食事区分→日付の順になっている
+        orders = list(Order.objects.all().order_by('id'))
+        self.assertEqual(orders[0].menu_name, self.joshoku)
+        self.assertEqual(orders[0].meal_name, self.breakfast)
+        self.assertEqual(orders[6].eating_day, self.date_list[-1])
+        self.assertEqual(orders[7].meal_name, self.lunch)
+        self.assertEqual(orders[14].menu_name, self.soft)
+
+    def test_skip_exists(self):
+        Order.objects.create(unit_name=self.unit, menu_name=self.joshoku, meal_name=self.breakfast,
+                             eating_day=self.date_list[0], allergen_id=1, quantity=3)
+
+        summary = OrderSlotGenerator().generate([self.unit], [self.date_list])
+
+        self.assertEqual(summary.exists_count, 1)
+        self.assertEqual(summary.created_count, 2 * 2 * 7 - 1)
+        self.assertEqual(Order.objects.filter(eating_day=self.date_list[0], menu_name=self.joshoku,
+                                              meal_name=self.breakfast).count(), 1)
+
+    def test_dry_run(self):
+        summary = OrderSlotGenerator().generate([self.unit], [self.date_list], dry_run=True)
+
+        self.assertEqual(summary.planned_count, 2 * 2 * 7)
+        self.assertEqual(summary.created_count, 0)
+        self.assertFalse(Order.objects.exists())
+
+    def test_not_skip_abolished(self):
+        summary = OrderSlotGenerator(skip_abolished=False).generate([self.unit], [self.date_list])
+
+        self.assertEqual(summary.created_count, 3 * 2 * 7)
+
+    def test_conflict(self):
+        """
+        作成済み確認後に他の処理で作成された枠は、作成数に含めない
+        """
+        class ConcurrentOrderSlotGenerator(OrderSlotGenerator):
+            def _load_exists(self, units, date_blocks):
+                return set()
+
+        Order.objects.create(unit_name=self.unit, menu_name=self.joshoku, meal_name=self.breakfast,
+                             eating_day=self.date_list[0], allergen_id=1, quantity=3)
+
+        summary = ConcurrentOrderSlotGenerator().generate([self.unit], [self.date_list])
+
+        self.assertEqual(summary.planned_count, 2 * 2 * 7)
+        self.assertEqual(summary.created_count, 2 * 2 * 7 - 1)
+
+from accounts.models import User
+from .models import UnitMaster, MenuMaster, MealMaster, MenuDisplay, NewUnitPrice, AllergenMaster, Order
+from .prices import PriceResolver
+class PriceResolverTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        self.other_user = User.objects.create_user(username='10002', password='test', dry_cold_type='乾燥')
+        self.unit = UnitMaster.objects.create(
+            unit_name='テストユニット', group='テスト', seq_order=1, is_active=True, username=self.user, unit_code=10001)
+        self.joshoku = MenuMaster.objects.create(menu_name='常食', group='常食', seq_order=1)
+        self.soft = MenuMaster.objects.create(menu_name='ソフト', group='嚥下', seq_order=3)
+        self.breakfast = MealMaster.objects.create(meal_name='朝食', soup=True, filling=True, miso_soup='汁具', seq_order=1)
+        self.lunch = MealMaster.objects.create(meal_name='昼食', soup=True, filling=True, miso_soup='汁具', seq_order=2)
+        AllergenMaster.objects.create(id=1, allergen_name='なし', is_common=False)
+
+        MenuDisplay.objects.create(username=self.user, menu_name=self.joshoku,
+                                   price_breakfast=300, price_lunch=500, price_dinner=500)
+        MenuDisplay.objects.create(username=self.other_user, menu_name=self.joshoku,
+                                   price_breakfast=310, price_lunch=510, price_dinner=510)
+        NewUnitPrice.objects.create(username=self.user, menu_name='常食', eating_day=dt.date(2024, 4, 1),
+                                    price_breakfast=320, price_lunch=520, price_dinner=520)
+        NewUnitPrice.objects.create(username=self.user, menu_name='常食', eating_day=dt.date(2024, 10, 1),
+                                    price_breakfast=330, price_lunch=530, price_dinner=530)
+        NewUnitPrice.objects.create(username=self.user, menu_name='ソフト', eating_day=dt.date(2024, 6, 1),
+                                    price_breakfast=400, price_lunch=600, price_dinner=600)
+
+    def test_get_price(self):
+        resolver = PriceResolver()
+
+        # 単価変更前は献立種類の単価
+        self.assertEqual(resolver.get_price('10001', self.joshoku, '朝食', dt.date(2024, 3, 31)), 300)
+
+        # 適用日以降は、適用済みの最新の単価変更
+        self.assertEqual(resolver.get_price('10001', self.joshoku, '朝食', dt.date(2024, 4, 1)), 320)
+        self.assertEqual(resolver.get_price('10001', self.joshoku, '昼食', dt.date(2024, 9, 30)), 520)
+        self.assertEqual(resolver.get_price('10001', self.joshoku, '夕食', dt.date(2024, 10, 1)), 530)
+
+        # 他施設の単価変更は影響しない
+        self.assertEqual(resolver.get_price('10002', self.joshoku, '朝食', dt.date(2024, 10, 1)), 310)
+
+        # 献立種類の表示設定がない
+        self.assertIsNone(resolver.get_price('10001', self.soft, '朝食', dt.date(2024, 10, 1)))
+
+    def test_get_new_price_matches_query(self):
+        resolver = PriceResolver(usernames=['10001'])
+        for sales_day in [dt.date(2024, 3, 31), dt.date(2024, 4, 1), dt.date(2024, 6, 15), dt.date(2024, 10, 2)]:
+            expected = NewUnitPrice.objects.filter(
+                username__username='10001', menu_name='常食', eating_day__lte=sales_day).order_by('-eating_day').first()
+            self.assertEqual(resolver.get_new_price('10001', '常食', sales_day), expected)
+
+    def test_get_user_new_prices(self):
+        resolver = PriceResolver()
+
+        new_prices = resolver.get_user_new_prices('10001', dt.date(2024, 7, 1))
+        self.assertEqual([(x.menu_name, x.eating_day) for x in new_prices],
+                         [('ソフト', dt.date(2024, 6, 1)), ('常食', dt.date(2024, 4, 1))])
+        self.assertEqual(resolver.get_user_new_prices('10001', dt.date(2024, 3, 1)), [])
+        self.assertEqual(resolver.get_user_new_prices('10002', dt.date(2024, 7, 1)), [])
+
+    def test_get_order_price(self):
+        order = Order.objects.create(unit_name=self.unit, menu_name=self.joshoku, meal_name=self.lunch,
+                                     eating_day=dt.date(2024, 10, 2), allergen_id=1, quantity=2)
+        resolver = PriceResolver.for_units([self.unit])
+
+        self.assertEqual(resolver.get_order_price(order, dt.date(2024, 10, 1)), 530)
+        self.assertEqual(resolver.get_order_price(order, '2024-09-30'), 520)
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from .date_management import SalesDayCalculator
+from .models import InvoiceException, Order
+class SalesDayCalculatorTests(TestCase):
+    test_settings = [
+        (2, '2000-01-01'),
+        (3, '2024-03-01')
+    ]
+
+    def setUp(self):
+        self.exception_masters = [
+            InvoiceException(unit_name_id=1, ng_saturday=0, ng_sunday=0, ng_holiday=0, reduced_rate=False, is_far=True),
+            InvoiceException(unit_name_id=2, ng_saturday=-1, ng_sunday=1, ng_holiday=0, reduced_rate=False, is_far=False),
+            InvoiceException(unit_name_id=3, ng_saturday=2, ng_sunday=-2, ng_holiday=0, reduced_rate=True, is_far=False),
+            InvoiceException(unit_name_id=4, ng_saturday=0, ng_sunday=0, ng_holiday=0, reduced_rate=True, is_far=True),
+        ]
+
+        # 売上日の設定変更(2024-03-01)をまたぐ期間の全ユニット(5は売上日調整なし)・全日付
+        start = dt.date(2024, 2, 1)
+        self.orders = [Order(unit_name_id=unit_id, eating_day=start + dt.timedelta(days=i))
+                       for unit_id in range(1, 6) for i in range(60)]
+
+    def get_sales_day_by_row(self, order):
+        """
+        ユニット毎の売上日調整を1件ずつ適用する(従来の算出方法)
+        """
+        unit_em = [x for x in self.exception_masters if x.unit_name_id == order.unit_name_id]
+        solid_day = SalesDayUtil.get_by_eating_day(order.eating_day, self.test_settings)
+        if unit_em:
+            unit_em_first = unit_em[0]
+            week_day = solid_day.weekday()
+            if week_day == 4:
+                if unit_em_first.is_far:
+                    return solid_day + relativedelta(days=-1)
+                else:
+                    return solid_day
+            elif week_day == 5:
+                return solid_day + relativedelta(days=unit_em_first.ng_saturday)
+            elif week_day == 6:
+                return solid_day + relativedelta(days=unit_em_first.ng_sunday)
+            elif unit_em_first.reduced_rate:
+                return order.eating_day
+            else:
+                return solid_day
+        else:
+            return solid_day
+
+    def test_parity(self):
+        calculator = SalesDayCalculator(self.exception_masters, self.test_settings)
+        result = list(calculator.generate(self.orders))
+
+        self.assertEqual(len(result), len(self.orders))
+        for order, sales_day in result:
+            self.assertEqual(sales_day, self.get_sales_day_by_row(order), (order.unit_name_id, order.eating_day))
+            self.assertIsInstance(sales_day, dt.date)
+
+    def test_is_far(self):
+        calculator = SalesDayCalculator(self.exception_masters, self.test_settings)
+
+        # 売上日(標準)が金曜日: 遠隔地のみ木曜日
+        sales_days = calculator.calc([1, 2, 5], [dt.date(2024, 4, 8)] * 3)
+        self.assertEqual(list(sales_days.astype(object)), [dt.date(2024, 4, 4), dt.date(2024, 4, 5), dt.date(2024, 4, 5)])
+
+    def test_ng_saturday_sunday(self):
+        calculator = SalesDayCalculator(self.exception_masters, self.test_settings)
+
+        # 売上日(標準)が土曜日・日曜日
+        sales_days = calculator.calc([2, 2, 3, 3], [dt.date(2024, 4, 9), dt.date(2024, 4, 10)] * 2)
+        self.assertEqual(list(sales_days.astype(object)), [
+            dt.date(2024, 4, 5), dt.date(2024, 4, 8), dt.date(2024, 4, 8), dt.date(2024, 4, 5)])
+
+    def test_reduced_rate(self):
+        calculator = SalesDayCalculator(self.exception_masters, self.test_settings)
+
+        # 業務委託は喫食日=売上日。ただし売上日(標準)が金〜日曜日の場合は曜日毎の調整を優先する
+        sales_days = calculator.calc([3, 3, 4], [dt.date(2024, 4, 4), dt.date(2024, 4, 8), dt.date(2024, 4, 8)])
+        self.assertEqual(list(sales_days.astype(object)), [dt.date(2024, 4, 4), dt.date(2024, 4, 5), dt.date(2024, 4, 4)])
+
+    def test_calc_frame(self):
+        calculator = SalesDayCalculator(self.exception_masters, self.test_settings)
+        df = pd.DataFrame({
+            'unit_name_id': [x.unit_name_id for x in self.orders],
+            'eating_day': [x.eating_day for x in self.orders]
+        })
+
+        sales_days = calculator.calc_frame(df)
+        self.assertEqual(sales_days.tolist(), [self.get_sales_day_by_row(x) for x in self.orders])
+
+    def test_empty(self):
+        calculator = SalesDayCalculator([], self.test_settings)
+        self.assertEqual(list(calculator.generate([])), [])
+
+    def test_no_settings(self):
+        calculator = SalesDayCalculator([], self.test_settings)
+        with self.assertRaises(ValueError):
+            calculator.calc([1], [dt.date(1999, 12, 31)])
+
+import numpy as np
+from .date_management import DateSettingsTable, OrderChangableDayUtil, get_date_settings_table
+class DateSettingsTableTests(TestCase):
+    test_settings = [
+        (3, '2024-03-01'),
+        (2, '2000-01-01'),
+    ]
+
+    def test_get(self):
+        table = DateSettingsTable(self.test_settings)
+
+        # 適用開始日の昇順で判定する
+        self.assertEqual(table.get(dt.date(2024, 2, 29)), 2)
+        self.assertEqual(table.get(dt.date(2024, 3, 1)), 3)
+        self.assertEqual(table.get(dt.datetime(2024, 3, 1, 9, 0)), 3)
+        with self.assertRaises(IndexError):
+            table.get(dt.date(1999, 12, 31))
+
+    def test_get_many(self):
+        table = DateSettingsTable(self.test_settings)
+        days = [dt.date(2024, 2, 1) + dt.timedelta(days=i) for i in range(60)]
+
+        self.assertEqual(table.get_many(days).tolist(), [table.get(x) for x in days])
+        self.assertEqual(table.get_many(np.array(days, dtype='datetime64[D]')).tolist(), [table.get(x) for x in days])
+        self.assertEqual(len(table.get_many([])), 0)
+        with self.assertRaises(IndexError):
+            table.get_many([dt.date(2024, 3, 1), dt.date(1999, 12, 31)])
+
+    def test_cache(self):
+        self.assertIs(get_date_settings_table(self.test_settings), get_date_settings_table(list(self.test_settings)))
+
+    def test_get_by_eating_days(self):
+        days = [dt.date(2024, 2, 1) + dt.timedelta(days=i) for i in range(60)]
+
+        sales_days = SalesDayUtil.get_by_eating_days(days, self.test_settings)
+        self.assertEqual(list(sales_days.astype(object)),
+                         [SalesDayUtil.get_by_eating_day(x, self.test_settings) for x in days])
+
+    def test_get_rule_versions(self):
+        change_settings = [(1, '2000-01-01'), (2, '2024-02-22')]
+        days = [dt.date(2024, 2, 20), dt.date(2024, 2, 21), dt.date(2024, 2, 21), dt.date(2024, 2, 22)]
+        hours = [23, 9, 10, 0]
+
+        versions = OrderChangableDayUtil.get_rule_versions(days, hours, change_settings)
+        self.assertEqual(versions.tolist(), [1, 1, 2, 2])
+        self.assertEqual(versions.tolist(),
+                         [OrderChangableDayUtil.get_rule_version(x, y, change_settings) for x, y in zip(days, hours)])
+
+from .business_calendar import BusinessCalendar
+from .models import HolidayList, JapanHoliday
+class BusinessCalendarTests(TestCase):
+    def setUp(self):
+        BusinessCalendar.clear()
+        for day in [dt.date(2024, 4, 29), dt.date(2024, 5, 3), dt.date(2024, 5, 4), dt.date(2024, 5, 6)]:
+            JapanHoliday.objects.create(name='祝日', date=day)
+        HolidayList.objects.create(holiday_name='年末年始', start_date=dt.date(2024, 12, 29),
+                                   end_date=dt.date(2025, 1, 3), limit_day=dt.date(2024, 12, 14))
+        HolidayList.objects.create(holiday_name='年始', start_date=dt.date(2025, 1, 4),
+                                   end_date=dt.date(2025, 1, 5), limit_day=dt.date(2024, 12, 21))
+
+    def tearDown(self):
+        BusinessCalendar.clear()
+
+    def get_holidays(self):
+        return list(JapanHoliday.objects.all().values_list('date', flat=True))
+
+    def add_working_days_by_loop(self, day, days, weekend):
+        # 祝日・週末を1日ずつ判定する(従来の算出方法)
+        holidays = self.get_holidays()
+        while (day.date() in holidays) or (day.weekday() in weekend):
+            day += dt.timedelta(days=1)
+        for _ in range(days):
+            day += dt.timedelta(days=1)
+            while (day.date() in holidays) or (day.weekday() in weekend):
+                day += dt.timedelta(days=1)
+        return day
+
+    def prev_working_day_by_loop(self, day, days):
+        holidays = self.get_holidays()
+        for _ in range(days):
+            day -= dt.timedelta(days=1)
+            while (day.date() in holidays) or (day.weekday() in [5, 6]):
+                day -= dt.timedelta(days=1)
+        return day
+
+    def test_is_working_day(self):
+        calendar = BusinessCalendar.get()
+
+        self.assertFalse(calendar.is_working_day(dt.date(2024, 4, 29)))
+        self.assertTrue(calendar.is_working_day(dt.date(2024, 4, 27)))
+        self.assertFalse(calendar.is_working_day(dt.date(2024, 4, 27), BusinessCalendar.WEEKMASK_V2))
+        self.assertFalse(calendar.is_working_day(dt.datetime(2024, 4, 28, 11, 0)))
+
+    def test_working_days_parity(self):
+        calendar = BusinessCalendar.get()
+        start = dt.datetime(2024, 4, 20, 10, 30)
+        for i in range(30):
+            day = start + dt.timedelta(days=i)
+            for days in [0, 1, 6, 7]:
+                self.assertEqual(calendar.add_working_days(day, days, BusinessCalendar.WEEKMASK_V1),
+                                 self.add_working_days_by_loop(day, days, [6]), (day, days))
+                self.assertEqual(calendar.prev_working_day(day, days, BusinessCalendar.WEEKMASK_V2),
+                                 self.prev_working_day_by_loop(day, days), (day, days))
+
+    def test_long_holiday(self):
+        calendar = BusinessCalendar.get()
+
+        self.assertFalse(calendar.is_long_holiday(dt.date(2024, 12, 28)))
+        self.assertTrue(calendar.is_long_holiday(dt.date(2024, 12, 29)))
+        self.assertTrue(calendar.is_long_holiday(dt.date(2025, 1, 5)))
+
+        # 連続する長期休暇は、まとめて判定する
+        self.assertEqual(calendar.next_non_holiday(dt.date(2024, 12, 30)), dt.date(2025, 1, 6))
+        self.assertEqual(calendar.prev_non_holiday(dt.date(2025, 1, 5)), dt.date(2024, 12, 28))
+        self.assertEqual(calendar.next_non_holiday(dt.date(2024, 12, 1)), dt.date(2024, 12, 1))
+
+        holidays = calendar.get_long_holidays(dt.date(2024, 12, 15))
+        self.assertEqual([x.name for x in holidays], ['年始'])
+
+    def test_clear_on_save(self):
+        calendar = BusinessCalendar.get()
+        self.assertIs(BusinessCalendar.get(), calendar)
+
+        JapanHoliday.objects.create(name='祝日', date=dt.date(2024, 7, 15))
+        self.assertIsNot(BusinessCalendar.get(), calendar)
+        self.assertTrue(BusinessCalendar.get().is_japan_holiday(dt.date(2024, 7, 15)))
+
+        HolidayList.objects.all().delete()
+        self.assertFalse(BusinessCalendar.get().is_long_holiday(dt.date(2024, 12, 29)))
+
+
+import os
+import shutil
+import tempfile
+import openpyxl
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from accounts.models import User
+from .models import UnitMaster, MenuMaster, MealMaster, AllergenMaster, Order, OrderEveryday
+from .models import CommonAllergen, UncommonAllergen
+class AggregationGoldenTests(TestCase):
+    """
+    食数集計(aggregationコマンド)の出力を、testdata/aggregation の期待値ファイルと比較する
+    """
+    golden_dir = os.path.join(os.path.dirname(__file__), 'testdata', 'aggregation')
+
+    def setUp(self):
+        self.aggregation_day = dt.date(2024, 4, 10)
+
+        user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        fixed_user = User.objects.create_user(username='90001', password='test', dry_cold_type='乾燥')
+        unit = UnitMaster.objects.create(unit_name='テスト1', group='テスト', seq_order=1, is_active=True,
+                                         username=user, unit_code=10001, unit_number=1)
+        freeze_unit = UnitMaster.objects.create(unit_name='テスト・フリーズ', group='テスト', seq_order=2, is_active=True,
+                                                username=user, unit_code=10002, unit_number=2)
+        kizawa_unit = UnitMaster.objects.create(unit_name='木沢・個食1', group='テスト', seq_order=3, is_active=True,
+                                                username=user, unit_code=10003, unit_number=3)
+        excluded_unit = UnitMaster.objects.create(unit_name='除外', group='テスト', seq_order=4, is_active=True,
+                                                  username=user, unit_code=80001, unit_number=4)
+        keep_unit = UnitMaster.objects.create(unit_name='保存', group='保存', seq_order=5, is_active=True,
+                                              username=fixed_user, unit_code=90001)
+        keep_single_unit = UnitMaster.objects.create(unit_name='保存1人袋', group='保存', seq_order=6, is_active=True,
+                                                     username=fixed_user, unit_code=90002)
+
+        joshoku = MenuMaster.objects.create(menu_name='常食', group='常食', seq_order=1)
+        usuaji = MenuMaster.objects.create(menu_name='薄味', group='薄味', seq_order=2)
+        soft = MenuMaster.objects.create(menu_name='ソフト', group='常食', seq_order=3)
+
+        breakfast = MealMaster.objects.create(meal_name='朝食', soup=True, filling=True, miso_soup='汁具', seq_order=1)
+        lunch = MealMaster.objects.create(meal_name='昼食', soup=False, filling=True, miso_soup='具のみ', seq_order=2)
+        dinner = MealMaster.objects.create(meal_name='夕食', soup=False, filling=False, miso_soup='なし', seq_order=3)
+        snack = MealMaster.objects.create(meal_name='間食', soup=False, filling=False, miso_soup='なし', seq_order=4)
+
+        nothing = AllergenMaster.objects.create(id=1, allergen_name='なし', seq_order=0, is_common=False)
+        kosyoku = AllergenMaster.objects.create(id=2, allergen_name='個食', seq_order=1, is_common=True)
+        freeze = AllergenMaster.objects.create(id=3, allergen_name='フリーズ', seq_order=2, is_common=True)
+        egg = AllergenMaster.objects.create(id=4, allergen_name='卵', seq_order=10, is_common=True)
+        milk = AllergenMaster.objects.create(id=5, allergen_name='乳', seq_order=20, is_common=False, rakukon_name='乳製品')
+        soba = AllergenMaster.objects.create(id=6, allergen_name='そば', seq_order=21, is_common=False)
+        shrimp = AllergenMaster.objects.create(id=7, allergen_name='えび', seq_order=11, is_common=True)
+        crab = AllergenMaster.objects.create(id=8, allergen_name='かに', seq_order=12, is_common=True)
+
+        CommonAllergen.objects.create(code='ｺｼｮｸ', name='個食', menu_name=joshoku, allergen=kosyoku, seq_order=11)
+        CommonAllergen.objects.create(code='ﾀﾏｺﾞ', name='卵', menu_name=joshoku, allergen=egg, seq_order=12)
+        CommonAllergen.objects.create(code='ﾀﾏｺﾞｳ', name='卵', menu_name=usuaji, allergen=egg, seq_order=14)
+        CommonAllergen.objects.create(code='ｴﾋﾞ', name='えび', menu_name=joshoku, allergen=shrimp, seq_order=15)
+
+        UncommonAllergen.objects.create(code='常ｱﾚ1', name='乳製品', menu_name=joshoku, allergen=milk, seq_order=1)
+        UncommonAllergen.objects.create(code='常ｱﾚ2', name='ごま', menu_name=joshoku, allergen=milk, seq_order=2)
+        UncommonAllergen.objects.create(code='常ｱﾚ3', name='キウイ', menu_name=joshoku, allergen=milk, seq_order=3)
+        UncommonAllergen.objects.create(code='薄ｱﾚ１', name='りんご', menu_name=usuaji, allergen=milk, seq_order=8)
+
+        day = self.aggregation_day
+        orders = [
+            (unit, breakfast, joshoku, nothing, 10), (unit, lunch, joshoku, nothing, 12),
+            (unit, dinner, joshoku, nothing, 11), (unit, snack, joshoku, nothing, 4),
+            (unit, breakfast, usuaji, nothing, 5), (unit, lunch, usuaji, nothing, 6), (unit, dinner, usuaji, nothing, 7),
+            (unit, breakfast, soft, nothing, 2), (unit, lunch, soft, nothing, 3),
+            (unit, breakfast, joshoku, egg, 1), (unit, lunch, joshoku, egg, 2), (unit, dinner, usuaji, egg, 1),
+            (unit, breakfast, joshoku, milk, 1), (unit, dinner, joshoku, milk, 2),
+            (unit, lunch, joshoku, soba, 1), (unit, lunch, soft, shrimp, 1), (unit, dinner, joshoku, crab, 1),
+            (unit, breakfast, joshoku, kosyoku, 2), (unit, breakfast, usuaji, freeze, 1),
+            (unit, snack, usuaji, nothing, 0),
+            (freeze_unit, breakfast, joshoku, nothing, 3), (freeze_unit, lunch, joshoku, nothing, 2),
+            (freeze_unit, dinner, joshoku, nothing, 1),
+            (kizawa_unit, breakfast, joshoku, nothing, 2), (kizawa_unit, dinner, joshoku, nothing, 1),
+            (excluded_unit, breakfast, joshoku, nothing, 9),
+        ]
+        for unit_name, meal_name, menu_name, allergen, quantity in orders:
+            Order.objects.create(eating_day=day, unit_name=unit_name, meal_name=meal_name, menu_name=menu_name,
+                                 allergen=allergen, quantity=quantity)
+        Order.objects.create(eating_day=day + dt.timedelta(days=1), unit_name=unit, meal_name=breakfast,
+                             menu_name=joshoku, allergen=nothing, quantity=8)
+
+        OrderEveryday.objects.create(unit_name=keep_unit, meal_name=breakfast, menu_name=usuaji, allergen=nothing, quantity=2)
+        OrderEveryday.objects.create(unit_name=keep_single_unit, meal_name=lunch, menu_name=usuaji, allergen=nothing,
+                                     quantity=1)
+        OrderEveryday.objects.create(unit_name=keep_unit, meal_name=dinner, menu_name=joshoku, allergen=nothing, quantity=3)
+
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def _read_bytes(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_outputs_match_golden_files(self):
+        with override_settings(OUTPUT_DIR=self.output_dir, KIZAWA_RAKUKON_CODE='ｺｼｮｸ'):
+            os.makedirs(os.path.join(self.output_dir, settings.RAKUKON_DIR, 'autoinput'))
+            call_command('aggregation', str(self.aggregation_day))
+
+            golden_rakukon_dir = os.path.join(self.golden_dir, 'rakukon')
+            rakukon_dir = os.path.join(self.output_dir, settings.RAKUKON_DIR)
+
+        # 中間ファイル(CSV)・食数自動入力用ファイルはバイト単位で一致すること
+        dir_name = f'{self.aggregation_day}_食数集計表（新方式）'
+        golden_files = sorted(os.listdir(os.path.join(golden_rakukon_dir, dir_name)))
+        output_files = sorted(
+            x for x in os.listdir(os.path.join(rakukon_dir, dir_name)) if not x.startswith('_agg_log_'))
+        self.assertEqual(output_files, golden_files)
+        for file_name in golden_files:
+            with self.subTest(file=file_name):
+                self.assertEqual(self._read_bytes(os.path.join(rakukon_dir, dir_name, file_name)),
+                                 self._read_bytes(os.path.join(golden_rakukon_dir, dir_name, file_name)))
+
+        auto_input = os.path.join('autoinput', f'{self.aggregation_day}.txt')
+        self.assertEqual(self._read_bytes(os.path.join(rakukon_dir, auto_input)),
+                         self._read_bytes(os.path.join(golden_rakukon_dir, auto_input)))
+
+        # 散発アレルギー一覧はセルの値で比較する(出力日・最新注文日は実行日時で変わるため、値の有無のみ確認する)
+        file_name = f'散発アレルギー一覧_{self.aggregation_day}.xlsx'
+        golden_ws = openpyxl.load_workbook(os.path.join(golden_rakukon_dir, file_name))['アレルギー一覧']
+        output_ws = openpyxl.load_workbook(os.path.join(rakukon_dir, file_name))['アレルギー一覧']
+        self.assertIsNotNone(output_ws.cell(3, 3).value)
+        for golden_row, output_row in zip(golden_ws.iter_rows(min_row=4), output_ws.iter_rows(min_row=4)):
+            self.assertEqual([x.value for x in output_row[:5]], [x.value for x in golden_row[:5]])
+            if golden_row[0].row >= 7:
+                self.assertEqual(output_row[5].value is None, golden_row[5].value is None)
+            else:
+                self.assertEqual(output_row[5].value, golden_row[5].value)
+
+    def test_trace_off_skips_intermediate_files(self):
+        with override_settings(OUTPUT_DIR=self.output_dir, KIZAWA_RAKUKON_CODE='ｺｼｮｸ'):
+            os.makedirs(os.path.join(self.output_dir, settings.RAKUKON_DIR, 'autoinput'))
+            call_command('aggregation', str(self.aggregation_day), trace='off')
+
+            golden_rakukon_dir = os.path.join(self.golden_dir, 'rakukon')
+            rakukon_dir = os.path.join(self.output_dir, settings.RAKUKON_DIR)
+
+        dir_name = f'{self.aggregation_day}_食数集計表（新方式）'
+        output_files = os.listdir(os.path.join(rakukon_dir, dir_name))
+        self.assertIn('01_常食_朝食_内訳.csv', output_files)
+        self.assertIn('A-3_らく献_自動入力.csv', output_files)
+        self.assertNotIn('A-1-1_注文データ_アレルギー込.csv', output_files)
+        self.assertNotIn('A-5-4_集計_アレルギーあり_ソート.csv', output_files)
+
+        auto_input = os.path.join('autoinput', f'{self.aggregation_day}.txt')
+        self.assertEqual(self._read_bytes(os.path.join(rakukon_dir, auto_input)),
+                         self._read_bytes(os.path.join(golden_rakukon_dir, auto_input)))
+
+
+import pandas as pd
+from .pipeline_trace import PipelineTrace
+class PipelineTraceTests(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_summary_records_without_files(self):
+        path = os.path.join(self.output_dir, 'A-1.csv')
+        with PipelineTrace('test', 'summary') as trace:
+            trace.dump('A-1', pd.DataFrame({'quantity': [1, 2, 3]}), path, index=False)
+            trace.dump('P-1', pd.DataFrame({'count': [4, '', 5]}), path, quantity_column='count', index=False)
+
+        self.assertEqual(trace.stages, [
+            {'stage': 'A-1', 'rows': 3, 'quantity': 6},
+            {'stage': 'P-1', 'rows': 3, 'quantity': 9.0},
+        ])
+        self.assertFalse(os.path.exists(path))
+
+    def test_full_writes_snapshot(self):
+        path = os.path.join(self.output_dir, 'A-1.csv')
+        df = pd.DataFrame({'quantity': [1, 2]})
+        with PipelineTrace('test', 'full') as trace:
+            trace.dump('A-1', df, path, index=False)
+            # 出力指示後の変更は中間ファイルに反映しない
+            df['quantity'] = 0
+
+        with open(path) as f:
+            self.assertEqual(f.read(), 'quantity\n1\n2\n')
+
+    def test_off(self):
+        path = os.path.join(self.output_dir, 'A-1.csv')
+        with PipelineTrace('test', 'off') as trace:
+            trace.dump('A-1', pd.DataFrame({'quantity': [1]}), path, index=False)
+
+        self.assertEqual(trace.stages, [])
+        self.assertFalse(os.path.exists(path))
+
+    def test_cooking_direction_default(self):
+        """
+        調理表の中間ファイルは、設定値がfullでも--trace fullを指定した場合のみ出力する
+        """
+        from .management.commands.cooking_direction import Command
+        parser = Command().create_parser('manage.py', 'cooking_direction')
+        with override_settings(PIPELINE_TRACE_LEVEL='full'):
+            self.assertEqual(parser.parse_args(['調理表.xlsx']).trace, 'summary')
+            self.assertEqual(parser.parse_args(['調理表.xlsx', '--trace', 'full']).trace, 'full')
+
+from django.forms import modelformset_factory
+from accounts.models import User
+from .forms import OrderForm
+from .models import UnitMaster, MenuMaster, MealMaster, AllergenMaster, Order, OrderHistory
+from .order_updates import OrderQuantityUpdater
+class OrderQuantityUpdaterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        self.unit = UnitMaster.objects.create(
+            unit_name='テストユニット', group='テスト', seq_order=1, is_active=True, username=self.user, unit_code=10001)
+        self.joshoku = MenuMaster.objects.create(menu_name='常食', group='常食', seq_order=1)
+        self.breakfast = MealMaster.objects.create(meal_name='朝食', soup=True, filling=True, miso_soup='汁具', seq_order=1)
+        AllergenMaster.objects.create(id=1, allergen_name='なし', is_common=False)
+
+        self.date_list = [dt.date(2024, 12, 30) + dt.timedelta(days=i) for i in range(3)]
+        for eating_day in self.date_list:
+            Order.objects.create(unit_name=self.unit, menu_name=self.joshoku, meal_name=self.breakfast,
+                                 eating_day=eating_day, allergen_id=1, quantity=2)
+
+    def get_formset(self, quantities):
+        OrderFormSet = modelformset_factory(Order, form=OrderForm, extra=0)
+        qs = Order.objects.all().order_by('id')
+        data = {
+            'form-TOTAL_FORMS': str(len(quantities)),
+            'form-INITIAL_FORMS': str(len(quantities)),
+        }
+        for i, (order, quantity) in enumerate(zip(qs, quantities)):
+            data[f'form-{i}-id'] = str(order.id)
+            data[f'form-{i}-quantity'] = str(quantity)
+        formset = OrderFormSet(data, queryset=qs)
+        self.assertTrue(formset.is_valid())
+        return formset
+
+    def test_save_changed_only(self):
+        before = {x.id: x.updated_at for x in Order.objects.all()}
+
+        summary = OrderQuantityUpdater().save(self.get_formset([2, 5, 2]))
+
+        self.assertEqual(summary.form_count, 3)
+        self.assertEqual(summary.changed_count, 1)
+        self.assertEqual(summary.quantity_delta, 3)
+        self.assertEqual(Order.objects.get(eating_day=self.date_list[1]).quantity, 5)
+
+        # 変更のない注文は更新しない
+        unchanged = Order.objects.get(eating_day=self.date_list[0])
+        self.assertEqual(unchanged.updated_at, before[unchanged.id])
+
+    def test_write_history(self):
+        OrderQuantityUpdater().save(self.get_formset([4, 1, 2]))
+
+        histories = OrderHistory.objects.all().order_by('eating_day')
+        self.assertEqual([(x.eating_day, x.prev, x.quantity) for x in histories],
+                         [(self.date_list[0], 2, 4), (self.date_list[1], 2, 1)])
+
+    def test_skip(self):
+        summary = OrderQuantityUpdater().save(
+            self.get_formset([3, 3, 3]), skip=lambda x: (x.eating_day.month == 1) and (x.eating_day.day == 1))
+
+        self.assertEqual(summary.changed_count, 2)
+        self.assertEqual(summary.skipped_count, 1)
+        self.assertEqual(Order.objects.get(eating_day=self.date_list[2]).quantity, 2)
+        self.assertFalse(OrderHistory.objects.filter(eating_day=self.date_list[2]).exists())
+
+from accounts.models import User
+from .models import UnitMaster, MenuMaster, MealMaster, AllergenMaster, Order, CookingDirectionPlate
+from .models import PackageMaster, UnitPackage
+from .picking import EatingManagement, InnerPackageManagement, PackageCountMatrix
+class PackageCountMatrixTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        self.unit = UnitMaster.objects.create(
+            unit_name='テストユニット', group='テスト', seq_order=1, is_active=True, username=self.user, unit_code=10001,
+            unit_number=10, calc_name='テスト', short_name='テスト')
+        self.other_unit = UnitMaster.objects.create(
+            unit_name='テストユニット個食', group='テスト', seq_order=2, is_active=True, username=self.user, unit_code=10002,
+            unit_number=10, calc_name='テスト', short_name='個食')
+        joshoku = MenuMaster.objects.create(menu_name='常食', group='常食', seq_order=1)
+        soft = MenuMaster.objects.create(menu_name='ソフト', group='嚥下', seq_order=2)
+        breakfast = MealMaster.objects.create(meal_name='朝食', soup=True, filling=True, miso_soup='汁具', seq_order=1)
+        AllergenMaster.objects.create(id=1, allergen_name='なし', is_common=False)
+        AllergenMaster.objects.create(id=2, allergen_name='卵', is_common=False)
+
+        self.cooking_day = dt.date(2024, 4, 10)
+        self.eating_day = dt.date(2024, 4, 12)
+        for unit, menu, allergen_id, quantity in [
+            (self.unit, joshoku, 1, 25), (self.unit, joshoku, 2, 1), (self.unit, soft, 1, 0),
+            (self.other_unit, soft, 2, 3),
+        ]:
+            Order.objects.create(unit_name=unit, menu_name=menu, meal_name=breakfast, eating_day=self.eating_day,
+                                 allergen_id=allergen_id, quantity=quantity)
+        CookingDirectionPlate.objects.create(
+            cooking_day=self.cooking_day, eating_day=self.eating_day, plate_name='みそ汁', meal_name='朝食',
+            seq_meal=1, index=0, is_soup=True)
+
+    def test_order_count(self):
+        matrix = PackageCountMatrix(self.cooking_day)
+
+        self.assertEqual(matrix.get_order_count(10, [self.eating_day], '朝食', matrix.PICKING_TYPE_BASIC), 26)
+        self.assertEqual(matrix.get_order_count(10, [self.eating_day], '朝食', matrix.PICKING_TYPE_ENGE), 3)
+        self.assertEqual(matrix.get_order_count(10, [self.eating_day], '昼食', matrix.PICKING_TYPE_BASIC), 0)
+        self.assertTrue(matrix.has_miso_soup('朝食', self.eating_day))
+
+    def test_has_order(self):
+        matrix = PackageCountMatrix(self.cooking_day)
+
+        self.assertTrue(matrix.has_order(self.unit.id, self.eating_day, '朝食', allergen_name='なし'))
+        # 食数0の注文は含めない
+        self.assertFalse(matrix.has_order(self.unit.id, self.eating_day, '朝食', menu_names=['ソフト']))
+        self.assertFalse(matrix.has_order(self.other_unit.id, self.eating_day, '朝食', allergen_name='なし'))
+        self.assertTrue(matrix.has_other_unit_order(self.unit, self.eating_day, '朝食'))
+
+    def test_inner_package_info(self):
+        manager = InnerPackageManagement(EatingManagement.get_dict_by_cooking_day(self.cooking_day))
+
+        info = manager.get_inner_package_info(10, '朝食', '基本食', self.cooking_day)
+        self.assertEqual((info['order_count'], info['package_count']), (26, 2))
+
+        # 読込済みの注文数を使用するため、再度のクエリは発生しない
+        with self.assertNumQueries(0):
+            info = manager.get_inner_package_info(10, '朝食', '嚥下食', self.cooking_day)
+        self.assertEqual((info['order_count'], info['package_count']), (3, 1))
+
+    def test_meals_dict(self):
+        matrix = PackageCountMatrix(self.cooking_day)
+
+        # ピッキング指示書の出力では、読込済みの料理から喫食日・食事区分を取得する
+        self.assertEqual(matrix.get_meals_dict(), EatingManagement.get_meals_dict_by_cooking_day(self.cooking_day))
+
+    def test_required_units(self):
+        package = PackageMaster.objects.create(name='10人用', quantity=10)
+        for menu_name in ['常食', 'ソフト', '常食']:
+            UnitPackage.objects.create(
+                unit_name='テスト', unit_number=10, plate_name='みそ汁', cooking_day=self.cooking_day,
+                eating_day=self.eating_day, meal_name='朝食', package=package, count=1, menu_name=menu_name)
+        manager = InnerPackageManagement(EatingManagement.get_dict_by_cooking_day(self.cooking_day))
+
+        # 具ありの注文があるため、汁・汁具も照合が必要
+        self.assertEqual(manager.get_required_units(self.cooking_day), [
+            (10, '朝食', '基本食', '中袋'), (10, '朝食', '基本食', '段ボール'),
+            (10, '朝食', '嚥下食', '中袋'), (10, '朝食', '嚥下食', '段ボール'),
+            (10, '朝食', '汁・汁具', '中袋'), (10, '朝食', '汁・汁具', '段ボール'),
+        ])
+
+from .models import ReqirePickingPackage, PickingResultRaw
+from .picking_reconciliation import PickingFilter, PickingReconciliation
+class PickingReconciliationTests(TestCase):
+    def setUp(self):
+        PickingReconciliation.clear()
+        self.cooking_day = dt.date(2024, 4, 10)
+        self.picking_day = dt.datetime(2024, 4, 10)
+        for unit_number, package_count in [(1, 1), (2, 2), (3, 1)]:
+            ReqirePickingPackage.objects.create(
+                unit_number=unit_number, short_name=f'施設{unit_number}', cooking_day=self.cooking_day,
+                eating_day=dt.date(2024, 4, 12), meal_name='朝食', picking_type_code='01',
+                order_count=10, package_count=package_count)
+
+        self.add_result('001010112', 'NG')
+        self.add_result('001010112', 'OK')
+        self.add_result('002010112', 'OK')
+
+    def add_result(self, qr_value, result, phase='中袋'):
+        PickingResultRaw.objects.create(
+            menu_file_no=1, menu_no=1 if phase == '中袋' else 2, terminal_no='1', picking_date=self.picking_day,
+            qr_value=qr_value, result=result, picking_phase=phase)
+
+    def get_records(self, **kwargs):
+        picking_filter = PickingFilter(**kwargs)
+        return PickingReconciliation.get(self.cooking_day, self.picking_day).get_records(picking_filter)
+
+    def test_status(self):
+        records = self.get_records(is_show_corrected=True, visible_phase_code='0')
+
+        self.assertEqual([(x['unit_number'], x['warning']) for x in records],
+                         [(1, '正常(NG訂正)'), (2, '読み取り件数不足'), (3, '読み取り件数不足')])
+        self.assertEqual(records[0]['result_list'], ['NG', 'OK'])
+
+    def test_cache(self):
+        self.get_records()
+
+        # 読み取り結果に変更がない場合は、照合し直さない(更新確認のクエリのみ)
+        with self.assertNumQueries(2):
+            records = self.get_records(visible_phase_code='1')
+        self.assertEqual(len(records), 3)
+
+        # 読み取り結果が追加された場合は、照合し直す
+        self.add_result('003010112', 'OK')
+        records = self.get_records(visible_phase_code='0')
+        self.assertEqual([x['unit_number'] for x in records], [2])
+
+
+from web_order.picking import PickingResultFileReader
+
+
+class PickingResultFileReaderTests(TestCase):
+    def read(self, rows):
+        df = pd.DataFrame(rows, dtype=str)
+        return PickingResultFileReader(df, 'picking.csv').read_to_save()
+
+    def get_rows(self):
+        return [
+            ['1', '1', '01', '2024/04/10', '08:00:00', '1010112', '', 'OK'],
+            ['1', '2', '01', '2024/04/10', '08:00:01', '001010112', '', 'OK'],
+            # ファイル内の重複
+            ['1', '2', '01', '2024/04/10', '08:00:01', '001010112', '', 'OK'],
+            # QRコード値なし・日時不正
+            ['1', '1', '01', '2024/04/10', '08:00:02', np.nan, '', 'OK'],
+            ['1', '1', '01', '2024/04/10', '08:00:02', '1', '', 'OK'],
+            ['1', '1', '01', '2024/04/99', '08:00:02', '001010112', '', 'NG'],
+        ]
+
+    def test_read_to_save(self):
+        summary = self.read(self.get_rows())
+
+        self.assertEqual((summary.inserted_count, summary.duplicate_count, summary.rejected_count), (2, 1, 3))
+        self.assertEqual(list(PickingResultRaw.objects.order_by('id').values_list('qr_value', 'picking_phase', 'upload_file_name')),
+                         [('001010112', '中袋', 'picking.csv'), ('001010112', '段ボール', 'picking.csv')])
+
+    def test_reupload(self):
+        self.read(self.get_rows())
+        summary = self.read(self.get_rows())
+
+        # 登録済みの読み取り結果は登録しない
+        self.assertEqual((summary.inserted_count, summary.duplicate_count, summary.rejected_count), (0, 3, 3))
+        self.assertEqual(PickingResultRaw.objects.count(), 2)
+
+    def test_concurrent_upload(self):
+        """
+        登録済み確認後に他のアップロードで登録された読み取り結果は、登録数に含めない
+        """
+        class ConcurrentFileReader(PickingResultFileReader):
+            def get_exists_keys(self, df):
+                return set()
+
+        self.read(self.get_rows())
+        df = pd.DataFrame(self.get_rows(), dtype=str)
+        summary = ConcurrentFileReader(df, 'picking.csv').read_to_save()
+
+        self.assertEqual((summary.inserted_count, summary.duplicate_count, summary.rejected_count), (0, 3, 3))
+        self.assertEqual(PickingResultRaw.objects.count(), 2)
+
+
+import shutil
+
+import threading
+from django.db import transaction
+from .qr_assets import QrImageCache, QrImageStore, render_qr_png
+
+
+class QrImageStoreTests(TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.targets = {f'0010101{x:02}.png': f'0010101{x:02}' for x in range(1, 32)}
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def test_generate_files(self):
+        store = QrImageStore(self.root_dir, 'files')
+        summary = store.generate(self.targets)
+        self.assertEqual((summary.target_count, summary.created_count), (31, 31))
+
+        with open(os.path.join(self.root_dir, '001010101.png'), 'rb') as f:
+            self.assertEqual(f.read(), render_qr_png('001010101'))
+
+        # 作成済みの画像は作成しない
+        self.targets['002010101.png'] = '002010101'
+        summary = store.generate(self.targets)
+        self.assertEqual((summary.exists_count, summary.created_count), (31, 1))
+
+    def test_generate_zip(self):
+        store = QrImageStore(self.root_dir, 'zip')
+        summary = store.generate(self.targets, processes=2)
+        self.assertEqual(summary.created_count, 31)
+        self.assertFalse(os.path.isfile(os.path.join(self.root_dir, '001010101.png')))
+        self.assertEqual(store.read(os.path.join(self.root_dir, '001010101.png')), render_qr_png('001010101'))
+
+    def test_generate_zip_concurrent(self):
+        """
+        同時に作成した場合も、それぞれの画像がアーカイブ・マニフェストに残る
+        """
+        other_targets = {f'0020101{x:02}.png': f'0020101{x:02}' for x in range(1, 32)}
+        threads = [threading.Thread(target=QrImageStore(self.root_dir, 'zip').generate, args=(x,))
+                   for x in [self.targets, other_targets]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        store = QrImageStore(self.root_dir, 'zip')
+        self.assertEqual(store.load_manifest(), set(self.targets.keys()) | set(other_targets.keys()))
+        self.assertEqual(store.load_manifest(rebuild=True), store.load_manifest())
+        self.assertFalse([x for x in os.listdir(self.root_dir) if x.endswith('.tmp')])
+
+    def test_render_in_transaction(self):
+        """
+        トランザクション内(画面からのユニット登録)では、件数が多くてもプロセスプールを使わない
+        """
+        values = [f'0010101{x:02}' for x in range(1, 100)]
+        with transaction.atomic():
+            with self.assertLogs('web_order.qr_assets', level='WARNING'):
+                images, processes = QrImageStore(self.root_dir, 'files').render(values, 2)
+        self.assertEqual(processes, 1)
+        self.assertEqual(images[0], render_qr_png('001010101'))
+
+    def test_image_cache(self):
+        store = QrImageStore(self.root_dir, 'files')
+        store.generate(self.targets)
+
+        qr_cache = QrImageCache(store, max_size=2)
+        for value in ['001010101', '001010102', '001010101', '001010103', '001010102']:
+            image = qr_cache.get_image(value, os.path.join(self.root_dir, f'{value}.png'), 100, 100)
+        self.assertEqual((image.width, image.height), (100, 100))
+        self.assertEqual(image._data(), render_qr_png('001010102'))
+
+        # 2件目の001010101のみ読込を省略し、保持上限を超えた分は破棄する
+        self.assertEqual((qr_cache.request_count, qr_cache.load_count, qr_cache.avoided_count), (5, 4, 1))
+        self.assertEqual(qr_cache.eviction_count, 2)
+
+
+from unittest import SkipTest
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from .management.commands.generate_qr import Command as GenerateQrCommand
+from .models import RawPlatePackageMaster
+from .picking import ChillerPicking, PickingDirectionOutputManagement
+from .process_pool import DatabaseProcessPool
+
+
+class ProcessPoolOutputTestMixin:
+    """
+    プロセスプールを使う出力処理の試験用
+    """
+    def assert_serial_in_transaction(self, logger_name: str, output, processes: int):
+        """
+        トランザクション内でoutput(processes)を呼び出し、1プロセスに切り替えた警告を確認して、その結果を返す
+        """
+        with transaction.atomic():
+            with self.assertLogs(logger_name, level='WARNING') as logs:
+                result = output(processes)
+        self.assertIn('1プロセスで出力します', logs.output[0])
+        return result
+
+    def assert_parallel_output(self, output, processes: int):
+        """
+        トランザクション外でoutput(processes)とoutput(1)を呼び出し、結果の一致を確認して、その結果を返す
+        """
+        self.assertTrue(DatabaseProcessPool.is_available())
+        result = output(processes)
+        self.assertEqual(result, output(1))
+        return result
+
+
+class ProcessPoolTransactionTestCase(ProcessPoolOutputTestMixin, TransactionTestCase):
+    """
+    子プロセスから試験用DBを参照する試験(インメモリのDBの場合は実行しない)
+    """
+    @classmethod
+    def setUpClass(cls):
+        if (connection.vendor == 'sqlite') and connection.is_in_memory_db():
+            raise SkipTest('インメモリのDBは子プロセスから参照できないため')
+        super().setUpClass()
+
+
+class PickingDirectionFixtureMixin:
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.root_dir, OUTPUT_DIR=os.path.join(self.root_dir, 'output'))
+        self.override.enable()
+
+        dry_user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        cold_user = User.objects.create_user(username='10002', password='test', dry_cold_type='冷凍')
+        units = [
+            UnitMaster.objects.create(unit_name='テストA', group='テスト', seq_order=1, is_active=True, username=dry_user,
+                                      unit_code=10001, unit_number=10, calc_name='テストA', short_name='A'),
+            UnitMaster.objects.create(unit_name='テストB', group='テスト', seq_order=2, is_active=True, username=cold_user,
+                                      unit_code=10002, unit_number=11, calc_name='テストB', short_name='B'),
+        ]
+        joshoku = MenuMaster.objects.create(menu_name='常食', group='常食', seq_order=1)
+        soft = MenuMaster.objects.create(menu_name='ソフト', group='嚥下', seq_order=2)
+        meals = [
+            MealMaster.objects.create(meal_name='朝食', soup=True, filling=True, miso_soup='汁具', seq_order=1),
+            MealMaster.objects.create(meal_name='昼食', soup=True, filling=True, miso_soup='汁具', seq_order=2),
+            MealMaster.objects.create(meal_name='夕食', soup=False, filling=False, miso_soup='なし', seq_order=3),
+        ]
+        AllergenMaster.objects.create(id=1, allergen_name='なし', is_common=False)
+        # ピッキング指示書で使用する袋(設定値PICKING_PACKAGES)
+        for package_id in range(1, 15):
+            PackageMaster.objects.create(id=package_id, name=f'袋{package_id}', quantity=package_id)
+        package = PackageMaster.objects.get(id=1)
+        RawPlatePackageMaster.objects.create(
+            base_name='ほうれん草', dry_name='ほうれん草', cold_name='ほうれん草', chilled_name='ほうれん草',
+            dry_unit='g', cold_unit='g', chilled_unit='g', is_direct_dry=False, is_direct_cold=True)
+
+        self.cooking_day = dt.date(2024, 4, 10)
+        eating_day = dt.date(2024, 4, 12)
+        for unit in units:
+            for menu in [joshoku, soft]:
+                for meal in meals:
+                    Order.objects.create(unit_name=unit, menu_name=menu, meal_name=meal, eating_day=eating_day,
+                                         allergen_id=1, quantity=3)
+        for index, (meal_name, plate_name, is_soup) in enumerate([
+            ('朝食', 'みそ汁', True), ('朝食', 'ほうれん草 50g原体', False), ('昼食', '焼き魚', False), ('夕食', '煮物', False),
+        ]):
+            plate = CookingDirectionPlate.objects.create(
+                cooking_day=self.cooking_day, eating_day=eating_day, plate_name=plate_name, meal_name=meal_name,
+                seq_meal=1, index=index, is_soup=is_soup)
+            for unit in units:
+                UnitPackage.objects.create(
+                    unit_name=unit.calc_name, unit_number=unit.unit_number, plate_name=plate_name,
+                    cooking_day=self.cooking_day, index=index, eating_day=eating_day, meal_name=meal_name,
+                    package=package, count=2, menu_name='常食', cooking_direction=plate)
+
+        targets = {}
+        for unit in units:
+            targets.update(GenerateQrCommand().get_targets(unit))
+        QrImageStore().generate(targets)
+        self.chillers = [ChillerPicking(i, 1, 100) for i in range(1, 5)]
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.root_dir)
+
+    def write_directions(self, processes: int):
+        management = PickingDirectionOutputManagement(self.cooking_day, self.chillers)
+        self.assertTrue(management.write_directions(management.PICKING_TYPE_ALL, processes))
+
+        output_dir = os.path.join(settings.OUTPUT_DIR, 'picking')
+        directions = {}
+        for file_name in sorted(os.listdir(output_dir)):
+            workbook = openpyxl.load_workbook(os.path.join(output_dir, file_name))
+            # 1行目は出力日時のため比較しない
+            directions[file_name] = [[cell.value for cell in row] for ws in workbook for row in ws.iter_rows(min_row=2)]
+        shutil.rmtree(output_dir)
+        return directions
+
+
+class PickingDirectionOutputManagementTests(PickingDirectionFixtureMixin, ProcessPoolOutputTestMixin, TestCase):
+    def test_write_directions_in_transaction(self):
+        """
+        画面からの出力(トランザクション内)で3プロセスを指定しても、全種類(7ファイル)のピッキング指示書を出力できる
+        """
+        directions = self.assert_serial_in_transaction('web_order.picking', self.write_directions, 3)
+        self.assertEqual(len(directions), 7)
+
+
+class PickingDirectionParallelTests(PickingDirectionFixtureMixin, ProcessPoolTransactionTestCase):
+    def test_write_directions_parallel(self):
+        """
+        種類毎に別プロセスで出力したピッキング指示書の各シートのセルの値(出力日時を除く)が、1プロセスの場合と一致する
+        """
+        directions = self.assert_parallel_output(self.write_directions, 3)
+        self.assertEqual(len(directions), 7)
+
+
+from django.core.signals import request_finished, request_started
+from .cooking_calendar import CookingCalendar
+from .models import CookingEatingDay
+
+
+class CookingCalendarTests(TestCase):
+    def setUp(self):
+        CookingCalendar.clear()
+        self.cooking_day = dt.date.today()
+        self.eating_day = self.cooking_day + dt.timedelta(days=2)
+        for index, meal_name in enumerate(['夕食', '朝食', '朝食']):
+            CookingDirectionPlate.objects.create(
+                cooking_day=self.cooking_day, eating_day=self.eating_day, plate_name=f'料理{index}',
+                meal_name=meal_name, seq_meal=1, index=index)
+
+    def tearDown(self):
+        CookingCalendar.clear()
+
+    def test_dict(self):
+        # 調理表献立の保存時に、製造日・喫食日の対応が登録される
+        self.assertEqual(CookingEatingDay.objects.count(), 2)
+
+        self.assertEqual(EatingManagement.get_dict_by_cooking_day(self.cooking_day),
+                         {'朝食': [self.eating_day], '昼食': [], '夕食': [self.eating_day]})
+        self.assertEqual(EatingManagement.get_meals_dict_by_cooking_day(self.cooking_day), {self.eating_day: ['朝食', '夕食']})
+        self.assertEqual(EatingManagement.get_meal_dict_by_cooking_day(self.cooking_day), [self.eating_day])
+
+        calendar = CookingCalendar.get()
+        self.assertEqual(calendar.get_cooking_day(self.eating_day, '夕食'), self.cooking_day)
+        self.assertIsNone(calendar.get_cooking_day(self.eating_day, '昼食'))
+
+    def test_cache(self):
+        EatingManagement.get_dict_by_cooking_day(self.cooking_day)
+
+        # 対応に変更がない場合は、更新確認のクエリのみ
+        with self.assertNumQueries(1):
+            EatingManagement.get_meals_dict_by_cooking_day(self.cooking_day)
+
+        CookingDirectionPlate.objects.filter(cooking_day=self.cooking_day, meal_name='夕食').delete()
+        CookingCalendar.refresh(self.cooking_day)
+        self.assertEqual(EatingManagement.get_meals_dict_by_cooking_day(self.cooking_day), {self.eating_day: ['朝食']})
+
+    def test_check_once_per_request(self):
+        EatingManagement.get_dict_by_cooking_day(self.cooking_day)
+
+        # リクエストの処理中は、更新確認はリクエスト毎に1度のみ
+        request_started.send(sender=self.__class__)
+        try:
+            with self.assertNumQueries(1):
+                EatingManagement.get_dict_by_cooking_day(self.cooking_day)
+                EatingManagement.get_meals_dict_by_cooking_day(self.cooking_day)
+                EatingManagement.get_meal_dict_by_cooking_day(self.cooking_day)
+        finally:
+            request_finished.send(sender=self.__class__)
+
+        # リクエスト外では、呼出毎に確認する
+        with self.assertNumQueries(2):
+            EatingManagement.get_dict_by_cooking_day(self.cooking_day)
+            EatingManagement.get_meals_dict_by_cooking_day(self.cooking_day)
+
+        # ピッキング実施日は製造日と同日のため、DBを参照しない
+        with self.assertNumQueries(0):
+            self.assertEqual(InnerPackageManagement.get_cooking_day_from_picking_day(self.cooking_day), self.cooking_day)
+
+
+from .models import TmpPlateNamePackage
+from .picking import PlatePackageRegister, UnitPackageBuffer
+class UnitPackageBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        UnitMaster.objects.create(
+            unit_name='テストユニット', group='テスト', seq_order=1, is_active=True, username=self.user, unit_code=10001,
+            unit_number=10, calc_name='テスト', short_name='テスト')
+        PackageMaster.objects.create(name='10人用', quantity=10)
+        PackageMaster.objects.create(name='1人用', quantity=1)
+
+        self.cooking_day = dt.date(2024, 4, 10)
+        self.eating_day = dt.date(2024, 4, 12)
+        CookingDirectionPlate.objects.create(
+            cooking_day=self.cooking_day, eating_day=self.eating_day, plate_name='肉じゃが', meal_name='朝食',
+            seq_meal=1, index=1)
+
+    def tearDown(self):
+        PlatePackageRegister.set_buffer(None)
+
+    def register(self):
+        for unit_number, unit_name, count, master_name, menu_name in [
+            (10, 'テスト', 2, '10人用', '常食'), (10, 'テスト', 1, '1人用', '常食'),
+            (10, 'テスト個食', 3, '1人用', '常食'), (10, 'テスト個食', 1, '10人用', 'ソフト'),
+            (10, 'テスト', 1, '1人用', 'ソフト'),
+        ]:
+            PlatePackageRegister.register_unit_package(
+                self.cooking_day, self.eating_day, '朝食', 1, unit_number, unit_name, count, master_name, '肉じゃが',
+                menu_name=menu_name)
+        PlatePackageRegister.register_tmp_plate_name('肉じゃが', self.cooking_day, 10, '常食')
+        PlatePackageRegister.register_tmp_plate_name('肉じゃが', str(self.cooking_day), 10, '常食')
+
+    def get_values(self):
+        return list(UnitPackage.objects.order_by('id').values_list(
+            'unit_name', 'package__name', 'count', 'menu_name')), TmpPlateNamePackage.objects.count()
+
+    def test_save(self):
+        # 直接登録する場合と、まとめて登録する場合で、登録内容が同じになる
+        self.register()
+        expected = self.get_values()
+        self.assertEqual(expected, ([
+            ('テスト', '10人用', 2, '常食'), ('テスト', '1人用', 4, '常食'),
+            ('テストユニット', '10人用', 1, 'ソフト'), ('テスト', '1人用', 1, 'ソフト'),
+        ], 1))
+        UnitPackage.objects.all().delete()
+        TmpPlateNamePackage.objects.all().delete()
+
+        buffer = UnitPackageBuffer()
+        PlatePackageRegister.set_buffer(buffer)
+        self.register()
+        PlatePackageRegister.set_buffer(None)
+        with self.assertNumQueries(2):
+            buffer.save()
+        self.assertEqual(self.get_values(), expected)
+
+    def test_merge(self):
+        buffers = []
+        for sequence, meal_name in [(2, '昼食'), (1, '朝食')]:
+            buffer = UnitPackageBuffer()
+            buffer.sequence = sequence
+            buffer.add_unit_package(UnitPackage(
+                unit_name='テスト', unit_number=10, plate_name='肉じゃが', cooking_day=self.cooking_day,
+                eating_day=self.eating_day, meal_name=meal_name, package=PackageMaster.objects.get(name='10人用'),
+                count=1, menu_name='常食', index=1))
+            buffers.append(buffer)
+
+        buffer = UnitPackageBuffer()
+        buffer.merge(buffers)
+        buffer.delete_unit_packages(['常食'], cooking_day=str(self.cooking_day), eating_day=self.eating_day,
+                                    meal_name='昼食', index=1)
+        buffer.save()
+
+        # 料理の番号順に並べ直し、削除した袋数は登録しない
+        self.assertEqual(list(UnitPackage.objects.values_list('meal_name', flat=True)), ['朝食'])
+
+
+import os
+from django.conf import settings
+from .management.commands.utils import ExcelOutputMixin, MeasureTemplateCache, MeasureWriterTimer
+class MeasureTemplateCacheTests(TestCase):
+    def setUp(self):
+        MeasureTemplateCache.clear()
+        MeasureWriterTimer.clear()
+        self.template = os.path.join(settings.STATICFILES_DIRS[0], 'excel/measure.xlsx')
+
+    def test_load_template(self):
+        writer = ExcelOutputMixin()
+        book = writer.load_template(self.template)
+        book.worksheets[0].cell(1, 1, 'テスト')
+
+        # 作成したブックは、テンプレートの読込内容と独立している
+        other_book = writer.load_template(self.template)
+        original = openpyxl.load_workbook(self.template)
+        self.assertEqual(other_book.sheetnames, original.sheetnames)
+        for ws, original_ws in zip(other_book.worksheets, original.worksheets):
+            self.assertEqual([[(x.value, x.number_format, repr(x.font), repr(x.border)) for x in row] for row in ws.iter_rows()],
+                             [[(x.value, x.number_format, repr(x.font), repr(x.border)) for x in row] for row in original_ws.iter_rows()])
+            self.assertEqual(ws.merged_cells.ranges, original_ws.merged_cells.ranges)
+
+        self.assertEqual(len(MeasureTemplateCache._snapshots), 1)
+        self.assertEqual(MeasureWriterTimer.get_summary().split('/')[0], 'ExcelOutputMixin-読込=2回')
+
+
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from .models import OrderEveryday
+from .management.commands.agg_measure_analyzed import AggMeasureOrdersManager
+class AggMeasureOrdersManagerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        unit = UnitMaster.objects.create(
+            unit_name='テストユニット', group='テスト', seq_order=1, is_active=True, username=user, unit_code=10001,
+            unit_number=1, calc_name='テスト')
+        joshoku = MenuMaster.objects.create(id=1, menu_name='常食', group='常食', seq_order=1)
+        soft = MenuMaster.objects.create(id=5, menu_name='ソフト', group='嚥下', seq_order=2)
+        breakfast = MealMaster.objects.create(meal_name='朝食', soup=True, filling=True, miso_soup='汁具', seq_order=1)
+        lunch = MealMaster.objects.create(meal_name='昼食', soup=True, filling=True, miso_soup='汁具', seq_order=2)
+        allergen = AllergenMaster.objects.create(id=1, allergen_name='なし', is_common=False)
+
+        self.eating_days = [dt.date(2024, 4, 12), dt.date(2024, 4, 13)]
+        for i, eating_day in enumerate(self.eating_days):
+            for meal, quantity in [(breakfast, 11), (lunch, 8)]:
+                Order.objects.create(unit_name=unit, menu_name=joshoku, meal_name=meal, eating_day=eating_day,
+                                     allergen=allergen, quantity=quantity + i)
+                Order.objects.create(unit_name=unit, menu_name=soft, meal_name=meal, eating_day=eating_day,
+                                     allergen=allergen, quantity=1)
+        OrderEveryday.objects.create(id=25, unit_name=unit, menu_name=soft, meal_name=breakfast, allergen=allergen,
+                                     quantity=2)
+
+    def test_snapshot(self):
+        manager = AggMeasureOrdersManager()
+        manager.load_snapshot([str(x) for x in self.eating_days])
+
+        # 喫食日・食事区分を切り替えても、注文情報を読み直さない
+        with CaptureQueriesContext(connection) as context:
+            for eating_day in self.eating_days:
+                for meal in ['朝食', '昼食', '朝食']:
+                    manager.set_eating(eating_day, meal)
+                    manager.get_df_basic()
+                    manager.get_df_soft()
+                    manager.get_needle_orders()
+        self.assertEqual(len(context.captured_queries), 0)
+
+        manager.set_eating(self.eating_days[1], '昼食')
+        df = manager.get_df_basic()
+        self.assertEqual(list(df['注文数']), [9])
+        self.assertEqual(list(df['単位袋7']), [1])
+        self.assertEqual(list(df['7の端数袋・入数']), [2])
+        self.assertEqual(list(manager.get_df_soft()['10の1人用袋']), [1])
+
+        # 食数固定注文がない場合は0
+        manager.set_eating(self.eating_days[0], '朝食')
+        self.assertEqual(manager.get_needle_orders(), (2, 0, 0))
+
+    def test_max_bytes(self):
+        # 上限を超える場合は、喫食日毎に読み込み、使っていない注文内容を破棄する
+        manager = AggMeasureOrdersManager(max_bytes=1)
+        manager.load_snapshot(self.eating_days)
+        self.assertIsNone(manager.snapshot)
+
+        for meal in ['朝食', '昼食']:
+            manager.set_eating(self.eating_days[0], meal)
+            self.assertEqual(list(manager.get_df_basic()['注文数']), [11 if meal == '朝食' else 8])
+        self.assertEqual(list(manager.frames.keys()), [(self.eating_days[0], '昼食')])
+        self.assertEqual(manager.eviction_count, 1)
+
+
+from .jobs import BATCH_JOB_DEFINITIONS
+from .management.commands import cooking_direction
+from .models import PlatePackageForPrint, TmpPlateNamePackage
+
+
+class MeasureTableFixtureMixin:
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.override = override_settings(OUTPUT_DIR=self.root_dir)
+        self.override.enable()
+
+        user = User.objects.create_user(username='10001', password='test', dry_cold_type='乾燥')
+        unit = UnitMaster.objects.create(
+            unit_name='テスト1', group='テスト', seq_order=1, is_active=True, username=user, unit_code=1,
+            unit_number=10, calc_name='テスト', short_name='テスト')
+        menus = [MenuMaster.objects.create(id=1, menu_name='常食', group='常食', seq_order=1),
+                 MenuMaster.objects.create(id=5, menu_name='ソフト', group='嚥下', seq_order=2)]
+        meals = [MealMaster.objects.create(meal_name='朝食', soup=True, filling=True, miso_soup='汁具', seq_order=1),
+                 MealMaster.objects.create(meal_name='昼食', soup=True, filling=True, miso_soup='汁具', seq_order=2)]
+        AllergenMaster.objects.create(id=1, allergen_name='なし', is_common=False)
+        for name in ['BASIC_1', 'BASIC_10', 'BASIC_5', 'BASIC_FRACTION', 'BASIC_UNIT', 'ENGE_1', 'ENGE_14', 'ENGE_2',
+                     'ENGE_20', 'ENGE_7', 'SOUP_1', 'SOUP_10', 'SOUP_FRACTION', 'SOUP_UNIT']:
+            PackageMaster.objects.create(name=name, quantity=1)
+
+        self.cooking_day = dt.date(2024, 4, 10)
+        self.eating_day = dt.date(2024, 4, 12)
+        for menu in menus:
+            for meal in meals:
+                Order.objects.create(unit_name=unit, menu_name=menu, meal_name=meal, eating_day=self.eating_day,
+                                     allergen_id=1, quantity=13)
+        # 調理表献立に登録されていない料理(番号が-1)は、ピッキング指示書用の料理名(TmpPlateNamePackage)を登録する
+        self.plates = [(0, '朝食', '肉じゃが 80g'), (1, '昼食', '焼き魚 1個'), (-1, '昼食', 'ポテトサラダ 60g')]
+        for index, meal_name, plate_name in self.plates[:2]:
+            CookingDirectionPlate.objects.create(
+                cooking_day=self.cooking_day, eating_day=self.eating_day, plate_name=plate_name, meal_name=meal_name,
+                seq_meal=1, index=index)
+            for menu in menus:
+                PlatePackageForPrint.objects.create(
+                    cooking_day=self.cooking_day, eating_day=self.eating_day, plate_name=plate_name,
+                    meal_name=meal_name, index=index, menu_name=menu.menu_name, is_basic_plate=True)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.root_dir)
+
+    def get_tasks(self):
+        analyzer = cooking_direction.AggMeasureTargetAnalyzer(str(self.cooking_day))
+        for index, meal_name, plate_name in self.plates:
+            analyzer.add_cook(index, plate_name, str(self.eating_day), meal_name, [], plate_name)
+        return [(index, analyzed, 0) for index, analyzed in enumerate(analyzer.generate_analyzed())]
+
+    def write_measure_tables(self, processes: int):
+        """
+        計量表を出力し、料理毎の出力結果と、登録されたピッキング指示書用袋数・印刷用袋数を返す(登録内容は出力前に戻す)
+        """
+        results, buffer = cooking_direction.Command().write_measure_tables_parallel(self.get_tasks(), processes)
+        buffer.save()
+        measure_files = sorted(os.listdir(os.path.join(self.root_dir, 'measure')))
+        unit_packages = sorted(UnitPackage.objects.values_list(
+            'unit_name', 'plate_name', 'meal_name', 'index', 'package__name', 'count', 'menu_name'))
+        tmp_plate_names = sorted(TmpPlateNamePackage.objects.values_list('plate_name', 'size', 'menu_name'))
+        print_packages = sorted(PlatePackageForPrint.objects.values_list(
+            'plate_name', 'menu_name', 'count', 'count_one_p', 'count_one_50g'))
+
+        UnitPackage.objects.all().delete()
+        TmpPlateNamePackage.objects.all().delete()
+        PlatePackageForPrint.objects.update(count=0, count_one_p=0, count_one_50g=0)
+        shutil.rmtree(os.path.join(self.root_dir, 'measure'))
+        return results, measure_files, unit_packages, tmp_plate_names, print_packages
+
+
+class MeasureTableProcessesTests(MeasureTableFixtureMixin, ProcessPoolOutputTestMixin, TestCase):
+    def test_parallel_in_transaction(self):
+        """
+        調理表登録のバッチ処理(トランザクション内)で2プロセスを指定しても、全ての料理の計量表を出力し、
+        ピッキング指示書用袋数(UnitPackage・TmpPlateNamePackage)を登録できる
+        """
+        results, measure_files, unit_packages, tmp_plate_names, _ = self.assert_serial_in_transaction(
+            'web_order.management.commands.cooking_direction', self.write_measure_tables, 2)
+
+        self.assertEqual(results, [(0, None, True), (1, None, True), (2, None, True)])
+        self.assertEqual(len(measure_files), 1)
+        self.assertEqual({x[2] for x in unit_packages}, {'朝食', '昼食'})
+        self.assertTrue(tmp_plate_names)
+
+    def test_batch_job_atomic(self):
+        """
+        計量表を複数プロセスで出力する場合のみ、調理表登録のバッチ処理をトランザクション外で実行する
+        """
+        definition = BATCH_JOB_DEFINITIONS['cooking_direction']
+        with override_settings(MEASURE_TABLE_PROCESSES=1):
+            self.assertTrue(definition.is_atomic(BatchJob(command_name='cooking_direction')))
+            self.assertFalse(definition.is_atomic(BatchJob(command_name='cooking_direction', options={'processes': 2})))
+        with override_settings(MEASURE_TABLE_PROCESSES=2):
+            self.assertFalse(definition.is_atomic(BatchJob(command_name='cooking_direction')))
+        self.assertTrue(BATCH_JOB_DEFINITIONS['agg_measure'].is_atomic(BatchJob(command_name='agg_measure')))
+
+
+class MeasureTableParallelTests(MeasureTableFixtureMixin, ProcessPoolTransactionTestCase):
+    def test_parallel(self):
+        """
+        喫食日・食事区分毎に別プロセスで出力した場合も、子プロセスで登録したピッキング指示書用袋数
+        (UnitPackage・TmpPlateNamePackage)と、子プロセスで更新した印刷用袋数(PlatePackageForPrint)が、1プロセスの場合と一致する
+        """
+        results, _, unit_packages, tmp_plate_names, print_packages = self.assert_parallel_output(
+            self.write_measure_tables, 2)
+
+        self.assertEqual(results, [(0, None, True), (1, None, True), (2, None, True)])
+        self.assertEqual({x[2] for x in unit_packages}, {'朝食', '昼食'})
+        self.assertTrue(tmp_plate_names)
+        self.assertTrue([x for x in print_packages if x[2]])
+
+
+import random
+import pandas as pd
+from .management.commands.utils import PackageSplitUtil
+class PackageSplitUtilTests(TestCase):
+    def split_scalar(self, quantity, size, is_use_one_pack):
+        """
+        1件毎に分割する場合の袋数(列単位の計算結果の比較用)
+        """
+        units, fraction = divmod(quantity, size)
+        if is_use_one_pack and (fraction == 1):
+            return units, 0, 1
+        return units, fraction, 0
+
+    def test_split(self):
+        rnd = random.Random(0)
+        for _ in range(200):
+            quantities = [rnd.randint(0, 200) for _ in range(rnd.randint(0, 30))]
+            size = rnd.choice([5, 7, 10, 14, 20, 30])
+            is_use_one_pack = rnd.choice([True, False])
+
+            units, fractions, one_packs = PackageSplitUtil.split(quantities, size, is_use_one_pack)
+            self.assertEqual(list(zip(units.tolist(), fractions.tolist(), one_packs.tolist())),
+                             [self.split_scalar(x, size, is_use_one_pack) for x in quantities])
+
+            # 分割した袋の合計は注文数と一致する
+            self.assertEqual((units * size + fractions + one_packs).tolist(), quantities)
+
+    def test_add_columns(self):
+        df = pd.DataFrame({'呼出番号': [1, 2, 3], '注文数': [1, 11, 25]})
+
+        result = PackageSplitUtil.add_columns(df)
+        self.assertEqual(list(result.columns)[2:],
+                         ['単位袋10', '10の端数袋・入数', '10の1人用袋', '単位袋7', '7の端数袋・入数', '7の1人用袋',
+                          '単位袋5', '5の端数袋・入数', '5の1人用袋'])
+        self.assertEqual(result['10の1人用袋'].tolist(), [1, 1, 0])
+        self.assertEqual(result['7の端数袋・入数'].tolist(), [0, 4, 4])
+
+        result = PackageSplitUtil.add_columns(df, is_use_one_pack=False)
+        self.assertNotIn('10の1人用袋', result.columns)
+        self.assertEqual(result['10の端数袋・入数'].tolist(), [1, 1, 5])
+
+        # 注文がない場合も列は追加する
+        result = PackageSplitUtil.add_columns(df[df['注文数'] > 100])
+        self.assertTrue(result.empty)
+        self.assertIn('単位袋5', result.columns)
+
+    # 注文数と、変更前の計量表の注文情報(AggMeasureOrdersManager)で1行毎(iterrows)に計算していた袋数
+    # 1人用袋あり(make_dataframe): (単位袋10, 10の端数袋・入数, 10の1人用袋, 単位袋7, ..., 5の1人用袋)
+    LEGACY_ONE_PACK_CASES = [
+        (1, (0, 0, 1, 0, 0, 1, 0, 0, 1)),
+        (6, (0, 6, 0, 0, 6, 0, 1, 0, 1)),
+        (8, (0, 8, 0, 1, 0, 1, 1, 3, 0)),
+        (11, (1, 0, 1, 1, 4, 0, 2, 0, 1)),
+        (15, (1, 5, 0, 2, 0, 1, 3, 0, 0)),
+        (21, (2, 0, 1, 3, 0, 0, 4, 0, 1)),
+        (25, (2, 5, 0, 3, 4, 0, 5, 0, 0)),
+    ]
+    # 1人用袋なし(make_df_soup): (単位袋10, 10の端数袋・入数, 単位袋7, 7の端数袋・入数, 単位袋5, 5の端数袋・入数)
+    LEGACY_CASES = [
+        (1, (0, 1, 0, 1, 0, 1)),
+        (6, (0, 6, 0, 6, 1, 1)),
+        (8, (0, 8, 1, 1, 1, 3)),
+        (11, (1, 1, 1, 4, 2, 1)),
+        (15, (1, 5, 2, 1, 3, 0)),
+        (21, (2, 1, 3, 0, 4, 1)),
+        (25, (2, 5, 3, 4, 5, 0)),
+    ]
+
+    def test_add_columns_legacy(self):
+        """
+        変更前の1行毎の計算結果と、同じ袋数になる
+        """
+        df = pd.DataFrame({'注文数': [x for x, _ in self.LEGACY_ONE_PACK_CASES]})
+        result = PackageSplitUtil.add_columns(df)
+        self.assertEqual([tuple(x[1:]) for x in result.itertuples(index=False)],
+                         [x for _, x in self.LEGACY_ONE_PACK_CASES])
+
+        df = pd.DataFrame({'注文数': [x for x, _ in self.LEGACY_CASES]})
+        result = PackageSplitUtil.add_columns(df, is_use_one_pack=False)
+        self.assertEqual([tuple(x[1:]) for x in result.itertuples(index=False)], [x for _, x in self.LEGACY_CASES])
+
+
+from .plate_name_parser import PlateNameParser
+class PlateNameParserTests(TestCase):
+    # 過去の調理表の料理名(表記揺れを含む)と解析結果
+    CORPUS = [
+        ('⑤味噌汁（里芋2個・さつま揚げ5g）', 'soup_ko_gram', 'soup_ko_gram', ('味噌汁 里芋', '2', '・さつま揚げ', '5')),
+        ('⑤味噌汁具（玉葱・しめじ）16ｇ', 'soup_gram', 'soup_gram', ('味噌汁具 玉葱・しめじ ', '16')),
+        ('⑤スープ具（ギョーザ）1個', 'soup_ko', 'soup_ko', ('スープ具 ギョーザ ', '1')),
+        ('⑤スープの具（コーン）', 'soup_none', 'soup_ko', None),
+        ('④■ポン酢7g', 'seasoning_small', 'small', '7'),
+        ('④タルタルソース7g', 'seasoning', 'liquid', '7'),
+        ('①鮭の塩焼き60ｇ1尾', 'unit', 'unit_quantities', '1'),
+        ('③サラダ（枝豆・豆腐）1/2丁', 'cho', 'cho', '1÷2'),
+        ('①トマトソース煮込みハンバーグ1個 + 液20g', 'ko_liquid', 'ko_liquid', ('1', '20')),
+        ('②煮物（肉団子3個＋小松菜36g）+液60g', 'ko_gram_density', 'ko_gram_density', ('煮物', '肉団子', '3', '小松菜', '36', '60')),
+        ('②煮物（肉団子3個(10g)＋小松菜36g）+10%', 'ko_gram_inner_percent', 'ko_gram_inner_percent',
+         ('煮物', '肉団子', '3', '10', '小松菜', '36', '10')),
+        ('②れんこん煮物（れんこん1個+いんげん4ｇ）+9%', 'ko_gram_percent', 'ko_gram_percent',
+         ('れんこん煮物', 'れんこん', '1', 'いんげん', '4', '9')),
+        ('②煮物（肉団子3個(10g)＋小松菜36g）+10g', 'ko_gram_inner_density', 'ko_gram_inner_density',
+         ('煮物', '肉団子', '3', '10', '小松菜', '36', '10')),
+        ('①食【た】べるスープの具【ぐ】（団子4個+具60ｇ）', 'ko_gram', 'ko_gram', ('食【た】べるスープの具【ぐ】', '団子', '4', '具', '60')),
+        ('②麻婆豆腐（豆腐90g+ミンチ22g）+25%', 'gram_gram_percent', 'gram_gram_percent', ('麻婆豆腐', '豆腐', '90', 'ミンチ', '22', '25')),
+        ('②麻婆豆腐（豆腐90g+ミンチ22g）+液25g', 'gram_gram_density', 'gram_gram_density', ('麻婆豆腐', '豆腐', '90', 'ミンチ', '22', '25')),
+        ('①白身フライ60g1個', 'ko', 'ko', '1'),
+        ('①すきやき76g+48g', 'gram', 'grams', '76'),
+        ('①すきやき76りっとる', 'none', 'grams', None),
+    ]
+
+    def test_corpus(self):
+        for name, kind, field, expected in self.CORPUS:
+            with self.subTest(name=name):
+                parsed = PlateNameParser.parse(name)
+                self.assertEqual(parsed.kind, kind)
+                values = getattr(parsed, field)
+                if expected is None:
+                    self.assertEqual(values, ())
+                else:
+                    self.assertEqual(values[0], expected)
+
+    def test_normalize(self):
+        parsed = PlateNameParser.parse('②ほうれん草山葵和え（42.75ｇ）+10%')
+        self.assertEqual(parsed.name, '②ほうれん草山葵和え 42.75g ＋10％')
+        self.assertEqual(parsed.numberless_name, 'ほうれん草山葵和え 42.75g ＋10％')
+        self.assertEqual(parsed.grams, ('42.75',))
+        self.assertEqual(parsed.get_percentage(), 10)
+
+        # 同じ料理名になる表記揺れは、同じ解析結果を使う
+        self.assertIs(PlateNameParser.parse('②ほうれん草山葵和え(42.75g)＋10％'), parsed)
+
+    def test_cache(self):
+        PlateNameParser.clear()
+        for _ in range(3):
+            PlateNameParser.parse('①白身フライ60g1個')
+        info = PlateNameParser.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 2)
+
+    def test_soup(self):
+        self.assertTrue(PlateNameParser.parse('⑤みそ汁30cc 希釈130').is_miso_soup)
+        self.assertTrue(PlateNameParser.parse('⑤みそ汁30cc 希釈130').is_soup_liquid)
+        self.assertFalse(PlateNameParser.parse('⑤みそ汁具 希釈').is_soup_liquid)
+        self.assertFalse(PlateNameParser.parse('⑤コンソメ（玉葱・人参）16g').is_miso_soup)
+
+    def test_base_name(self):
+        manager = InnerPackageManagement({})
+        self.assertEqual(manager.convert_plate_name('①白身フライ(大)60ｇ1個'), '白身フライ 大')
+        with self.assertRaises(ValueError):
+            manager.convert_plate_name('①123')
+
+        self.assertEqual(PlateNameParser.find_name_parts('ほうれん草 50g'), (('ほうれん草 ', '0'),))
+        self.assertEqual(PlateNameParser.remove_print_marks('▲鮭の塩焼き●'), '鮭の塩焼き')
+
+
+from .models import AllergenPlateRelations
+from .cooking_direction_plates import CookingDirectionPlateIndex, CookingDirectionPlatesManager
+class CookingDirectionPlatesSaveTests(TestCase):
+    def setUp(self):
+        CookingCalendar.clear()
+
+    def tearDown(self):
+        CookingCalendar.clear()
+        PlatePackageRegister.set_buffer(None)
+
+    def get_plate_dict_list(self, count):
+        plate_list = []
+        for index in range(count):
+            plate_list.append({
+                'eating_meal': '■4/10朝食', 'plate': f'①料理{index}', 'is_basic_plate': True, 'is_soup': False,
+                'is_allergen': False, 'eating_type_list': ['20 常･基本食']})
+        plate_list.append({
+            'eating_meal': '■4/10朝食', 'plate': '①料理0(卵なし)', 'is_basic_plate': False, 'is_soup': False,
+            'is_allergen': True, 'eating_type_list': ['1 ﾀﾏｺﾞ･基本食'], 'allergen_base': {'1 ﾀﾏｺﾞ･基本食': '①料理0'}})
+        return [plate_list]
+
+    def save(self, count, cooking_day='2024-04-08'):
+        plate_dict_list = self.get_plate_dict_list(count)
+        with CaptureQueriesContext(connection) as context:
+            CookingDirectionPlatesManager.save(plate_dict_list, cooking_day)
+        return plate_dict_list, len(context.captured_queries)
+
+    def test_save(self):
+        plate_dict_list, _ = self.save(3)
+
+        # 登録した料理のIDが設定される
+        for target_plate in plate_dict_list[0]:
+            self.assertEqual(CookingDirectionPlate.objects.get(id=target_plate['model_id']).plate_name, target_plate['plate'])
+
+        relation = AllergenPlateRelations.objects.get(source__plate_name='①料理0')
+        self.assertEqual((relation.source.plate_name, relation.plate.plate_name, relation.code), ('①料理0', '①料理0(卵なし)', 'ﾀﾏｺﾞ'))
+
+        # 一括登録でも製造日・喫食日の対応が作成される
+        self.assertEqual(EatingManagement.get_meals_dict_by_cooking_day(dt.date(2024, 4, 8)), {dt.date(2024, 4, 10): ['朝食']})
+
+    def test_queries(self):
+        # 料理数が増えても、クエリ数は変わらない
+        _, queries = self.save(2)
+        _, many_queries = self.save(20, cooking_day='2024-04-09')
+        self.assertEqual(many_queries, queries)
+        self.assertEqual(CookingDirectionPlate.objects.filter(cooking_day='2024-04-09').count(), 21)
+
+    def test_index(self):
+        self.save(2)
+        CookingDirectionPlate.objects.create(
+            cooking_day=dt.date(2024, 4, 8), eating_day=dt.date(2024, 4, 10), plate_name='①料理0', meal_name='朝食',
+            seq_meal=7, index=0)
+
+        # 同じ条件の料理は、先に登録したものを返す
+        plate_index = CookingDirectionPlateIndex(dt.date(2024, 4, 8))
+        first = CookingDirectionPlate.objects.filter(plate_name='①料理0').order_by('id').first()
+        self.assertEqual(plate_index.get(dt.date(2024, 4, 10), '朝食', 0, True), first)
+        self.assertEqual(plate_index.find('朝食', True, '①料理0', eating_day='2024-04-10'), first)
+        self.assertEqual(plate_index.find('朝食', True, '①料理0'), first)
+        self.assertIsNone(plate_index.get(dt.date(2024, 4, 10), '昼食', 0, True))
+
+    def test_register_unit_package(self):
+        self.save(2)
+        PackageMaster.objects.create(name='10人用', quantity=10)
+
+        # 袋数をメモリ上に保持する場合、調理表献立・袋マスタは初回のみ検索する
+        buffer = UnitPackageBuffer()
+        PlatePackageRegister.set_buffer(buffer)
+        PlatePackageRegister.register_unit_package(
+            dt.date(2024, 4, 8), dt.date(2024, 4, 10), '朝食', 0, 10, 'テスト', 1, '10人用', '料理0')
+        with self.assertNumQueries(0):
+            PlatePackageRegister.register_unit_package(
+                dt.date(2024, 4, 8), dt.date(2024, 4, 10), '朝食', 1, 10, 'テスト', 2, '10人用', '料理1')
+        self.assertEqual([x.plate_name for _, x in buffer.unit_packages], ['①料理0', '①料理1'])
+
+
+from openpyxl.styles import Font
+from .cooking_direction_sheet import CookingDirectionSheet
+from .management.commands.cooking_direction import Command as CookingDirectionCommand
+from .management.commands.cooking_direction import NORMALIZED_FRAME_NAME, NORMALIZED_FRAME_VERSION
+from .pipeline_trace import TRACE_OFF
+class CookingDirectionSheetTests(TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.root_dir, '調理表_2024.04.08.xlsx')
+        self.sheet_dir = os.path.join(self.root_dir, 'cooking_direction_sheet')
+        self.save_workbook('①鮭の塩焼き')
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def save_workbook(self, plate_name):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws['F4'] = '2024年4月8日(月) 調理'
+        ws['A9'] = '■4/10朝食'
+        ws.merge_cells('A9:O9')
+        for row in [
+            (None, 21, '20 常･基本食(施設)', plate_name, None, '鮭', 1),
+            (None, None, '1 基･基本食(施設)', None, None, '塩', 0.5),
+            (None, 3, '3 常ｱﾚ1･基本食(施設)', '①鮭(乳なし)', None, '鮭', '1/2'),
+            (None, 2.0, None, None, None, None, None),
+        ]:
+            ws.append(row)
+        ws['A14'] = '■4/10昼食'
+        ws['D15'] = '⑤味噌汁'
+        ws['H15'] = '=1+1'
+        # 書式のみ設定された行は読み込まない
+        ws['B20'].font = Font(bold=True)
+        wb.save(self.path)
+
+    def test_to_frame(self):
+        with override_settings(COOKING_DIRECTION_SHEET_DIR=self.sheet_dir):
+            sheet = CookingDirectionSheet.load(self.path)
+
+        # pandas.read_excelと同じ内容になる
+        pd.testing.assert_frame_equal(sheet.to_frame(), pd.read_excel(self.path))
+
+        rows = list(sheet.iter_rows(min_row=9))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0][:4], ['■4/10朝食', '', '', ''])
+        self.assertEqual(rows[1][:7], ['', 21, '20 常･基本食(施設)', '①鮭の塩焼き', '', '鮭', 1])
+        self.assertEqual(rows[4][1], 2)
+
+    def test_cache(self):
+        with override_settings(COOKING_DIRECTION_SHEET_DIR=self.sheet_dir):
+            sheet = CookingDirectionSheet.load(self.path)
+            cache_dir = os.path.join(self.sheet_dir, '調理表_2024.04.08.xlsx')
+            cache_path = CookingDirectionSheet.get_cache_path(cache_dir, sheet.file_hash)
+            self.assertTrue(os.path.isfile(cache_path))
+
+            # 同じ内容の調理表は、中間ファイルから読み込む
+            values = sheet.values.copy()
+            values.loc[10, 'D'] = '中間ファイル'
+            values.to_pickle(cache_path)
+            self.assertEqual(CookingDirectionSheet.load(self.path).values.loc[10, 'D'], '中間ファイル')
+
+            # 再アップロードで内容が変わった場合は、読み直す
+            self.save_workbook('①鯖の味噌煮')
+            sheet = CookingDirectionSheet.load(self.path)
+            self.assertEqual(sheet.values.loc[10, 'D'], '①鯖の味噌煮')
+
+            # 古い内容の中間ファイルは削除する
+            self.assertEqual(os.listdir(cache_dir), [os.path.basename(CookingDirectionSheet.get_cache_path(cache_dir, sheet.file_hash))])
+
+    def test_prune_dirs(self):
+        with override_settings(COOKING_DIRECTION_SHEET_DIR=self.sheet_dir, COOKING_DIRECTION_SHEET_RETENTION_DAYS=62):
+            old_dir = os.path.join(self.sheet_dir, '調理表_2024.01.08.xlsx')
+            recent_dir = os.path.join(self.sheet_dir, '調理表_2024.03.08.xlsx')
+            for cache_dir, days in [(old_dir, 63), (recent_dir, 61)]:
+                os.makedirs(cache_dir)
+                timestamp = (dt.datetime.now() - dt.timedelta(days=days)).timestamp()
+                os.utime(cache_dir, (timestamp, timestamp))
+
+            # 保持日数より前に更新された、他の調理表のフォルダを削除する
+            CookingDirectionSheet.load(self.path)
+            self.assertEqual(sorted(os.listdir(self.sheet_dir)), ['調理表_2024.03.08.xlsx', '調理表_2024.04.08.xlsx'])
+
+    def test_normalized_frame(self):
+        with override_settings(COOKING_DIRECTION_SHEET_DIR=self.sheet_dir):
+            sheet = CookingDirectionSheet.load(self.path)
+            self.assertIsNone(sheet.load_frame(NORMALIZED_FRAME_NAME, NORMALIZED_FRAME_VERSION))
+
+            # 整形後の内容を保存し、同じ内容の調理表から読み込む
+            cook_direc = sheet.to_frame()
+            cook_direc = cook_direc.drop(index=cook_direc.index[[0, 1, 2, 3, 4, 5, 6]]).replace(np.nan, '', regex=True)
+            # 調理表の列数(A〜O列)に揃える
+            cook_direc = cook_direc.reindex(
+                columns=[f'Unnamed: {i}' for i in range(15)], fill_value='')
+            with PipelineTrace('test', TRACE_OFF) as trace:
+                normalized = CookingDirectionCommand().normalize_directions(cook_direc, '2024', '4月', trace)
+            self.assertEqual(list(normalized['before_name']), ['①鮭の塩焼き', '①鮭(乳なし)'])
+            sheet.save_frame(NORMALIZED_FRAME_NAME, NORMALIZED_FRAME_VERSION, normalized)
+            pd.testing.assert_frame_equal(
+                CookingDirectionSheet.load(self.path).load_frame(NORMALIZED_FRAME_NAME, NORMALIZED_FRAME_VERSION),
+                normalized)
+
+            # 整形内容を変更した(バージョンが異なる)場合は使わず、保存し直した場合は古いバージョンを削除する
+            next_version = NORMALIZED_FRAME_VERSION + 1
+            self.assertIsNone(sheet.load_frame(NORMALIZED_FRAME_NAME, next_version))
+            sheet.save_frame(NORMALIZED_FRAME_NAME, next_version, normalized)
+            self.assertIsNone(sheet.load_frame(NORMALIZED_FRAME_NAME, NORMALIZED_FRAME_VERSION))
+
+            # 再アップロードで内容が変わった場合は、整形後の内容も削除する
+            self.save_workbook('①鯖の味噌煮')
+            self.assertIsNone(CookingDirectionSheet.load(self.path).load_frame(NORMALIZED_FRAME_NAME, next_version))
@@ -586,9 +586,11 @@ class UnitImporter:
         enable_day_str = self.input_user.enable_start_day.strftime('%Y-%m-%d')
         if unit_list:
             call_command('weekly_for_call', enable_day_str, ",".join(unit_list))
+            # 画面からの登録(トランザクション内)のため、QRコード画像はプロセスプールを使わずに作成する
+            call_command('generate_qr', units=",".join(unit_list), processes=1)
         else:
             call_command('weekly_for_call', enable_day_str, str(unit.id))
-        call_command('generate_qr')
+            call_command('generate_qr', units=str(unit.id), processes=1)
 
 
 class KarteWriter:
@@ -161,6 +161,10 @@ urlpatterns = [
     path('exec-setout-direction', exec_setout_direction, name="exec_setout_direction"),
     path('exec-setout-create', exec_setout_create, name="exec_setout_create"),
 
+    # バッチ処理状況
+    path('batch-jobs', views.batch_job_list, name="batch_job_list"),
+    path('batch-jobs/<int:pk>', views.batch_job_detail, name="batch_job_detail"),
+
     path('chat/', chat, name="chat"),
     path('chat-all/', chat_all, name="chat_all"),
     path('chat-delete/<int:pk>', chat_delete, name="chat_delete"),
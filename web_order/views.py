@@ -37,11 +37,13 @@ from django.shortcuts import render, redirect
 from django.urls import reverse_lazy, reverse
 from django.views.generic import CreateView, ListView, UpdateView, DetailView, TemplateView, DeleteView
 
+from .business_calendar import BusinessCalendar
 from .contract import ContractManager, UserContract
 from .cooking_direction_plates import CookingDirectionPlatesManager, PlateNameAnalizeUtil
-from .date_management import OrderChangableDayUtil, SalesDayUtil
+from .date_management import OrderChangableDayUtil, SalesDayUtil, SalesDayCalculator
 from .desigin_seal_csv import DesignSealCsvWriter
 from .exceptions import NotChangeOrderError, SetoutDirectionNotExistError
+from .jobs import BatchJobManager, BATCH_JOB_DEFINITIONS
 
 from .forms import OrderForm, OrderListForm, OrderChangeForm, OrderRiceForm, AllergenForm, OrderNewYearForm, AllergenNewYearForm
 from .forms import CommunicationForm, PaperDocumentsForm, InvoiceFilesForm, DocumentsUploadForm, OrderListSalesForm
@@ -62,19 +64,23 @@ from accounts.forms import CustomUserUpdateDryColdForm
 from .meal import MealUtil
 from .models import Order, OrderRice, Communication, OrderEveryday, AllergenDisplay, MealDisplay, MenuDisplay
 from .models import UnitMaster, UserOption, DocGroupDisplay, PaperDocuments, InvoiceFiles, ReservedMealDisplay
-from .models import Chat, FoodPhoto, MonthlyMenu, HolidayList, JapanHoliday, NewYearDaySetting, DocumentDirDisplay, ImportMonthlyReport
+from .models import Chat, FoodPhoto, MonthlyMenu, HolidayList, NewYearDaySetting, DocumentDirDisplay, ImportMonthlyReport
 from .models import GenericSetoutDirection, EngeFoodDirection, SetoutDuration, MonthlySalesPrice, ImportP7SourceFile
-from .models import AllergenPlateRelations, CookingDirectionPlate, BackupAllergenPlateRelations, PickingResultRaw
+from .models import AllergenPlateRelations, CookingDirectionPlate, BackupAllergenPlateRelations
 from .models import InvoiceException, PickingNotice, ReqirePickingPackage, InvoiceDataHistory, ReservedStop
 from .models import UnitPackage, PlatePackageForPrint, TaxEverydaySellingSetting
 from .models import EverydaySelling, NewUnitPrice, AllergenMaster, MixRicePackageMaster, TaxSetting, TaxMaster
 from .models import CommonAllergen, ImportUnit, UserCreationInput, AggMeasureMixRiceMaster, RawPlatePackageMaster
+from .models import BatchJob
 
+from .order_updates import OrderChangeSummary, OrderQuantityUpdater
 from .p7 import P7SourceFileReader, P7CsvFileWriter
 from .picking import ChillerPicking, PickingDirectionOutputManagement, EatingManagement, InnerPackageManagement
 from .picking import QrCodeUtil, PickingResultFileReader
+from .picking_reconciliation import PickingFilter, PickingReconciliation
 
 from .pouch_design import PouchAggregate, PouchDesignWriter
+from .prices import PriceResolver
 
 from .services import AggregateOrder, CookingProduceExporter
 from .setout import ImageClearRequest, EditSetoutDirecion, OutputSetoutHelper
@@ -94,24 +100,11 @@ def get_last_date(datetime):
 
 
 def get_holiday_list(order_limit_day):
-
-    queryset = HolidayList.objects.filter(limit_day__gte=order_limit_day).order_by('limit_day')
-    holiday_list = []
-
-    name = ''
-    for res in queryset:
-        holidays = []
-        name = res.holiday_name
-        s_date = res.start_date
-        e_date = res.end_date
-        holidays.append(s_date)
-        next_date = s_date + timedelta(days=1)
-
-        while next_date <= e_date:
-            holidays.append(next_date)
-            next_date = next_date + timedelta(days=1)
-
-        holiday_list.append((sorted(holidays), res.limit_day))
+    """
+    入力締め切り日が指定日以降の長期休暇を、締め切り日順に取得する
+    """
+    holiday_list = BusinessCalendar.get().get_long_holidays(order_limit_day)
+    name = holiday_list[-1].name if holiday_list else ''
 
     return holiday_list, name
 
@@ -121,94 +114,50 @@ def is_in_holiday_list(target_day):
     指定日が長期休暇に含まれるかどうかを返す
     """
     try:
-        all = list(HolidayList.objects.all())
-        queryset = HolidayList.objects.filter(end_date__gte=target_day, start_date__lte=target_day)
-        q_list = list(queryset)
-        return queryset.exists()
+        return BusinessCalendar.get().is_long_holiday(target_day)
     except BaseException as e:
-        test = f'test'
+        logger.warning(f'長期休暇判定失敗:{e}')
         return False
 
 
 def get_holiday_next_day(target_day):
-    current_day = target_day
-    queryset = HolidayList.objects.filter(end_date__gte=current_day).order_by('limit_day')
-
-    holiday_list = [x for x in queryset if (x.start_date <= current_day) and (x.end_date >= current_day)]
-
-    while holiday_list:
-        current_day += timedelta(days=1)
-        holiday_list = [x for x in queryset if (x.start_date <= current_day) and (x.end_date >= current_day)]
-
-    return current_day
+    return BusinessCalendar.get().next_non_holiday(target_day)
 
 
 def get_holiday_prev_day(target_day):
-    current_day = target_day
-    queryset = HolidayList.objects.filter(start_date__lte=current_day).order_by('limit_day')
-
-    holiday_list = [x for x in queryset if (x.start_date <= current_day) and (x.end_date >= current_day)]
+    return BusinessCalendar.get().prev_non_holiday(target_day)
 
-    while holiday_list:
-        current_day -= timedelta(days=1)
-        holiday_list = [x for x in queryset if (x.start_date <= current_day) and (x.end_date >= current_day)]
 
-    return current_day
+def get_delta_working_day_v1(input_date, business_calendar, days):
+    # 日曜・祝日以外を営業日として、days営業日後を取得
+    return business_calendar.add_working_days(input_date, days, BusinessCalendar.WEEKMASK_V1)
 
 
-def is_holiday(input_date, holiday_list):
-    # 指定された日が祝日(振替休日含む)かどうかを取得する
-    # 引数： 日時、祝日リスト(日付)
-    # 返り値： input_dateが祝日かどうか
-
-    date = input_date.date()
-    matched = [x for x in holiday_list if x == date]
-    return matched
-
-
-def get_delta_working_day_v1(input_date, holiday_list, days):
-    delta_date = input_date
-    while is_holiday(delta_date, holiday_list) or (delta_date.weekday() == 6):
-        delta_date = delta_date + timedelta(days=1)
-
-    for _ in range(days):
-        delta_date = delta_date + timedelta(days=1)
-        while is_holiday(delta_date, holiday_list) or (delta_date.weekday() == 6):
-            delta_date = delta_date + timedelta(days=1)
-
-    return delta_date
-
-
-def get_order_change_limit(date, holiday_list, days_of_rule):
+def get_order_change_limit(date, business_calendar, days_of_rule):
     # dateが日曜なら、それ以外まで巻き戻す(日曜以外は変更期限の最短日になる可能性がある)
     delta_date = date
     while delta_date.weekday() in [6]:
         delta_date = delta_date - timedelta(days=1)
 
     # 平日6日分戻す
-    for _ in range(days_of_rule):
-        delta_date = delta_date - timedelta(days=1)
-        while is_holiday(delta_date, holiday_list) or (delta_date.weekday() in [5, 6]):
-            delta_date = delta_date - timedelta(days=1)
-
-    return delta_date
+    return business_calendar.prev_working_day(delta_date, days_of_rule, BusinessCalendar.WEEKMASK_V2)
 
-def get_delta_working_day_v2(input_date, holiday_list, days):
+def get_delta_working_day_v2(input_date, business_calendar, days):
     # +6日、必ず土日は挟むので+2の計8日
     delta_date = input_date + timedelta(days=8)
 
     # 仮基準日のリミットを取得
-    limit = get_order_change_limit(delta_date, holiday_list, days)
+    limit = get_order_change_limit(delta_date, business_calendar, days)
     if limit == input_date:
         # 同日の場合は、制限日を確定
         return delta_date
     elif limit > input_date:
         delta_date -= timedelta(days=1)
-        before_limit = get_order_change_limit(delta_date, holiday_list, days)
+        before_limit = get_order_change_limit(delta_date, business_calendar, days)
         while before_limit > input_date:
             # 同じか追い越すまで、さかのぼる
             delta_date -= timedelta(days=1)
-            before_limit = get_order_change_limit(delta_date, holiday_list, days)
+            before_limit = get_order_change_limit(delta_date, business_calendar, days)
 
         if before_limit == input_date:
             # 入力と同じ日なら、再取得日が制限日
@@ -218,23 +167,23 @@ def get_delta_working_day_v2(input_date, holiday_list, days):
             return delta_date + timedelta(days=1)
     else:
         delta_date += timedelta(days=1)
-        after_limit = get_order_change_limit(delta_date, holiday_list, days)
+        after_limit = get_order_change_limit(delta_date, business_calendar, days)
         while after_limit < input_date:
             # 同じか追い越すまで、進める
             delta_date += timedelta(days=1)
-            after_limit = get_order_change_limit(delta_date, holiday_list, days)
+            after_limit = get_order_change_limit(delta_date, business_calendar, days)
 
         return delta_date
 
 
-def is_working_day_v1(youbi, input_date, holiday_list):
+def is_working_day_v1(youbi, input_date, business_calendar):
     # 日曜でない、かつ祝日でもない
-    return (not (youbi == 6)) and (not is_holiday(input_date, holiday_list))
+    return business_calendar.is_working_day(input_date, BusinessCalendar.WEEKMASK_V1)
 
 
-def is_working_day_v2(youbi, input_date, holiday_list):
-    # 日曜でない、かつ祝日でもない
-    return (not (youbi in [5, 6])) and (not is_holiday(input_date, holiday_list))
+def is_working_day_v2(youbi, input_date, business_calendar):
+    # 土日でない、かつ祝日でもない
+    return business_calendar.is_working_day(input_date, BusinessCalendar.WEEKMASK_V2)
 
 
 def get_order_change_dates(input_date, ignore_holiday_list=False):
@@ -263,49 +212,48 @@ def get_order_change_dates_v1(input_date, ignore_holiday_list=False):
     # 終了日は、今日を起点に翌々週の月曜日（それ以降は仮注文フォームで入力可能）
 
     # 祝日対応：国民の祝日を読み込む
-    holiday_list_qs = JapanHoliday.objects.filter(date__gte=input_date).values('date').order_by('date')
-    holiday_list = [x['date'] for x in holiday_list_qs]
+    business_calendar = BusinessCalendar.get()
 
     # 開始日の計算
     start_days = 6
     # 営業日は10:00で締め切りの切り替えが発生する
-    if is_working_day_v1(youbi, input_date, holiday_list) and (jikoku >= 10):
+    if is_working_day_v1(youbi, input_date, business_calendar) and (jikoku >= 10):
         start_days += 1
 
     # 今日が日曜日なら土曜午後から引き続き次の月曜喫食日分、つまり8日後以降のものが変更可能で、10時以降も変更なし
     if youbi == 6:
-        from_date = get_delta_working_day_v1(input_date, holiday_list, start_days)
+        from_date = get_delta_working_day_v1(input_date, business_calendar, start_days)
         to_date = input_date + timedelta(days=15)
 
     # 今日が月曜なら10時までは次の月曜喫食日分、つまり7日後(日曜を除いた6日後)以降のものが変更可能で、10時を過ぎると8日後以降のものが可能
     elif youbi == 0:
-        from_date = get_delta_working_day_v1(input_date, holiday_list, start_days)
+        from_date = get_delta_working_day_v1(input_date, business_calendar, start_days)
         to_date = input_date + timedelta(days=14)
 
     # 今日が火曜なら10時までは次の火曜曜喫食日分、つまり7日後以降のものが変更可能で、10時を過ぎると8日後以降のものが可能
     elif youbi == 1:
-        from_date = get_delta_working_day_v1(input_date, holiday_list, start_days)
+        from_date = get_delta_working_day_v1(input_date, business_calendar, start_days)
         to_date = input_date + timedelta(days=13)
 
     # 今日が水曜なら10時までは次の水曜曜喫食日分、つまり7日後以降のものが変更可能で、10時を過ぎると8日後以降のものが可能
     elif youbi == 2:
-        from_date = get_delta_working_day_v1(input_date, holiday_list, start_days)
+        from_date = get_delta_working_day_v1(input_date, business_calendar, start_days)
         to_date = input_date + timedelta(days=12)
 
     # 今日が木曜なら10時までは次の木曜曜喫食日分、つまり7日後以降のものが変更可能で、10時を過ぎると8日後以降のものが可能
     elif youbi == 3:
-        from_date = get_delta_working_day_v1(input_date, holiday_list, start_days)
+        from_date = get_delta_working_day_v1(input_date, business_calendar, start_days)
         to_date = input_date + timedelta(days=11)
 
     # 今日が金曜なら10時までは次の金曜曜喫食日分、つまり7日後以降のものが変更可能で、10時を過ぎると8日後以降のものが可能
     elif youbi == 4:
-        from_date = get_delta_working_day_v1(input_date, holiday_list, start_days)
+        from_date = get_delta_working_day_v1(input_date, business_calendar, start_days)
         to_date = input_date + timedelta(days=10)
 
     # 今日が土曜なら10時までは次の土曜曜喫食日分、つまり7日後以降のものが変更可能で、10時を過ぎると9日後以降のものが可能
     # (次の日曜日喫食分は、10時まで変更可能)
     elif youbi == 5:
-        from_date = get_delta_working_day_v1(input_date, holiday_list, start_days)
+        from_date = get_delta_working_day_v1(input_date, business_calendar, start_days)
 
         if jikoku >= 17:  # 17を過ぎていた場合
             to_date = input_date + timedelta(days=16)
@@ -357,22 +305,20 @@ def get_order_change_dates_v2(input_date, ignore_holiday_list=False):
     # 終了日は、今日を起点に翌々週の月曜日（それ以降は仮注文フォームで入力可能）
 
     # 祝日対応：国民の祝日を読み込む
-    search_date = input_date - relativedelta(days=7)
-    holiday_list_qs = JapanHoliday.objects.filter(date__gte=search_date).values('date').order_by('date')
-    holiday_list = [x['date'] for x in holiday_list_qs]
+    business_calendar = BusinessCalendar.get()
 
     # 開始日の計算
     start_days = 6
     start_day = input_date
     # 営業日は10:00で締め切りの切り替えが発生する
     # V2では、非営業日でも10:00に切り替える
-    # if is_working_day_v2(youbi, input_date, holiday_list) and (jikoku >= 10):
+    # if is_working_day_v2(youbi, input_date, business_calendar) and (jikoku >= 10):
     if jikoku >= 10:
         start_day += relativedelta(days=1)
 
     # 今日が日曜日
     if youbi == 6:
-        from_date = get_delta_working_day_v2(start_day, holiday_list, start_days)
+        from_date = get_delta_working_day_v2(start_day, business_calendar, start_days)
         if jikoku < 10:
             to_date = start_day + timedelta(days=17)
         else:
@@ -380,7 +326,7 @@ def get_order_change_dates_v2(input_date, ignore_holiday_list=False):
 
     # 今日が月曜
     elif youbi == 0:
-        from_date = get_delta_working_day_v2(start_day, holiday_list, start_days)
+        from_date = get_delta_working_day_v2(start_day, business_calendar, start_days)
         if jikoku < 10:
             to_date = start_day + timedelta(days=16)
         else:
@@ -388,7 +334,7 @@ def get_order_change_dates_v2(input_date, ignore_holiday_list=False):
 
     # 今日が火曜
     elif youbi == 1:
-        from_date = get_delta_working_day_v2(start_day, holiday_list, start_days)
+        from_date = get_delta_working_day_v2(start_day, business_calendar, start_days)
         if jikoku < 10:
             to_date = start_day + timedelta(days=15)
         else:
@@ -396,7 +342,7 @@ def get_order_change_dates_v2(input_date, ignore_holiday_list=False):
 
     # 今日が水曜
     elif youbi == 2:
-        from_date = get_delta_working_day_v2(start_day, holiday_list, start_days)
+        from_date = get_delta_working_day_v2(start_day, business_calendar, start_days)
         if jikoku < 10:
             to_date = start_day + timedelta(days=14)
         else:
@@ -404,7 +350,7 @@ def get_order_change_dates_v2(input_date, ignore_holiday_list=False):
 
     # 今日が木曜
     elif youbi == 3:
-        from_date = get_delta_working_day_v2(start_day, holiday_list, start_days)
+        from_date = get_delta_working_day_v2(start_day, business_calendar, start_days)
         if jikoku < 10:
             to_date = start_day + timedelta(days=13)
         else:
@@ -412,7 +358,7 @@ def get_order_change_dates_v2(input_date, ignore_holiday_list=False):
 
     # 今日が金曜
     elif youbi == 4:
-        from_date = get_delta_working_day_v2(start_day, holiday_list, start_days)
+        from_date = get_delta_working_day_v2(start_day, business_calendar, start_days)
         if jikoku < 10:
             to_date = start_day + timedelta(days=12)
         else:
@@ -420,7 +366,7 @@ def get_order_change_dates_v2(input_date, ignore_holiday_list=False):
 
     # 今日が土曜
     elif youbi == 5:
-        from_date = get_delta_working_day_v2(start_day, holiday_list, start_days)
+        from_date = get_delta_working_day_v2(start_day, business_calendar, start_days)
         if jikoku < 10:
             to_date = start_day + timedelta(days=11)
         else:
@@ -562,16 +508,16 @@ def order(request):
     order_end = order_limit_day + timedelta(days=16)
     # ----------------------------------------------------------------------------
 
-    # 長期休暇に設定されている日付のリストを取得
+    # 長期休暇の一覧を取得
     holiday_list, _ = get_holiday_list(order_limit_day)
-    for holidays, holiday_limit_day in holiday_list:
-        if order_end in holidays:
-            duration = order_start - holidays[0]
+    for holiday in holiday_list:
+        if holiday.includes(order_end):
+            duration = order_start - holiday.start_date
             if (date_time_now.weekday() == 5) and (date_time_now.hour >= 17):
                 judge_days = 6
             else:
                 judge_days = 7
-            if (duration.days >= judge_days) and (order_start in holidays):
+            if (duration.days >= judge_days) and holiday.includes(order_start):
                 # 各期日を1週間延長
                 order_limit_day = order_limit_day + timedelta(days=7)
                 from_date = from_date + timedelta(days=7)
@@ -580,7 +526,7 @@ def order(request):
                 order_end = order_end + timedelta(days=7)
 
                 # まだorder_endが休暇期間内なら、越えるまで延長
-                while order_end in holidays:
+                while holiday.includes(order_end):
                     order_limit_day = order_limit_day + timedelta(days=7)
                     from_date = from_date + timedelta(days=7)
                     to_date = to_date + timedelta(days=7)
@@ -589,29 +535,29 @@ def order(request):
 
                 # order_endが休暇期間を超えている状態
                 # 入力開始期間は、休み明けの日から
-                order_start = holidays[-1] + timedelta(days=1)
+                order_start = holiday.end_date + timedelta(days=1)
             else:
                 # order_startはかえる必要ないはず・・・
-                order_end = holidays[-1]
+                order_end = holiday.end_date
 
             break
         else:
-            duration = holiday_limit_day - order_limit_day
+            duration = holiday.limit_day - order_limit_day
             if (date_time_now.weekday() == 5) and (date_time_now.hour >= 17):
                 judge_days = 6
             else:
                 judge_days = 7
             if duration.days < judge_days:
                 # この期間の入力を設定
-                if (order_end + timedelta(days=1)) == holidays[0]:
-                    order_end = holidays[-1]
-                    order_limit_day = holiday_limit_day
+                if (order_end + timedelta(days=1)) == holiday.start_date:
+                    order_end = holiday.end_date
+                    order_limit_day = holiday.limit_day
                 else:
-                    order_start = holidays[0]
-                    order_end = holidays[-1]
-                    from_date = holidays[0] # 火曜日である前提
+                    order_start = holiday.start_date
+                    order_end = holiday.end_date
+                    from_date = holiday.start_date # 火曜日である前提
                     to_date = from_date + timedelta(days=6)
-                    order_limit_day = holiday_limit_day
+                    order_limit_day = holiday.limit_day
                 break
     change_limit_day = None
     if not holiday_list:
@@ -785,14 +731,11 @@ def order(request):
     if request.method == "POST" and formset.is_valid():
         logger.info(f"●仮注文入力開始({request.user.facility_name})-{from_date}")
 
-        for fm in formset:
-            updated_order = fm.save(commit=False)
-            if (updated_order.eating_day.month == 1) and (updated_order.eating_day.day == 1):
-                pass
-            else:
-                updated_order.save()
+        # 食数の変わった注文のみを保存する(1/1は対象外)
+        summary = OrderQuantityUpdater().save(
+            formset, skip=lambda x: (x.eating_day.month == 1) and (x.eating_day.day == 1))
 
-        logger.info(f"●仮注文入力完了({request.user.facility_name})")
+        logger.info(f"●仮注文入力完了({request.user.facility_name})-{summary}")
         messages.success(request, 'この週の注文を確定しました。')
         return redirect("web_order:order")
     else:
@@ -1311,33 +1254,45 @@ class OrderMaintenanceView(TemplateView):
         unit = None
         eating_day = None
         if formset.is_valid() and is_valid_allergen:
-            # 通常注文の反映
-            formset.save()
-
             unit = base_order.unit_name
             eating_day = base_order.eating_day
 
-            # アレルギー注文の反映
+            # 通常注文の変更内容
+            updater = OrderQuantityUpdater()
+            summary = OrderChangeSummary()
+            updater.collect_changes(formset, summary)
+
+            # アレルギー注文の変更内容
+            ar_changes = []
+            ar_creates = []
+            ar_delete_ids = []
+            existing_orders = Order.objects.in_bulk([int(x[0]) for x in orders if x[0]])
             for x in orders:
                 if x[0]:    # IDがある場合
-                    order = Order.objects.get(id=x[0])
+                    order = existing_orders[int(x[0])]
                     if x[5]:    # 食数がある場合
-                        order.unit_name_id = x[1]
-                        order.meal_name_id = x[2]
-                        order.menu_name_id = x[3]
-                        order.allergen_id = x[4]
-                        order.quantity = x[5]
-                        order.save()
+                        values = (int(x[1]), int(x[2]), int(x[3]), int(x[4]), x[5])
+                        prev_values = (order.unit_name_id, order.meal_name_id, order.menu_name_id,
+                                       order.allergen_id, order.quantity)
+                        if values != prev_values:
+                            prev = order.quantity
+                            order.unit_name_id, order.meal_name_id, order.menu_name_id, \
+                                order.allergen_id, order.quantity = values
+                            ar_changes.append((order, prev))
                     else:
-                        order.delete()
+                        ar_delete_ids.append(order.id)
                 else:
-                    Order.objects.create(
+                    ar_creates.append(Order(
                         eating_day=eating_day,
                         unit_name_id=x[1],
                         meal_name_id=x[2],
                         menu_name_id=x[3],
                         allergen_id=x[4],
-                        quantity=x[5])
+                        quantity=x[5]))
+
+            # 通常注文・アレルギー注文を1トランザクションで反映
+            updater.write(summary, creates=ar_creates, delete_ids=ar_delete_ids, extra_changes=ar_changes)
+            logger.info(f'注文メンテナンス({unit.unit_name}-{eating_day}):{summary}')
             messages.success(request, '注文を更新しました。')
 
         context = {
@@ -1709,6 +1664,13 @@ def order_rice(request):
             # バリデーションされたデータを一時保存
             instances = formset.save(commit=False)
 
+            # 変更前の合数・期限解除の設定・長期休暇をまとめて取得
+            before_dict = OrderRice.objects.in_bulk([x.id for x in instances if x.id])
+            unlock_users = set(UserOption.objects.filter(
+                username__in=[x.unit_name.username_id for x in instances if x.eating_day and x.unit_name_id],
+                unlock_limitation=True).values_list('username_id', flat=True))
+            holiday_list = list(HolidayList.objects.all().order_by('id'))
+
             # 不正な日付を直接入力した場合の対応
             for entry in instances:
                 if entry.eating_day:
@@ -1720,86 +1682,66 @@ def order_rice(request):
                         }
                         return render(request, template_name="order_rice.html", context=context)
 
-                    before = OrderRice.objects.filter(id=entry.id).first()
-                    if before:
-                        if (before.quantity != entry.quantity) or (before.eating_day != entry.eating_day):
-                            target_eating_day = date_time_now.date()
-                            unit = entry.unit_name
-                            if UserOption.objects.filter(username=unit.username, unlock_limitation=True).exists():
-                                target_eating_day -= relativedelta(days=7)
-
-                            enable_holiday_list = HolidayList.objects.filter(start_date__lte=entry.eating_day,
-                                                                             end_date__gte=entry.eating_day).first()
-                            if enable_holiday_list and _is_over_order_change_limit(target_eating_day, enable_holiday_list.limit_day,
-                                                                                   date_time_now.hour):
-                                # 入力の喫食日が長期休暇で食数変更不可の場合
-                                messages.error(request, f'運送便の長期休暇による仕入れの都合により、{entry.eating_day.strftime("%m月%d日")}の合数変更は行えません。')
-                                context = {
-                                    "formset": formset,
-                                    "from_date": from_date,
-                                }
-                                logger.info('合数変更不可')
-                                return render(request, template_name="order_rice.html", context=context)
-                    else:
-                        target_eating_day = date_time_now.date()
-                        unit = entry.unit_name
-                        if UserOption.objects.filter(username=unit.username, unlock_limitation=True).exists():
-                            target_eating_day -= relativedelta(days=7)
-
-                        enable_holiday_list = HolidayList.objects.filter(start_date__lte=entry.eating_day,
-                                                                         end_date__gte=entry.eating_day).first()
-                        if enable_holiday_list and _is_over_order_change_limit(target_eating_day, enable_holiday_list.limit_day,
-                                                                               date_time_now.hour):
-                            # 入力の喫食日が長期休暇で食数変更不可の場合
-                            messages.error(request, f'運送便の長期休暇による仕入れの都合により、{entry.eating_day.strftime("%m月%d日")}の合数変更は行えません。')
-                            context = {
-                                "formset": formset,
-                                "from_date": from_date,
-                            }
-                            logger.info('合数変更不可')
-                            return render(request, template_name="order_rice.html", context=context)
-
-
-            # 削除チェックがついたentryを取り出して削除
-            for entry in formset.deleted_objects:
-                entry.delete()
+                    before = before_dict.get(entry.id, None)
+                    if before and (before.quantity == entry.quantity) and (before.eating_day == entry.eating_day):
+                        # 合数・喫食日に変更がない場合は、締め切りを確認しない
+                        continue
+
+                    target_eating_day = date_time_now.date()
+                    if entry.unit_name.username_id in unlock_users:
+                        target_eating_day -= relativedelta(days=7)
+
+                    enable_holiday_list = next(
+                        (x for x in holiday_list if x.start_date <= entry.eating_day <= x.end_date), None)
+                    if enable_holiday_list and _is_over_order_change_limit(target_eating_day, enable_holiday_list.limit_day,
+                                                                           date_time_now.hour):
+                        # 入力の喫食日が長期休暇で食数変更不可の場合
+                        messages.error(request, f'運送便の長期休暇による仕入れの都合により、{entry.eating_day.strftime("%m月%d日")}の合数変更は行えません。')
+                        context = {
+                            "formset": formset,
+                            "from_date": from_date,
+                        }
+                        logger.info('合数変更不可')
+                        return render(request, template_name="order_rice.html", context=context)
 
-            # 新たに作成されたentryと更新されたentryを取り出し、ユーザーを紐づけて保存
-            delete_list = []
-            for entry in instances:
-                if entry.eating_day:
-                    rice_entry, is_create = OrderRice.objects.get_or_create(eating_day=entry.eating_day, unit_name=entry.unit_name)
-                    if is_create:
-                        if entry.id:
-                            # 更新先が存在しない場合は、既存の情報を更新
-                            entry.user = request.user
-                            entry.save()
-
-                            rice_entry.delete()
+            with transaction.atomic():
+                # 削除チェックがついたentryを取り出して削除
+                OrderRice.objects.filter(id__in=[x.id for x in formset.deleted_objects]).delete()
+
+                # 新たに作成されたentryと更新されたentryを取り出し、ユーザーを紐づけて保存
+                delete_list = []
+                for entry in instances:
+                    if entry.eating_day:
+                        rice_entry, is_create = OrderRice.objects.get_or_create(eating_day=entry.eating_day, unit_name=entry.unit_name)
+                        if is_create:
+                            if entry.id:
+                                # 更新先が存在しない場合は、既存の情報を更新
+                                entry.user = request.user
+                                entry.save()
+
+                                rice_entry.delete()
+                            else:
+                                # 更新先が存在しない、新規データはそのまま登録
+                                rice_entry.quantity = entry.quantity
+                                rice_entry.user = request.user
+                                rice_entry.save()
                         else:
-                            # 更新先が存在しない、新規データはそのまま登録
                             rice_entry.quantity = entry.quantity
                             rice_entry.user = request.user
                             rice_entry.save()
+
+                            delete_list = [x for x in delete_list if x.id != rice_entry.id]
+                            if entry.id:
+                                # 更新先が存在する場合は、既存の情報を削除して、上書き
+                                delete_list.append(entry)
+                            else:
+                                # 更新先が存在する場合、新規データは無視して更新に使う
+                                pass
                     else:
-                        rice_entry.quantity = entry.quantity
-                        rice_entry.user = request.user
-                        rice_entry.save()
-
-                        for enum_index, e in enumerate(delete_list):
-                            if e.id == rice_entry.id:
-                                delete_list.pop(enum_index)
-                        if entry.id:
-                            # 更新先が存在する場合は、既存の情報を削除して、上書き
-                            delete_list.append(entry)
-                        else:
-                            # 更新先が存在する場合、新規データは無視して更新に使う
-                            pass
-                else:
-                    delete_list.append(entry)
+                        delete_list.append(entry)
 
-            for entry in delete_list:
-                entry.delete()
+                OrderRice.objects.filter(id__in=[x.id for x in delete_list if x.id]).delete()
+            logger.info(f'合数更新:入力={len(instances)},削除={len(formset.deleted_objects)}')
             messages.success(request, '登録しました。')
             return redirect("web_order:order_rice")
 
@@ -1834,37 +1776,10 @@ def get_all_units(request):
 
 
 def generate_sales_date(qs, exception_masters):
-    for order in qs:
-        unit_em = [x for x in exception_masters if x.unit_name_id == order.unit_name_id]
-        if unit_em:
-            unit_em_first = unit_em[0]
-            solid_day = SalesDayUtil.get_by_eating_day_by_settings(order.eating_day)
-            week_day = solid_day.weekday()
-            if week_day == 4:
-                # 金曜日の場合
-                if unit_em_first.is_far:
-                    sales_date = solid_day + relativedelta(days=-1)
-                    yield order, sales_date
-                else:
-                    sales_date = solid_day
-                    yield order, sales_date
-            elif week_day == 5:
-                # 土曜日の場合
-                sales_date = solid_day + relativedelta(days=unit_em_first.ng_saturday)
-                yield order, sales_date
-            elif week_day == 6:
-                # 日曜日の場合
-                sales_date = solid_day + relativedelta(days=unit_em_first.ng_sunday)
-                yield order, sales_date
-            elif unit_em_first.reduced_rate:
-                # 業務委託の場合は、喫食日=売上日とする
-                yield order, order.eating_day
-            else:
-                sales_date = solid_day
-                yield order, sales_date
-        else:
-            sales_date = SalesDayUtil.get_by_eating_day_by_settings(order.eating_day)
-            yield order, sales_date
+    """
+    注文と売上日の組を返す(売上日はユニット毎の売上日調整を反映)
+    """
+    return SalesDayCalculator(exception_masters).generate(qs)
 
 
 # すべての注文データの表示 ------------------------------------------------
@@ -1972,34 +1887,15 @@ def order_list(request):
                     csv_form = OrderListCsvForm(None, initial=d_dict)
 
                 # 単価情報の取得
-                user_list = [x[0] for x in
-                             UnitMaster.objects.filter(id__in=unit_id_list).distinct().values_list('username')]
-                qs2 = MenuDisplay.objects.filter(username__in=user_list)
+                price_resolver = PriceResolver.for_units(unit_list)
                 object_list = []
                 sales_dict = {}
                 num_dict = {}
                 for order, sales_day in order_list:
-                    menu_display = qs2.filter(username=order.unit_name.username, menu_name=order.menu_name).first()
+                    menu_display = price_resolver.get_menu_display(order.unit_name.username_id, order.menu_name_id)
                     if menu_display:
-                        new_price = NewUnitPrice.objects.filter(
-                            username=order.unit_name.username, menu_name=order.menu_name.menu_name,
-                            eating_day__lte=sales_day).order_by('eating_day').first()
                         disp_dict = {'order': order, 'sales_day': sales_day}
-                        if order.meal_name.meal_name == '朝食':
-                            if new_price:
-                                disp_dict['price'] = new_price.price_breakfast
-                            else:
-                                disp_dict['price'] = menu_display.price_breakfast
-                        elif order.meal_name.meal_name == '昼食':
-                            if new_price:
-                                disp_dict['price'] = new_price.price_lunch
-                            else:
-                                disp_dict['price'] = menu_display.price_lunch
-                        elif order.meal_name.meal_name == '夕食':
-                            if new_price:
-                                disp_dict['price'] = new_price.price_dinner
-                            else:
-                                disp_dict['price'] = menu_display.price_dinner
+                        disp_dict['price'] = price_resolver.get_order_price(order, sales_day)
                         disp_dict['sales'] = disp_dict['price'] * order.quantity
                         total_sales += disp_dict['sales']
                         if disp_dict['sales_day'] in sales_dict:
@@ -2100,22 +1996,15 @@ def order_list(request):
             csv_form = OrderListCsvForm(None, initial=d_dict)
 
             # 単価情報の取得
-            user_list = [x[0] for x in
-                         UnitMaster.objects.filter(id__in=unit_id_list).distinct().values_list('username')]
-            qs2 = MenuDisplay.objects.filter(username__in=user_list)
+            price_resolver = PriceResolver.for_units(unit_list)
             object_list = []
             sales_dict = {}
             num_dict = {}
             for order, sales_day in order_list:
-                menu_display = qs2.filter(username=order.unit_name.username, menu_name=order.menu_name).first()
+                menu_display = price_resolver.get_menu_display(order.unit_name.username_id, order.menu_name_id)
                 if menu_display:
                     disp_dict = {'order': order, 'sales_day': sales_day}
-                    if order.meal_name.meal_name == '朝食':
-                        disp_dict['price'] = menu_display.price_breakfast
-                    elif order.meal_name.meal_name == '昼食':
-                        disp_dict['price'] = menu_display.price_lunch
-                    elif order.meal_name.meal_name == '夕食':
-                        disp_dict['price'] = menu_display.price_dinner
+                    disp_dict['price'] = price_resolver.get_order_price(order, sales_day)
                     disp_dict['sales'] = disp_dict['price'] * order.quantity
                     total_sales += disp_dict['sales']
                     if disp_dict['sales_day'] in sales_dict:
@@ -2198,20 +2087,13 @@ def order_list_csv(request):
                   (x[1] >= in_date) and (x[1] <= out_date)]
 
     # 単価情報の取得
-    user_list = [x[0] for x in
-                 UnitMaster.objects.filter(id__in=unit_id_list).distinct().values_list('username')]
-    qs2 = MenuDisplay.objects.filter(username__in=user_list)
+    price_resolver = PriceResolver.for_units(UnitMaster.objects.filter(id__in=unit_id_list))
     object_list = []
     for order, sales_day in order_list:
-        menu_display = qs2.filter(username=order.unit_name.username, menu_name=order.menu_name).first()
+        menu_display = price_resolver.get_menu_display(order.unit_name.username_id, order.menu_name_id)
         if menu_display:
             disp_dict = {'order': order, 'sales_day': sales_day}
-            if order.meal_name.meal_name == '朝食':
-                disp_dict['price'] = menu_display.price_breakfast
-            elif order.meal_name.meal_name == '昼食':
-                disp_dict['price'] = menu_display.price_lunch
-            elif order.meal_name.meal_name == '夕食':
-                disp_dict['price'] = menu_display.price_dinner
+            disp_dict['price'] = price_resolver.get_order_price(order, sales_day)
             disp_dict['sales'] = disp_dict['price'] * order.quantity
             object_list.append(disp_dict)
 
@@ -2463,17 +2345,7 @@ def create_measure_table(request):
         filename = str(request.FILES['document_file'])
         if form.is_valid():
             form.save()
-            command_errors = call_command('cooking_direction', filename)
-
-            error_sp = command_errors.split(",") if command_errors else []
-            if error_sp:
-                message = "以下の調理表出力に失敗しました。"
-                messages.warning(request, message)
-                for error in error_sp:
-                    messages.warning(request, f'・{error}')
-            else:
-                messages.success(request, '計量表の出力が完了しました')
-            return redirect('web_order:control_panel')
+            return enqueue_batch_job(request, 'cooking_direction', filename, filename)
     else:
         form = CreateMeasureTableForm()
     return render(request, 'paper_documents.html', {'form': form})
@@ -5767,6 +5639,21 @@ def manual_files_pouch(request):
 
 
 # submit押下時に呼び出されるもの -----------------------------------------
+def enqueue_batch_job(request, command_name, target, *args, **options):
+    """
+    バッチ処理を登録し、処理状況画面に遷移する。処理自体はbatch_workerコマンドで実行される。
+    """
+    job, created = BatchJobManager.enqueue(
+        command_name, str(target), *args, requested_by=request.user.username, **options)
+    label = BatchJobManager.get_definition(command_name).label
+    if created:
+        messages.success(request, f'{label}({target})を受け付けました。処理状況はこの画面で確認できます。')
+    else:
+        messages.info(request, f'{label}({target})は既に受付済みです。処理状況はこの画面で確認できます。')
+
+    return redirect('web_order:batch_job_detail', pk=job.id)
+
+
 def exec_agg_temp(request):
     form = ExecForm(request.POST)
 
@@ -5775,12 +5662,7 @@ def exec_agg_temp(request):
 
     in_date = form.cleaned_data['in_date']
 
-    # call_command('agg_temp', in_date)
-    call_command('aggregation', in_date)
-
-    messages.success(request, '食数集計表の出力が完了しました')
-
-    return redirect('web_order:control_panel')
+    return enqueue_batch_job(request, 'aggregation', in_date, in_date)
 
 
 def exec_agg_measure(request):
@@ -5791,8 +5673,7 @@ def exec_agg_measure(request):
 
     in_date = form.cleaned_data['in_date']
 
-    call_command('agg_measure', in_date)
-    return redirect('web_order:control_panel')
+    return enqueue_batch_job(request, 'agg_measure', in_date, in_date)
 
 # 請求データ集計の実行
 def exec_invoice_label(request):
@@ -5803,11 +5684,7 @@ def exec_invoice_label(request):
 
     in_date = form.cleaned_data['in_date']
 
-    call_command('gen_invoice_label', in_date)
-
-    messages.success(request, '出力が完了しました')
-
-    return redirect('web_order:control_panel')
+    return enqueue_batch_job(request, 'gen_invoice_label', in_date, in_date)
 
 
 # 配送ラベル出力の実行
@@ -5819,11 +5696,7 @@ def exec_transfer_label(request):
 
     in_date = form.cleaned_data['in_date']
 
-    call_command('gen_transfer_label', in_date)
-
-    messages.success(request, '出力が完了しました')
-
-    return redirect('web_order:control_panel')
+    return enqueue_batch_job(request, 'gen_transfer_label', in_date, in_date)
 
 
 # 売価計算表出力の実行
@@ -5839,11 +5712,7 @@ def exec_sales_price(request):
     else:
         month = in_date.strftime('%Y-%-m')
 
-    call_command('calc_sales_price', month)
-
-    messages.success(request, '出力が完了しました')
-
-    return redirect('web_order:control_panel')
+    return enqueue_batch_job(request, 'calc_sales_price', month, month)
 
 def exec_aggregation(request):
     form = ExecForm(request.POST)
@@ -5853,13 +5722,7 @@ def exec_aggregation(request):
 
     in_date = form.cleaned_data['in_date']
 
-    call_command('aggregation', in_date)
-
-    context = {
-        "form": form
-    }
-
-    return render(request, template_name='control_panel.html', context=context)
+    return enqueue_batch_job(request, 'aggregation', in_date, in_date)
 
 
 def exec_setout_direction(request):
@@ -5870,15 +5733,47 @@ def exec_setout_direction(request):
 
     in_date = form.cleaned_data['in_date']
 
-    #call_command('setout_direction', in_date)
-    call_command('gen_setout_direction', in_date)
+    return enqueue_batch_job(request, 'gen_setout_direction', in_date, in_date)
+
+
+# バッチ処理状況一覧
+def batch_job_list(request):
+    if not request.user.is_staff:
+        return HttpResponse('このページは表示できません', status=500)
+
+    jobs = BatchJob.objects.all().order_by('-created_at')[:100]
+    rows = []
+    for job in jobs:
+        definition = BATCH_JOB_DEFINITIONS.get(job.command_name)
+        rows.append((job, definition.label if definition else job.command_name))
 
     context = {
-        "form": form
+        "rows": rows,
+        "interval": settings.BATCH_JOB_AUTO_RELOAD_INTERVAL,
     }
 
-    messages.success(request, '出力が完了しました')
-    return render(request, template_name='monthly_menu_list.html', context=context)
+    return render(request, template_name="batch_job_list.html", context=context)
+
+
+# バッチ処理状況詳細
+def batch_job_detail(request, pk):
+    if not request.user.is_staff:
+        return HttpResponse('このページは表示できません', status=500)
+
+    job = BatchJob.objects.filter(id=pk).first()
+    if not job:
+        return HttpResponse('指定されたバッチ処理は存在しません', status=404)
+
+    definition = BATCH_JOB_DEFINITIONS.get(job.command_name)
+    context = {
+        "job": job,
+        "label": definition.label if definition else job.command_name,
+        "list_url_name": definition.list_url_name if definition else '',
+        "result_files": [(os.path.basename(x), f'{settings.MEDIA_URL}{x}') for x in job.result_files],
+        "interval": settings.BATCH_JOB_AUTO_RELOAD_INTERVAL,
+    }
+
+    return render(request, template_name="batch_job_detail.html", context=context)
 
 
 # チャット -----------------------------------------------------------
@@ -6126,15 +6021,8 @@ def exec_output_kakiokoshi(request):
                 #date = in_date.strftime('%Y-%-m%-d')
                 date = in_date.strftime('%Y-%m-%d')
 
-            call_command('kakiokoshi_output', date)
-
-            messages.success(request, '出力が完了しました')
-            logger.info(f'帳票出力完了(書き起こし表)-{in_date}製造')
-
-            new_form = ExecOutputKakiokoshiForm()
-            context = {
-                "form": new_form
-            }
+            logger.info(f'帳票出力受付(書き起こし表)-{in_date}製造')
+            return enqueue_batch_job(request, 'kakiokoshi_output', date, date)
         else:
             context = {
                 "form": form
@@ -6404,10 +6292,20 @@ def picking_upload(request):
             doc_file = file.document_file
             df = pd.read_csv(doc_file, delimiter=',', header=None, dtype=str)
             reader = PickingResultFileReader(df, doc_file.name)
-            reader.read_to_save()
+            summary = reader.read_to_save()
+
+            file.inserted_count = summary.inserted_count
+            file.duplicate_count = summary.duplicate_count
+            file.rejected_count = summary.rejected_count
+            file.save()
+
+            # 照合結果を破棄し、次の表示時に照合し直す
+            PickingReconciliation.clear()
 
             now = dt.datetime.now()
-            messages.success(request, f'[{now.strftime("%Y/%m/%d %H:%M:%S")}]結果のアップロードが完了しました')
+            messages.success(request, f'[{now.strftime("%Y/%m/%d %H:%M:%S")}]結果のアップロードが完了しました'
+                                      f'(登録:{summary.inserted_count}件、重複:{summary.duplicate_count}件、'
+                                      f'対象外:{summary.rejected_count}件)')
             render(request, 'picking_upload.html', {'form': form})
         else:
             messages.error(request, '結果のアップロードに失敗しました')
@@ -6421,192 +6319,18 @@ class PickingResultView(TemplateView):
     template_name = "picking_result_list.html"
 
     def judge_result(self, result_list, package_count):
-        if result_list:
-            last_result = result_list[-1]
-            if last_result == 'NG':
-                return 'NG未解消'
-
-        result_len = len([x for x in result_list if x == 'OK'])
-        if (result_len == 0) or (package_count == 0):
-            return 'データ不正'
-        if package_count > result_len:
-            return '読み取り件数不足'
-        elif package_count < result_len:
-            return '照合重複'
-        elif 'NG' in result_list:
-            return '正常(NG訂正)'
-        return '-'
-
-    def parse_qr_value_v2(self, value: str, terminal_no: str, picking_date, require_qs, phase: str):
-        """
-        QRコード値の解析
-        """
-        unit_number, meal_name, type_value, eating_day = QrCodeUtil.perse_qr_value_v2(value)
-        type_name = QrCodeUtil.parse_type(type_value)
-        qs = require_qs.filter(unit_number=unit_number, meal_name=meal_name, picking_type_code=type_value)
-        result = None
-        for require in qs:
-            if require.eating_day.day == eating_day:
-                result = require
-                break
-
-        if result:
-            return {
-                'require_id': result.id,
-                'terminal_no': terminal_no,
-                'unit_number': unit_number,
-                'unit_name': result.short_name,
-                'picking_date': picking_date.strftime('%Y年%m月%d日'),
-                'qr_value': value,
-                'meal_name': meal_name,
-                'type': type_name,
-                'picking_phase': 'ピッキング指示書と中袋' if phase == '中袋' else '配送用ダンボールと中袋',
-                'eating_day': result.eating_day,
-                'order_count': result.order_count,
-                'package_count': result.package_count,
-            }
-        else:
-            # logger.warning(f'value_skip:{unit_number}-{meal_name}-{type_name}-{eating_day}')
-            return None
+        return PickingReconciliation.judge_result(result_list, package_count)
 
     def get_records(self, cooking_day, picking_day, is_show_corrected: bool=False, visible_phase_code="", visible_meal_code="", visible_type_code=""):
-        object_list = []
-
-        # 読み取り結果なしの施設をNG表示するため、照合が必要な施設の一覧を取得
-        require_qs = ReqirePickingPackage.objects.filter(cooking_day=cooking_day, package_count__gt=0).order_by('unit_number')
-
-        max_date = picking_day + relativedelta(days=1)
-        result_qs = PickingResultRaw.objects.filter(picking_date__gte=picking_day).filter(
-            picking_date__lt=max_date).order_by('terminal_no', 'qr_value', 'picking_phase', 'created_at')
-
         # 一覧フィルタリング条件
-        if is_show_corrected:
-            filter_status = ['-']
-        else:
-            filter_status = ['正常(NG訂正)', '-']
-        if visible_phase_code:
-            if visible_phase_code == "0":
-                visible_phase = ['ピッキング指示書と中袋']
-                visible_phase_for_none = ['中袋']
-            else:
-                visible_phase = ['配送用ダンボールと中袋']
-                visible_phase_for_none = ['段ボール']
-        else:
-            visible_phase = ['ピッキング指示書と中袋', '配送用ダンボールと中袋']
-            visible_phase_for_none = ['中袋', '段ボール']
-        if visible_meal_code:
-            if visible_meal_code == "1":
-                visible_meals = ['朝食']
-            elif visible_meal_code == "2":
-                visible_meals = ['昼食']
-            elif visible_meal_code == "3":
-                visible_meals = ['夕食']
-            else:
-                visible_meals = []
-        else:
-            visible_meals = ['朝食', '昼食', '夕食']
-        if visible_type_code:
-            if visible_type_code == "1":
-                visible_types = ['基本食']
-                visible_types_code = ['01']
-            elif visible_type_code == "2":
-                visible_types = ['嚥下食']
-                visible_types_code = ['02']
-            elif visible_type_code == "3":
-                visible_types = ['汁・汁具']
-                visible_types_code = ['03']
-            elif visible_type_code == "4":
-                visible_types = ['原体']
-                visible_types_code = ['04']
-            else:
-                visible_types = []
-                visible_types_code = []
-        else:
-            visible_types = ['基本食', '嚥下食', '汁・汁具', '原体']
-            visible_types_code = ['01', '02', '03', '04']
+        picking_filter = PickingFilter(is_show_corrected, visible_phase_code, visible_meal_code, visible_type_code)
 
         # 検索条件ログ出力
-        logger.info('ピッキング結果表示条件:')
-        logger.info(filter_status)
-        logger.info(visible_phase)
-        logger.info(visible_meals)
-        logger.info(visible_types)
-
-        result_exists_dict = {}
-        for key, group in groupby(result_qs, key=lambda x: (x.terminal_no, x.qr_value, x.picking_phase)):
-            terminal_no, qr_value, picking_phase = key
-            result_dict = self.parse_qr_value_v2(
-                qr_value, terminal_no, picking_day, require_qs, phase=picking_phase)
-
-            if result_dict:
-                # 結果リストの設定
-                result_list = [x.result for x in group]
-                result_dict['result_list'] = result_list
-                result_dict['warning'] = self.judge_result(result_list, result_dict['package_count'])
-
-                if (not (result_dict['warning'] in filter_status)) and \
-                        (result_dict['picking_phase'] in visible_phase)and \
-                        (result_dict['meal_name'] in visible_meals) and \
-                        (result_dict['type'] in visible_types):
-                    object_list.append(result_dict)
-
-                # 出力済み施設の検証
-                if result_dict['require_id'] in result_exists_dict:
-                    result_exists_dict[result_dict['require_id']] += [picking_phase]
-                else:
-                    result_exists_dict[result_dict['require_id']] = [picking_phase]
-
-        for require in require_qs:
-            # 取得済みの除外
-            exists_phase = []
-            target_phase = []
-            if require.id in result_exists_dict:
-                if len(result_exists_dict[require.id]) == 2:
-                    # ピッキング指示書照合、段ボール照合両方取得済み
-                    continue
-                elif require.id in result_exists_dict:
-                    exists_phase = result_exists_dict[require.id]
+        picking_filter.log()
 
-            # フィルタリング条件に合わないものを除外
-            if not (require.meal_name in visible_meals):
-                continue
-            if not (require.picking_type_code in visible_types_code):
-                continue
-            if exists_phase:
-                for p in visible_phase_for_none:
-                    if p in exists_phase:
-                        pass
-                    else:
-                        target_phase += [p]
-            else:
-                target_phase = visible_phase_for_none
-
-            # 施設の照合結果がないので、追加する
-            for phase in target_phase:
-                dict = {}
-                dict['terminal_no'] = '-'
-                dict['picking_date'] = picking_day.strftime('%Y年%m月%d日')
-                dict['eating_day'] = require.eating_day.strftime('%Y年%m月%d日')
-                dict['qr_value'] = ''
-                dict['result_list'] = []
-                if require.picking_type_code == '01':
-                    dict['type'] = '基本食'
-                elif require.picking_type_code == '02':
-                    dict['type'] = '嚥下食'
-                elif require.picking_type_code == '03':
-                    dict['type'] = '汁・汁具'
-                elif require.picking_type_code == '04':
-                    dict['type'] = '原体'
-                dict['picking_phase'] = 'ピッキング指示書と中袋' if phase == '中袋' else '配送用ダンボールと中袋'
-                dict['warning'] = '読み取り件数不足'
-                dict['unit_number'] = require.unit_number
-                dict['unit_name'] = require.short_name
-                dict['order_count'] = require.order_count
-                dict['package_count'] = require.package_count
-                dict['meal_name'] = require.meal_name
-                object_list.append(dict)
-
-        return object_list
+        # 照合結果は、読み取り結果のアップロードがあるまで再利用する
+        reconciliation = PickingReconciliation.get(cooking_day, picking_day)
+        return reconciliation.get_records(picking_filter)
 
     def get_label_list(self, object_list):
         # 結果最大数分の反映
@@ -6728,6 +6452,8 @@ class PickingHistoriesView(PickingResultView):
         messages.success(request, '備考欄入力内容を登録しました。')
         return self.render_to_response(context)
 
+# ピッキング指示書を複数プロセスで出力する場合、子プロセスからDBを参照するため、リクエストをトランザクションにしない
+@transaction.non_atomic_requests
 def picking_output_view(request):
     if not request.user.is_staff:
         return HttpResponse('このページは表示できません', status=500)
@@ -6746,7 +6472,7 @@ def picking_output_view(request):
             management = PickingDirectionOutputManagement(form.cleaned_data['cooking_date'], chiller_list)
             management.write_directions(picking_type)
 
-            messages.success(request, '出力が完了しました')
+            messages.success(request, f'出力が完了しました(処理時間:{management.elapsed_seconds:.1f}秒)')
         else:
             messages.error(request, '施設番号の入力が不正です。')
     else:
@@ -6886,12 +6612,9 @@ def seal_csv_output_view(request):
             eating_dict = EatingManagement.get_meals_dict_by_cooking_day(cooking_date)
             inner_package_manager = InnerPackageManagement(eating_dict)
             unit_count_list = []
-            if input_meal == '01':
-                ReqirePickingPackage.objects.filter(cooking_day=cooking_date, meal_name='朝食').delete()
-            elif input_meal == '02':
-                ReqirePickingPackage.objects.filter(cooking_day=cooking_date, meal_name='昼食').delete()
-            else:
-                ReqirePickingPackage.objects.filter(cooking_day=cooking_date, meal_name='夕食').delete()
+
+            # 照合が必要な中袋は、計算後にまとめて登録する
+            require_packages = []
 
             order_def_dict_list = [{}]
 
@@ -6931,7 +6654,7 @@ def seal_csv_output_view(request):
 
                 has_soup = inner_package_manager.has_soup(cooking_date, eating_day, meal_name)
                 has_mixrice = inner_package_manager.has_mix_rice(cooking_date, eating_day, meal_name)
-                has_miso_soup = inner_package_manager.has_plate_miso_soup(eating_day, meal_name)
+                has_miso_soup = inner_package_manager.has_plate_miso_soup(eating_day, meal_name, cooking_date)
                 raw_plates = inner_package_manager.get_raw_plates(cooking_date, eating_day, meal_name)
 
                 mixrice_basic_count = 0
@@ -6963,7 +6686,7 @@ def seal_csv_output_view(request):
                             else:
                                 logger.info(f'嚥下情報追加:{dict_m}')
                                 unit_count_list.append(dict_m)
-                            ReqirePickingPackage.objects.create(
+                            require_packages.append(ReqirePickingPackage(
                                 unit_number=prev_unit[0],
                                 short_name=prev_unit[1],
                                 cooking_day=cooking_date,
@@ -6972,7 +6695,7 @@ def seal_csv_output_view(request):
                                 picking_type_code='02',
                                 order_count=enge_count,
                                 package_count=package_count
-                            )
+                            ))
 
                             # 汁・汁具の登録
                             if has_soup:
@@ -7002,7 +6725,7 @@ def seal_csv_output_view(request):
                                 unit_count_list.append(dict_m)
 
                             if soup_count:
-                                ReqirePickingPackage.objects.create(
+                                require_packages.append(ReqirePickingPackage(
                                     unit_number=prev_unit[0],
                                     short_name=prev_unit[1],
                                     cooking_day=cooking_date,
@@ -7011,7 +6734,7 @@ def seal_csv_output_view(request):
                                     picking_type_code='03',
                                     order_count=soup_count,
                                     package_count=package_count
-                                )
+                                ))
                                 logger.debug(f'{prev_unit[0]}.{prev_unit[1]}:{soup_count}(base:{basic_count},enge:{enge_count})')
 
                             # 原体の計算
@@ -7052,7 +6775,7 @@ def seal_csv_output_view(request):
                                 logger.info(f'原体追加:{dict_m}')
                                 unit_count_list.append(dict_m)
                             if has_raw_plate:
-                                ReqirePickingPackage.objects.create(
+                                require_packages.append(ReqirePickingPackage(
                                     unit_number=prev_unit[0],
                                     short_name=prev_unit[1],
                                     cooking_day=cooking_date,
@@ -7061,7 +6784,7 @@ def seal_csv_output_view(request):
                                     picking_type_code='04',
                                     order_count=1,
                                     package_count=1
-                                )
+                                ))
 
                             # サンシティ(混ぜご飯用)の対応(集計)
                             if has_mixrice and input_meal == '02':
@@ -7078,7 +6801,7 @@ def seal_csv_output_view(request):
                                             pass
                                         else:
                                             unit_count_list.append(dict_m)
-                                        ReqirePickingPackage.objects.create(
+                                        require_packages.append(ReqirePickingPackage(
                                             unit_number=prev_unit[0],
                                             short_name=prev_unit[1],
                                             cooking_day=cooking_date,
@@ -7087,7 +6810,7 @@ def seal_csv_output_view(request):
                                             picking_type_code='01',
                                             order_count=mixrice_basic_count,
                                             package_count=package_count
-                                        )
+                                        ))
 
                                         # 嚥下食
                                         package_count = math.ceil(
@@ -7099,7 +6822,7 @@ def seal_csv_output_view(request):
                                             pass
                                         else:
                                             unit_count_list.append(dict_m)
-                                        ReqirePickingPackage.objects.create(
+                                        require_packages.append(ReqirePickingPackage(
                                             unit_number=prev_unit[0],
                                             short_name=prev_unit[1],
                                             cooking_day=cooking_date,
@@ -7108,7 +6831,7 @@ def seal_csv_output_view(request):
                                             picking_type_code='02',
                                             order_count=mixrice_enge_count,
                                             package_count=package_count
-                                        )
+                                        ))
 
                             basic_count = 0
                             enge_count = 0
@@ -7130,7 +6853,7 @@ def seal_csv_output_view(request):
                             pass
                         else:
                             unit_count_list.append(dict_m)
-                        ReqirePickingPackage.objects.create(
+                        require_packages.append(ReqirePickingPackage(
                             unit_number=data['unit_number'],
                             short_name=data['short_name'],
                             cooking_day=cooking_date,
@@ -7139,7 +6862,7 @@ def seal_csv_output_view(request):
                             picking_type_code='01',
                             order_count=basic_count,
                             package_count=package_count
-                        )
+                        ))
                     else:
                         # 嚥下の加算
                         enge_count += data['quantity']
@@ -7157,7 +6880,7 @@ def seal_csv_output_view(request):
                 else:
                     logger.info(f'嚥下情報追加:{dict_m}')
                     unit_count_list.append(dict_m)
-                ReqirePickingPackage.objects.create(
+                require_packages.append(ReqirePickingPackage(
                     unit_number=prev_unit[0],
                     short_name=prev_unit[1],
                     cooking_day=cooking_date,
@@ -7166,7 +6889,7 @@ def seal_csv_output_view(request):
                     picking_type_code='02',
                     order_count=enge_count,
                     package_count=package_count
-                )
+                ))
 
                 # 汁・汁具の登録
                 if prev_tpl[0]:
@@ -7192,7 +6915,7 @@ def seal_csv_output_view(request):
                     unit_count_list.append(dict_m)
 
                 if soup_count:
-                    ReqirePickingPackage.objects.create(
+                    require_packages.append(ReqirePickingPackage(
                         unit_number=prev_unit[0],
                         short_name=prev_unit[1],
                         cooking_day=cooking_date,
@@ -7201,7 +6924,7 @@ def seal_csv_output_view(request):
                         picking_type_code='03',
                         order_count=soup_count,
                         package_count=package_count
-                    )
+                    ))
 
                 # 原体の計算
                 has_raw_plate = False
@@ -7240,7 +6963,7 @@ def seal_csv_output_view(request):
                 else:
                     unit_count_list.append(dict_m)
                 if has_raw_plate:
-                    ReqirePickingPackage.objects.create(
+                    require_packages.append(ReqirePickingPackage(
                         unit_number=prev_unit[0],
                         short_name=prev_unit[1],
                         cooking_day=cooking_date,
@@ -7249,7 +6972,7 @@ def seal_csv_output_view(request):
                         picking_type_code='04',
                         order_count=1,
                         package_count=1
-                    )
+                    ))
 
                 # サンシティ(混ぜご飯用)の対応(集計)
                 if has_mixrice and input_meal == '02':
@@ -7266,7 +6989,7 @@ def seal_csv_output_view(request):
                                 pass
                             else:
                                 unit_count_list.append(dict_m)
-                            ReqirePickingPackage.objects.create(
+                            require_packages.append(ReqirePickingPackage(
                                 unit_number=prev_unit[0],
                                 short_name=prev_unit[1],
                                 cooking_day=cooking_date,
@@ -7275,7 +6998,7 @@ def seal_csv_output_view(request):
                                 picking_type_code='01',
                                 order_count=mixrice_basic_count,
                                 package_count=package_count
-                            )
+                            ))
 
                             # 嚥下食
                             package_count = math.ceil(
@@ -7287,7 +7010,7 @@ def seal_csv_output_view(request):
                                 pass
                             else:
                                 unit_count_list.append(dict_m)
-                            ReqirePickingPackage.objects.create(
+                            require_packages.append(ReqirePickingPackage(
                                 unit_number=prev_unit[0],
                                 short_name=prev_unit[1],
                                 cooking_day=cooking_date,
@@ -7296,7 +7019,17 @@ def seal_csv_output_view(request):
                                 picking_type_code='02',
                                 order_count=mixrice_enge_count,
                                 package_count=package_count
-                            )
+                            ))
+
+            with transaction.atomic():
+                if input_meal == '01':
+                    ReqirePickingPackage.objects.filter(cooking_day=cooking_date, meal_name='朝食').delete()
+                elif input_meal == '02':
+                    ReqirePickingPackage.objects.filter(cooking_day=cooking_date, meal_name='昼食').delete()
+                else:
+                    ReqirePickingPackage.objects.filter(cooking_day=cooking_date, meal_name='夕食').delete()
+                ReqirePickingPackage.objects.bulk_create(require_packages, batch_size=500)
+            logger.info(f'照合が必要な中袋登録:{len(require_packages)}件')
 
             count_df = pd.DataFrame(data=unit_count_list)
             count_df.to_csv("tmp/Seal-1-pre.csv", index=False, header=False, encoding='cp932')